@@ -0,0 +1,151 @@
+"""
+Background health prober for upstream services.
+
+All upstreams are probed concurrently on a fixed interval over their pooled
+clients, so one hung dependency costs at most ``timeout`` per round instead
+of stalling the others. The last known state is kept in memory and
+``/services/health`` answers from it without touching the network. State
+changes are pushed into the resilience engine so requests to an upstream
+that is known to be down fail fast.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import structlog
+from prometheus_client import Gauge, Histogram
+
+from .resilience import ResilienceEngine
+from .transport import UpstreamTransport
+
+logger = structlog.get_logger("api-gateway")
+
+upstream_up = Gauge(
+    'api_gateway_upstream_up',
+    'Last probe result per upstream (1=healthy, 0=not healthy)',
+    ['service']
+)
+upstream_probe_duration = Histogram(
+    'api_gateway_upstream_probe_seconds',
+    'Upstream /health probe latency',
+    ['service'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+
+class ServiceHealth:
+    """Last-known state of one upstream"""
+
+    def __init__(self, name: str, window: int = 60):
+        self.name = name
+        self.status = "unknown"
+        self.last_checked: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.latency_ms: Optional[float] = None
+        self.consecutive_failures = 0
+        self.error: Optional[str] = None
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "last_checked": self.last_checked,
+            "last_change": self.last_change,
+            "latency_ms": self.latency_ms,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "consecutive_failures": self.consecutive_failures,
+            "error": self.error,
+        }
+
+
+class HealthProber:
+    """Probes every upstream concurrently and keeps the results in memory"""
+
+    def __init__(
+        self,
+        transport: UpstreamTransport,
+        resilience: ResilienceEngine,
+        interval: float = 10.0,
+        timeout: float = 2.0,
+        down_after: int = 3
+    ):
+        self.transport = transport
+        self.resilience = resilience
+        self.interval = interval
+        self.timeout = timeout
+        self.down_after = down_after
+        self.services: Dict[str, ServiceHealth] = {name: ServiceHealth(name) for name in transport.pools}
+        # Pre-built responses so the endpoint is a dict lookup
+        self.summary: Dict[str, str] = {name: "unknown" for name in self.services}
+        self.details: Dict[str, Dict[str, Any]] = {name: s.to_dict() for name, s in self.services.items()}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error("Health probe round failed", error=str(e))
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self._probe(name) for name in self.services))
+        self.summary = {name: s.status for name, s in self.services.items()}
+        self.details = {name: s.to_dict() for name, s in self.services.items()}
+
+    async def _probe(self, name: str) -> None:
+        health = self.services[name]
+        pool = self.transport.get(name)
+        start = time.perf_counter()
+        status, error = "healthy", None
+        try:
+            response = await asyncio.wait_for(pool.client.get("/health", timeout=self.timeout), self.timeout)
+            if response.status_code != 200:
+                status, error = "unhealthy", f"HTTP {response.status_code}"
+        except Exception as e:
+            status, error = "unreachable", str(e) or type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        upstream_probe_duration.labels(service=name).observe(elapsed)
+        health.latencies.append(round(elapsed * 1000, 2))
+        health.latency_ms = round(elapsed * 1000, 2)
+        health.last_checked = time.time()
+        health.error = error
+
+        if status == "healthy":
+            if health.consecutive_failures >= self.down_after:
+                logger.info("Upstream recovered", service=name)
+                self.resilience.mark_up(name)
+            health.consecutive_failures = 0
+        else:
+            health.consecutive_failures += 1
+            if health.consecutive_failures == self.down_after:
+                logger.warning("Upstream marked down", service=name, error=error)
+            if health.consecutive_failures >= self.down_after:
+                self.resilience.mark_down(name)
+
+        if status != health.status:
+            health.last_change = health.last_checked
+        health.status = status
+        upstream_up.labels(service=name).set(1 if status == "healthy" else 0)
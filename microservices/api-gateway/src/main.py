@@ -6,12 +6,20 @@ import structlog
 from typing import Any, Dict
 import consul
 import asyncio
-from circuitbreaker import circuit
-from tenacity import retry, stop_after_attempt, wait_exponential
+import hashlib
+import time
 import os
 import logging
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from starlette.responses import Response
+from .transport import UpstreamTransport, stream_response
+from .resilience import ResilienceEngine, CircuitOpenError, DeadlineExceededError
+from .health import HealthProber
+from shared.token_verifier import TokenVerifier
+from .response_cache import (
+    ResponseCache, CachePolicy, CacheEntry, INVALIDATE_HEADER, cache_requests_total,
+    has_permissions, etag_matches, entry_response, not_modified_response
+)
 try:
     from .logging_config import LOGGING_MESSAGES, ERROR_MESSAGES, INFO_MESSAGES, DEBUG_MESSAGES, WARNING_MESSAGES
 except ImportError:
@@ -55,6 +63,39 @@ class Settings(BaseSettings):
     carrier_integration_service_url: str = "http://carrier-integration-service:8009"
     consul_host: str = "consul"
     consul_port: int = 8500
+    redis_url: str = "redis://redis:6379/10"
+    # Token verification for cached routes (must match auth-service)
+    jwt_secret_key: str = "your-super-secret-jwt-key-change-in-production"
+    jwt_algorithm: str = "HS256"
+    token_cache_ttl_seconds: int = 300
+    token_revocation_channel: str = "auth:token-revocations"
+    # Response cache
+    response_cache_enabled: bool = True
+    response_cache_l1_max_entries: int = 5000
+    response_cache_channel: str = "gateway:cache-invalidations"
+    # Upstream connection pooling
+    upstream_max_connections: int = 100
+    upstream_max_keepalive_connections: int = 20
+    upstream_keepalive_expiry: float = 30.0
+    upstream_connect_timeout: float = 5.0
+    upstream_read_timeout: float = 30.0
+    upstream_http2: bool = True
+    # Per-service overrides of upstream_max_connections, e.g. {"analytics": 20}
+    upstream_connection_limits: Dict[str, int] = {}
+    # Resilience: end-to-end deadline, retries and per-upstream breakers
+    request_deadline_seconds: float = 30.0
+    # Per-service deadline overrides, e.g. {"analytics": 60}
+    request_deadline_overrides: Dict[str, float] = {}
+    retry_max_attempts: int = 3
+    retry_budget_ratio: float = 0.2
+    retry_budget_min_per_second: float = 5.0
+    circuit_failure_threshold: int = 5
+    circuit_recovery_timeout: float = 30.0
+    # Background upstream health probing
+    health_probe_interval: float = 10.0
+    health_probe_timeout: float = 2.0
+    # Consecutive failed probes before an upstream's breaker is tripped
+    health_probe_down_after: int = 3
     
 settings = Settings()
 
@@ -103,57 +144,131 @@ service_registry = {
     "auth": settings.auth_service_url,
 }
 
-# Circuit breaker decorator
-@circuit(failure_threshold=5, recovery_timeout=30)
-async def make_service_request(service_url: str, path: str, method: str = "GET", **kwargs):
+upstream_transport = UpstreamTransport(
+    service_registry,
+    max_connections=settings.upstream_max_connections,
+    max_keepalive_connections=settings.upstream_max_keepalive_connections,
+    keepalive_expiry=settings.upstream_keepalive_expiry,
+    connect_timeout=settings.upstream_connect_timeout,
+    read_timeout=settings.upstream_read_timeout,
+    http2=settings.upstream_http2,
+    connection_limits=settings.upstream_connection_limits
+)
+
+resilience_engine = ResilienceEngine(
+    upstream_transport,
+    deadline_seconds=settings.request_deadline_seconds,
+    deadline_overrides=settings.request_deadline_overrides,
+    max_attempts=settings.retry_max_attempts,
+    failure_threshold=settings.circuit_failure_threshold,
+    recovery_timeout=settings.circuit_recovery_timeout,
+    retry_budget_ratio=settings.retry_budget_ratio,
+    retry_budget_min_per_second=settings.retry_budget_min_per_second
+)
+
+health_prober = HealthProber(
+    upstream_transport,
+    resilience_engine,
+    interval=settings.health_probe_interval,
+    timeout=settings.health_probe_timeout,
+    down_after=settings.health_probe_down_after
+)
+
+token_verifier = TokenVerifier(
+    auth_service_url=settings.auth_service_url,
+    secret_key=settings.jwt_secret_key,
+    algorithm=settings.jwt_algorithm,
+    redis_url=settings.redis_url,
+    revocation_channel=settings.token_revocation_channel,
+    cache_ttl=settings.token_cache_ttl_seconds
+)
+
+response_cache = ResponseCache(
+    settings.redis_url,
+    channel=settings.response_cache_channel,
+    l1_max_entries=settings.response_cache_l1_max_entries
+)
+
+# Read-heavy routes served through the response cache, keyed by route template.
+# Permissions mirror the owning service; tags are invalidated by the owning
+# service's write endpoints through the X-Cache-Invalidate response header.
+cache_policies = {
+    "/api/v1/countries": CachePolicy(ttl=3600, stale_ttl=86400, tags=["countries"]),
+    "/api/v1/carriers": CachePolicy(ttl=3600, stale_ttl=86400, tags=["carriers"]),
+    "/api/v1/territories": CachePolicy(
+        ttl=300, stale_ttl=3600, permissions=["territories:read"], tags=["territories"]
+    ),
+    "/api/v1/territories/{territory_code}": CachePolicy(
+        ttl=300, stale_ttl=3600, permissions=["territories:read"], tags=["territories"]
+    ),
+    "/api/v1/products": CachePolicy(ttl=60, stale_ttl=600, scope="company", tags=["products"]),
+    "/api/v1/products/{product_id}": CachePolicy(
+        ttl=60, stale_ttl=600, scope="company", permissions=["products:read"],
+        tags=["products", "product:{product_id}"]
+    ),
+    "/api/v1/franchises/{franchise_id}/performance": CachePolicy(
+        ttl=300, stale_ttl=1800, permissions=["franchises:read"],
+        tags=["franchise:{franchise_id}"]
+    ),
+}
+
+# Response headers never stored with a cached body (aread() already decoded it)
+UNCACHED_HEADERS = frozenset({
+    "connection", "keep-alive", "transfer-encoding", "content-length",
+    "content-encoding", "date", "set-cookie", "etag", "x-cache-invalidate",
+})
+
+async def make_service_request(service_name: str, path: str, method: str = "GET", **kwargs):
+    pool = upstream_transport.get(service_name)
     start_time = asyncio.get_event_loop().time()
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            logger.debug(
-                DEBUG_MESSAGES["AGW_D001"]["message"].format(request_id=f"{method}_{path}", client_ip=service_url),
-                **DEBUG_MESSAGES["AGW_D001"]
-            )
-            response = await client.request(method, f"{service_url}{path}", **kwargs)
-            response_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
-            
-            logger.debug(
-                DEBUG_MESSAGES["AGW_D006"]["message"].format(
-                    service_name=service_url.split("//")[1].split(":")[0], 
-                    status_code=response.status_code, 
+        logger.debug(
+            DEBUG_MESSAGES["AGW_D001"]["message"].format(request_id=f"{method}_{path}", client_ip=pool.base_url),
+            **DEBUG_MESSAGES["AGW_D001"]
+        )
+        response = await resilience_engine.send(service_name, method, path, **kwargs)
+        response_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
+        
+        logger.debug(
+            DEBUG_MESSAGES["AGW_D006"]["message"].format(
+                service_name=service_name, 
+                status_code=response.status_code, 
+                response_time=response_time
+            ),
+            **DEBUG_MESSAGES["AGW_D006"]
+        )
+        
+        if response_time > 2000:  # Log warning for slow responses
+            logger.warning(
+                WARNING_MESSAGES["AGW_W001"]["message"].format(
+                    service_name=service_name, 
                     response_time=response_time
                 ),
-                **DEBUG_MESSAGES["AGW_D006"]
+                **WARNING_MESSAGES["AGW_W001"]
             )
-            
-            if response_time > 2000:  # Log warning for slow responses
-                logger.warning(
-                    WARNING_MESSAGES["AGW_W001"]["message"].format(
-                        service_name=service_url.split("//")[1].split(":")[0], 
-                        response_time=response_time
-                    ),
-                    **WARNING_MESSAGES["AGW_W001"]
-                )
-            
-            response.raise_for_status()
-            return response.json()
-    except httpx.TimeoutException as e:
+        
+        return response
+    except CircuitOpenError:
+        logger.error(
+            ERROR_MESSAGES["AGW_E006"]["message"].format(service_name=service_name),
+            **ERROR_MESSAGES["AGW_E006"]
+        )
+        raise
+    except (httpx.TimeoutException, DeadlineExceededError) as e:
         logger.error(
-            ERROR_MESSAGES["AGW_E003"]["message"].format(service_name=service_url.split("//")[1].split(":")[0]),
+            ERROR_MESSAGES["AGW_E003"]["message"].format(service_name=service_name),
             **ERROR_MESSAGES["AGW_E003"]
         )
         raise
     except Exception as e:
         logger.error(
-            ERROR_MESSAGES["AGW_E002"]["message"].format(service_name=service_url.split("//")[1].split(":")[0]),
+            ERROR_MESSAGES["AGW_E002"]["message"].format(service_name=service_name),
             **ERROR_MESSAGES["AGW_E002"]
         )
         raise
 
-# Retry decorator for resilience
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-async def resilient_request(service_name: str, path: str, method: str = "GET", **kwargs):
-    service_url = service_registry.get(service_name)
-    if not service_url:
+async def fetch_upstream(service_name: str, path: str, method: str = "GET", **kwargs) -> httpx.Response:
+    if service_name not in service_registry:
         logger.error(
             ERROR_MESSAGES["AGW_E002"]["message"].format(service_name=service_name),
             **ERROR_MESSAGES["AGW_E002"]
@@ -165,8 +280,15 @@ async def resilient_request(service_name: str, path: str, method: str = "GET", *
             INFO_MESSAGES["AGW_I002"]["message"].format(service_name=service_name, method=method, path=path),
             **INFO_MESSAGES["AGW_I002"]
         )
-        result = await make_service_request(service_url, path, method, **kwargs)
-        return result
+        return await make_service_request(service_name, path, method, **kwargs)
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service {service_name} unavailable",
+            headers={"Retry-After": str(max(1, int(e.retry_after)))}
+        )
+    except DeadlineExceededError:
+        raise HTTPException(status_code=504, detail=f"Service {service_name} timed out")
     except Exception as e:
         logger.error(
             ERROR_MESSAGES["AGW_E002"]["message"].format(service_name=service_name),
@@ -175,6 +297,118 @@ async def resilient_request(service_name: str, path: str, method: str = "GET", *
         )
         raise HTTPException(status_code=503, detail=f"Service {service_name} unavailable")
 
+async def resilient_request(service_name: str, path: str, method: str = "GET", **kwargs):
+    response = await fetch_upstream(service_name, path, method, **kwargs)
+    
+    # Owning services name the cached data their writes touch
+    invalidate = response.headers.get(INVALIDATE_HEADER)
+    if invalidate and method != "GET" and response.status_code < 400:
+        await response_cache.invalidate(invalidate.split(","))
+    
+    return stream_response(response)
+
+async def cache_profile(request: Request, policy: CachePolicy):
+    """Verified profile of the caller if it may be served from cache, else None"""
+    authorization = request.headers.get("authorization", "")
+    if not settings.response_cache_enabled or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        profile = await token_verifier.verify(authorization[7:])
+    except HTTPException:
+        # Let the owning service produce the authoritative error
+        return None
+    if policy.permissions and not has_permissions(profile, policy.permissions):
+        return None
+    return profile
+
+def cache_scope(policy: CachePolicy, profile: Dict[str, Any]) -> str:
+    if policy.scope == "company":
+        return f"company:{profile.get('company_id')}"
+    if policy.scope == "user":
+        return f"user:{profile.get('id')}"
+    return "authenticated"
+
+async def fetch_cache_entry(
+    route: str, policy: CachePolicy, service_name: str, path: str,
+    tags: list, **kwargs
+) -> tuple:
+    """Fetch and buffer an upstream response; returns (entry, cacheable)"""
+    response = await fetch_upstream(service_name, path, "GET", **kwargs)
+    try:
+        body = await response.aread()
+    finally:
+        await response.aclose()
+    
+    etag = response.headers.get("etag") or f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    now = time.time()
+    entry = CacheEntry(
+        route=route,
+        status_code=response.status_code,
+        headers=[(k, v) for k, v in response.headers.multi_items() if k.lower() not in UNCACHED_HEADERS],
+        body=body,
+        etag=etag,
+        fresh_until=now + policy.ttl,
+        stale_until=now + policy.ttl + policy.stale_ttl,
+        tags=tags
+    )
+    cacheable = (
+        response.status_code == 200
+        and len(body) <= policy.max_body_bytes
+        and "no-store" not in response.headers.get("cache-control", "")
+        and "set-cookie" not in response.headers
+    )
+    return entry, cacheable
+
+async def cached_request(service_name: str, path: str, request: Request):
+    """GET through the response cache according to the route's CachePolicy"""
+    route = request.scope["route"].path
+    policy = cache_policies[route]
+    headers = dict(request.headers)
+    params = dict(request.query_params)
+    
+    profile = await cache_profile(request, policy)
+    if profile is None:
+        cache_requests_total.labels(route=route, result='bypass').inc()
+        return await resilient_request(service_name, path, headers=headers, params=params)
+    
+    key = response_cache.build_key(route, path, request.url.query, cache_scope(policy, profile))
+    tags = [tag.format(**request.path_params) for tag in policy.tags]
+    
+    # Conditional headers are answered by the gateway, not forwarded upstream
+    upstream_headers = {
+        k: v for k, v in headers.items() if k.lower() not in ("if-none-match", "if-modified-since")
+    }
+    
+    async def fetch():
+        entry, cacheable = await fetch_cache_entry(
+            route, policy, service_name, path, tags, headers=upstream_headers, params=params
+        )
+        return entry if cacheable else None
+    
+    entry, tier = await response_cache.get(key)
+    if entry is not None:
+        if entry.fresh_until <= time.time():
+            response_cache.refresh_in_background(key, fetch)
+            result, cache_status = "stale", "STALE"
+        else:
+            result, cache_status = ("hit" if tier == "l1" else "hit_l2"), "HIT"
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            cache_requests_total.labels(route=route, result='not_modified').inc()
+            return not_modified_response(entry)
+        cache_requests_total.labels(route=route, result=result).inc()
+        return entry_response(entry, cache_status)
+    
+    cache_requests_total.labels(route=route, result='miss').inc()
+    fetched_at = time.time()
+    entry, cacheable = await fetch_cache_entry(
+        route, policy, service_name, path, tags, headers=upstream_headers, params=params
+    )
+    if cacheable:
+        await response_cache.put(key, entry, fetched_at)
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return not_modified_response(entry)
+    return entry_response(entry, "MISS")
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": settings.service_name}
@@ -184,32 +418,9 @@ async def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.get("/services/health")
-async def check_all_services():
-    health_status = {}
-    for service_name, service_url in service_registry.items():
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{service_url}/health")
-                if response.status_code == 200:
-                    health_status[service_name] = "healthy"
-                    logger.info(
-                        INFO_MESSAGES["AGW_I003"]["message"].format(service_name=service_name),
-                        **INFO_MESSAGES["AGW_I003"]
-                    )
-                else:
-                    health_status[service_name] = "unhealthy"
-                    logger.warning(
-                        WARNING_MESSAGES["AGW_W002"]["message"].format(service_name=service_name),
-                        **WARNING_MESSAGES["AGW_W002"]
-                    )
-        except Exception as e:
-            health_status[service_name] = "unreachable"
-            logger.warning(
-                WARNING_MESSAGES["AGW_W002"]["message"].format(service_name=service_name),
-                **WARNING_MESSAGES["AGW_W002"],
-                error_details=str(e)
-            )
-    return health_status
+async def check_all_services(verbose: bool = False):
+    # Served from the background prober's last round; never blocks on upstreams
+    return health_prober.details if verbose else health_prober.summary
 
 # Authentication endpoints
 @app.post("/api/v1/auth/login")
@@ -357,14 +568,11 @@ async def get_customer_analytics(request: Request):
 # Product endpoints
 @app.get("/api/v1/products")
 async def list_products(request: Request):
-    headers = dict(request.headers)
-    params = dict(request.query_params)
-    return await resilient_request("order", "/api/v1/products", headers=headers, params=params)
+    return await cached_request("order", "/api/v1/products", request)
 
 @app.get("/api/v1/products/{product_id}")
 async def get_product(product_id: str, request: Request):
-    headers = dict(request.headers)
-    return await resilient_request("order", f"/api/v1/products/{product_id}", headers=headers)
+    return await cached_request("order", f"/api/v1/products/{product_id}", request)
 
 @app.post("/api/v1/products")
 async def create_product(request: Request):
@@ -553,9 +761,7 @@ async def validate_shipping(request: Request):
 # Countries endpoints
 @app.get("/api/v1/countries")
 async def list_countries(request: Request):
-    headers = dict(request.headers)
-    params = dict(request.query_params)
-    return await resilient_request("international-shipping", "/api/v1/countries", headers=headers, params=params)
+    return await cached_request("international-shipping", "/api/v1/countries", request)
 
 @app.post("/api/v1/countries")
 async def create_country(request: Request):
@@ -566,9 +772,7 @@ async def create_country(request: Request):
 # Carriers endpoints
 @app.get("/api/v1/carriers")
 async def list_carriers(request: Request):
-    headers = dict(request.headers)
-    params = dict(request.query_params)
-    return await resilient_request("international-shipping", "/api/v1/carriers", headers=headers, params=params)
+    return await cached_request("international-shipping", "/api/v1/carriers", request)
 
 @app.post("/api/v1/carriers")
 async def create_carrier(request: Request):
@@ -761,21 +965,16 @@ async def update_franchise_status(franchise_id: str, request: Request):
 # Territory Management endpoints
 @app.get("/api/v1/territories")
 async def list_territories(request: Request):
-    headers = dict(request.headers)
-    params = dict(request.query_params)
-    return await resilient_request("franchise", "/api/v1/territories", headers=headers, params=params)
+    return await cached_request("franchise", "/api/v1/territories", request)
 
 @app.get("/api/v1/territories/{territory_code}")
 async def get_territory(territory_code: str, request: Request):
-    headers = dict(request.headers)
-    return await resilient_request("franchise", f"/api/v1/territories/{territory_code}", headers=headers)
+    return await cached_request("franchise", f"/api/v1/territories/{territory_code}", request)
 
 # Performance Tracking endpoints
 @app.get("/api/v1/franchises/{franchise_id}/performance")
 async def get_franchise_performance(franchise_id: str, request: Request):
-    headers = dict(request.headers)
-    params = dict(request.query_params)
-    return await resilient_request("franchise", f"/api/v1/franchises/{franchise_id}/performance", headers=headers, params=params)
+    return await cached_request("franchise", f"/api/v1/franchises/{franchise_id}/performance", request)
 
 # Service Discovery Registration
 async def register_with_consul():
@@ -799,6 +998,9 @@ async def register_with_consul():
 @app.on_event("startup")
 async def startup_event():
     await register_with_consul()
+    await token_verifier.start()
+    await response_cache.start()
+    await health_prober.start()
     logger.info(
         INFO_MESSAGES["AGW_I001"]["message"].format(port=8000),
         **INFO_MESSAGES["AGW_I001"]
@@ -806,6 +1008,10 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await health_prober.stop()
+    await response_cache.stop()
+    await token_verifier.stop()
+    await upstream_transport.close()
     c = consul.Consul(host=settings.consul_host, port=settings.consul_port)
     try:
         c.agent.service.deregister(f"{settings.service_name}-1")
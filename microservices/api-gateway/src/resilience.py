@@ -0,0 +1,292 @@
+"""
+Per-upstream resilience for the API Gateway.
+
+Every upstream service gets its own circuit breaker and retry budget so a
+failing service only sheds its own traffic. Retries are limited to requests
+that are safe to repeat (idempotent methods, requests carrying an
+``Idempotency-Key``, or attempts that never reached the upstream) and every
+request runs against a deadline that is propagated downstream in the
+``X-Request-Deadline`` header (absolute Unix time in milliseconds).
+"""
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+import structlog
+from prometheus_client import Counter, Gauge
+
+from .transport import UpstreamTransport
+
+logger = structlog.get_logger("api-gateway")
+
+DEADLINE_HEADER = "X-Request-Deadline"
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Failures where the request provably never reached the upstream
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+circuit_state = Gauge(
+    'api_gateway_circuit_state',
+    'Circuit breaker state per upstream (0=closed, 1=half_open, 2=open)',
+    ['service']
+)
+circuit_rejections_total = Counter(
+    'api_gateway_circuit_rejections_total',
+    'Requests rejected without contacting the upstream',
+    ['service', 'reason']
+)
+upstream_retries_total = Counter(
+    'api_gateway_upstream_retries_total',
+    'Retried upstream attempts',
+    ['service']
+)
+retry_budget_exhausted_total = Counter(
+    'api_gateway_retry_budget_exhausted_total',
+    'Retries skipped because the retry budget was exhausted',
+    ['service']
+)
+deadline_exceeded_total = Counter(
+    'api_gateway_deadline_exceeded_total',
+    'Requests that ran out of deadline',
+    ['service']
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised when the upstream's breaker is open"""
+
+    def __init__(self, service_name: str, retry_after: float):
+        super().__init__(f"Circuit open for {service_name}")
+        self.service_name = service_name
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's deadline expires before the upstream answers"""
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open single trial"""
+
+    def __init__(self, service_name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.service_name = service_name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        circuit_state.labels(service=service_name).set(STATE_VALUES["closed"])
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.info("Circuit state change", service=self.service_name, old_state=self.state, new_state=state)
+        self.state = state
+        circuit_state.labels(service=self.service_name).set(STATE_VALUES[state])
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def allow_request(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if self.retry_after() > 0:
+                return False
+            self._set_state("half_open")
+        # half-open: let exactly one trial through
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial that ended without a verdict on the upstream"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        self._set_state("closed")
+
+    def record_failure(self) -> None:
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state("open")
+
+    def trip(self) -> None:
+        """Open immediately (e.g. on external evidence the upstream is down)"""
+        self._trial_in_flight = False
+        self.opened_at = time.monotonic()
+        self._set_state("open")
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent traffic.
+
+    Each first attempt deposits ``ratio`` tokens and each retry withdraws
+    one, so under a full outage retries add at most ``ratio`` extra load.
+    ``min_per_second`` keeps low-traffic services retryable.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 5.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def record_request(self) -> None:
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+def is_retryable(method: str, headers: Optional[Dict[str, str]]) -> bool:
+    """Whether a request may be repeated after it reached the upstream"""
+    if method.upper() in IDEMPOTENT_METHODS:
+        return True
+    return any(k.lower() == IDEMPOTENCY_KEY_HEADER.lower() for k in (headers or {}))
+
+
+class ResilienceEngine:
+    """Sends proxied requests through per-upstream breakers, budgets and deadlines"""
+
+    def __init__(
+        self,
+        transport: UpstreamTransport,
+        deadline_seconds: float = 30.0,
+        deadline_overrides: Optional[Dict[str, float]] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        retry_budget_ratio: float = 0.2,
+        retry_budget_min_per_second: float = 5.0
+    ):
+        self.transport = transport
+        self.deadline_seconds = deadline_seconds
+        self.deadline_overrides = deadline_overrides or {}
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breakers = {
+            name: CircuitBreaker(name, failure_threshold, recovery_timeout)
+            for name in transport.pools
+        }
+        self.budgets = {
+            name: RetryBudget(retry_budget_ratio, retry_budget_min_per_second)
+            for name in transport.pools
+        }
+
+    def mark_down(self, service_name: str) -> None:
+        """Fail fast for an upstream the health prober considers down"""
+        breaker = self.breakers.get(service_name)
+        if breaker is not None:
+            breaker.trip()
+
+    def mark_up(self, service_name: str) -> None:
+        """Close the breaker once the health prober sees the upstream recover"""
+        breaker = self.breakers.get(service_name)
+        if breaker is not None and breaker.state != "closed":
+            breaker.record_success()
+
+    def _deadline_for(self, service_name: str, headers: Dict[str, str]) -> float:
+        """Absolute deadline (epoch seconds), tightened by a caller-supplied one"""
+        deadline = time.time() + self.deadline_overrides.get(service_name, self.deadline_seconds)
+        for key, value in headers.items():
+            if key.lower() == DEADLINE_HEADER.lower():
+                try:
+                    deadline = min(deadline, int(value) / 1000)
+                except ValueError:
+                    pass
+        return deadline
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps synchronized clients from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def send(self, service_name: str, method: str, path: str, **kwargs) -> httpx.Response:
+        pool = self.transport.get(service_name)
+        breaker = self.breakers[service_name]
+        budget = self.budgets[service_name]
+
+        incoming = kwargs.pop("headers", None) or {}
+        deadline = self._deadline_for(service_name, incoming)
+        headers = {k: v for k, v in incoming.items() if k.lower() != DEADLINE_HEADER.lower()}
+        headers[DEADLINE_HEADER] = str(int(deadline * 1000))
+        retryable = is_retryable(method, headers)
+
+        budget.record_request()
+        attempt = 0
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                deadline_exceeded_total.labels(service=service_name).inc()
+                raise DeadlineExceededError(f"Deadline exceeded calling {service_name}")
+
+            if not breaker.allow_request():
+                circuit_rejections_total.labels(service=service_name, reason='circuit_open').inc()
+                raise CircuitOpenError(service_name, breaker.retry_after())
+
+            attempt += 1
+            error: Optional[Exception] = None
+            response: Optional[httpx.Response] = None
+            try:
+                response = await pool.send(method, path, headers=headers, timeout=remaining, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                # Cancelled (caller disconnected) or failed before an answer: a half-open
+                # breaker must not keep waiting for a trial that will never report back
+                breaker.release_trial()
+                raise
+
+            if error is None and response.status_code < 500:
+                breaker.record_success()
+                return response
+
+            breaker.record_failure()
+            may_repeat = retryable or isinstance(error, NOT_SENT_ERRORS)
+            if attempt >= self.max_attempts or not may_repeat:
+                break
+            if not budget.try_spend():
+                retry_budget_exhausted_total.labels(service=service_name).inc()
+                break
+
+            delay = self._backoff(attempt)
+            if time.time() + delay >= deadline:
+                break
+            if response is not None:
+                await response.aclose()
+            upstream_retries_total.labels(service=service_name).inc()
+            logger.info("Retrying upstream request", service=service_name, method=method,
+                        path=path, attempt=attempt + 1, error=str(error) if error else response.status_code)
+            await asyncio.sleep(delay)
+
+        if error is not None:
+            if isinstance(error, httpx.TimeoutException) and deadline - time.time() <= 0:
+                deadline_exceeded_total.labels(service=service_name).inc()
+                raise DeadlineExceededError(f"Deadline exceeded calling {service_name}") from error
+            raise error
+        # Relay the upstream's own 5xx rather than masking it
+        return response
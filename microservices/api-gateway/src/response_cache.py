@@ -0,0 +1,358 @@
+"""
+Response cache for read-heavy gateway routes.
+
+Two tiers: a per-worker in-process LRU (L1) in front of Redis (L2) shared by
+all gateway workers. Keys vary by route, path, query string and the caller's
+scope (shared for all authenticated users, per company or per user), and a
+cached response is only served after the caller's token has been verified
+and any permissions the route requires have been checked.
+
+Entries carry an ETag (``If-None-Match`` is answered with 304), a fresh TTL
+and a stale window during which the stale body is served while a single
+background refresh runs. Invalidation is tag based: owning services name the
+tags their write endpoints touch in an ``X-Cache-Invalidate`` response header
+and the gateway drops the tagged L2 entries and broadcasts the tags so every
+worker drops its L1 copies.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import redis.asyncio as redis
+import structlog
+from prometheus_client import Counter
+from starlette.responses import Response
+
+logger = structlog.get_logger("api-gateway")
+
+INVALIDATE_HEADER = "X-Cache-Invalidate"
+
+cache_requests_total = Counter(
+    'api_gateway_cache_requests_total',
+    'Cache lookups per route by result (hit, hit_l2, stale, miss, bypass, not_modified)',
+    ['route', 'result']
+)
+cache_evictions_total = Counter(
+    'api_gateway_cache_evictions_total',
+    'Cache entries evicted per route by reason (tag, lru)',
+    ['route', 'reason']
+)
+cache_invalidations_total = Counter(
+    'api_gateway_cache_invalidations_total',
+    'Tag invalidations processed',
+    ['tag']
+)
+
+
+@dataclass
+class CachePolicy:
+    """Caching rules for one route template"""
+    ttl: int
+    stale_ttl: int = 0
+    # "authenticated" (shared by every authenticated caller), "company" or "user"
+    scope: str = "authenticated"
+    permissions: List[str] = field(default_factory=list)
+    # Tag templates formatted with the route's path parameters
+    tags: List[str] = field(default_factory=list)
+    max_body_bytes: int = 1024 * 1024
+
+
+@dataclass
+class CacheEntry:
+    route: str
+    status_code: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    etag: str
+    fresh_until: float
+    stale_until: float
+    tags: List[str]
+
+    def to_redis(self) -> Dict[str, Any]:
+        meta = {
+            "route": self.route,
+            "status_code": self.status_code,
+            "headers": self.headers,
+            "etag": self.etag,
+            "fresh_until": self.fresh_until,
+            "stale_until": self.stale_until,
+            "tags": self.tags,
+        }
+        return {"meta": json.dumps(meta), "body": self.body}
+
+    @classmethod
+    def from_redis(cls, data: Dict[bytes, bytes]) -> "CacheEntry":
+        meta = json.loads(data[b"meta"])
+        return cls(
+            route=meta["route"],
+            status_code=meta["status_code"],
+            headers=[tuple(h) for h in meta["headers"]],
+            body=data[b"body"],
+            etag=meta["etag"],
+            fresh_until=meta["fresh_until"],
+            stale_until=meta["stale_until"],
+            tags=meta["tags"],
+        )
+
+
+def has_permissions(profile: Dict[str, Any], required: Iterable[str]) -> bool:
+    """Mirror of the services' permission rules; never more permissive"""
+    if profile.get("is_superuser"):
+        return True
+    granted = set(profile.get("permissions") or [])
+    if "*" in granted:
+        return True
+    return set(required).issubset(granted)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+class ResponseCache:
+    """Two-tier (in-process + Redis) response cache with tag invalidation"""
+
+    def __init__(
+        self,
+        redis_url: str,
+        channel: str = "gateway:cache-invalidations",
+        l1_max_entries: int = 5000,
+        key_prefix: str = "gwcache",
+        tag_ttl: int = 2 * 86400
+    ):
+        self.redis_url = redis_url
+        self.channel = channel
+        self.l1_max_entries = l1_max_entries
+        self.key_prefix = key_prefix
+        self.tag_ttl = tag_ttl
+        self._redis: Optional[redis.Redis] = None
+        self._l1: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._l1_tags: Dict[str, Set[str]] = {}
+        self._refreshing: Set[str] = set()
+        self._invalidated_at: Dict[str, float] = {}
+        self._feed_connected = False
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._redis = redis.from_url(self.redis_url)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis:
+            await self._redis.close()
+            self._redis = None
+
+    # Keys -----------------------------------------------------------------
+
+    def build_key(self, route: str, path: str, query: str, scope: str) -> str:
+        normalized_query = "&".join(sorted(query.split("&"))) if query else ""
+        digest = hashlib.sha256(f"{route}|{path}|{normalized_query}|{scope}".encode()).hexdigest()
+        return f"{self.key_prefix}:entry:{digest}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.key_prefix}:tag:{tag}"
+
+    # L1 -------------------------------------------------------------------
+
+    def _l1_get(self, key: str) -> Optional[CacheEntry]:
+        # Without the invalidation feed another worker's write could go unseen
+        if not self._feed_connected:
+            return None
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        if entry.stale_until <= time.time():
+            self._l1_evict(key)
+            return None
+        self._l1.move_to_end(key)
+        return entry
+
+    def _l1_put(self, key: str, entry: CacheEntry) -> None:
+        if not self._feed_connected:
+            return
+        self._l1[key] = entry
+        self._l1.move_to_end(key)
+        for tag in entry.tags:
+            self._l1_tags.setdefault(tag, set()).add(key)
+        while len(self._l1) > self.l1_max_entries:
+            oldest = next(iter(self._l1))
+            cache_evictions_total.labels(route=self._l1[oldest].route, reason='lru').inc()
+            self._l1_evict(oldest)
+
+    def _l1_evict(self, key: str) -> None:
+        entry = self._l1.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._l1_tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._l1_tags[tag]
+
+    def _l1_invalidate(self, tags: Iterable[str]) -> None:
+        now = time.time()
+        if len(self._invalidated_at) > 10000:
+            # Only needed to guard fetches that are still in flight
+            self._invalidated_at = {t: ts for t, ts in self._invalidated_at.items() if now - ts < 60}
+        for tag in tags:
+            self._invalidated_at[tag] = now
+            for key in list(self._l1_tags.get(tag, ())):
+                entry = self._l1.get(key)
+                if entry is not None:
+                    cache_evictions_total.labels(route=entry.route, reason='tag').inc()
+                self._l1_evict(key)
+
+    # L2 -------------------------------------------------------------------
+
+    async def _l2_get(self, key: str) -> Optional[CacheEntry]:
+        try:
+            data = await self._redis.hgetall(key)
+        except Exception as e:
+            logger.warning("Response cache read failed", error=str(e))
+            return None
+        if not data:
+            return None
+        return CacheEntry.from_redis(data)
+
+    async def _l2_put(self, key: str, entry: CacheEntry) -> None:
+        ttl = max(1, int(entry.stale_until - time.time()))
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hset(key, mapping=entry.to_redis())
+            pipe.expire(key, ttl)
+            for tag in entry.tags:
+                pipe.sadd(self._tag_key(tag), key)
+                # Must outlive every member so invalidation can still find them
+                pipe.expire(self._tag_key(tag), max(ttl, self.tag_ttl))
+            await pipe.execute()
+        except Exception as e:
+            logger.warning("Response cache write failed", error=str(e))
+
+    # Public API -------------------------------------------------------------
+
+    async def get(self, key: str) -> Tuple[Optional[CacheEntry], str]:
+        """Return (entry, tier) where tier is "l1", "l2" or "" on miss"""
+        entry = self._l1_get(key)
+        if entry is not None:
+            return entry, "l1"
+        entry = await self._l2_get(key)
+        if entry is None or entry.stale_until <= time.time():
+            return None, ""
+        self._l1_put(key, entry)
+        return entry, "l2"
+
+    async def put(self, key: str, entry: CacheEntry, fetched_at: float) -> None:
+        """Store an entry unless one of its tags was invalidated mid-fetch"""
+        if any(self._invalidated_at.get(tag, 0) >= fetched_at for tag in entry.tags):
+            return
+        self._l1_put(key, entry)
+        await self._l2_put(key, entry)
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        tags = [t.strip() for t in tags if t and t.strip()]
+        if not tags:
+            return
+        self._l1_invalidate(tags)
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for tag in tags:
+                pipe.smembers(self._tag_key(tag))
+            members = await pipe.execute()
+            keys = {k for group in members for k in group}
+            pipe = self._redis.pipeline(transaction=False)
+            if keys:
+                pipe.delete(*keys)
+            pipe.delete(*[self._tag_key(t) for t in tags])
+            pipe.publish(self.channel, json.dumps(tags))
+            await pipe.execute()
+        except Exception as e:
+            logger.error("Response cache invalidation failed", tags=tags, error=str(e))
+        for tag in tags:
+            cache_invalidations_total.labels(tag=tag.split(":")[0]).inc()
+
+    def refresh_in_background(self, key: str, fetch: Callable[[], Awaitable[Optional[CacheEntry]]]) -> None:
+        """Single-flight background refresh of a stale entry"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def run() -> None:
+            fetched_at = time.time()
+            try:
+                entry = await fetch()
+                if entry is not None:
+                    await self.put(key, entry, fetched_at)
+            except Exception as e:
+                logger.warning("Background cache refresh failed", error=str(e))
+            finally:
+                self._refreshing.discard(key)
+
+        asyncio.create_task(run())
+
+    async def _listen(self) -> None:
+        while True:
+            client = redis.from_url(self.redis_url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Anything held before (re)subscribing may have missed invalidations
+                self._l1.clear()
+                self._l1_tags.clear()
+                self._feed_connected = True
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._l1_invalidate(json.loads(message["data"]))
+                    except (ValueError, TypeError) as e:
+                        logger.warning("Malformed cache invalidation", error=str(e))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache invalidation feed disconnected", error=str(e))
+            finally:
+                self._feed_connected = False
+                self._l1.clear()
+                self._l1_tags.clear()
+                try:
+                    await pubsub.close()
+                    await client.close()
+                except Exception:
+                    pass
+            await asyncio.sleep(1)
+
+
+def entry_response(entry: CacheEntry, cache_status: str) -> Response:
+    response = Response(content=entry.body, status_code=entry.status_code)
+    response.raw_headers = [
+        (name.encode("latin-1"), value.encode("latin-1"))
+        for name, value in entry.headers
+        if name.lower() not in ("content-length", "etag")
+    ] + [
+        (b"content-length", str(len(entry.body)).encode()),
+        (b"etag", entry.etag.encode("latin-1")),
+        (b"x-cache", cache_status.encode()),
+    ]
+    return response
+
+
+def not_modified_response(entry: CacheEntry) -> Response:
+    return Response(status_code=304, headers={"ETag": entry.etag, "X-Cache": "HIT"})
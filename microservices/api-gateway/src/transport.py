@@ -0,0 +1,220 @@
+"""
+Upstream transport for the API Gateway.
+
+Keeps one long-lived, pooled ``httpx.AsyncClient`` per upstream service so
+proxied calls reuse keep-alive connections instead of paying a TCP/TLS
+handshake per request. Responses are handed back un-parsed so the gateway
+can stream them to the caller with their original status and headers.
+"""
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.responses import StreamingResponse
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 negotiation in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = structlog.get_logger("api-gateway")
+
+# Headers that describe a single hop and must not be forwarded (RFC 7230 §6.1)
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade",
+})
+# Re-computed by httpx for the outbound request
+REQUEST_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {"host", "content-length"}
+
+upstream_requests_total = Counter(
+    'api_gateway_upstream_requests_total',
+    'Requests sent to upstream services',
+    ['service']
+)
+upstream_connections_opened_total = Counter(
+    'api_gateway_upstream_connections_opened_total',
+    'New TCP connections opened to upstream services',
+    ['service']
+)
+upstream_inflight_requests = Gauge(
+    'api_gateway_upstream_inflight_requests',
+    'Requests currently holding an upstream connection',
+    ['service']
+)
+upstream_pool_saturation = Gauge(
+    'api_gateway_upstream_pool_saturation_ratio',
+    'In-flight requests divided by the connection limit of the upstream pool',
+    ['service']
+)
+upstream_request_duration = Histogram(
+    'api_gateway_upstream_response_headers_seconds',
+    'Time until upstream response headers were received',
+    ['service']
+)
+
+
+def filter_headers(headers: Dict[str, str], excluded: frozenset) -> Dict[str, str]:
+    """Drop hop-by-hop (and other excluded) headers, keeping the rest"""
+    return {k: v for k, v in headers.items() if k.lower() not in excluded}
+
+
+class UpstreamPool:
+    """Pooled client and connection metrics for a single upstream service"""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: httpx.Timeout,
+        http2: bool
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.inflight = 0
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            http2=http2 and HTTP2_AVAILABLE
+        )
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            upstream_connections_opened_total.labels(service=self.name).inc()
+
+    def _acquire(self) -> None:
+        self.inflight += 1
+        upstream_inflight_requests.labels(service=self.name).set(self.inflight)
+        upstream_pool_saturation.labels(service=self.name).set(self.inflight / self.max_connections)
+
+    def _release(self) -> None:
+        self.inflight -= 1
+        upstream_inflight_requests.labels(service=self.name).set(self.inflight)
+        upstream_pool_saturation.labels(service=self.name).set(self.inflight / self.max_connections)
+
+    async def send(
+        self,
+        method: str,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """Send a request and return the response with its body still unread.
+
+        The caller owns the response and must ``aclose()`` it (``stream_response`` does so
+        once the body has been relayed).
+        """
+        request = self.client.build_request(
+            method,
+            path,
+            headers=filter_headers(headers or {}, REQUEST_EXCLUDED_HEADERS),
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            extensions={"trace": self._trace},
+            **kwargs
+        )
+        upstream_requests_total.labels(service=self.name).inc()
+        self._acquire()
+        start = time.perf_counter()
+        try:
+            response = await self.client.send(request, stream=True)
+        except BaseException:
+            self._release()
+            raise
+        upstream_request_duration.labels(service=self.name).observe(time.perf_counter() - start)
+
+        # Release the slot exactly once, when the body is closed
+        original_aclose = response.aclose
+        released = False
+
+        async def aclose() -> None:
+            nonlocal released
+            try:
+                await original_aclose()
+            finally:
+                if not released:
+                    released = True
+                    self._release()
+
+        response.aclose = aclose
+        return response
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class UpstreamTransport:
+    """Registry of per-service pools"""
+
+    def __init__(
+        self,
+        registry: Dict[str, str],
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        http2: bool = True,
+        connection_limits: Optional[Dict[str, int]] = None
+    ):
+        connection_limits = connection_limits or {}
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+        self.pools: Dict[str, UpstreamPool] = {
+            name: UpstreamPool(
+                name=name,
+                base_url=url,
+                max_connections=connection_limits.get(name, max_connections),
+                max_keepalive_connections=min(
+                    max_keepalive_connections, connection_limits.get(name, max_connections)
+                ),
+                keepalive_expiry=keepalive_expiry,
+                timeout=timeout,
+                http2=http2
+            )
+            for name, url in registry.items()
+        }
+
+    def get(self, service_name: str) -> Optional[UpstreamPool]:
+        return self.pools.get(service_name)
+
+    async def close(self) -> None:
+        for pool in self.pools.values():
+            await pool.close()
+
+
+def stream_response(response: httpx.Response) -> StreamingResponse:
+    """Relay an upstream response body to the caller without buffering it.
+
+    The raw (still content-encoded) byte stream is forwarded so
+    ``Content-Encoding`` and ``Content-Length`` stay valid, and repeated
+    headers such as ``Set-Cookie`` are preserved.
+    """
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            # Also runs when the caller disconnects mid-stream
+            await response.aclose()
+
+    relayed = StreamingResponse(body(), status_code=response.status_code)
+    relayed.raw_headers = [
+        (name, value)
+        for name, value in response.headers.raw
+        if name.decode("latin-1").lower() not in HOP_BY_HOP_HEADERS
+    ]
+    return relayed
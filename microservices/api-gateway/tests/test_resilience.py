@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import pytest
+
+from src.resilience import CircuitBreaker, CircuitOpenError, ResilienceEngine
+
+
+def engine_with(send):
+    pool = SimpleNamespace(send=send)
+    transport = SimpleNamespace(pools={"orders": pool}, get=lambda name: pool)
+    return ResilienceEngine(transport, failure_threshold=1, recovery_timeout=30.0)
+
+
+def half_open(breaker: CircuitBreaker) -> None:
+    breaker.trip()
+    breaker.opened_at -= breaker.recovery_timeout
+
+
+class TestCircuitBreaker:
+    def test_single_trial_when_half_open(self):
+        breaker = CircuitBreaker("orders", failure_threshold=1)
+        half_open(breaker)
+
+        assert breaker.allow_request()
+        assert breaker.state == "half_open"
+        assert not breaker.allow_request()
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker("orders", failure_threshold=1)
+        half_open(breaker)
+        breaker.allow_request()
+
+        breaker.record_failure()
+
+        assert breaker.state == "open"
+        assert not breaker.allow_request()
+
+
+class TestResilienceEngine:
+    @pytest.mark.asyncio
+    async def test_cancelled_trial_frees_half_open_breaker(self):
+        started = asyncio.Event()
+
+        async def hang(*args, **kwargs):
+            started.set()
+            await asyncio.sleep(60)
+
+        engine = engine_with(hang)
+        breaker = engine.breakers["orders"]
+        half_open(breaker)
+
+        trial = asyncio.create_task(engine.send("orders", "GET", "/orders"))
+        await started.wait()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        assert breaker.state == "half_open"
+        assert breaker.allow_request()
+
+    @pytest.mark.asyncio
+    async def test_unexpected_error_frees_half_open_breaker(self):
+        engine = engine_with(AsyncMock(side_effect=RuntimeError("bug")))
+        breaker = engine.breakers["orders"]
+        half_open(breaker)
+
+        with pytest.raises(RuntimeError):
+            await engine.send("orders", "GET", "/orders")
+
+        assert breaker.allow_request()
+
+    @pytest.mark.asyncio
+    async def test_successful_trial_closes_breaker(self):
+        engine = engine_with(AsyncMock(return_value=Mock(status_code=200)))
+        breaker = engine.breakers["orders"]
+        half_open(breaker)
+
+        response = await engine.send("orders", "GET", "/orders")
+
+        assert response.status_code == 200
+        assert breaker.state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_rejects_without_sending(self):
+        send = AsyncMock(side_effect=httpx.ConnectError("refused"))
+        engine = engine_with(send)
+        engine.breakers["orders"].trip()
+
+        with pytest.raises(CircuitOpenError):
+            await engine.send("orders", "GET", "/orders")
+
+        send.assert_not_awaited()
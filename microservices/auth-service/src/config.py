@@ -19,7 +19,10 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_expiration_minutes: int = 60
     jwt_refresh_expiration_days: int = 7
-    
+
+    # Revocation feed consumed by downstream token verifiers
+    token_revocation_channel: str = "auth:token-revocations"
+
     # OAuth Configuration
     # Google OAuth
     google_client_id: Optional[str] = None
@@ -31,6 +31,7 @@ from .security import (
     revoke_user_session, SecurityMiddleware, verify_password
 )
 from .oauth import oauth_service
+from .revocation import revocation_publisher
 
 # Import logging configuration
 import os
@@ -186,6 +187,7 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     try:
         await close_db()
+        await revocation_publisher.close()
         logger.info("Auth service shutdown successfully")
     except Exception as e:
         logger.error("Error during shutdown", error=str(e))
@@ -442,6 +444,8 @@ async def logout(
             session = await get_user_session(db, jti)
             if session:
                 await revoke_user_session(db, session)
+                await db.commit()
+                await revocation_publisher.revoke_session(jti, current_user.id)
         
         # Log logout
         await log_audit_event(db, current_user, "logout", "authentication", str(current_user.id), request, "success")
@@ -732,6 +736,9 @@ async def update_user(
         await db.commit()
         await db.refresh(user)
         
+        # Downstream services cache the profile (role, permissions, active state)
+        await revocation_publisher.revoke_user(user.id, "user_updated")
+        
         # Log user update
         await log_audit_event(db, current_user, "update_user", "user", str(user.id), request, "success")
         
@@ -771,6 +778,7 @@ async def delete_user(
         user.updated_at = datetime.utcnow()
         
         await db.commit()
+        await revocation_publisher.revoke_user(user.id, "user_deactivated")
         
         # Log user deletion
         await log_audit_event(db, current_user, "delete_user", "user", str(user.id), request, "success")
@@ -819,6 +827,7 @@ async def update_profile(
         
         await db.commit()
         await db.refresh(current_user)
+        await revocation_publisher.revoke_user(current_user.id, "profile_updated")
         
         # Log profile update
         await log_audit_event(db, current_user, "update_profile", "profile", str(current_user.id), request, "success")
@@ -864,7 +873,18 @@ async def change_password(
         current_user.password_changed_at = datetime.utcnow()
         current_user.updated_at = datetime.utcnow()
         
+        # Sessions opened with the old password are no longer valid
+        auth_header = request.headers.get("Authorization", "")
+        current_jti = decode_jwt_token(auth_header.replace("Bearer ", "")).get("jti")
+        stmt = update(UserSession).where(
+            UserSession.user_id == current_user.id,
+            UserSession.is_active == True,
+            UserSession.jti != current_jti
+        ).values(is_active=False, revoked_at=datetime.utcnow())
+        await db.execute(stmt)
+        
         await db.commit()
+        await revocation_publisher.revoke_user(current_user.id, "password_changed")
         
         # Log password change
         await log_audit_event(db, current_user, "change_password", "authentication", str(current_user.id), request, "success")
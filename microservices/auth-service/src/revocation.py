@@ -0,0 +1,62 @@
+"""
+Token revocation feed.
+
+Downstream services verify access tokens locally and cache the resolved
+profile per ``jti``. Whenever a session or a whole user stops being valid
+(logout, password change, deactivation, role/permission change) auth-service
+publishes an event on a Redis pub/sub channel so those caches are evicted
+immediately instead of waiting for their TTL.
+"""
+import json
+import time
+from typing import Optional
+
+import redis.asyncio as redis
+import structlog
+
+from .config import settings
+
+logger = structlog.get_logger()
+
+
+class RevocationPublisher:
+    """Publishes revocation events for sessions (jti) and users"""
+
+    def __init__(self, redis_url: str, channel: str):
+        self.redis_url = redis_url
+        self.channel = channel
+        self._client: Optional[redis.Redis] = None
+
+    def _get_client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(self.redis_url, decode_responses=True)
+        return self._client
+
+    async def _publish(self, event: dict) -> None:
+        event["ts"] = time.time()
+        try:
+            await self._get_client().publish(self.channel, json.dumps(event))
+        except Exception as e:
+            # Revocation must never break the auth flow itself; downstream
+            # caches are still bounded by token_cache_ttl_seconds.
+            logger.error("Failed to publish token revocation", event=event, error=str(e))
+
+    async def revoke_session(self, jti: str, user_id: Optional[int] = None) -> None:
+        """Revoke a single session (e.g. logout)"""
+        await self._publish({
+            "type": "jti",
+            "jti": jti,
+            "user_id": str(user_id) if user_id is not None else None
+        })
+
+    async def revoke_user(self, user_id: int, reason: str) -> None:
+        """Revoke every cached session of a user"""
+        await self._publish({"type": "user", "user_id": str(user_id), "reason": reason})
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+revocation_publisher = RevocationPublisher(settings.redis_url, settings.token_revocation_channel)
@@ -0,0 +1,38 @@
+"""Add carrier_city_codes table for persistent carrier city-code lookups
+
+Revision ID: 4f1c2a7d9e31
+Revises: 9b3c24948a8e
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1c2a7d9e31'
+down_revision = '9b3c24948a8e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('carrier_city_codes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('carrier', sa.String(length=50), nullable=False),
+        sa.Column('city_key', sa.String(length=200), nullable=False),
+        sa.Column('city_name', sa.String(length=200), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=True),
+        sa.Column('postal_code', sa.String(length=20), nullable=True),
+        sa.Column('code', sa.String(length=20), nullable=False),
+        sa.Column('details', sa.JSON(), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('carrier', 'city_key', name='uq_carrier_city_codes_carrier_city')
+    )
+    op.create_index(op.f('ix_carrier_city_codes_id'), 'carrier_city_codes', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_carrier_city_codes_id'), table_name='carrier_city_codes')
+    op.drop_table('carrier_city_codes')
@@ -0,0 +1,45 @@
+"""Add natural-key unique constraint to tracking_events
+
+Revision ID: 7a2e5c81b04f
+Revises: 4f1c2a7d9e31
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2e5c81b04f'
+down_revision = '4f1c2a7d9e31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    exists = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_constraint WHERE conname = 'uq_tracking_events_natural_key'"
+    )).scalar()
+    if exists:
+        # Created by the models on a fresh database
+        return
+
+    # Keep the first copy of events stored more than once before the constraint existed
+    op.execute("""
+        DELETE FROM tracking_events a
+        USING tracking_events b
+        WHERE a.id > b.id
+          AND a.tracking_number = b.tracking_number
+          AND a.carrier = b.carrier
+          AND a.event_date = b.event_date
+          AND a.status = b.status
+    """)
+    op.create_unique_constraint(
+        'uq_tracking_events_natural_key',
+        'tracking_events',
+        ['tracking_number', 'carrier', 'event_date', 'status']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_tracking_events_natural_key', 'tracking_events', type_='unique')
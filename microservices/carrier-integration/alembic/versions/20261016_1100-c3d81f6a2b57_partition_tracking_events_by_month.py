@@ -0,0 +1,101 @@
+"""Partition tracking_events by event month
+
+The existing table is attached as the partition for everything before the
+first new month (no rows are copied) and is dropped as a whole once it falls
+out of the retention window. New months get their own partitions; a default
+partition catches events dated outside every monthly range.
+
+Revision ID: c3d81f6a2b57
+Revises: 7a2e5c81b04f
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d81f6a2b57'
+down_revision = '7a2e5c81b04f'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = 'tracking_events'")).scalar()
+    if relkind != 'r':
+        # Missing, or already created partitioned from the models
+        return
+
+    latest = bind.execute(sa.text("SELECT max(event_date) FROM tracking_events")).scalar()
+    bound = _next_month(max(datetime.now(), latest) if latest else datetime.now())
+
+    op.execute("ALTER TABLE tracking_events RENAME TO tracking_events_legacy")
+    op.execute("ALTER TABLE tracking_events_legacy RENAME CONSTRAINT tracking_events_pkey TO tracking_events_legacy_pkey")
+    op.execute(
+        "ALTER TABLE tracking_events_legacy "
+        "RENAME CONSTRAINT uq_tracking_events_natural_key TO tracking_events_legacy_natural_key"
+    )
+    op.execute("ALTER INDEX IF EXISTS ix_tracking_events_id RENAME TO ix_tracking_events_legacy_id")
+    op.execute(
+        "ALTER INDEX IF EXISTS ix_tracking_events_tracking_number "
+        "RENAME TO ix_tracking_events_legacy_tracking_number"
+    )
+
+    op.execute("CREATE TABLE tracking_events (LIKE tracking_events_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (event_date)")
+    op.execute("ALTER TABLE tracking_events ADD CONSTRAINT tracking_events_pkey PRIMARY KEY (id, event_date)")
+    op.execute(
+        "ALTER TABLE tracking_events ADD CONSTRAINT uq_tracking_events_natural_key "
+        "UNIQUE (tracking_number, carrier, event_date, status)"
+    )
+    op.create_index('ix_tracking_events_id', 'tracking_events', ['id'], unique=False)
+    op.create_index(
+        'ix_tracking_events_tracking_number_event_date', 'tracking_events', ['tracking_number', 'event_date'], unique=False
+    )
+    op.execute("ALTER SEQUENCE tracking_events_id_seq OWNED BY tracking_events.id")
+
+    # A validated CHECK matching the range lets ATTACH skip its own full scan
+    op.execute(
+        f"ALTER TABLE tracking_events_legacy ADD CONSTRAINT tracking_events_legacy_range "
+        f"CHECK (event_date < '{bound.isoformat()}') NOT VALID"
+    )
+    op.execute("ALTER TABLE tracking_events_legacy VALIDATE CONSTRAINT tracking_events_legacy_range")
+    op.execute(
+        f"ALTER TABLE tracking_events ATTACH PARTITION tracking_events_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{bound.isoformat()}')"
+    )
+    op.execute("ALTER TABLE tracking_events_legacy DROP CONSTRAINT tracking_events_legacy_range")
+
+    op.execute("CREATE TABLE tracking_events_default PARTITION OF tracking_events DEFAULT")
+    start = bound
+    for _ in range(MONTHS_AHEAD + 1):
+        end = _next_month(start)
+        op.execute(
+            f"CREATE TABLE tracking_events_p{start:%Y_%m} PARTITION OF tracking_events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+
+
+def downgrade() -> None:
+    op.execute("CREATE TABLE tracking_events_plain (LIKE tracking_events INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO tracking_events_plain SELECT * FROM tracking_events")
+    op.execute("ALTER SEQUENCE tracking_events_id_seq OWNED BY tracking_events_plain.id")
+    op.execute("DROP TABLE tracking_events")
+    op.execute("ALTER TABLE tracking_events_plain RENAME TO tracking_events")
+    op.execute("ALTER TABLE tracking_events ADD CONSTRAINT tracking_events_pkey PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE tracking_events ADD CONSTRAINT uq_tracking_events_natural_key "
+        "UNIQUE (tracking_number, carrier, event_date, status)"
+    )
+    op.create_index('ix_tracking_events_id', 'tracking_events', ['id'], unique=False)
+    op.create_index('ix_tracking_events_tracking_number', 'tracking_events', ['tracking_number'], unique=False)
@@ -0,0 +1,30 @@
+"""Add label blob store columns to shipping_labels
+
+Revision ID: 5e9b0d3c7a14
+Revises: c3d81f6a2b57
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9b0d3c7a14'
+down_revision = 'c3d81f6a2b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('shipping_labels', sa.Column('label_sha256', sa.String(length=64), nullable=True))
+    op.add_column('shipping_labels', sa.Column('label_content_type', sa.String(length=50), nullable=True))
+    op.add_column('shipping_labels', sa.Column('label_size', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_shipping_labels_label_sha256'), 'shipping_labels', ['label_sha256'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_shipping_labels_label_sha256'), table_name='shipping_labels')
+    op.drop_column('shipping_labels', 'label_size')
+    op.drop_column('shipping_labels', 'label_content_type')
+    op.drop_column('shipping_labels', 'label_sha256')
@@ -0,0 +1,70 @@
+"""Add shipment import job, chunk and error tables
+
+Revision ID: 8d4f2b6e1c90
+Revises: 5e9b0d3c7a14
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4f2b6e1c90'
+down_revision = '5e9b0d3c7a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('shipment_import_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('file_digest', sa.String(length=64), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('auto_process', sa.Boolean(), nullable=True),
+        sa.Column('total_rows', sa.Integer(), nullable=True),
+        sa.Column('chunks_total', sa.Integer(), nullable=True),
+        sa.Column('chunks_done', sa.Integer(), nullable=True),
+        sa.Column('rows_valid', sa.Integer(), nullable=True),
+        sa.Column('rows_invalid', sa.Integer(), nullable=True),
+        sa.Column('labels_created', sa.Integer(), nullable=True),
+        sa.Column('labels_failed', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('shipment_import_chunks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=36), nullable=False),
+        sa.Column('start_offset', sa.BigInteger(), nullable=False),
+        sa.Column('end_offset', sa.BigInteger(), nullable=False),
+        sa.Column('first_row', sa.Integer(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('validated', sa.Boolean(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('job_id', 'start_offset', name='uq_shipment_import_chunks_job_start')
+    )
+    op.create_table('shipment_import_errors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=36), nullable=False),
+        sa.Column('row_number', sa.Integer(), nullable=False),
+        sa.Column('field', sa.String(length=100), nullable=True),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_shipment_import_errors_job_row', 'shipment_import_errors', ['job_id', 'row_number'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_shipment_import_errors_job_row', table_name='shipment_import_errors')
+    op.drop_table('shipment_import_errors')
+    op.drop_table('shipment_import_chunks')
+    op.drop_table('shipment_import_jobs')
@@ -0,0 +1,50 @@
+"""Add carrier and route daily stats rollups
+
+Revision ID: 2b7e9a4c6d18
+Revises: 8d4f2b6e1c90
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e9a4c6d18'
+down_revision = '8d4f2b6e1c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The carriertype enum already exists (shipping_labels and friends)
+    carrier_type = postgresql.ENUM(name='carriertype', create_type=False)
+    op.create_table('carrier_daily_stats',
+        sa.Column('stat_date', sa.Date(), nullable=False),
+        sa.Column('carrier', carrier_type, nullable=False),
+        sa.Column('labels_generated', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('quotes_generated', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('quote_amount', sa.Float(), server_default='0', nullable=False),
+        sa.Column('tracking_events', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('delivered', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('in_transit', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('exceptions', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('stat_date', 'carrier')
+    )
+    op.create_table('route_daily_stats',
+        sa.Column('stat_date', sa.Date(), nullable=False),
+        sa.Column('origin_city', sa.String(length=100), nullable=False),
+        sa.Column('destination_city', sa.String(length=100), nullable=False),
+        sa.Column('quotes', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('quote_amount', sa.Float(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('stat_date', 'origin_city', 'destination_city')
+    )
+    # Populate with recompute_carrier_daily_stats(days=N) for the history the reports need
+
+
+def downgrade() -> None:
+    op.drop_table('route_daily_stats')
+    op.drop_table('carrier_daily_stats')
@@ -0,0 +1,83 @@
+"""Partition api_call_logs by day
+
+The existing table is attached as the partition for everything before
+tomorrow (no rows are copied) and is dropped as a whole once it falls out of
+the retention window. Each following day gets its own partition; a default
+partition catches rows dated outside every daily range.
+
+Revision ID: 6c1f8e3a9d25
+Revises: 2b7e9a4c6d18
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1f8e3a9d25'
+down_revision = '2b7e9a4c6d18'
+branch_labels = None
+depends_on = None
+
+DAYS_AHEAD = 7
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = 'api_call_logs'")).scalar()
+    if relkind != 'r':
+        # Missing, or already created partitioned from the models
+        return
+
+    latest = bind.execute(sa.text("SELECT max(created_at) FROM api_call_logs")).scalar()
+    bound = datetime.combine((max(datetime.now(), latest) if latest else datetime.now()).date(), datetime.min.time())
+    bound += timedelta(days=1)
+
+    # The partition key may not be NULL
+    op.execute("UPDATE api_call_logs SET created_at = now() WHERE created_at IS NULL")
+    op.execute("ALTER TABLE api_call_logs ALTER COLUMN created_at SET NOT NULL")
+
+    op.execute("ALTER TABLE api_call_logs RENAME TO api_call_logs_legacy")
+    op.execute("ALTER TABLE api_call_logs_legacy RENAME CONSTRAINT api_call_logs_pkey TO api_call_logs_legacy_pkey")
+    op.execute("ALTER INDEX IF EXISTS ix_api_call_logs_id RENAME TO ix_api_call_logs_legacy_id")
+
+    op.execute("CREATE TABLE api_call_logs (LIKE api_call_logs_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER TABLE api_call_logs ADD CONSTRAINT api_call_logs_pkey PRIMARY KEY (id, created_at)")
+    op.create_index('ix_api_call_logs_id', 'api_call_logs', ['id'], unique=False)
+    op.execute("ALTER SEQUENCE api_call_logs_id_seq OWNED BY api_call_logs.id")
+
+    # A validated CHECK matching the range lets ATTACH skip its own full scan
+    op.execute(
+        f"ALTER TABLE api_call_logs_legacy ADD CONSTRAINT api_call_logs_legacy_range "
+        f"CHECK (created_at < '{bound.isoformat()}') NOT VALID"
+    )
+    op.execute("ALTER TABLE api_call_logs_legacy VALIDATE CONSTRAINT api_call_logs_legacy_range")
+    op.execute(
+        f"ALTER TABLE api_call_logs ATTACH PARTITION api_call_logs_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{bound.isoformat()}')"
+    )
+    op.execute("ALTER TABLE api_call_logs_legacy DROP CONSTRAINT api_call_logs_legacy_range")
+
+    op.execute("CREATE TABLE api_call_logs_default PARTITION OF api_call_logs DEFAULT")
+    start = bound
+    for _ in range(DAYS_AHEAD + 1):
+        end = start + timedelta(days=1)
+        op.execute(
+            f"CREATE TABLE api_call_logs_p{start:%Y%m%d} PARTITION OF api_call_logs "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+
+
+def downgrade() -> None:
+    op.execute("CREATE TABLE api_call_logs_plain (LIKE api_call_logs INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO api_call_logs_plain SELECT * FROM api_call_logs")
+    op.execute("ALTER SEQUENCE api_call_logs_id_seq OWNED BY api_call_logs_plain.id")
+    op.execute("DROP TABLE api_call_logs")
+    op.execute("ALTER TABLE api_call_logs_plain RENAME TO api_call_logs")
+    op.execute("ALTER TABLE api_call_logs ALTER COLUMN created_at DROP NOT NULL")
+    op.execute("ALTER TABLE api_call_logs ADD CONSTRAINT api_call_logs_pkey PRIMARY KEY (id)")
+    op.create_index('ix_api_call_logs_id', 'api_call_logs', ['id'], unique=False)
@@ -0,0 +1,53 @@
+"""Add callback delivery and endpoint tables
+
+Revision ID: 9a3e5c7b2f40
+Revises: 6c1f8e3a9d25
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3e5c7b2f40'
+down_revision = '6c1f8e3a9d25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('callback_deliveries',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('url', sa.String(length=500), nullable=False),
+        sa.Column('endpoint', sa.String(length=255), nullable=False),
+        sa.Column('event', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('last_status_code', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('delivered_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_callback_deliveries_due', 'callback_deliveries', ['status', 'next_attempt_at'], unique=False)
+    op.create_index(op.f('ix_callback_deliveries_endpoint'), 'callback_deliveries', ['endpoint'], unique=False)
+    op.create_table('callback_endpoints',
+        sa.Column('endpoint', sa.String(length=255), nullable=False),
+        sa.Column('failures', sa.Integer(), nullable=False),
+        sa.Column('open_for', sa.Float(), nullable=True),
+        sa.Column('open_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('endpoint')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('callback_endpoints')
+    op.drop_index(op.f('ix_callback_deliveries_endpoint'), table_name='callback_deliveries')
+    op.drop_index('ix_callback_deliveries_due', table_name='callback_deliveries')
+    op.drop_table('callback_deliveries')
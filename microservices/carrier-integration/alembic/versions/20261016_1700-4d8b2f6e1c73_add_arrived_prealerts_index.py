@@ -0,0 +1,27 @@
+"""Add partial index on arrived package prealerts
+
+Revision ID: 4d8b2f6e1c73
+Revises: 9a3e5c7b2f40
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8b2f6e1c73'
+down_revision = '9a3e5c7b2f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_package_prealerts_arrived', 'package_prealerts', ['mailbox_id'], unique=False,
+        postgresql_where=sa.text("status = 'arrived'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_package_prealerts_arrived', table_name='package_prealerts')
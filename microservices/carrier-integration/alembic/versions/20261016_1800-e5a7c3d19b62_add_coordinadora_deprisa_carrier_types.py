@@ -0,0 +1,27 @@
+"""Add Coordinadora and Deprisa to the carriertype enum
+
+Revision ID: e5a7c3d19b62
+Revises: 4d8b2f6e1c73
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c3d19b62'
+down_revision = '4d8b2f6e1c73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block before PostgreSQL 12
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE carriertype ADD VALUE IF NOT EXISTS 'COORDINADORA'")
+        op.execute("ALTER TYPE carriertype ADD VALUE IF NOT EXISTS 'DEPRISA'")
+
+
+def downgrade() -> None:
+    # PostgreSQL cannot drop a value from an enum type; the unused values stay
+    pass
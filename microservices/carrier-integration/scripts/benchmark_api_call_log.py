@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+API call log benchmark
+Measures what auditing costs the calling thread: no audit log, the buffered
+writer (record() plus the background batch INSERTs it triggers), and the
+legacy one-row INSERT committed inline with each call. Each call simulates
+--work-ms of request handling; rows go to the api_call_logs table in
+DATABASE_URL.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/benchmark_api_call_log.py --calls 5000
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.database import SessionLocal, engine  # noqa: E402
+from src.models import ApiCallLog, CarrierType  # noqa: E402
+from src.services.api_call_log import ApiCallLogWriter  # noqa: E402
+
+PAYLOAD = {"tracking_number": "1Z999AA10123456784", "status": "in_transit", "events": [{"code": "DP"}] * 5}
+
+
+def throughput(label: str, audit, calls: int, work_ms: float):
+    started = time.perf_counter()
+    for _ in range(calls):
+        if work_ms:
+            time.sleep(work_ms / 1000)
+        audit()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {calls / elapsed:10.0f} calls/s  {elapsed / calls * 1e6:10.2f}us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--work-ms", type=float, default=0.0, help="Simulated handling time per call")
+    args = parser.parse_args()
+
+    throughput("no audit log", lambda: None, args.calls, args.work_ms)
+
+    writer = ApiCallLogWriter(engine, enabled=True)
+
+    def buffered():
+        writer.record("DHL", "/webhooks/dhl", "POST", 3.2, 200, PAYLOAD, {"processed": True})
+
+    throughput("buffered writer", buffered, args.calls, args.work_ms)
+    started = time.perf_counter()
+    writer.close()
+    print(f"{'  drain on close':<24} {(time.perf_counter() - started) * 1000:10.2f}ms")
+
+    db = SessionLocal()
+    try:
+        def inline():
+            db.add(ApiCallLog(
+                carrier=CarrierType.DHL,
+                endpoint="/webhooks/dhl",
+                method="POST",
+                request_data=PAYLOAD,
+                response_data={"processed": True},
+                status_code=200,
+                latency_ms=3.2,
+                created_at=datetime.now()
+            ))
+            db.commit()
+
+        throughput("inline INSERT (legacy)", inline, args.calls, args.work_ms)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Carrier daily report benchmark
+Seeds one day (2001-01-01 by default) of synthetic shipments into
+DATABASE_URL: one label, one quote and three tracking events per shipment,
+1M shipments by default, generated server-side with generate_series. It
+then times the GROUP BY recomputation of the rollups, the report read from
+the rollups, the per-write cost of the incremental update (rolled back), and
+the legacy report that loaded every row of the day into the ORM. Benchmark
+rows use a BENCH- prefix and are deleted afterwards with the day's rollups.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/benchmark_carrier_stats.py --shipments 1000000
+"""
+
+import argparse
+import resource
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+from src.database import SessionLocal  # noqa: E402
+from src.models import (  # noqa: E402
+    CarrierDailyStats, CarrierType, RouteDailyStats, ShippingLabel, ShippingQuote, TrackingEvent
+)
+from src.services.carrier_stats import build_daily_report, record_labels, recompute_daily_stats  # noqa: E402
+
+PREFIX = "BENCH-"
+CITIES = ["Bogota", "Medellin", "Cali", "Barranquilla", "Cartagena", "Bucaramanga", "Pereira", "Miami"]
+STATUSES = ["Label Created", "In Transit", "Delivered"]
+
+
+def seed(day: date, shipments: int):
+    params = {"day": datetime.combine(day, datetime.min.time()), "n": shipments, "prefix": PREFIX}
+    carrier = "(enum_range(NULL::carriertype))[1 + g % 5]"
+    created = ":day + (g % 86400) * interval '1 second'"
+    db = SessionLocal()
+    try:
+        db.execute(text(f"""
+            INSERT INTO shipping_labels (order_id, carrier, tracking_number, service_type, created_at)
+            SELECT :prefix || g, {carrier}, :prefix || g, 'standard', {created}
+            FROM generate_series(1, :n) g
+        """), params)
+        db.execute(text(f"""
+            INSERT INTO shipping_quotes (quote_id, carrier, origin_country, origin_city, destination_country,
+                                         destination_city, weight_kg, dimensions_cm, service_type, amount,
+                                         currency, estimated_days, valid_until, created_at)
+            SELECT :prefix || g, {carrier}, 'CO', (:cities)[1 + g % 8], 'CO', (:cities)[1 + (g / 8) % 8],
+                   1 + g % 20, '{{}}'::json, 'standard', 10000 + g % 90000, 'COP', 1 + g % 5,
+                   :day + interval '2 days', {created}
+            FROM generate_series(1, :n) g
+        """), {**params, "cities": CITIES})
+        db.execute(text(f"""
+            INSERT INTO tracking_events (tracking_number, carrier, event_date, status, description, created_at)
+            SELECT :prefix || g, {carrier}, {created} + s * interval '1 minute', (:statuses)[s], 'Benchmark event',
+                   {created}
+            FROM generate_series(1, :n) g, generate_series(1, 3) s
+        """), {**params, "statuses": STATUSES})
+        db.commit()
+    finally:
+        db.close()
+
+
+def cleanup(day: date):
+    db = SessionLocal()
+    try:
+        for model, column in (
+            (TrackingEvent, TrackingEvent.tracking_number),
+            (ShippingQuote, ShippingQuote.quote_id),
+            (ShippingLabel, ShippingLabel.order_id),
+        ):
+            db.query(model).filter(column.like(f"{PREFIX}%")).delete(synchronize_session=False)
+        db.query(CarrierDailyStats).filter(CarrierDailyStats.stat_date == day).delete(synchronize_session=False)
+        db.query(RouteDailyStats).filter(RouteDailyStats.stat_date == day).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def timed(label, func, *args):
+    db = SessionLocal()
+    try:
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        result = func(db, *args)
+        db.commit()
+        elapsed = time.perf_counter() - started
+        rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+        print(f"{label:<36} {elapsed:9.3f}s  peak RSS +{rss_growth:8.1f} MiB")
+        return result
+    finally:
+        db.close()
+
+
+def incremental_writes(db, writes: int):
+    """Per-write rollup cost; rolled back so today's stats stay untouched"""
+    carriers = list(CarrierType)[:5]
+    started = time.perf_counter()
+    for i in range(writes):
+        record_labels(db, [carriers[i % len(carriers)]])
+    elapsed = time.perf_counter() - started
+    db.rollback()
+    print(f"{'incremental update, per write':<36} {elapsed / writes * 1000:9.3f}ms")
+
+
+def legacy_report(db, day: date):
+    """What generate_daily_report used to do"""
+    start_time = datetime.combine(day, datetime.min.time())
+    end_time = start_time + timedelta(days=1)
+    labels = db.query(ShippingLabel).filter(ShippingLabel.created_at >= start_time, ShippingLabel.created_at < end_time).all()
+    quotes = db.query(ShippingQuote).filter(ShippingQuote.created_at >= start_time, ShippingQuote.created_at < end_time).all()
+    events = db.query(TrackingEvent).filter(TrackingEvent.created_at >= start_time, TrackingEvent.created_at < end_time).all()
+    stats = {}
+    for carrier in CarrierType:
+        carrier_labels = [label for label in labels if label.carrier == carrier]
+        carrier_quotes = [quote for quote in quotes if quote.carrier == carrier]
+        stats[carrier.value] = (len(carrier_labels), len(carrier_quotes), sum(quote.amount for quote in carrier_quotes))
+    delivered = len([event for event in events if event.status.lower() in ['delivered', 'entregado']])
+    return stats, delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=1_000_000)
+    parser.add_argument("--day", type=date.fromisoformat, default=date(2001, 1, 1))
+    parser.add_argument("--writes", type=int, default=1_000, help="Incremental updates to time")
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not run the ORM report")
+    args = parser.parse_args()
+
+    try:
+        started = time.perf_counter()
+        seed(args.day, args.shipments)
+        print(f"seeded {args.shipments} shipments in {time.perf_counter() - started:.1f}s")
+
+        timed("GROUP BY recomputation", recompute_daily_stats, args.day)
+        report = timed("report from rollups", build_daily_report, args.day)
+        print(f"  {report['summary']}")
+        db = SessionLocal()
+        try:
+            incremental_writes(db, args.writes)
+        finally:
+            db.close()
+        if not args.skip_legacy:
+            # Last: peak RSS only grows, so this does not skew the numbers above
+            timed("legacy ORM report", legacy_report, args.day)
+    finally:
+        cleanup(args.day)
+
+
+if __name__ == "__main__":
+    main()
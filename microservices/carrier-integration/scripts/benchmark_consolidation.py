@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Consolidation planner benchmark
+Plans a nightly run of synthetic arrived packages spread over customers the
+way process_arrived_packages does, without the database: --packages
+packages with random weights and dimensions, per-customer counts skewed so a
+few customers have hundreds of packages.
+
+Usage:
+    python scripts/benchmark_consolidation.py --packages 100000 --customers 20000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.models import CarrierType  # noqa: E402
+from src.services.consolidation import TARIFFS, PackageSize, plan_consolidation  # noqa: E402
+
+
+def synthetic_customers(packages: int, customers: int, seed: int):
+    rng = random.Random(seed)
+    counts = [0] * customers
+    for _ in range(packages):
+        # A fifth of the packages go to a few heavy shoppers, the rest are spread evenly
+        if rng.random() < 0.2:
+            counts[min(customers - 1, int(rng.paretovariate(1.2)) - 1)] += 1
+        else:
+            counts[rng.randrange(customers)] += 1
+
+    for customer, count in enumerate(counts):
+        yield customer, [
+            PackageSize(f"C{customer}-{i}", round(rng.lognormvariate(0.7, 0.8), 2),
+                        rng.uniform(4, 18) * rng.uniform(4, 14) * rng.uniform(2, 10))
+            for i in range(count)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packages", type=int, default=100000)
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    tariff = TARIFFS[CarrierType.AEROPOST]
+    customers = list(synthetic_customers(args.packages, args.customers, args.seed))
+    planned = sum(len(packages) for _, packages in customers)
+    largest = max(len(packages) for _, packages in customers)
+
+    started = time.perf_counter()
+    boxes = consolidated_packages = 0
+    individual = consolidated = 0.0
+    for _, packages in customers:
+        groups, alone_cost, plan_cost = plan_consolidation(tariff, packages)
+        boxes += len(groups)
+        consolidated_packages += sum(len(g.package_ids) for g in groups)
+        individual += alone_cost
+        consolidated += plan_cost
+    elapsed = time.perf_counter() - started
+
+    print(f"packages          {planned:>12}  (largest customer {largest})")
+    print(f"planned in        {elapsed:>12.2f}s  {planned / elapsed:,.0f} packages/s")
+    print(f"boxes             {boxes:>12}  holding {consolidated_packages} packages")
+    print(f"cost alone        {individual:>12,.2f} USD")
+    print(f"cost consolidated {consolidated:>12,.2f} USD  (saves {individual - consolidated:,.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Credential lookup benchmark
+Times CredentialManager.get_credential served from the in-process credential
+store against what every call used to cost (query the active credentials in
+DATABASE_URL and decrypt them), then measures how long an invalidation
+published on REDIS_URL takes to reach a listening store.
+
+Usage:
+    DATABASE_URL=postgresql://... REDIS_URL=redis://... python scripts/benchmark_credentials.py --calls 10000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import redis  # noqa: E402
+
+from src import credentials_manager  # noqa: E402
+from src.credentials_manager import CREDENTIAL_CHANNEL, CredentialManager, CredentialStore  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+
+
+def per_call(label: str, func, calls: int):
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed / calls * 1e6:10.2f}us/call")
+
+
+def invalidation_latency(rounds: int):
+    store = CredentialStore()
+    store.get("DHL", dict)  # starts the listener
+    time.sleep(0.5)
+    publisher = redis.Redis.from_url(credentials_manager.REDIS_URL)
+    latencies = []
+    for _ in range(rounds):
+        generation = store._generation
+        started = time.perf_counter()
+        publisher.publish(CREDENTIAL_CHANNEL, "DHL")
+        while store._generation == generation:
+            time.sleep(0.0001)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(f"{'invalidation delivered':<28} p50 {latencies[len(latencies) // 2] * 1000:.2f}ms  "
+          f"max {latencies[-1] * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=10_000)
+    parser.add_argument("--carrier", default="DHL")
+    parser.add_argument("--credential-type", default="API_KEY")
+    parser.add_argument("--rounds", type=int, default=50, help="Invalidations to time")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        manager = CredentialManager(db)
+        credentials_manager.credential_store = CredentialStore(listen=False)
+
+        def uncached():
+            return manager._load_active_credentials().get(args.carrier, {}).get(args.credential_type)
+
+        per_call("query and decrypt (legacy)", uncached, max(1, args.calls // 100))
+        manager.get_credential(args.carrier, args.credential_type)
+        per_call("credential store", lambda: manager.get_credential(args.carrier, args.credential_type), args.calls)
+    finally:
+        db.close()
+
+    invalidation_latency(args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Quote fan-out benchmark
+Measures the latency of one concurrent round of requests to every carrier
+API, the way get_best_quote fans out, using either a fresh httpx.AsyncClient
+per call (legacy behaviour) or the shared per-carrier pools from
+src.carriers.transport. Only connection setup and round-trip are measured, so
+no carrier credentials are needed.
+
+With --service-url the script instead times end-to-end best-quote requests
+against a running carrier-integration service, to compare deployments before
+and after a change.
+
+Usage:
+    python scripts/benchmark_quote_fanout.py --rounds 50
+    python scripts/benchmark_quote_fanout.py --service-url http://localhost:8009 --rounds 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.carriers.transport import close_carrier_clients, get_carrier_client  # noqa: E402
+
+# Sandbox endpoints used by the carrier clients
+CARRIER_URLS = {
+    "DHL": "https://express.api.dhl.com/mydhlapi/test/rates",
+    "FedEx": "https://apis-sandbox.fedex.com/rate/v1/rates/quotes",
+    "UPS": "https://wwwcie.ups.com/api/rating/v1/Shop",
+    "Interrapidisimo": "https://apitest.interrapidisimo.co/api/v1/cotizacion",
+    "Aeropost": "https://sandbox-api.aeropost.com/v3/quotes",
+    "Pickit": "https://api.pickit.net/v2/quotes",
+}
+
+SAMPLE_QUOTE = {
+    "origin": {
+        "street": "Calle 100 # 19-54", "city": "Bogota", "postal_code": "110111",
+        "country": "CO", "contact_name": "Origin", "contact_phone": "+5712345678"
+    },
+    "destination": {
+        "street": "Carrera 43A # 1-50", "city": "Medellin", "postal_code": "050021",
+        "country": "CO", "contact_name": "Destination", "contact_phone": "+5742345678"
+    },
+    "packages": [{"weight_kg": 2.5, "length_cm": 30, "width_cm": 20, "height_cm": 15}]
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, samples):
+    print(
+        f"{name:<24} n={len(samples):<5} "
+        f"p50={percentile(samples, 50) * 1000:9.1f} ms  "
+        f"p99={percentile(samples, 99) * 1000:9.1f} ms  "
+        f"mean={statistics.mean(samples) * 1000:9.1f} ms"
+    )
+
+
+async def call_legacy(carrier, url, timeout):
+    async with httpx.AsyncClient() as client:
+        try:
+            await client.post(url, json={}, timeout=timeout)
+        except httpx.HTTPError:
+            pass
+
+
+async def call_pooled(carrier, url, timeout):
+    client = get_carrier_client(carrier)
+    try:
+        await client.post(url, json={}, timeout=timeout)
+    except httpx.HTTPError:
+        pass
+
+
+async def bench_fanout(call, rounds, timeout, pause):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await asyncio.gather(*(call(carrier, url, timeout) for carrier, url in CARRIER_URLS.items()))
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(pause)
+    return samples
+
+
+async def bench_service(service_url, rounds, pause):
+    samples = []
+    async with httpx.AsyncClient(base_url=service_url, timeout=120.0) as client:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await client.post("/api/v1/quotes", json=SAMPLE_QUOTE)
+            samples.append(time.perf_counter() - start)
+            await asyncio.sleep(pause)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--pause", type=float, default=0.2, help="seconds between rounds")
+    parser.add_argument("--service-url", help="time best-quote requests against a running service instead")
+    args = parser.parse_args()
+
+    if args.service_url:
+        report("service best quote", await bench_service(args.service_url, args.rounds, args.pause))
+        return
+
+    legacy = await bench_fanout(call_legacy, args.rounds, args.timeout, args.pause)
+    try:
+        pooled = await bench_fanout(call_pooled, args.rounds, args.timeout, args.pause)
+    finally:
+        await close_carrier_clients()
+
+    report("client per call (legacy)", legacy)
+    report("shared carrier pools", pooled)
+    print(f"p50 speedup: {percentile(legacy, 50) / percentile(pooled, 50):.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+API rate limiter benchmark
+Times the per-request cost of the rate limit check against REDIS_URL: the
+legacy fixed windows (INCR and EXPIRE per window plus the GET for the
+headers), the GCRA script with one EVALSHA per request, and the GCRA script
+with local batches. Requests are spread round-robin over --clients keys with
+limits high enough that nothing is denied. Redis commands per request come
+from the server's total_commands_processed. Benchmark keys use a bench:
+prefix and are deleted afterwards.
+
+Usage:
+    REDIS_URL=redis://localhost:6379/1 python scripts/benchmark_rate_limiter.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import redis.asyncio as redis  # noqa: E402
+
+from src.services.rate_limiter import RateLimit, RateLimiter  # noqa: E402
+
+PER_MINUTE = 1_000_000
+PER_HOUR = 10_000_000
+
+
+async def legacy_check(client, client_id: str):
+    """What RateLimitMiddleware used to do per request"""
+    now = int(time.time())
+    minute_key = f"bench:legacy:minute:{client_id}:{now // 60}"
+    await client.incr(minute_key)
+    await client.expire(minute_key, 60)
+    hour_key = f"bench:legacy:hour:{client_id}:{now // 3600}"
+    await client.incr(hour_key)
+    await client.expire(hour_key, 3600)
+    await client.get(minute_key)
+
+
+async def commands_processed(client) -> int:
+    return (await client.info("stats"))["total_commands_processed"]
+
+
+async def measure(label: str, client, check, requests: int, clients: int):
+    before = await commands_processed(client)
+    started = time.perf_counter()
+    for i in range(requests):
+        await check(f"ip:10.0.0.{i % clients}")
+    elapsed = time.perf_counter() - started
+    # The INFO call itself counts once
+    commands = await commands_processed(client) - before - 1
+    print(f"{label:<28} {elapsed / requests * 1e6:9.1f}us/request  {commands / requests:6.2f} Redis commands/request")
+
+
+async def cleanup(client):
+    async for key in client.scan_iter(match="bench:*"):
+        await client.delete(key)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=10, help="Distinct client keys")
+    parser.add_argument("--batch", type=int, default=20, help="Largest local batch")
+    args = parser.parse_args()
+
+    client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/1"))
+    limits = [RateLimit(PER_MINUTE, 60), RateLimit(PER_HOUR, 3600)]
+    single = RateLimiter(limits, prefix="bench:gcra", get_client=lambda: client, local_batch=1)
+    batched = RateLimiter(limits, prefix="bench:batched", get_client=lambda: client, local_batch=args.batch)
+    try:
+        await measure("legacy INCR/EXPIRE", client, lambda key: legacy_check(client, key), args.requests, args.clients)
+        await measure("GCRA, one EVALSHA", client, single.check, args.requests, args.clients)
+        await measure(f"GCRA, local batches <= {args.batch}", client, batched.check, args.requests, args.clients)
+    finally:
+        await cleanup(client)
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
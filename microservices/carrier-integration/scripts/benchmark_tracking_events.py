@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tracking event writer benchmark
+Writes a batch of synthetic tracking events (100k by default) into the
+tracking_events table of DATABASE_URL with insert_tracking_events, first as
+all-new events and then again as all-duplicates (a full re-sync), and times
+the legacy SELECT-per-event path on a sample for comparison. Benchmark rows
+use a BENCH- tracking number prefix and are deleted afterwards.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/benchmark_tracking_events.py --events 100000
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.database import SessionLocal  # noqa: E402
+from src.models import CarrierType, TrackingEvent  # noqa: E402
+from src.services.tracking_events import event_row, insert_tracking_events  # noqa: E402
+
+STATUSES = ["Label Created", "Picked Up", "In Transit", "Out for Delivery", "Delivered"]
+
+
+def make_rows(count: int, prefix: str):
+    carriers = [CarrierType.DHL, CarrierType.FEDEX, CarrierType.UPS, CarrierType.SERVIENTREGA]
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        shipment = i // len(STATUSES)
+        rows.append(event_row(
+            f"{prefix}{shipment:08d}",
+            carriers[shipment % len(carriers)],
+            start + timedelta(minutes=i),
+            STATUSES[i % len(STATUSES)],
+            "Benchmark event",
+            "BOG"
+        ))
+    return rows
+
+
+def timed_bulk(rows):
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        inserted = insert_tracking_events(db, rows)
+        db.commit()
+        return time.perf_counter() - started, len(inserted)
+    finally:
+        db.close()
+
+
+def timed_legacy(rows):
+    """The per-event existence check sync_tracking_async used to do"""
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        added = 0
+        for row in rows:
+            existing = db.query(TrackingEvent).filter(
+                TrackingEvent.tracking_number == row["tracking_number"],
+                TrackingEvent.event_date == row["event_date"],
+                TrackingEvent.status == row["status"]
+            ).first()
+            if not existing:
+                db.add(TrackingEvent(**row))
+                db.flush()
+                added += 1
+        db.commit()
+        return time.perf_counter() - started, added
+    finally:
+        db.close()
+
+
+def cleanup(prefix: str):
+    db = SessionLocal()
+    try:
+        db.query(TrackingEvent).filter(TrackingEvent.tracking_number.like(f"{prefix}%")).delete(
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def report(label, count, elapsed, inserted):
+    print(f"{label:<32} {elapsed:8.2f}s  {count / elapsed:10.0f} events/s  {inserted:7d} inserted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--legacy-sample", type=int, default=5_000, help="Events written through the legacy path")
+    args = parser.parse_args()
+
+    prefix = f"BENCH-{uuid.uuid4().hex[:6]}-"
+    rows = make_rows(args.events, prefix)
+    try:
+        report("bulk, all new", args.events, *timed_bulk(rows))
+        report("bulk, all duplicates", args.events, *timed_bulk(rows))
+
+        legacy_rows = make_rows(args.legacy_sample, f"{prefix}L-")
+        report("legacy, all new", args.legacy_sample, *timed_legacy(legacy_rows))
+        report("legacy, all duplicates", args.legacy_sample, *timed_legacy(legacy_rows))
+    finally:
+        cleanup(prefix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tracking sync benchmark
+Compares the legacy tracking sync, one Celery task per shipment that creates
+its own event loop and CarrierService, with the batched TrackingSyncEngine on
+one long-lived loop. Carrier calls are simulated with a fixed latency and
+results are discarded, so neither carrier credentials nor a database are
+needed; the numbers show scheduling overhead and request counts.
+
+Usage:
+    python scripts/benchmark_tracking_sync.py --shipments 10000 --latency-ms 150
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.schemas import TrackingEvent, TrackingResponse  # noqa: E402
+from src.services.tracking_sync import ActiveShipment, TrackingSyncEngine  # noqa: E402
+
+CARRIERS = {"DHL": 10, "FedEx": 30, "UPS": 1, "Servientrega": 1}
+
+
+def make_tracking(tracking_number: str, carrier: str) -> TrackingResponse:
+    return TrackingResponse(
+        tracking_number=tracking_number,
+        carrier=carrier,
+        status="In Transit",
+        events=[TrackingEvent(date=datetime.now(), status="In Transit", description="Scan", location="BOG")]
+    )
+
+
+class SimulatedClient:
+    def __init__(self, carrier: str, batch: int, latency: float):
+        self.carrier = carrier
+        self.latency = latency
+        self.requests = 0
+        if batch > 1:
+            self.MAX_TRACKING_BATCH = batch
+
+    async def track_shipment(self, tracking_number: str) -> TrackingResponse:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return make_tracking(tracking_number, self.carrier)
+
+    async def track_shipments(self, tracking_numbers):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return {number: make_tracking(number, self.carrier) for number in tracking_numbers}
+
+
+class SimulatedCarrierService:
+    def __init__(self, latency: float):
+        self.carriers = {name: SimulatedClient(name, batch, latency) for name, batch in CARRIERS.items()}
+
+    async def track_shipment(self, carrier, tracking_number):
+        return await self.carriers[carrier].track_shipment(tracking_number)
+
+    async def track_shipments(self, carrier, tracking_numbers):
+        return await self.carriers[carrier].track_shipments(tracking_numbers)
+
+    def requests(self) -> int:
+        return sum(client.requests for client in self.carriers.values())
+
+
+def make_shipments(count: int):
+    names = list(CARRIERS)
+    return [ActiveShipment(f"TRK{i:08d}", names[i % len(names)], "In Transit") for i in range(count)]
+
+
+def run_legacy(shipments, latency: float, workers: int):
+    """One new loop and one new service per shipment, like sync_tracking_async used to"""
+    requests = 0
+
+    def task(shipment):
+        loop = asyncio.new_event_loop()
+        try:
+            service = SimulatedCarrierService(latency)
+            loop.run_until_complete(service.track_shipment(shipment.carrier, shipment.tracking_number))
+            return service.requests()
+        finally:
+            loop.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        requests = sum(pool.map(task, shipments))
+    return time.perf_counter() - started, requests
+
+
+def run_engine(shipments, latency: float, concurrency: int):
+    service = SimulatedCarrierService(latency)
+    engine = TrackingSyncEngine(
+        service,
+        store=lambda batch: {},
+        concurrency={carrier: concurrency for carrier in CARRIERS}
+    )
+    started = time.perf_counter()
+    asyncio.run(engine.sync(shipments))
+    return time.perf_counter() - started, service.requests()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--workers", type=int, default=16, help="Legacy: concurrent Celery worker slots")
+    parser.add_argument("--concurrency", type=int, default=4, help="Engine: in-flight requests per carrier")
+    args = parser.parse_args()
+
+    shipments = make_shipments(args.shipments)
+    latency = args.latency_ms / 1000
+
+    print(f"{args.shipments} shipments across {len(CARRIERS)} carriers, {args.latency_ms:.0f}ms per carrier call\n")
+    for label, (elapsed, requests) in (
+        (f"legacy ({args.workers} workers)", run_legacy(shipments, latency, args.workers)),
+        (f"batched ({args.concurrency}/carrier)", run_engine(shipments, latency, args.concurrency)),
+    ):
+        print(f"{label:<28} {elapsed:8.2f}s  {args.shipments / elapsed:9.1f} shipments/s  {requests:7d} carrier requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,8 @@ from .ups import UPSClient
 from .servientrega import ServientregaClient
 from .interrapidisimo import InterrapidisimoClient
 from .pickit import PickitClient
-from .deprisa import DeprisaCarrier
-from .coordinadora import CoordinadoraCarrier
+from .deprisa import DeprisaClient
+from .coordinadora import CoordinadoraClient
 
 __all__ = [
     'DHLClient', 
@@ -14,6 +14,6 @@ __all__ = [
     'ServientregaClient',
     'InterrapidisimoClient',
     'PickitClient',
-    'DeprisaCarrier',
-    'CoordinadoraCarrier'
+    'DeprisaClient',
+    'CoordinadoraClient'
 ]
\ No newline at end of file
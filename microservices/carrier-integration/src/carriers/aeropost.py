@@ -3,7 +3,6 @@ Aeropost Integration Client
 International courier service with Miami PO Box
 """
 
-import httpx
 import structlog
 import os
 from typing import Dict, Any, List, Optional
@@ -11,14 +10,14 @@ from datetime import datetime, timedelta
 import base64
 from decimal import Decimal
 import xml.etree.ElementTree as ET
-from zeep import Client as SOAPClient
-from zeep.transports import Transport
 
 from ..schemas import (
     QuoteRequest, QuoteResponse,
     TrackingRequest, TrackingResponse, TrackingEvent,
     LabelRequest, LabelResponse
 )
+from .transport import carrier_client
+from .soap import get_soap_client_async, call_soap
 from ..credentials_manager import get_credential_manager
 from ..error_handlers import CarrierException
 
@@ -78,7 +77,7 @@ class AeropostClient:
             PO Box assignment details
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 response = await client.post(
                     f"{self.base_url}/mailbox/assign",
                     headers={
@@ -143,7 +142,7 @@ class AeropostClient:
             List of packages in Miami warehouse
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 response = await client.get(
                     f"{self.base_url}/packages",
                     headers={
@@ -199,7 +198,7 @@ class AeropostClient:
             Consolidation order details
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 response = await client.post(
                     f"{self.base_url}/consolidation",
                     headers={
@@ -255,10 +254,10 @@ class AeropostClient:
         """
         try:
             # Use SOAP service for accurate calculation
-            transport = Transport(operation_timeout=10)
-            soap_client = SOAPClient(self.soap_url, transport=transport)
+            soap_client = await get_soap_client_async(self.soap_url, timeout=10)
             
-            result = soap_client.service.CalculateImportCosts(
+            result = await call_soap(
+                "Aeropost", soap_client.service, "CalculateImportCosts",
                 APIKey=self.credentials.get("API_KEY"),
                 PackageValue=package_data["value"],
                 WeightPounds=package_data["weight_lb"],
@@ -296,7 +295,7 @@ class AeropostClient:
     async def _calculate_costs_rest(self, package_data: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate costs using REST API"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 response = await client.post(
                     f"{self.base_url}/calculator/import",
                     headers={
@@ -397,7 +396,7 @@ class AeropostClient:
             Declaration confirmation
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 response = await client.post(
                     f"{self.base_url}/packages/{package_id}/declaration",
                     headers={
@@ -457,7 +456,7 @@ class AeropostClient:
             Tracking information
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 response = await client.get(
                     f"{self.base_url}/tracking/{tracking_number}",
                     headers={"Authorization": self._get_auth_header()},
@@ -536,7 +535,7 @@ class AeropostClient:
             Photo request confirmation
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 response = await client.post(
                     f"{self.base_url}/packages/{package_id}/services/photos",
                     headers={
@@ -587,7 +586,7 @@ class AeropostClient:
             Shipping order details
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 response = await client.post(
                     f"{self.base_url}/shipping/create",
                     headers={
@@ -638,7 +637,7 @@ class AeropostClient:
     async def get_health_status(self) -> Dict[str, Any]:
         """Check Aeropost API health status"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Aeropost") as client:
                 start = datetime.now()
                 response = await client.get(
                     f"{self.base_url}/health",
@@ -0,0 +1,158 @@
+"""
+Persistent carrier city-code tables
+Carriers identify cities by their own (or DANE) codes. Codes are kept in the
+carrier_city_codes table with an in-memory copy per process, so quotes resolve
+a city with a dict lookup instead of a remote call. Misses are resolved once
+through the carrier and stored for every worker; the in-memory copy is
+reloaded from the database periodically and stale rows are re-validated by a
+scheduled task.
+"""
+
+import asyncio
+import re
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import structlog
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database import SessionLocal
+from ..models import CarrierCityCode
+
+logger = structlog.get_logger()
+
+# How often a process re-reads the table to pick up codes stored by other workers
+RELOAD_INTERVAL = 3600
+
+
+def normalize_city(name: str) -> str:
+    """Lookup key for a city name: no accents, punctuation or case"""
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", stripped.lower()).strip()
+
+
+class CityCodeTable:
+    """City name -> carrier code lookup backed by carrier_city_codes"""
+
+    def __init__(self, carrier: str, max_age: timedelta = timedelta(days=30)):
+        self.carrier = carrier
+        self.max_age = max_age
+        self._codes: Dict[str, str] = {}
+        self._names: Dict[str, str] = {}
+        self._refreshed_at: Dict[str, datetime] = {}
+        self._loaded_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    async def load(self) -> None:
+        """(Re)load the in-memory copy from the database"""
+        try:
+            rows = await asyncio.to_thread(self._read_rows)
+        except Exception as e:
+            logger.warning("Failed to load city codes", carrier=self.carrier, error=str(e))
+            rows = []
+        for row in rows:
+            self._codes[row.city_key] = row.code
+            self._names[row.city_key] = row.city_name
+            self._refreshed_at[row.city_key] = row.refreshed_at
+        # Also set on failure so a database outage is not retried on every quote
+        self._loaded_at = time.monotonic()
+
+    def _read_rows(self) -> List[CarrierCityCode]:
+        db = SessionLocal()
+        try:
+            return db.query(CarrierCityCode).filter(CarrierCityCode.carrier == self.carrier).all()
+        finally:
+            db.close()
+
+    async def lookup(
+        self,
+        city: str,
+        resolve: Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]] = None
+    ) -> Optional[str]:
+        """Return the code for a city, resolving and storing it on a miss.
+
+        ``resolve`` asks the carrier and returns a row dict (see ``store``) or None.
+        """
+        if time.monotonic() - self._loaded_at > RELOAD_INTERVAL:
+            await self.load()
+        key = normalize_city(city)
+        code = self._codes.get(key)
+        if code is not None or resolve is None:
+            return code
+        entry = await resolve()
+        if not entry:
+            return None
+        await self.store([{"city_name": city, **entry}])
+        return entry["code"]
+
+    async def store(self, entries: List[Dict[str, Any]]) -> None:
+        """Upsert rows of {city_name, code, department?, postal_code?, details?}"""
+        now = datetime.utcnow()
+        rows = {}
+        for entry in entries:
+            key = normalize_city(entry["city_name"])
+            if not key or not entry.get("code"):
+                continue
+            rows[key] = {
+                "carrier": self.carrier,
+                "city_key": key,
+                "city_name": entry["city_name"],
+                "department": entry.get("department"),
+                "postal_code": entry.get("postal_code"),
+                "code": str(entry["code"]),
+                "details": entry.get("details"),
+                "refreshed_at": now,
+            }
+            self._codes[key] = str(entry["code"])
+            self._names[key] = entry["city_name"]
+            self._refreshed_at[key] = now
+        if not rows:
+            return
+        try:
+            await asyncio.to_thread(self._upsert_rows, list(rows.values()))
+        except Exception as e:
+            logger.warning("Failed to persist city codes", carrier=self.carrier, error=str(e))
+
+    def _upsert_rows(self, rows: List[Dict[str, Any]]) -> None:
+        statement = insert(CarrierCityCode).values(rows)
+        statement = statement.on_conflict_do_update(
+            constraint="uq_carrier_city_codes_carrier_city",
+            set_={
+                "city_name": statement.excluded.city_name,
+                "department": statement.excluded.department,
+                "postal_code": statement.excluded.postal_code,
+                "code": statement.excluded.code,
+                "details": statement.excluded.details,
+                "refreshed_at": statement.excluded.refreshed_at,
+            }
+        )
+        db = SessionLocal()
+        try:
+            db.execute(statement)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stale_cities(self) -> List[str]:
+        """City names whose codes have not been re-validated within max_age"""
+        cutoff = datetime.utcnow() - self.max_age
+        return [self._names[key] for key, at in self._refreshed_at.items() if at is None or at < cutoff]
+
+
+_tables: Dict[str, CityCodeTable] = {}
+
+
+def get_city_table(carrier: str) -> CityCodeTable:
+    """Process-wide table for a carrier, shared by all of its client instances"""
+    table = _tables.get(carrier)
+    if table is None:
+        table = _tables[carrier] = CityCodeTable(carrier)
+    return table
@@ -3,40 +3,55 @@ Coordinadora Carrier Integration
 Colombian logistics provider with nationwide coverage
 """
 
+import base64
 import hashlib
-import json
-import logging
+import os
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-import requests
-from decimal import Decimal
-import xml.etree.ElementTree as ET
-from xml.etree.ElementTree import Element, SubElement, tostring
 
-from ..error_handlers import CarrierError, ValidationError, AuthenticationError
+import httpx
+import structlog
 
-logger = logging.getLogger(__name__)
+from ..schemas import (
+    QuoteRequest, QuoteResponse,
+    LabelRequest, LabelResponse,
+    TrackingResponse, TrackingEvent,
+    PickupRequest, PickupResponse
+)
+from .transport import carrier_client
+from .city_codes import get_city_table
+from ..error_handlers import CarrierException, CarrierErrorType
 
+logger = structlog.get_logger()
 
-class CoordinadoraCarrier:
+# Re-download the DANE city list at most this often when a city is missing
+CITY_SYNC_INTERVAL = 6 * 3600
+
+_last_city_sync = 0.0
+
+
+class CoordinadoraClient:
     """
     Coordinadora carrier implementation for Colombian shipping
     """
-    
+
     # API Configuration
     BASE_URL = "https://api.coordinadora.com/cm-api-rest"
     SANDBOX_URL = "https://sandbox.coordinadora.com/cm-api-rest"
-    
+
     # Service types mapping
     SERVICE_TYPES = {
         'standard': 'NOR',  # Normal
+        'economy': 'NOR',
         'express': 'EXP',   # Express
+        'overnight': 'EXP',
+        'same_day': 'EXP',
         'documents': 'DOC', # Documents
         'heavy': 'CAR',     # Heavy cargo
         'reverse': 'REV'    # Reverse logistics
     }
-    
+
     # Status mapping
     STATUS_MAP = {
         '1': 'pending',
@@ -48,603 +63,478 @@ class CoordinadoraCarrier:
         '7': 'returned',
         '8': 'cancelled'
     }
-    
-    def __init__(self, credentials: Dict[str, Any]):
+
+    def __init__(self, credentials: Dict[str, Any] = None, environment: str = None):
         """
         Initialize Coordinadora carrier
-        
+
         Args:
             credentials: Dictionary containing:
                 - api_key: API key
                 - api_password: API password
                 - nit: Company NIT
                 - client_code: Client code
-                - sandbox: Use sandbox environment (default: False)
+            environment: "sandbox" or "production"
         """
+        # Load from environment variables if credentials not provided
+        if credentials is None:
+            credentials = self._load_from_env()
+
         self.api_key = credentials.get('api_key')
         self.api_password = credentials.get('api_password')
         self.nit = credentials.get('nit')
         self.client_code = credentials.get('client_code')
-        self.sandbox = credentials.get('sandbox', False)
-        
+        self.environment = environment or os.getenv('COORDINADORA_ENVIRONMENT', 'sandbox')
+
         if not all([self.api_key, self.api_password, self.nit]):
             raise ValueError("Coordinadora requires api_key, api_password, and nit")
-        
-        self.base_url = self.SANDBOX_URL if self.sandbox else self.BASE_URL
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        })
-        
-        # Set authentication headers
-        self._setup_authentication()
-    
-    def _setup_authentication(self):
-        """Setup authentication headers"""
+
+        self.base_url = self.SANDBOX_URL if self.environment == "sandbox" else self.BASE_URL
+        self.headers = self._get_headers()
+        self.cities = get_city_table("DANE")
+
+    def _load_from_env(self) -> Dict[str, Any]:
+        """Load Coordinadora credentials from environment variables"""
+        return {
+            'api_key': os.getenv('COORDINADORA_API_KEY'),
+            'api_password': os.getenv('COORDINADORA_API_PASSWORD'),
+            'nit': os.getenv('COORDINADORA_NIT'),
+            'client_code': os.getenv('COORDINADORA_CLIENT_CODE')
+        }
+
+    def _get_headers(self) -> Dict[str, str]:
+        """Get authentication headers"""
         auth_string = f"{self.api_key}:{self.api_password}"
         auth_hash = hashlib.sha256(auth_string.encode()).hexdigest()
-        
-        self.session.headers.update({
+
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
             'Authorization': f'Bearer {auth_hash}',
             'X-API-Key': self.api_key,
             'X-NIT': self.nit
-        })
-        
+        }
         if self.client_code:
-            self.session.headers['X-Client-Code'] = self.client_code
-    
-    def calculate_quote(self, shipment_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Calculate shipping quote
-        
-        Args:
-            shipment_data: Shipment details including origin, destination, packages
-        
-        Returns:
-            Quote information with rates and transit times
-        """
+            headers['X-Client-Code'] = self.client_code
+        return headers
+
+    async def _request(self, method: str, path: str, operation: str, **kwargs) -> httpx.Response:
+        """Send a request and turn transport and HTTP errors into CarrierException"""
         try:
-            # Build quote request for Coordinadora
-            quote_request = {
-                'origen': {
-                    'ciudad': self._get_city_code(shipment_data['origin'].get('city')),
-                    'direccion': shipment_data['origin'].get('street', ''),
-                    'telefono': shipment_data['origin'].get('phone', '')
-                },
-                'destino': {
-                    'ciudad': self._get_city_code(shipment_data['destination'].get('city')),
-                    'direccion': shipment_data['destination'].get('street', ''),
-                    'telefono': shipment_data['destination'].get('phone', '')
-                },
-                'unidades': self._format_packages_for_quote(shipment_data.get('packages', [])),
-                'tipo_servicio': self.SERVICE_TYPES.get(
-                    shipment_data.get('service_type', 'standard'),
-                    'NOR'
-                ),
-                'valor_declarado': shipment_data.get('declared_value', 0),
-                'tipo_pago': shipment_data.get('payment_type', 'CONTADO')
-            }
-            
-            response = self.session.post(
-                f"{self.base_url}/cotizador/cotizar",
-                json=quote_request,
-                timeout=30
+            async with carrier_client("Coordinadora") as client:
+                response = await client.request(
+                    method, f"{self.base_url}{path}", headers=self.headers, timeout=30.0, **kwargs
+                )
+        except httpx.TimeoutException as e:
+            raise CarrierException("Coordinadora", CarrierErrorType.TIMEOUT, f"{operation} timed out: {str(e)}")
+        except httpx.HTTPError as e:
+            raise CarrierException("Coordinadora", CarrierErrorType.NETWORK_ERROR, f"{operation} failed: {str(e)}")
+
+        if response.status_code != 200:
+            logger.error("Coordinadora API error response", operation=operation,
+                         status=response.status_code, body=response.text)
+            raise CarrierException(
+                "Coordinadora",
+                _error_type(response.status_code),
+                f"{operation} failed: {response.text}",
+                details={"status_code": response.status_code}
             )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Quote calculation failed: {response.text}")
-            
-            quote_data = response.json()
-            
-            # Format response
-            services = []
-            for service in quote_data.get('servicios', []):
-                services.append({
-                    'code': service['codigo'],
-                    'name': service['nombre'],
-                    'transit_days': service.get('dias_entrega', 1),
-                    'estimated_delivery': self._calculate_delivery_date(service.get('dias_entrega', 1)),
-                    'cost': {
-                        'amount': float(service['valor_total']),
-                        'currency': 'COP',
-                        'breakdown': {
-                            'base_rate': float(service.get('valor_flete', 0)),
-                            'handling': float(service.get('valor_manejo', 0)),
-                            'insurance': float(service.get('valor_seguro', 0)),
-                            'tax': float(service.get('valor_iva', 0))
-                        }
-                    },
-                    'available': True
-                })
-            
-            return {
-                'carrier': 'coordinadora',
-                'quote_id': quote_data.get('numero_cotizacion'),
-                'valid_until': (datetime.now() + timedelta(days=7)).isoformat(),
-                'services': services,
-                'total_weight': sum(p.get('weight', 0) for p in shipment_data.get('packages', [])),
-                'currency': 'COP'
-            }
-            
-        except Exception as e:
-            logger.error(f"Quote calculation error: {e}")
-            raise CarrierError(f"Failed to calculate quote: {str(e)}")
-    
-    def create_shipment(self, shipment_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Create a shipment
-        
-        Args:
-            shipment_data: Complete shipment information
-        
-        Returns:
-            Shipment details with tracking number
-        """
-        try:
-            # Build shipment request
-            request_data = {
-                'remitente': self._format_sender(shipment_data['origin']),
-                'destinatario': self._format_recipient(shipment_data['destination']),
-                'unidades': self._format_packages_for_shipment(shipment_data.get('packages', [])),
-                'tipo_servicio': self.SERVICE_TYPES.get(
-                    shipment_data.get('service_type', 'standard'),
-                    'NOR'
-                ),
-                'valor_declarado': shipment_data.get('declared_value', 0),
-                'observaciones': shipment_data.get('special_instructions', ''),
-                'referencia': shipment_data.get('reference', ''),
-                'contenido': shipment_data.get('content_description', 'Merchandise'),
-                'cuenta_pago': self.client_code or self.nit,
-                'tipo_pago': shipment_data.get('payment_type', 'CONTADO')
-            }
-            
-            # Add collection date if provided
-            if shipment_data.get('collection_date'):
-                request_data['fecha_recogida'] = shipment_data['collection_date']
-            
-            response = self.session.post(
-                f"{self.base_url}/envios/generar",
-                json=request_data,
-                timeout=30
+        return response
+
+    async def get_quote(self, request: QuoteRequest) -> QuoteResponse:
+        """Get shipping quote from Coordinadora"""
+        origin_code = await self._get_city_code(request.origin.city)
+        dest_code = await self._get_city_code(request.destination.city)
+        service_code = self.SERVICE_TYPES.get(request.service_type or 'standard', 'NOR')
+
+        quote_request = {
+            'origen': {
+                'ciudad': origin_code,
+                'direccion': request.origin.street,
+                'telefono': request.origin.contact_phone
+            },
+            'destino': {
+                'ciudad': dest_code,
+                'direccion': request.destination.street,
+                'telefono': request.destination.contact_phone
+            },
+            'unidades': self._format_packages_for_quote(request.packages),
+            'tipo_servicio': service_code,
+            'valor_declarado': request.customs_value or sum(p.declared_value or 0 for p in request.packages),
+            'tipo_pago': 'CONTADO'
+        }
+
+        response = await self._request("POST", "/cotizador/cotizar", "Quote calculation", json=quote_request)
+        quote_data = response.json()
+
+        services = quote_data.get('servicios', [])
+        if not services:
+            raise CarrierException(
+                "Coordinadora", CarrierErrorType.COVERAGE_UNAVAILABLE, "No services available for this route"
             )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Shipment creation failed: {response.text}")
-            
-            result = response.json()
-            
-            # Get label URL
-            label_url = f"{self.base_url}/envios/etiqueta/{result['numero_guia']}"
-            
-            return {
-                'carrier': 'coordinadora',
-                'tracking_number': result['numero_guia'],
-                'shipment_id': result.get('id_envio'),
-                'label_url': label_url,
-                'status': 'created',
-                'service_type': shipment_data.get('service_type', 'standard'),
-                'estimated_delivery': result.get('fecha_estimada_entrega'),
-                'cost': {
-                    'amount': float(result.get('valor_total', 0)),
-                    'currency': 'COP'
-                }
+        # Prefer the requested service, otherwise the cheapest one offered
+        service = next(
+            (s for s in services if s.get('codigo') == service_code),
+            min(services, key=lambda s: float(s['valor_total']))
+        )
+
+        return QuoteResponse(
+            quote_id=quote_data.get('numero_cotizacion') or f"COORDINADORA-{datetime.now().timestamp()}",
+            carrier="Coordinadora",
+            service_type=service['nombre'],
+            amount=float(service['valor_total']),
+            currency="COP",
+            estimated_days=int(service.get('dias_entrega', 1)),
+            valid_until=datetime.now() + timedelta(days=7),
+            breakdown={
+                'base_rate': float(service.get('valor_flete', 0)),
+                'handling': float(service.get('valor_manejo', 0)),
+                'insurance': float(service.get('valor_seguro', 0)),
+                'tax': float(service.get('valor_iva', 0))
             }
-            
-        except Exception as e:
-            logger.error(f"Shipment creation error: {e}")
-            raise CarrierError(f"Failed to create shipment: {str(e)}")
-    
-    def track_shipment(self, tracking_number: str) -> Dict[str, Any]:
+        )
+
+    async def generate_label(self, request: LabelRequest) -> LabelResponse:
+        """Create a shipment (guía) and fetch its label"""
+        request_data = {
+            'remitente': await self._format_sender(request.origin),
+            'destinatario': await self._format_recipient(request.destination),
+            'unidades': self._format_packages_for_shipment(request.packages, request.order_id),
+            'tipo_servicio': self.SERVICE_TYPES.get(request.service_type, 'NOR'),
+            'valor_declarado': sum(p.declared_value or 0 for p in request.packages),
+            'observaciones': f"Orden: {request.order_id}",
+            'referencia': request.reference_number or request.order_id,
+            'contenido': request.packages[0].description or 'Merchandise' if request.packages else 'Merchandise',
+            'cuenta_pago': self.client_code or self.nit,
+            'tipo_pago': 'CONTADO'
+        }
+
+        response = await self._request("POST", "/envios/generar", "Shipment creation", json=request_data)
+        result = response.json()
+        tracking_number = result['numero_guia']
+
+        label_data = await self.get_label(tracking_number)
+        estimated = _parse_datetime(result.get('fecha_estimada_entrega'))
+
+        return LabelResponse(
+            tracking_number=tracking_number,
+            carrier="Coordinadora",
+            label_url=f"{self.base_url}/envios/etiqueta/{tracking_number}",
+            label_data=base64.b64encode(label_data).decode(),
+            barcode=tracking_number,
+            estimated_delivery=estimated or datetime.now() + timedelta(days=3),
+            cost=float(result.get('valor_total', 0)),
+            currency="COP"
+        )
+
+    async def get_label(self, tracking_number: str, format: str = 'PDF') -> bytes:
         """
-        Track a shipment
-        
+        Download the shipping label for an existing guía
+
         Args:
-            tracking_number: Tracking number (guía)
-        
+            tracking_number: Tracking number
+            format: Label format (PDF, ZPL)
+
         Returns:
-            Tracking information
+            Label data as bytes
         """
-        try:
-            response = self.session.get(
-                f"{self.base_url}/seguimiento/consultar/{tracking_number}",
-                timeout=30
-            )
-            
-            if response.status_code == 404:
-                raise CarrierError(f"Shipment not found: {tracking_number}")
-            elif response.status_code != 200:
-                raise CarrierError(f"Tracking failed: {response.text}")
-            
-            tracking_data = response.json()
-            
-            # Map status
-            current_status = self.STATUS_MAP.get(
-                tracking_data.get('estado_codigo', '1'),
-                'pending'
+        response = await self._request(
+            "GET", f"/envios/etiqueta/{tracking_number}", "Label generation",
+            params={'formato': format.upper(), 'tipo': 'etiqueta'}
+        )
+        return response.content
+
+    async def track_shipment(self, tracking_number: str) -> TrackingResponse:
+        """Track Coordinadora shipment"""
+        response = await self._request("GET", f"/seguimiento/consultar/{tracking_number}", "Tracking")
+        tracking_data = response.json()
+
+        events = [
+            TrackingEvent(
+                date=_parse_datetime(event['fecha_hora']) or datetime.now(),
+                status=self.STATUS_MAP.get(str(event.get('estado_codigo', '')), 'in_transit'),
+                description=event['descripcion'],
+                location=event.get('ciudad'),
+                details={'state': event.get('departamento')}
             )
-            
-            # Format tracking events
-            events = []
-            for event in tracking_data.get('movimientos', []):
-                events.append({
-                    'timestamp': event['fecha_hora'],
-                    'status': self.STATUS_MAP.get(event.get('estado_codigo', ''), 'in_transit'),
-                    'description': event['descripcion'],
-                    'location': {
-                        'city': event.get('ciudad'),
-                        'state': event.get('departamento'),
-                        'country': 'CO'
-                    }
-                })
-            
-            return {
-                'carrier': 'coordinadora',
-                'tracking_number': tracking_number,
-                'status': current_status,
-                'status_description': tracking_data.get('estado_descripcion'),
-                'last_update': tracking_data.get('fecha_actualizacion'),
-                'current_location': {
-                    'city': tracking_data.get('ciudad_actual'),
-                    'state': tracking_data.get('departamento_actual'),
-                    'country': 'CO'
-                },
-                'origin': {
-                    'city': tracking_data.get('ciudad_origen'),
-                    'state': tracking_data.get('departamento_origen')
-                },
-                'destination': {
-                    'city': tracking_data.get('ciudad_destino'),
-                    'state': tracking_data.get('departamento_destino')
-                },
-                'estimated_delivery': tracking_data.get('fecha_estimada_entrega'),
-                'actual_delivery': tracking_data.get('fecha_entrega'),
-                'events': events,
-                'proof_of_delivery': {
-                    'signature': tracking_data.get('firma_recibido'),
-                    'name': tracking_data.get('nombre_recibe'),
-                    'identification': tracking_data.get('identificacion_recibe'),
-                    'relationship': tracking_data.get('parentesco')
-                } if tracking_data.get('fecha_entrega') else None
-            }
-            
-        except Exception as e:
-            logger.error(f"Tracking error: {e}")
-            raise CarrierError(f"Failed to track shipment: {str(e)}")
-    
-    def cancel_shipment(self, tracking_number: str, reason: str = None) -> Dict[str, Any]:
+            for event in tracking_data.get('movimientos', [])
+        ]
+        delivered_date = _parse_datetime(tracking_data.get('fecha_entrega'))
+
+        return TrackingResponse(
+            tracking_number=tracking_number,
+            carrier="Coordinadora",
+            status=self.STATUS_MAP.get(str(tracking_data.get('estado_codigo', '1')), 'pending'),
+            current_location=tracking_data.get('ciudad_actual'),
+            estimated_delivery=_parse_datetime(tracking_data.get('fecha_estimada_entrega')),
+            delivered_date=delivered_date,
+            events=events,
+            proof_of_delivery={
+                'signature': tracking_data.get('firma_recibido'),
+                'name': tracking_data.get('nombre_recibe'),
+                'identification': tracking_data.get('identificacion_recibe'),
+                'relationship': tracking_data.get('parentesco')
+            } if delivered_date else None
+        )
+
+    async def schedule_pickup(self, request: PickupRequest) -> PickupResponse:
+        """Schedule pickup with Coordinadora"""
+        request_data = {
+            'fecha_recogida': request.pickup_date.strftime("%Y-%m-%d"),
+            'hora_inicio': request.pickup_window_start,
+            'hora_fin': request.pickup_window_end,
+            'direccion': {
+                'direccion': request.address.street,
+                'ciudad': await self._get_city_code(request.address.city),
+                'barrio': '',
+                'referencias': ''
+            },
+            'contacto': {
+                'nombre': request.address.contact_name,
+                'telefono': request.address.contact_phone,
+                'email': request.address.contact_email
+            },
+            'guias': request.tracking_numbers or [],
+            'unidades': request.packages_count,
+            'peso_total': request.total_weight_kg,
+            'observaciones': request.special_instructions or ''
+        }
+
+        response = await self._request("POST", "/recogidas/programar", "Pickup scheduling", json=request_data)
+        result = response.json()
+
+        return PickupResponse(
+            confirmation_number=str(result.get('confirmacion') or result['numero_recogida']),
+            carrier="Coordinadora",
+            pickup_date=request.pickup_date,
+            pickup_window=f"{request.pickup_window_start}-{request.pickup_window_end}",
+            status="scheduled"
+        )
+
+    async def cancel_shipment(self, tracking_number: str, reason: str = None) -> Dict[str, Any]:
         """
         Cancel a shipment
-        
+
         Args:
             tracking_number: Tracking number
             reason: Cancellation reason
-        
+
         Returns:
             Cancellation confirmation
         """
-        try:
-            cancel_data = {
-                'numero_guia': tracking_number,
-                'motivo': reason or 'Solicitud del cliente',
-                'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            response = self.session.post(
-                f"{self.base_url}/envios/anular",
-                json=cancel_data,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Cancellation failed: {response.text}")
-            
-            result = response.json()
-            
-            return {
-                'carrier': 'coordinadora',
-                'tracking_number': tracking_number,
-                'status': 'cancelled',
-                'cancelled_at': result.get('fecha_anulacion'),
-                'confirmation': result.get('confirmacion')
-            }
-            
-        except Exception as e:
-            logger.error(f"Cancellation error: {e}")
-            raise CarrierError(f"Failed to cancel shipment: {str(e)}")
-    
-    def generate_label(self, tracking_number: str, format: str = 'PDF') -> bytes:
-        """
-        Generate shipping label
-        
-        Args:
-            tracking_number: Tracking number
-            format: Label format (PDF, ZPL)
-        
-        Returns:
-            Label data as bytes
-        """
-        try:
-            params = {
-                'formato': format.upper(),
-                'tipo': 'etiqueta'
-            }
-            
-            response = self.session.get(
-                f"{self.base_url}/envios/etiqueta/{tracking_number}",
-                params=params,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Label generation failed: {response.text}")
-            
-            return response.content
-            
-        except Exception as e:
-            logger.error(f"Label generation error: {e}")
-            raise CarrierError(f"Failed to generate label: {str(e)}")
-    
-    def schedule_pickup(self, pickup_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Schedule a pickup
-        
-        Args:
-            pickup_data: Pickup details
-        
-        Returns:
-            Pickup confirmation
-        """
-        try:
-            # Format pickup request for Coordinadora
-            request_data = {
-                'fecha_recogida': pickup_data['pickup_date'],
-                'hora_inicio': pickup_data.get('time_start', '08:00'),
-                'hora_fin': pickup_data.get('time_end', '18:00'),
-                'direccion': self._format_address(pickup_data.get('address', {})),
-                'contacto': {
-                    'nombre': pickup_data.get('contact_name'),
-                    'telefono': pickup_data.get('contact_phone'),
-                    'email': pickup_data.get('contact_email')
-                },
-                'guias': pickup_data.get('tracking_numbers', []),
-                'observaciones': pickup_data.get('instructions', '')
-            }
-            
-            response = self.session.post(
-                f"{self.base_url}/recogidas/programar",
-                json=request_data,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Pickup scheduling failed: {response.text}")
-            
-            result = response.json()
-            
-            return {
-                'carrier': 'coordinadora',
-                'pickup_id': result['numero_recogida'],
-                'confirmation_number': result.get('confirmacion'),
-                'status': 'scheduled',
-                'pickup_date': result['fecha_recogida'],
-                'time_window': f"{result.get('hora_inicio')} - {result.get('hora_fin')}"
-            }
-            
-        except Exception as e:
-            logger.error(f"Pickup scheduling error: {e}")
-            raise CarrierError(f"Failed to schedule pickup: {str(e)}")
-    
-    def get_coverage(self, location_data: Dict[str, Any]) -> Dict[str, Any]:
+        cancel_data = {
+            'numero_guia': tracking_number,
+            'motivo': reason or 'Solicitud del cliente',
+            'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        response = await self._request("POST", "/envios/anular", "Cancellation", json=cancel_data)
+        result = response.json()
+
+        return {
+            'carrier': 'coordinadora',
+            'tracking_number': tracking_number,
+            'status': 'cancelled',
+            'cancelled_at': result.get('fecha_anulacion'),
+            'confirmation': result.get('confirmacion')
+        }
+
+    async def check_coverage(self, city: str, service_type: str = 'standard') -> Dict[str, Any]:
         """
-        Check service coverage for a location
-        
+        Check service coverage for a city
+
         Args:
-            location_data: Location information (city, postal_code)
-        
+            city: City name
+            service_type: Requested service type
+
         Returns:
             Coverage information
         """
-        try:
-            params = {
-                'ciudad': self._get_city_code(location_data.get('city')),
-                'tipo_servicio': location_data.get('service_type', 'NOR')
-            }
-            
-            response = self.session.get(
-                f"{self.base_url}/cobertura/consultar",
-                params=params,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Coverage check failed: {response.text}")
-            
-            coverage = response.json()
-            
-            return {
-                'carrier': 'coordinadora',
-                'covered': coverage.get('cobertura', False),
-                'city': location_data.get('city'),
-                'services_available': coverage.get('servicios_disponibles', []),
-                'transit_days': coverage.get('dias_entrega'),
-                'restrictions': coverage.get('restricciones', [])
-            }
-            
-        except Exception as e:
-            logger.error(f"Coverage check error: {e}")
-            raise CarrierError(f"Failed to check coverage: {str(e)}")
-    
-    def validate_address(self, address: Dict[str, Any]) -> Dict[str, Any]:
+        city_code = await self._lookup_city_code(city)
+        if not city_code:
+            return {'carrier': 'coordinadora', 'covered': False, 'city': city}
+
+        response = await self._request(
+            "GET", "/cobertura/consultar", "Coverage check",
+            params={'ciudad': city_code, 'tipo_servicio': self.SERVICE_TYPES.get(service_type, 'NOR')}
+        )
+        coverage = response.json()
+
+        return {
+            'carrier': 'coordinadora',
+            'covered': coverage.get('cobertura', False),
+            'city': city,
+            'services_available': coverage.get('servicios_disponibles', []),
+            'transit_days': coverage.get('dias_entrega'),
+            'restrictions': coverage.get('restricciones', [])
+        }
+
+    async def validate_address(self, address: Dict[str, Any]) -> Dict[str, Any]:
         """
         Validate an address
-        
+
         Args:
             address: Address to validate
-        
+
         Returns:
             Validation result
         """
-        try:
-            # Coordinadora address validation
-            validation_request = {
-                'ciudad': self._get_city_code(address.get('city')),
-                'direccion': address.get('street', ''),
-                'barrio': address.get('neighborhood', ''),
-                'telefono': address.get('phone', '')
-            }
-            
-            response = self.session.post(
-                f"{self.base_url}/direcciones/validar",
-                json=validation_request,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise ValidationError(f"Address validation failed: {response.text}")
-            
-            result = response.json()
-            
-            return {
-                'valid': result.get('valida', False),
-                'normalized_address': result.get('direccion_normalizada'),
-                'city_code': result.get('codigo_ciudad'),
-                'zone': result.get('zona'),
-                'warnings': result.get('advertencias', [])
-            }
-            
-        except Exception as e:
-            logger.error(f"Address validation error: {e}")
-            raise ValidationError(f"Failed to validate address: {str(e)}")
-    
-    def get_cities(self) -> List[Dict[str, Any]]:
+        validation_request = {
+            'ciudad': await self._get_city_code(address.get('city', '')),
+            'direccion': address.get('street', ''),
+            'barrio': address.get('neighborhood', ''),
+            'telefono': address.get('phone', '')
+        }
+
+        response = await self._request("POST", "/direcciones/validar", "Address validation", json=validation_request)
+        result = response.json()
+
+        return {
+            'valid': result.get('valida', False),
+            'normalized_address': result.get('direccion_normalizada'),
+            'city_code': result.get('codigo_ciudad'),
+            'zone': result.get('zona'),
+            'warnings': result.get('advertencias', [])
+        }
+
+    async def get_cities(self) -> List[Dict[str, Any]]:
         """
         Get list of cities served by Coordinadora
-        
+
         Returns:
-            List of cities with codes
+            List of cities with DANE codes
         """
-        try:
-            response = self.session.get(
-                f"{self.base_url}/ciudades/listar",
-                timeout=30
+        response = await self._request("GET", "/ciudades/listar", "Cities retrieval")
+
+        return [
+            {
+                'code': city['codigo'],
+                'name': city['nombre'],
+                'state': city['departamento'],
+                'zone': city.get('zona')
+            }
+            for city in response.json()
+        ]
+
+    async def refresh_city_codes(self) -> int:
+        """Refresh the shared DANE city table from Coordinadora's city list"""
+        global _last_city_sync
+        _last_city_sync = time.monotonic()
+        cities = await self.get_cities()
+        await self.cities.store([
+            {
+                'city_name': city['name'],
+                'code': city['code'],
+                'department': city['state'],
+                'details': {'zone': city['zone']} if city.get('zone') else None
+            }
+            for city in cities
+        ])
+        logger.info("Coordinadora city table refreshed", cities=len(cities))
+        return len(cities)
+
+    async def _lookup_city_code(self, city_name: str) -> Optional[str]:
+        """DANE code for a city, syncing the city list when it is missing or unknown"""
+        code = await self.cities.lookup(city_name)
+        if code is not None:
+            return code
+        if time.monotonic() - _last_city_sync > CITY_SYNC_INTERVAL or not len(self.cities):
+            try:
+                await self.refresh_city_codes()
+            except CarrierException as e:
+                logger.warning("Coordinadora city list unavailable", error=str(e))
+            code = await self.cities.lookup(city_name)
+        return code
+
+    async def _get_city_code(self, city_name: str) -> str:
+        """DANE code for a city; unknown cities are rejected rather than guessed"""
+        code = await self._lookup_city_code(city_name)
+        if code is None:
+            raise CarrierException(
+                "Coordinadora",
+                CarrierErrorType.COVERAGE_UNAVAILABLE,
+                f"City not served by Coordinadora: {city_name}"
             )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Cities retrieval failed: {response.text}")
-            
-            cities = response.json()
-            
-            return [
-                {
-                    'code': city['codigo'],
-                    'name': city['nombre'],
-                    'state': city['departamento'],
-                    'zone': city.get('zona')
-                }
-                for city in cities
-            ]
-            
-        except Exception as e:
-            logger.error(f"Cities retrieval error: {e}")
-            raise CarrierError(f"Failed to get cities: {str(e)}")
-    
-    def _get_city_code(self, city_name: str) -> str:
-        """
-        Get city code from city name
-        
-        Args:
-            city_name: City name
-        
-        Returns:
-            City code
-        """
-        # This would typically use a cached mapping
-        # For now, return a default or lookup
-        city_codes = {
-            'Bogotá': '11001',
-            'Medellín': '05001',
-            'Cali': '76001',
-            'Barranquilla': '08001',
-            'Cartagena': '13001',
-            'Bucaramanga': '68001',
-            'Pereira': '66001',
-            'Manizales': '17001',
-            'Cúcuta': '54001',
-            'Ibagué': '73001'
-        }
-        return city_codes.get(city_name, '11001')  # Default to Bogotá
-    
-    def _format_sender(self, address: Dict[str, Any]) -> Dict[str, Any]:
+        return code
+
+    async def _format_sender(self, address) -> Dict[str, Any]:
         """Format sender information for Coordinadora"""
         return {
-            'nombre': address.get('name', ''),
-            'nit': address.get('nit', self.nit),
-            'direccion': address.get('street', ''),
-            'telefono': address.get('phone', ''),
-            'ciudad': self._get_city_code(address.get('city', '')),
-            'email': address.get('email', '')
+            'nombre': address.company or address.contact_name,
+            'nit': self.nit,
+            'direccion': address.street,
+            'telefono': address.contact_phone,
+            'ciudad': await self._get_city_code(address.city),
+            'email': address.contact_email or ''
         }
-    
-    def _format_recipient(self, address: Dict[str, Any]) -> Dict[str, Any]:
+
+    async def _format_recipient(self, address) -> Dict[str, Any]:
         """Format recipient information for Coordinadora"""
         return {
-            'nombre': address.get('name', ''),
-            'identificacion': address.get('identification', ''),
-            'direccion': f"{address.get('street', '')} {address.get('number', '')}",
-            'telefono': address.get('phone', ''),
-            'ciudad': self._get_city_code(address.get('city', '')),
-            'email': address.get('email', ''),
-            'barrio': address.get('neighborhood', '')
-        }
-    
-    def _format_address(self, address: Dict[str, Any]) -> Dict[str, Any]:
-        """Format address for Coordinadora API"""
-        return {
-            'direccion': f"{address.get('street', '')} {address.get('number', '')}",
-            'ciudad': self._get_city_code(address.get('city', '')),
-            'barrio': address.get('neighborhood', ''),
-            'referencias': address.get('reference', '')
+            'nombre': address.contact_name,
+            'identificacion': '',
+            'direccion': address.street,
+            'telefono': address.contact_phone,
+            'ciudad': await self._get_city_code(address.city),
+            'email': address.contact_email or '',
+            'barrio': ''
         }
-    
-    def _format_packages_for_quote(self, packages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+    def _format_packages_for_quote(self, packages) -> List[Dict[str, Any]]:
         """Format packages for quote calculation"""
-        formatted = []
-        for pkg in packages:
-            formatted.append({
-                'peso': float(pkg.get('weight', 0)),
-                'largo': float(pkg.get('length', 0)),
-                'ancho': float(pkg.get('width', 0)),
-                'alto': float(pkg.get('height', 0)),
-                'cantidad': int(pkg.get('quantity', 1)),
-                'valor_declarado': float(pkg.get('value', 0))
-            })
-        return formatted
-    
-    def _format_packages_for_shipment(self, packages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {
+                'peso': float(pkg.weight_kg),
+                'largo': float(pkg.length_cm),
+                'ancho': float(pkg.width_cm),
+                'alto': float(pkg.height_cm),
+                'cantidad': 1,
+                'valor_declarado': float(pkg.declared_value or 0)
+            }
+            for pkg in packages
+        ]
+
+    def _format_packages_for_shipment(self, packages, reference: str) -> List[Dict[str, Any]]:
         """Format packages for shipment creation"""
-        formatted = []
-        for i, pkg in enumerate(packages):
-            formatted.append({
+        return [
+            {
                 'numero': i + 1,
-                'peso': float(pkg.get('weight', 0)),
-                'largo': float(pkg.get('length', 0)),
-                'ancho': float(pkg.get('width', 0)),
-                'alto': float(pkg.get('height', 0)),
-                'cantidad': int(pkg.get('quantity', 1)),
-                'valor_declarado': float(pkg.get('value', 0)),
-                'contenido': pkg.get('description', 'Merchandise'),
-                'referencia': pkg.get('reference', f"PKG-{i+1}")
-            })
-        return formatted
-    
-    def _calculate_delivery_date(self, transit_days: int) -> str:
-        """Calculate estimated delivery date"""
-        # Skip weekends
-        delivery_date = datetime.now()
-        days_added = 0
-        while days_added < transit_days:
-            delivery_date += timedelta(days=1)
-            if delivery_date.weekday() < 5:  # Monday = 0, Friday = 4
-                days_added += 1
-        return delivery_date.isoformat()
\ No newline at end of file
+                'peso': float(pkg.weight_kg),
+                'largo': float(pkg.length_cm),
+                'ancho': float(pkg.width_cm),
+                'alto': float(pkg.height_cm),
+                'cantidad': 1,
+                'valor_declarado': float(pkg.declared_value or 0),
+                'contenido': pkg.description or 'Merchandise',
+                'referencia': f"{reference}-{i + 1}"
+            }
+            for i, pkg in enumerate(packages)
+        ]
+
+
+def _error_type(status_code: int) -> CarrierErrorType:
+    if status_code in (401, 403):
+        return CarrierErrorType.AUTHENTICATION
+    if status_code == 404:
+        return CarrierErrorType.INVALID_TRACKING
+    if status_code == 429:
+        return CarrierErrorType.RATE_LIMIT
+    if status_code >= 500:
+        return CarrierErrorType.SERVICE_UNAVAILABLE
+    return CarrierErrorType.UNKNOWN
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse the ISO or "YYYY-MM-DD HH:MM:SS" timestamps Coordinadora returns"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
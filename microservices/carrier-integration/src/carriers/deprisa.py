@@ -3,42 +3,48 @@ Deprisa Carrier Integration
 Colombian logistics provider for domestic and express shipping
 """
 
-import hashlib
-import hmac
-import json
-import logging
-import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-import requests
-from decimal import Decimal
 import base64
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+import httpx
+import structlog
 
-from ..error_handlers import CarrierError, ValidationError, AuthenticationError
+from ..schemas import (
+    QuoteRequest, QuoteResponse,
+    LabelRequest, LabelResponse,
+    TrackingResponse, TrackingEvent,
+    PickupRequest, PickupResponse
+)
+from .transport import carrier_client, get_oauth_token, invalidate_oauth_token
+from .city_codes import get_city_table
+from ..error_handlers import CarrierException, CarrierErrorType
 
-logger = logging.getLogger(__name__)
+logger = structlog.get_logger()
 
 
-class DeprisaCarrier:
+class DeprisaClient:
     """
     Deprisa carrier implementation for Colombian shipping
     """
-    
+
     # API Configuration
     BASE_URL = "https://api.deprisa.com/v2"
     SANDBOX_URL = "https://sandbox-api.deprisa.com/v2"
-    
+
     # Service types mapping
     SERVICE_TYPES = {
         'express': 'DEP-EXP',
         'standard': 'DEP-STD',
         'economy': 'DEP-ECO',
         'same_day': 'DEP-SD',
+        'overnight': 'DEP-ND',
         'next_day': 'DEP-ND',
         'documents': 'DEP-DOC',
         'merchandise': 'DEP-MER'
     }
-    
+
     # Status mapping
     STATUS_MAP = {
         'CREATED': 'pending',
@@ -50,591 +56,434 @@ class DeprisaCarrier:
         'RETURNED': 'returned',
         'CANCELLED': 'cancelled'
     }
-    
-    def __init__(self, credentials: Dict[str, Any]):
+
+    def __init__(self, credentials: Dict[str, Any] = None, environment: str = None):
         """
         Initialize Deprisa carrier
-        
+
         Args:
             credentials: Dictionary containing:
                 - client_id: API client ID
                 - client_secret: API client secret
                 - account_number: Deprisa account number
-                - sandbox: Use sandbox environment (default: False)
+            environment: "sandbox" or "production"
         """
+        # Load from environment variables if credentials not provided
+        if credentials is None:
+            credentials = self._load_from_env()
+
         self.client_id = credentials.get('client_id')
         self.client_secret = credentials.get('client_secret')
         self.account_number = credentials.get('account_number')
-        self.sandbox = credentials.get('sandbox', False)
-        
+        self.environment = environment or os.getenv('DEPRISA_ENVIRONMENT', 'sandbox')
+
         if not all([self.client_id, self.client_secret]):
             raise ValueError("Deprisa requires client_id and client_secret")
-        
-        self.base_url = self.SANDBOX_URL if self.sandbox else self.BASE_URL
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-            'User-Agent': 'CarrierIntegration/1.0'
-        })
-        
-        self.access_token = None
-        self.token_expires_at = None
-        
-        # Authenticate on initialization
-        self.authenticate()
-    
-    def authenticate(self) -> bool:
-        """
-        Authenticate with Deprisa API
-        
-        Returns:
-            True if authentication successful
-        
-        Raises:
-            AuthenticationError: If authentication fails
-        """
-        try:
-            endpoint = f"{self.base_url}/auth/token"
-            
-            auth_data = {
-                'grant_type': 'client_credentials',
-                'client_id': self.client_id,
-                'client_secret': self.client_secret
-            }
-            
-            if self.account_number:
-                auth_data['account_number'] = self.account_number
-            
-            response = self.session.post(endpoint, json=auth_data, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                self.access_token = data['access_token']
-                expires_in = data.get('expires_in', 3600)
-                self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-                
-                # Update session headers
-                self.session.headers.update({
-                    'Authorization': f'Bearer {self.access_token}'
-                })
-                
-                logger.info("Successfully authenticated with Deprisa")
-                return True
-            else:
-                raise AuthenticationError(f"Deprisa authentication failed: {response.text}")
-                
-        except requests.RequestException as e:
-            raise AuthenticationError(f"Deprisa authentication error: {str(e)}")
-    
-    def ensure_authenticated(self):
-        """Ensure valid authentication token"""
-        if not self.access_token or not self.token_expires_at:
-            self.authenticate()
-        elif datetime.now() >= self.token_expires_at:
-            logger.info("Token expired, re-authenticating...")
-            self.authenticate()
-    
-    def calculate_quote(self, shipment_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Calculate shipping quote
-        
-        Args:
-            shipment_data: Shipment details including origin, destination, packages
-        
-        Returns:
-            Quote information with rates and transit times
-        """
-        self.ensure_authenticated()
-        
+
+        self.base_url = self.SANDBOX_URL if self.environment == "sandbox" else self.BASE_URL
+        self.cities = get_city_table("DANE")
+
+    def _load_from_env(self) -> Dict[str, Any]:
+        """Load Deprisa credentials from environment variables"""
+        return {
+            'client_id': os.getenv('DEPRISA_CLIENT_ID'),
+            'client_secret': os.getenv('DEPRISA_CLIENT_SECRET'),
+            'account_number': os.getenv('DEPRISA_ACCOUNT_NUMBER')
+        }
+
+    @property
+    def _token_account(self) -> str:
+        return f"{self.environment}:{self.client_id}"
+
+    async def _get_access_token(self) -> str:
+        """Get the OAuth access token shared by all workers"""
+        return await get_oauth_token("Deprisa", self._token_account, self._request_access_token)
+
+    async def _request_access_token(self) -> Tuple[str, int]:
+        """Request a new access token"""
+        auth_data = {
+            'grant_type': 'client_credentials',
+            'client_id': self.client_id,
+            'client_secret': self.client_secret
+        }
+        if self.account_number:
+            auth_data['account_number'] = self.account_number
+
         try:
-            # Build quote request
-            quote_request = {
-                'origin': self._format_address(shipment_data['origin']),
-                'destination': self._format_address(shipment_data['destination']),
-                'packages': self._format_packages(shipment_data.get('packages', [])),
-                'service_type': shipment_data.get('service_type', 'standard'),
-                'insurance': shipment_data.get('insurance', False),
-                'declared_value': shipment_data.get('declared_value', 0),
-                'collection_date': shipment_data.get('collection_date')
-            }
-            
-            response = self.session.post(
-                f"{self.base_url}/shipping/quote",
-                json=quote_request,
-                timeout=30
+            async with carrier_client("Deprisa") as client:
+                response = await client.post(f"{self.base_url}/auth/token", json=auth_data, timeout=30.0)
+        except httpx.HTTPError as e:
+            raise CarrierException("Deprisa", CarrierErrorType.AUTHENTICATION, f"Deprisa authentication error: {str(e)}")
+
+        if response.status_code != 200:
+            raise CarrierException(
+                "Deprisa", CarrierErrorType.AUTHENTICATION, f"Deprisa authentication failed: {response.text}"
             )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Quote calculation failed: {response.text}")
-            
-            quote_data = response.json()
-            
-            # Format response
-            return {
-                'carrier': 'deprisa',
-                'quote_id': quote_data.get('quote_id'),
-                'valid_until': quote_data.get('valid_until'),
-                'services': self._format_services(quote_data.get('services', [])),
-                'total_weight': sum(p.get('weight', 0) for p in shipment_data.get('packages', [])),
-                'currency': 'COP'
+        data = response.json()
+        return data['access_token'], int(data.get('expires_in', 3600))
+
+    async def _request(self, method: str, path: str, operation: str, **kwargs) -> httpx.Response:
+        """Send an authenticated request, retrying once with a fresh token on 401"""
+        for attempt in range(2):
+            token = await self._get_access_token()
+            headers = {
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+                'Authorization': f'Bearer {token}'
             }
-            
-        except Exception as e:
-            logger.error(f"Quote calculation error: {e}")
-            raise CarrierError(f"Failed to calculate quote: {str(e)}")
-    
-    def create_shipment(self, shipment_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Create a shipment
-        
-        Args:
-            shipment_data: Complete shipment information
-        
-        Returns:
-            Shipment details with tracking number
-        """
-        self.ensure_authenticated()
-        
-        try:
-            # Prepare shipment request
-            if 'quote_id' in shipment_data:
-                # Create from existing quote
-                request_data = {
-                    'quote_id': shipment_data['quote_id'],
-                    'reference': shipment_data.get('reference'),
-                    'collection_date': shipment_data.get('collection_date'),
-                    'special_instructions': shipment_data.get('special_instructions')
-                }
-            else:
-                # Direct creation
-                request_data = {
-                    'origin': self._format_address(shipment_data['origin']),
-                    'destination': self._format_address(shipment_data['destination']),
-                    'packages': self._format_packages(shipment_data.get('packages', [])),
-                    'service_type': self.SERVICE_TYPES.get(
-                        shipment_data.get('service_type', 'standard'),
-                        'DEP-STD'
-                    ),
-                    'reference': shipment_data.get('reference'),
-                    'collection_date': shipment_data.get('collection_date'),
-                    'special_instructions': shipment_data.get('special_instructions'),
-                    'options': {
-                        'email_notifications': True,
-                        'sms_notifications': shipment_data['destination'].get('phone') is not None,
-                        'proof_of_delivery': True,
-                        'signature_required': shipment_data.get('signature_required', True)
-                    }
-                }
-            
-            response = self.session.post(
-                f"{self.base_url}/shipping/create",
-                json=request_data,
-                timeout=30
+            try:
+                async with carrier_client("Deprisa") as client:
+                    response = await client.request(
+                        method, f"{self.base_url}{path}", headers=headers, timeout=30.0, **kwargs
+                    )
+            except httpx.TimeoutException as e:
+                raise CarrierException("Deprisa", CarrierErrorType.TIMEOUT, f"{operation} timed out: {str(e)}")
+            except httpx.HTTPError as e:
+                raise CarrierException("Deprisa", CarrierErrorType.NETWORK_ERROR, f"{operation} failed: {str(e)}")
+
+            if response.status_code == 401 and attempt == 0:
+                # Token revoked or rotated early: drop it everywhere and retry once
+                await invalidate_oauth_token("Deprisa", self._token_account)
+                continue
+            break
+
+        if response.status_code != 200:
+            logger.error("Deprisa API error response", operation=operation,
+                         status=response.status_code, body=response.text)
+            raise CarrierException(
+                "Deprisa",
+                _error_type(response.status_code),
+                f"{operation} failed: {response.text}",
+                details={"status_code": response.status_code}
             )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Shipment creation failed: {response.text}")
-            
-            result = response.json()
-            
-            return {
-                'carrier': 'deprisa',
-                'tracking_number': result['tracking_number'],
-                'shipment_id': result['shipment_id'],
-                'label_url': result.get('label_url'),
-                'status': 'created',
-                'service_type': result['service']['name'],
-                'estimated_delivery': result.get('estimated_delivery'),
-                'cost': {
-                    'amount': result['pricing']['total'],
-                    'currency': result['pricing']['currency']
-                }
-            }
-            
-        except Exception as e:
-            logger.error(f"Shipment creation error: {e}")
-            raise CarrierError(f"Failed to create shipment: {str(e)}")
-    
-    def track_shipment(self, tracking_number: str) -> Dict[str, Any]:
-        """
-        Track a shipment
-        
-        Args:
-            tracking_number: Tracking number
-        
-        Returns:
-            Tracking information
-        """
-        self.ensure_authenticated()
-        
-        try:
-            response = self.session.get(
-                f"{self.base_url}/tracking/{tracking_number}",
-                timeout=30
+        return response
+
+    async def get_quote(self, request: QuoteRequest) -> QuoteResponse:
+        """Get shipping quote from Deprisa"""
+        service_code = self.SERVICE_TYPES.get(request.service_type or 'standard', 'DEP-STD')
+        quote_request = {
+            'origin': await self._format_address(request.origin),
+            'destination': await self._format_address(request.destination),
+            'packages': self._format_packages(request.packages),
+            'service_type': service_code,
+            'insurance': request.insurance_required,
+            'declared_value': request.customs_value or sum(p.declared_value or 0 for p in request.packages),
+            'collection_date': request.pickup_date.strftime("%Y-%m-%d") if request.pickup_date else None
+        }
+
+        response = await self._request("POST", "/shipping/quote", "Quote calculation", json=quote_request)
+        quote_data = response.json()
+
+        services = [s for s in quote_data.get('services', []) if s.get('available', True)]
+        if not services:
+            raise CarrierException(
+                "Deprisa", CarrierErrorType.COVERAGE_UNAVAILABLE, "No services available for this route"
             )
-            
-            if response.status_code == 404:
-                raise CarrierError(f"Shipment not found: {tracking_number}")
-            elif response.status_code != 200:
-                raise CarrierError(f"Tracking failed: {response.text}")
-            
-            tracking_data = response.json()
-            
-            return {
-                'carrier': 'deprisa',
-                'tracking_number': tracking_number,
-                'status': self.STATUS_MAP.get(
-                    tracking_data['status'],
-                    tracking_data['status'].lower()
-                ),
-                'status_description': tracking_data.get('status_description'),
-                'last_update': tracking_data.get('last_update'),
-                'current_location': {
-                    'city': tracking_data.get('current_city'),
-                    'state': tracking_data.get('current_state'),
-                    'country': 'CO'
-                },
-                'estimated_delivery': tracking_data.get('estimated_delivery'),
-                'actual_delivery': tracking_data.get('delivered_at'),
-                'events': self._format_tracking_events(tracking_data.get('events', [])),
-                'proof_of_delivery': tracking_data.get('proof_of_delivery')
-            }
-            
-        except Exception as e:
-            logger.error(f"Tracking error: {e}")
-            raise CarrierError(f"Failed to track shipment: {str(e)}")
-    
-    def cancel_shipment(self, tracking_number: str, reason: str = None) -> Dict[str, Any]:
-        """
-        Cancel a shipment
-        
-        Args:
-            tracking_number: Tracking number
-            reason: Cancellation reason
-        
-        Returns:
-            Cancellation confirmation
-        """
-        self.ensure_authenticated()
-        
-        try:
-            cancel_data = {
-                'reason': reason or 'Customer request',
-                'requested_by': 'API Client'
+        # Prefer the requested service, otherwise the cheapest one offered
+        service = next(
+            (s for s in services if s.get('code') == service_code),
+            min(services, key=lambda s: float(s['pricing']['total']))
+        )
+        pricing = service['pricing']
+
+        return QuoteResponse(
+            quote_id=quote_data.get('quote_id') or f"DEPRISA-{datetime.now().timestamp()}",
+            carrier="Deprisa",
+            service_type=service['name'],
+            amount=float(pricing['total']),
+            currency=pricing.get('currency', 'COP'),
+            estimated_days=int(service.get('transit_days', 1)),
+            valid_until=_parse_datetime(quote_data.get('valid_until')) or datetime.now() + timedelta(days=1),
+            breakdown={
+                name: float(pricing[name])
+                for name in ('base_rate', 'fuel_surcharge', 'insurance', 'tax')
+                if pricing.get(name) is not None
             }
-            
-            response = self.session.post(
-                f"{self.base_url}/shipping/shipments/{tracking_number}/cancel",
-                json=cancel_data,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Cancellation failed: {response.text}")
-            
-            result = response.json()
-            
-            return {
-                'carrier': 'deprisa',
-                'tracking_number': tracking_number,
-                'status': 'cancelled',
-                'cancelled_at': result.get('cancelled_at'),
-                'refund': result.get('refund')
+        )
+
+    async def generate_label(self, request: LabelRequest) -> LabelResponse:
+        """Create a shipment and fetch its label"""
+        request_data = {
+            'origin': await self._format_address(request.origin),
+            'destination': await self._format_address(request.destination),
+            'packages': self._format_packages(request.packages, request.order_id),
+            'service_type': self.SERVICE_TYPES.get(request.service_type, 'DEP-STD'),
+            'reference': request.reference_number or request.order_id,
+            'options': {
+                'email_notifications': True,
+                'sms_notifications': bool(request.destination.contact_phone),
+                'proof_of_delivery': True,
+                'signature_required': True
             }
-            
-        except Exception as e:
-            logger.error(f"Cancellation error: {e}")
-            raise CarrierError(f"Failed to cancel shipment: {str(e)}")
-    
-    def generate_label(self, tracking_number: str, format: str = 'PDF') -> bytes:
+        }
+        if request.quote_id:
+            request_data['quote_id'] = request.quote_id
+
+        response = await self._request("POST", "/shipping/create", "Shipment creation", json=request_data)
+        result = response.json()
+        tracking_number = result['tracking_number']
+
+        label_data = await self.get_label(tracking_number)
+        pricing = result.get('pricing', {})
+
+        return LabelResponse(
+            tracking_number=tracking_number,
+            carrier="Deprisa",
+            label_url=result.get('label_url'),
+            label_data=base64.b64encode(label_data).decode(),
+            barcode=tracking_number,
+            estimated_delivery=_parse_datetime(result.get('estimated_delivery')) or datetime.now() + timedelta(days=3),
+            cost=float(pricing.get('total', 0)),
+            currency=pricing.get('currency', 'COP')
+        )
+
+    async def get_label(self, tracking_number: str, format: str = 'PDF') -> bytes:
         """
-        Generate shipping label
-        
+        Download the shipping label for an existing shipment
+
         Args:
             tracking_number: Tracking number
             format: Label format (PDF, ZPL, PNG)
-        
+
         Returns:
             Label data as bytes
         """
-        self.ensure_authenticated()
-        
-        try:
-            response = self.session.get(
-                f"{self.base_url}/labels/{tracking_number}",
-                params={'format': format},
-                timeout=30
+        response = await self._request(
+            "GET", f"/labels/{tracking_number}", "Label generation", params={'format': format}
+        )
+        return response.content
+
+    async def track_shipment(self, tracking_number: str) -> TrackingResponse:
+        """Track Deprisa shipment"""
+        response = await self._request("GET", f"/tracking/{tracking_number}", "Tracking")
+        tracking_data = response.json()
+
+        events = [
+            TrackingEvent(
+                date=_parse_datetime(event['timestamp']) or datetime.now(),
+                status=self.STATUS_MAP.get(event['status'], event['status'].lower()),
+                description=event['description'],
+                location=event.get('city'),
+                details={'state': event.get('state')}
             )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Label generation failed: {response.text}")
-            
-            return response.content
-            
-        except Exception as e:
-            logger.error(f"Label generation error: {e}")
-            raise CarrierError(f"Failed to generate label: {str(e)}")
-    
-    def schedule_pickup(self, pickup_data: Dict[str, Any]) -> Dict[str, Any]:
+            for event in tracking_data.get('events', [])
+        ]
+
+        return TrackingResponse(
+            tracking_number=tracking_number,
+            carrier="Deprisa",
+            status=self.STATUS_MAP.get(tracking_data['status'], tracking_data['status'].lower()),
+            current_location=tracking_data.get('current_city'),
+            estimated_delivery=_parse_datetime(tracking_data.get('estimated_delivery')),
+            delivered_date=_parse_datetime(tracking_data.get('delivered_at')),
+            events=events,
+            proof_of_delivery=tracking_data.get('proof_of_delivery')
+        )
+
+    async def schedule_pickup(self, request: PickupRequest) -> PickupResponse:
+        """Schedule pickup with Deprisa"""
+        request_data = {
+            'tracking_numbers': request.tracking_numbers or [],
+            'pickup_date': request.pickup_date.strftime("%Y-%m-%d"),
+            'time_window': f"{request.pickup_window_start}-{request.pickup_window_end}",
+            'address': await self._format_address(request.address),
+            'contact': {
+                'name': request.address.contact_name,
+                'phone': request.address.contact_phone,
+                'email': request.address.contact_email
+            },
+            'packages': request.packages_count,
+            'total_weight': request.total_weight_kg,
+            'special_instructions': request.special_instructions or ''
+        }
+
+        response = await self._request("POST", "/pickup/schedule", "Pickup scheduling", json=request_data)
+        result = response.json()
+
+        return PickupResponse(
+            confirmation_number=str(result.get('confirmation_number') or result['pickup_id']),
+            carrier="Deprisa",
+            pickup_date=request.pickup_date,
+            pickup_window=result.get('time_window') or f"{request.pickup_window_start}-{request.pickup_window_end}",
+            status="scheduled"
+        )
+
+    async def cancel_shipment(self, tracking_number: str, reason: str = None) -> Dict[str, Any]:
         """
-        Schedule a pickup
-        
+        Cancel a shipment
+
         Args:
-            pickup_data: Pickup details
-        
+            tracking_number: Tracking number
+            reason: Cancellation reason
+
         Returns:
-            Pickup confirmation
+            Cancellation confirmation
         """
-        self.ensure_authenticated()
-        
-        try:
-            request_data = {
-                'tracking_numbers': pickup_data.get('tracking_numbers', []),
-                'pickup_date': pickup_data['pickup_date'],
-                'time_window': pickup_data.get('time_window', 'AM'),
-                'address': self._format_address(pickup_data.get('address', {})),
-                'contact': {
-                    'name': pickup_data.get('contact_name'),
-                    'phone': pickup_data.get('contact_phone'),
-                    'email': pickup_data.get('contact_email')
-                },
-                'special_instructions': pickup_data.get('instructions', '')
-            }
-            
-            response = self.session.post(
-                f"{self.base_url}/pickup/schedule",
-                json=request_data,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Pickup scheduling failed: {response.text}")
-            
-            result = response.json()
-            
-            return {
-                'carrier': 'deprisa',
-                'pickup_id': result['pickup_id'],
-                'confirmation_number': result.get('confirmation_number'),
-                'status': 'scheduled',
-                'pickup_date': result['pickup_date'],
-                'time_window': result['time_window']
-            }
-            
-        except Exception as e:
-            logger.error(f"Pickup scheduling error: {e}")
-            raise CarrierError(f"Failed to schedule pickup: {str(e)}")
-    
-    def get_service_points(self, location_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        cancel_data = {
+            'reason': reason or 'Customer request',
+            'requested_by': 'API Client'
+        }
+
+        response = await self._request(
+            "POST", f"/shipping/shipments/{tracking_number}/cancel", "Cancellation", json=cancel_data
+        )
+        result = response.json()
+
+        return {
+            'carrier': 'deprisa',
+            'tracking_number': tracking_number,
+            'status': 'cancelled',
+            'cancelled_at': result.get('cancelled_at'),
+            'refund': result.get('refund')
+        }
+
+    async def get_service_points(self, location_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Get service points near a location
-        
+
         Args:
             location_data: Location information (city, postal_code, coordinates)
-        
+
         Returns:
             List of nearby service points
         """
-        self.ensure_authenticated()
-        
-        try:
-            params = {
-                'city': location_data.get('city'),
-                'postal_code': location_data.get('postal_code'),
-                'radius_km': location_data.get('radius', 10)
+        params = {
+            'city': location_data.get('city'),
+            'postal_code': location_data.get('postal_code'),
+            'radius_km': location_data.get('radius', 10)
+        }
+        if location_data.get('latitude') and location_data.get('longitude'):
+            params['latitude'] = location_data['latitude']
+            params['longitude'] = location_data['longitude']
+
+        response = await self._request("GET", "/service-points", "Service points query", params=params)
+        points = response.json().get('service_points', [])
+
+        return [
+            {
+                'carrier': 'deprisa',
+                'point_id': point['point_id'],
+                'name': point['name'],
+                'type': point.get('type'),
+                'address': {
+                    'street': point.get('street'),
+                    'city': point.get('city'),
+                    'state': point.get('state'),
+                    'postal_code': point.get('postal_code'),
+                    'country': 'CO'
+                },
+                'coordinates': {
+                    'latitude': point.get('latitude'),
+                    'longitude': point.get('longitude')
+                },
+                'hours': point.get('hours'),
+                'services': point.get('services', [])
             }
-            
-            if location_data.get('latitude') and location_data.get('longitude'):
-                params['latitude'] = location_data['latitude']
-                params['longitude'] = location_data['longitude']
-            
-            response = self.session.get(
-                f"{self.base_url}/service-points",
-                params=params,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Service points query failed: {response.text}")
-            
-            points = response.json().get('service_points', [])
-            
-            return [
-                {
-                    'carrier': 'deprisa',
-                    'point_id': point['point_id'],
-                    'name': point['name'],
-                    'type': point.get('type'),
-                    'address': {
-                        'street': point.get('street'),
-                        'city': point.get('city'),
-                        'state': point.get('state'),
-                        'postal_code': point.get('postal_code'),
-                        'country': 'CO'
-                    },
-                    'coordinates': {
-                        'latitude': point.get('latitude'),
-                        'longitude': point.get('longitude')
-                    },
-                    'hours': point.get('hours'),
-                    'services': point.get('services', [])
-                }
-                for point in points
-            ]
-            
-        except Exception as e:
-            logger.error(f"Service points error: {e}")
-            raise CarrierError(f"Failed to get service points: {str(e)}")
-    
-    def validate_address(self, address: Dict[str, Any]) -> Dict[str, Any]:
+            for point in points
+        ]
+
+    async def validate_address(self, address: Dict[str, Any]) -> Dict[str, Any]:
         """
         Validate an address
-        
+
         Args:
             address: Address to validate
-        
+
         Returns:
             Validation result with standardized address
         """
-        self.ensure_authenticated()
-        
-        try:
-            response = self.session.post(
-                f"{self.base_url}/address/validate",
-                json=self._format_address(address),
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise ValidationError(f"Address validation failed: {response.text}")
-            
-            result = response.json()
-            
-            return {
-                'valid': result.get('valid', False),
-                'standardized': result.get('standardized_address'),
-                'suggestions': result.get('suggestions', []),
-                'warnings': result.get('warnings', [])
-            }
-            
-        except Exception as e:
-            logger.error(f"Address validation error: {e}")
-            raise ValidationError(f"Failed to validate address: {str(e)}")
-    
-    def get_transit_times(self, origin: str, destination: str) -> Dict[str, Any]:
+        payload = {
+            'street': address.get('street', ''),
+            'neighborhood': address.get('neighborhood', ''),
+            'city': address.get('city', ''),
+            'state': address.get('state', ''),
+            'postal_code': address.get('postal_code', ''),
+            'country_code': address.get('country_code', 'CO')
+        }
+        response = await self._request("POST", "/address/validate", "Address validation", json=payload)
+        result = response.json()
+
+        return {
+            'valid': result.get('valid', False),
+            'standardized': result.get('standardized_address'),
+            'suggestions': result.get('suggestions', []),
+            'warnings': result.get('warnings', [])
+        }
+
+    async def get_transit_times(self, origin: str, destination: str) -> Dict[str, Any]:
         """
         Get transit times between cities
-        
+
         Args:
             origin: Origin city
             destination: Destination city
-        
+
         Returns:
             Transit time information by service
         """
-        self.ensure_authenticated()
-        
-        try:
-            params = {
-                'origin': origin,
-                'destination': destination
-            }
-            
-            response = self.session.get(
-                f"{self.base_url}/transit-times",
-                params=params,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                raise CarrierError(f"Transit times query failed: {response.text}")
-            
-            data = response.json()
-            
-            return {
-                'origin': origin,
-                'destination': destination,
-                'services': data.get('services', []),
-                'zone': data.get('zone'),
-                'distance_km': data.get('distance_km')
-            }
-            
-        except Exception as e:
-            logger.error(f"Transit times error: {e}")
-            raise CarrierError(f"Failed to get transit times: {str(e)}")
-    
-    def _format_address(self, address: Dict[str, Any]) -> Dict[str, Any]:
-        """Format address for Deprisa API"""
+        response = await self._request(
+            "GET", "/transit-times", "Transit times query",
+            params={'origin': origin, 'destination': destination}
+        )
+        data = response.json()
+
         return {
-            'name': address.get('name', ''),
-            'company': address.get('company', ''),
-            'street': address.get('street', ''),
-            'number': address.get('number', ''),
-            'apartment': address.get('apartment', ''),
-            'neighborhood': address.get('neighborhood', ''),
-            'city': address.get('city', ''),
-            'state': address.get('state', ''),
-            'postal_code': address.get('postal_code', ''),
-            'country_code': address.get('country_code', 'CO'),
-            'phone': address.get('phone', ''),
-            'email': address.get('email', ''),
-            'reference': address.get('reference', '')
+            'origin': origin,
+            'destination': destination,
+            'services': data.get('services', []),
+            'zone': data.get('zone'),
+            'distance_km': data.get('distance_km')
         }
-    
-    def _format_packages(self, packages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+    async def _format_address(self, address) -> Dict[str, Any]:
+        """Format address for Deprisa API, adding the DANE code when it is known"""
+        return {
+            'name': address.contact_name,
+            'company': address.company or '',
+            'street': address.street,
+            'city': address.city,
+            'city_code': await self.cities.lookup(address.city) or '',
+            'state': address.state or '',
+            'postal_code': address.postal_code,
+            'country_code': address.country,
+            'phone': address.contact_phone,
+            'email': address.contact_email or ''
+        }
+
+    def _format_packages(self, packages, reference: str = None) -> List[Dict[str, Any]]:
         """Format packages for Deprisa API"""
-        formatted = []
-        for pkg in packages:
-            formatted.append({
-                'weight': float(pkg.get('weight', 0)),  # kg
-                'length': float(pkg.get('length', 0)),  # cm
-                'width': float(pkg.get('width', 0)),    # cm
-                'height': float(pkg.get('height', 0)),  # cm
-                'value': float(pkg.get('value', 0)),    # COP
-                'quantity': int(pkg.get('quantity', 1)),
-                'description': pkg.get('description', ''),
-                'type': pkg.get('type', 'BOX'),
-                'reference': pkg.get('reference', '')
-            })
-        return formatted
-    
-    def _format_services(self, services: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Format service options from quote"""
-        formatted = []
-        for service in services:
-            formatted.append({
-                'code': service['code'],
-                'name': service['name'],
-                'transit_days': service['transit_days'],
-                'estimated_delivery': service.get('estimated_delivery'),
-                'cost': {
-                    'amount': service['pricing']['total'],
-                    'currency': service['pricing']['currency'],
-                    'breakdown': {
-                        'base_rate': service['pricing'].get('base_rate'),
-                        'fuel_surcharge': service['pricing'].get('fuel_surcharge'),
-                        'insurance': service['pricing'].get('insurance'),
-                        'tax': service['pricing'].get('tax')
-                    }
-                },
-                'cutoff_time': service.get('cutoff_time'),
-                'available': service.get('available', True)
-            })
-        return formatted
-    
-    def _format_tracking_events(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Format tracking events"""
-        formatted = []
-        for event in events:
-            formatted.append({
-                'timestamp': event['timestamp'],
-                'status': self.STATUS_MAP.get(event['status'], event['status'].lower()),
-                'description': event['description'],
-                'location': {
-                    'city': event.get('city'),
-                    'state': event.get('state'),
-                    'country': 'CO'
-                }
-            })
-        return formatted
\ No newline at end of file
+        return [
+            {
+                'weight': float(pkg.weight_kg),   # kg
+                'length': float(pkg.length_cm),   # cm
+                'width': float(pkg.width_cm),     # cm
+                'height': float(pkg.height_cm),   # cm
+                'value': float(pkg.declared_value or 0),  # COP
+                'quantity': 1,
+                'description': pkg.description or '',
+                'type': 'BOX',
+                'reference': f"{reference}-{i + 1}" if reference else ''
+            }
+            for i, pkg in enumerate(packages)
+        ]
+
+
+def _error_type(status_code: int) -> CarrierErrorType:
+    if status_code in (401, 403):
+        return CarrierErrorType.AUTHENTICATION
+    if status_code == 404:
+        return CarrierErrorType.INVALID_TRACKING
+    if status_code == 429:
+        return CarrierErrorType.RATE_LIMIT
+    if status_code >= 500:
+        return CarrierErrorType.SERVICE_UNAVAILABLE
+    return CarrierErrorType.UNKNOWN
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
@@ -1,7 +1,7 @@
 import httpx
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import base64
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -12,6 +12,7 @@ from ..schemas import (
     TrackingResponse, TrackingEvent,
     PickupRequest, PickupResponse
 )
+from .transport import carrier_client
 from ..utils.encryption import decrypt_credentials
 
 logger = structlog.get_logger()
@@ -19,6 +20,9 @@ logger = structlog.get_logger()
 class DHLClient:
     """DHL Express API Client"""
 
+    # Tracking numbers accepted by one multi-shipment tracking request
+    MAX_TRACKING_BATCH = 10
+
     def __init__(self, credentials: Dict[str, Any] = None, environment: str = None):
         # Load from environment variables if credentials not provided
         if credentials is None:
@@ -55,7 +59,7 @@ class DHLClient:
     async def get_quote(self, request: QuoteRequest) -> QuoteResponse:
         """Get shipping quote from DHL"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("DHL") as client:
                 # Prepare request payload
                 payload = {
                     "customerDetails": {
@@ -195,7 +199,7 @@ class DHLClient:
     async def generate_label(self, request: LabelRequest) -> LabelResponse:
         """Generate shipping label with DHL"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("DHL") as client:
                 # Prepare shipment request
                 payload = {
                     "plannedShippingDateAndTime": datetime.now().strftime("%Y-%m-%dT%H:%M:%S GMT+00:00"),
@@ -306,7 +310,7 @@ class DHLClient:
     async def track_shipment(self, tracking_number: str) -> TrackingResponse:
         """Track DHL shipment"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("DHL") as client:
                 response = await client.get(
                     f"{self.base_url}/shipments/{tracking_number}/tracking",
                     headers=self.headers,
@@ -319,44 +323,70 @@ class DHLClient:
                 response.raise_for_status()
                 
                 data = response.json()
-                shipment = data['shipments'][0]
-                
-                # Parse tracking events
-                events = []
-                for event in shipment.get('events', []):
-                    events.append(TrackingEvent(
-                        date=datetime.fromisoformat(event['date']),
-                        status=event['typeCode'],
-                        description=event['description'],
-                        location=event.get('location', {}).get('address', {}).get('addressLocality')
-                    ))
-                
-                # Determine current status
-                status = shipment['status']['statusCode']
-                delivered = status == 'delivered'
+                return self._parse_tracking(tracking_number, data['shipments'][0])
                 
-                return TrackingResponse(
-                    tracking_number=tracking_number,
-                    carrier="DHL",
-                    status=status,
-                    current_location=shipment.get('status', {}).get('location', {}).get('address', {}).get('addressLocality'),
-                    estimated_delivery=datetime.fromisoformat(shipment['estimatedTimeOfDelivery']) if 'estimatedTimeOfDelivery' in shipment else None,
-                    delivered_date=datetime.fromisoformat(shipment['actualTimeOfDelivery']) if delivered and 'actualTimeOfDelivery' in shipment else None,
-                    events=events,
-                    proof_of_delivery={
-                        'signature': shipment.get('proofOfDelivery', {}).get('signatureImage'),
-                        'signed_by': shipment.get('proofOfDelivery', {}).get('signedBy')
-                    } if delivered else None
+        except httpx.HTTPError as e:
+            logger.error("DHL tracking failed", error=str(e))
+            raise Exception(f"DHL API error: {str(e)}")
+    
+    async def track_shipments(self, tracking_numbers: List[str]) -> Dict[str, TrackingResponse]:
+        """Track up to MAX_TRACKING_BATCH DHL shipments in one request"""
+        try:
+            async with carrier_client("DHL") as client:
+                response = await client.get(
+                    f"{self.base_url}/tracking",
+                    headers=self.headers,
+                    auth=(self.credentials['username'], self.credentials['password']),
+                    params=[("shipmentTrackingNumber", number) for number in tracking_numbers]
+                    + [("trackingView", "all-checkpoints")],
+                    timeout=30.0
                 )
+                if response.status_code != 200:
+                    logger.error("DHL API error response", status=response.status_code, body=response.text)
+                response.raise_for_status()
+                
+                return {
+                    shipment['shipmentTrackingNumber']: self._parse_tracking(shipment['shipmentTrackingNumber'], shipment)
+                    for shipment in response.json().get('shipments', [])
+                }
                 
         except httpx.HTTPError as e:
-            logger.error("DHL tracking failed", error=str(e))
+            logger.error("DHL batch tracking failed", error=str(e), count=len(tracking_numbers))
             raise Exception(f"DHL API error: {str(e)}")
     
+    def _parse_tracking(self, tracking_number: str, shipment: Dict[str, Any]) -> TrackingResponse:
+        # Parse tracking events
+        events = []
+        for event in shipment.get('events', []):
+            events.append(TrackingEvent(
+                date=datetime.fromisoformat(event['date']),
+                status=event['typeCode'],
+                description=event['description'],
+                location=event.get('location', {}).get('address', {}).get('addressLocality')
+            ))
+        
+        # Determine current status
+        status = shipment['status']['statusCode']
+        delivered = status == 'delivered'
+        
+        return TrackingResponse(
+            tracking_number=tracking_number,
+            carrier="DHL",
+            status=status,
+            current_location=shipment.get('status', {}).get('location', {}).get('address', {}).get('addressLocality'),
+            estimated_delivery=datetime.fromisoformat(shipment['estimatedTimeOfDelivery']) if 'estimatedTimeOfDelivery' in shipment else None,
+            delivered_date=datetime.fromisoformat(shipment['actualTimeOfDelivery']) if delivered and 'actualTimeOfDelivery' in shipment else None,
+            events=events,
+            proof_of_delivery={
+                'signature': shipment.get('proofOfDelivery', {}).get('signatureImage'),
+                'signed_by': shipment.get('proofOfDelivery', {}).get('signedBy')
+            } if delivered else None
+        )
+    
     async def schedule_pickup(self, request: PickupRequest) -> PickupResponse:
         """Schedule pickup with DHL"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("DHL") as client:
                 payload = {
                     "plannedPickupDateAndTime": request.pickup_date.strftime("%Y-%m-%dT%H:%M:%S"),
                     "accounts": [
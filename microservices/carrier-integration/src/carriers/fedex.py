@@ -1,7 +1,7 @@
 import httpx
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from tenacity import retry, stop_after_attempt, wait_exponential
 import structlog
@@ -11,12 +11,16 @@ from ..schemas import (
     TrackingResponse, TrackingEvent,
     PickupRequest, PickupResponse
 )
+from .transport import carrier_client, get_oauth_token
 
 logger = structlog.get_logger()
 
 class FedExClient:
     """FedEx Web Services API Client"""
 
+    # Tracking numbers accepted by one trackingnumbers request
+    MAX_TRACKING_BATCH = 30
+
     def __init__(self, credentials: Dict[str, Any] = None, environment: str = None):
         # Load from environment variables if credentials not provided
         if credentials is None:
@@ -25,8 +29,6 @@ class FedExClient:
         self.credentials = credentials
         self.environment = environment or os.getenv('FEDEX_ENVIRONMENT', 'sandbox')
         self.base_url = self._get_base_url()
-        self.access_token = None
-        self.token_expires = None
 
     def _load_from_env(self) -> Dict[str, Any]:
         """Load FedEx credentials from environment variables"""
@@ -46,11 +48,14 @@ class FedExClient:
         return "https://apis.fedex.com"
     
     async def _get_access_token(self) -> str:
-        """Get or refresh OAuth 2.0 access token"""
-        if self.access_token and self.token_expires and datetime.now() < self.token_expires:
-            return self.access_token
-        
-        async with httpx.AsyncClient() as client:
+        """Get the OAuth 2.0 access token shared by all workers"""
+        return await get_oauth_token(
+            "FedEx", f"{self.environment}:{self.credentials['client_id']}", self._request_access_token
+        )
+
+    async def _request_access_token(self) -> Tuple[str, int]:
+        """Request a new OAuth 2.0 access token"""
+        async with carrier_client("FedEx") as client:
             response = await client.post(
                 f"{self.base_url}/oauth/token",
                 data={
@@ -63,10 +68,7 @@ class FedExClient:
             response.raise_for_status()
             
             data = response.json()
-            self.access_token = data['access_token']
-            self.token_expires = datetime.now() + timedelta(seconds=data['expires_in'] - 60)
-            
-            return self.access_token
+            return data['access_token'], int(data['expires_in'])
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def get_quote(self, request: QuoteRequest) -> QuoteResponse:
@@ -74,7 +76,7 @@ class FedExClient:
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("FedEx") as client:
                 payload = {
                     "accountNumber": {"value": self.credentials['account_number']},
                     "requestedShipment": {
@@ -136,7 +138,7 @@ class FedExClient:
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("FedEx") as client:
                 payload = {
                     "labelResponseOptions": "LABEL",
                     "requestedShipment": {
@@ -212,10 +214,17 @@ class FedExClient:
     
     async def track_shipment(self, tracking_number: str) -> TrackingResponse:
         """Track FedEx shipment"""
+        results = await self.track_shipments([tracking_number])
+        if tracking_number not in results:
+            raise Exception(f"FedEx API error: no tracking result for {tracking_number}")
+        return results[tracking_number]
+    
+    async def track_shipments(self, tracking_numbers: List[str]) -> Dict[str, TrackingResponse]:
+        """Track up to MAX_TRACKING_BATCH FedEx shipments in one request"""
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("FedEx") as client:
                 response = await client.post(
                     f"{self.base_url}/track/v1/trackingnumbers",
                     headers={
@@ -231,6 +240,7 @@ class FedExClient:
                                     "trackingNumber": tracking_number
                                 }
                             }
+                            for tracking_number in tracking_numbers
                         ]
                     },
                     timeout=30.0
@@ -238,37 +248,48 @@ class FedExClient:
                 response.raise_for_status()
                 
                 data = response.json()
-                track_result = data['output']['completeTrackResults'][0]['trackResults'][0]
-                
-                events = []
-                for scan in track_result.get('scanEvents', []):
-                    events.append(TrackingEvent(
-                        date=datetime.fromisoformat(scan['date']),
-                        status=scan['eventType'],
-                        description=scan['eventDescription'],
-                        location=scan.get('scanLocation', {}).get('city')
-                    ))
-                
-                return TrackingResponse(
-                    tracking_number=tracking_number,
-                    carrier="FedEx",
-                    status=track_result['latestStatusDetail']['statusByLocale'],
-                    current_location=track_result.get('latestStatusDetail', {}).get('scanLocation', {}).get('city'),
-                    estimated_delivery=datetime.fromisoformat(track_result['estimatedDeliveryTimeWindow']['window']['ends']) if 'estimatedDeliveryTimeWindow' in track_result else None,
-                    delivered_date=datetime.fromisoformat(track_result['actualDeliveryTime']) if track_result.get('isDelivered') else None,
-                    events=events
-                )
+                results = {}
+                for complete_result in data['output']['completeTrackResults']:
+                    track_result = complete_result['trackResults'][0]
+                    if 'error' in track_result:
+                        logger.warning("FedEx tracking number rejected",
+                                       tracking_number=complete_result.get('trackingNumber'),
+                                       error=track_result['error'].get('message'))
+                        continue
+                    tracking_number = complete_result['trackingNumber']
+                    results[tracking_number] = self._parse_tracking(tracking_number, track_result)
+                return results
                 
         except httpx.HTTPError as e:
             logger.error("FedEx tracking failed", error=str(e))
             raise Exception(f"FedEx API error: {str(e)}")
     
+    def _parse_tracking(self, tracking_number: str, track_result: Dict[str, Any]) -> TrackingResponse:
+        events = []
+        for scan in track_result.get('scanEvents', []):
+            events.append(TrackingEvent(
+                date=datetime.fromisoformat(scan['date']),
+                status=scan['eventType'],
+                description=scan['eventDescription'],
+                location=scan.get('scanLocation', {}).get('city')
+            ))
+        
+        return TrackingResponse(
+            tracking_number=tracking_number,
+            carrier="FedEx",
+            status=track_result['latestStatusDetail']['statusByLocale'],
+            current_location=track_result.get('latestStatusDetail', {}).get('scanLocation', {}).get('city'),
+            estimated_delivery=datetime.fromisoformat(track_result['estimatedDeliveryTimeWindow']['window']['ends']) if 'estimatedDeliveryTimeWindow' in track_result else None,
+            delivered_date=datetime.fromisoformat(track_result['actualDeliveryTime']) if track_result.get('isDelivered') else None,
+            events=events
+        )
+    
     async def schedule_pickup(self, request: PickupRequest) -> PickupResponse:
         """Schedule pickup with FedEx"""
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("FedEx") as client:
                 payload = {
                     "associatedAccountNumber": {"value": self.credentials['account_number']},
                     "originDetail": {
@@ -11,6 +11,7 @@ from ..schemas import (
     TrackingResponse, TrackingEvent,
     PickupRequest, PickupResponse
 )
+from .transport import carrier_client
 
 logger = structlog.get_logger()
 
@@ -56,7 +57,7 @@ class InterrapidisimoClient:
     async def get_quote(self, request: QuoteRequest) -> QuoteResponse:
         """Get shipping quote from Interrapidisimo"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Interrapidisimo") as client:
                 # Prepare quote request
                 payload = {
                     "origen": {
@@ -121,7 +122,7 @@ class InterrapidisimoClient:
     async def generate_label(self, request: LabelRequest) -> LabelResponse:
         """Generate shipping label (remesa) with Interrapidisimo"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Interrapidisimo") as client:
                 # Prepare shipment data
                 payload = {
                     "remitente": {
@@ -199,7 +200,7 @@ class InterrapidisimoClient:
     async def track_shipment(self, tracking_number: str) -> TrackingResponse:
         """Track Interrapidisimo shipment"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Interrapidisimo") as client:
                 response = await client.get(
                     f"{self.base_url}/rastreo/{tracking_number}",
                     headers=self.headers,
@@ -260,7 +261,7 @@ class InterrapidisimoClient:
     async def schedule_pickup(self, request: PickupRequest) -> PickupResponse:
         """Schedule pickup with Interrapidisimo"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Interrapidisimo") as client:
                 payload = {
                     "fecha": request.pickup_date.strftime("%Y-%m-%d"),
                     "horaInicio": request.pickup_window_start,
@@ -315,7 +316,7 @@ class InterrapidisimoClient:
     async def get_coverage(self, city: str, department: str = None) -> List[Dict]:
         """Get Interrapidisimo coverage for a city"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Interrapidisimo") as client:
                 params = {"ciudad": city}
                 if department:
                     params["departamento"] = department
@@ -355,7 +356,7 @@ class InterrapidisimoClient:
     async def get_tariffs(self, origin: str, destination: str) -> Dict:
         """Get tariff matrix between origin and destination"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Interrapidisimo") as client:
                 response = await client.get(
                     f"{self.base_url}/tarifas",
                     headers=self.headers,
@@ -406,7 +407,7 @@ class InterrapidisimoClient:
     async def generate_manifest(self, tracking_numbers: List[str]) -> Dict:
         """Generate dispatch manifest for multiple shipments"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Interrapidisimo") as client:
                 response = await client.post(
                     f"{self.base_url}/manifiestos",
                     headers=self.headers,
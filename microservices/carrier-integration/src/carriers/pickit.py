@@ -19,6 +19,7 @@ from ..schemas import (
     LabelRequest, LabelResponse,
     PickupRequest, PickupResponse
 )
+from .transport import carrier_client, get_oauth_token
 from ..credentials_manager import get_credential_manager
 from ..error_handlers import CarrierException
 
@@ -33,7 +34,6 @@ class PickitClient:
         self.credentials = self._load_credentials()
         self.session = None
         self.access_token = None
-        self.token_expiry = None
         
     def _load_credentials(self) -> Dict[str, str]:
         """Load Pickit credentials from manager"""
@@ -41,16 +41,15 @@ class PickitClient:
         return manager.get_all_credentials("PICKIT")
     
     async def _ensure_authenticated(self) -> None:
-        """Ensure we have a valid access token"""
-        if self.access_token and self.token_expiry and datetime.utcnow() < self.token_expiry:
-            return
-            
-        await self._authenticate()
+        """Ensure we have a valid access token (shared by all workers)"""
+        self.access_token = await get_oauth_token(
+            "Pickit", self.credentials.get("CLIENT_ID") or "", self._authenticate
+        )
     
-    async def _authenticate(self) -> None:
+    async def _authenticate(self) -> Tuple[str, int]:
         """Authenticate with Pickit API and get access token"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Pickit") as client:
                 response = await client.post(
                     f"{self.base_url}/auth/token",
                     json={
@@ -64,14 +63,13 @@ class PickitClient:
                 
                 if response.status_code == 200:
                     auth_data = response.json()
-                    self.access_token = auth_data["access_token"]
                     expires_in = auth_data.get("expires_in", 3600)
-                    self.token_expiry = datetime.utcnow() + timedelta(seconds=expires_in - 60)
                     
                     logger.info(
                         "pickit_authentication_successful",
                         expires_in=expires_in
                     )
+                    return auth_data["access_token"], int(expires_in)
                 else:
                     raise CarrierException(
                         carrier="Pickit",
@@ -123,7 +121,7 @@ class PickitClient:
         await self._ensure_authenticated()
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Pickit") as client:
                 response = await client.get(
                     f"{self.base_url}/pickup-points",
                     headers={
@@ -215,7 +213,7 @@ class PickitClient:
             )
             chargeable_weight = max(total_weight, total_volume)
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Pickit") as client:
                 response = await client.post(
                     f"{self.base_url}/shipments/quote",
                     headers={
@@ -312,7 +310,7 @@ class PickitClient:
         await self._ensure_authenticated()
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Pickit") as client:
                 response = await client.post(
                     f"{self.base_url}/shipments/create",
                     headers={
@@ -424,7 +422,7 @@ class PickitClient:
         await self._ensure_authenticated()
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Pickit") as client:
                 response = await client.get(
                     f"{self.base_url}/shipments/{request.tracking_number}/tracking",
                     headers={
@@ -512,7 +510,7 @@ class PickitClient:
         await self._ensure_authenticated()
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Pickit") as client:
                 response = await client.post(
                     f"{self.base_url}/pickups/schedule",
                     headers={
@@ -600,7 +598,7 @@ class PickitClient:
         await self._ensure_authenticated()
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Pickit") as client:
                 response = await client.post(
                     f"{self.base_url}/shipments/{tracking_number}/cancel",
                     headers={
@@ -643,7 +641,7 @@ class PickitClient:
         await self._ensure_authenticated()
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("Pickit") as client:
                 response = await client.get(
                     f"{self.base_url}/shipments/{tracking_number}/proof-of-delivery",
                     headers={
@@ -1,9 +1,8 @@
+import asyncio
 import httpx
 import os
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
-from zeep import Client as SOAPClient
-from zeep.transports import Transport
 from tenacity import retry, stop_after_attempt, wait_exponential
 import structlog
 import hashlib
@@ -13,6 +12,8 @@ from ..schemas import (
     TrackingResponse, TrackingEvent,
     PickupRequest, PickupResponse
 )
+from .soap import get_soap_client, call_soap
+from .city_codes import get_city_table
 
 logger = structlog.get_logger()
 
@@ -49,8 +50,8 @@ class ServientregaClient:
     def _initialize_soap_client(self):
         """Initialize SOAP client with authentication"""
         try:
-            transport = Transport(timeout=30)
-            self.soap_client = SOAPClient(wsdl=self.wsdl_url, transport=transport)
+            # Parsed once per process; the WSDL itself is cached on disk
+            self.soap_client = get_soap_client(self.wsdl_url, timeout=30)
         except Exception as e:
             logger.error("Failed to initialize Servientrega SOAP client", error=str(e))
             raise
@@ -67,8 +68,10 @@ class ServientregaClient:
         """Get shipping quote from Servientrega"""
         try:
             # Servientrega typically requires origin and destination codes
-            origin_code = await self._get_city_code(request.origin.city, request.origin.postal_code)
-            dest_code = await self._get_city_code(request.destination.city, request.destination.postal_code)
+            origin_code, dest_code = await asyncio.gather(
+                self._get_city_code(request.origin.city, request.origin.postal_code),
+                self._get_city_code(request.destination.city, request.destination.postal_code)
+            )
             
             # Calculate total weight and volume
             total_weight = sum(pkg.weight_kg for pkg in request.packages)
@@ -78,7 +81,8 @@ class ServientregaClient:
             )
             
             # Call SOAP service for quote
-            response = self.soap_client.service.ConsultarLiquidacion(
+            response = await call_soap(
+                "Servientrega", self.soap_client.service, "ConsultarLiquidacion",
                 usuario=self.credentials['username'],
                 clave=self.credentials['password'],
                 codigoConvenio=self.credentials['agreement_code'],
@@ -118,8 +122,10 @@ class ServientregaClient:
         """Generate shipping label (guía) with Servientrega"""
         try:
             # Get city codes
-            origin_code = await self._get_city_code(request.origin.city, request.origin.postal_code)
-            dest_code = await self._get_city_code(request.destination.city, request.destination.postal_code)
+            origin_code, dest_code = await asyncio.gather(
+                self._get_city_code(request.origin.city, request.origin.postal_code),
+                self._get_city_code(request.destination.city, request.destination.postal_code)
+            )
             
             # Prepare shipment data
             shipment_data = {
@@ -156,7 +162,8 @@ class ServientregaClient:
                 })
             
             # Generate guide number
-            response = self.soap_client.service.GenerarGuiaSticker(
+            response = await call_soap(
+                "Servientrega", self.soap_client.service, "GenerarGuiaSticker",
                 **shipment_data,
                 tipoServicio=self._get_service_type(request.service_type),
                 adicionales=request.reference_number,
@@ -186,7 +193,8 @@ class ServientregaClient:
         """Track Servientrega shipment"""
         try:
             # Call tracking web service
-            response = self.soap_client.service.ConsultarGuia(
+            response = await call_soap(
+                "Servientrega", self.soap_client.service, "ConsultarGuia",
                 usuario=self.credentials['username'],
                 clave=self.credentials['password'],
                 numeroGuia=tracking_number
@@ -245,7 +253,8 @@ class ServientregaClient:
             city_code = await self._get_city_code(request.address.city, request.address.postal_code)
             
             # Schedule pickup via SOAP service
-            response = self.soap_client.service.SolicitarRecoleccion(
+            response = await call_soap(
+                "Servientrega", self.soap_client.service, "SolicitarRecoleccion",
                 usuario=self.credentials['username'],
                 clave=self.credentials['password'],
                 codigoConvenio=self.credentials['agreement_code'],
@@ -283,8 +292,24 @@ class ServientregaClient:
     
     async def _get_city_code(self, city: str, postal_code: str) -> str:
         """Get Servientrega city code from city name or postal code"""
+        code = await self._lookup_city_code(city, postal_code)
+        if code:
+            return code
+        # Default to Bogotá if city not found
+        logger.warning(f"City {city} not found, using default")
+        return "11001"  # Bogotá code
+    
+    async def _lookup_city_code(self, city: str, postal_code: str) -> Optional[str]:
+        """City code from the persistent table, asking Servientrega only on a miss"""
+        return await get_city_table("Servientrega").lookup(
+            city, lambda: self._resolve_city_code(city, postal_code)
+        )
+    
+    async def _resolve_city_code(self, city: str, postal_code: str) -> Optional[Dict[str, Any]]:
+        """Look a city up remotely with ConsultarCiudad"""
         try:
-            response = self.soap_client.service.ConsultarCiudad(
+            response = await call_soap(
+                "Servientrega", self.soap_client.service, "ConsultarCiudad",
                 usuario=self.credentials['username'],
                 clave=self.credentials['password'],
                 nombreCiudad=city,
@@ -292,27 +317,41 @@ class ServientregaClient:
             )
             
             if response and response.Exitoso:
-                return response.CodigoCiudad
-            else:
-                # Default to Bogotá if city not found
-                logger.warning(f"City {city} not found, using default")
-                return "11001"  # Bogotá code
+                return {"code": response.CodigoCiudad, "postal_code": postal_code}
+            return None
                 
         except Exception as e:
             logger.error("Failed to get city code", error=str(e))
-            return "11001"  # Default to Bogotá
+            return None
+    
+    async def refresh_city_codes(self) -> int:
+        """Re-validate city codes older than the table's max age; returns rows refreshed"""
+        table = get_city_table("Servientrega")
+        await table.load()
+        refreshed = []
+        for city in table.stale_cities():
+            entry = await self._resolve_city_code(city, "")
+            if entry:
+                refreshed.append({"city_name": city, **entry})
+        await table.store(refreshed)
+        return len(refreshed)
     
     async def check_coverage(self, city: str, postal_code: str) -> bool:
         """Check if Servientrega has coverage in a specific area"""
         try:
-            response = self.soap_client.service.ConsultarCobertura(
+            city_code = await self._lookup_city_code(city, postal_code)
+            if not city_code:
+                return False
+            
+            response = await call_soap(
+                "Servientrega", self.soap_client.service, "ConsultarCobertura",
                 usuario=self.credentials['username'],
                 clave=self.credentials['password'],
-                ciudad=city,
+                ciudad=city_code,
                 codigoPostal=postal_code
             )
             
-            return response and response.TieneCobertura
+            return bool(response and response.TieneCobertura)
             
         except Exception as e:
             logger.error("Failed to check coverage", error=str(e))
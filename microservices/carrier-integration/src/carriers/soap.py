@@ -0,0 +1,86 @@
+"""
+Non-blocking SOAP execution
+zeep is synchronous, so every SOAP operation runs on a bounded thread pool
+instead of the event loop. Parsed zeep clients are kept per WSDL URL for the
+life of the process and the downloaded WSDL/XSD documents are cached on disk,
+so constructing a carrier client does not re-download its WSDL.
+"""
+
+import asyncio
+import functools
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple
+
+import structlog
+from prometheus_client import Counter, Histogram
+from zeep import Client as SOAPClient
+from zeep.cache import SqliteCache
+from zeep.transports import Transport
+
+logger = structlog.get_logger()
+
+SOAP_CACHE_DIR = os.getenv("SOAP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "carrier-soap-cache"))
+WSDL_CACHE_TTL = int(os.getenv("SOAP_WSDL_CACHE_TTL", str(7 * 24 * 3600)))
+SOAP_MAX_WORKERS = int(os.getenv("SOAP_MAX_WORKERS", "8"))
+
+soap_call_duration = Histogram(
+    'carrier_soap_call_duration_seconds',
+    'SOAP operation duration including executor queueing',
+    ['carrier', 'operation'],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+soap_calls_total = Counter(
+    'carrier_soap_calls_total',
+    'SOAP operations by outcome',
+    ['carrier', 'operation', 'status']
+)
+
+_executor = ThreadPoolExecutor(max_workers=SOAP_MAX_WORKERS, thread_name_prefix="soap")
+_clients: Dict[Tuple[str, float], SOAPClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _wsdl_cache() -> SqliteCache:
+    os.makedirs(SOAP_CACHE_DIR, exist_ok=True)
+    return SqliteCache(path=os.path.join(SOAP_CACHE_DIR, "wsdl.db"), timeout=WSDL_CACHE_TTL)
+
+
+def get_soap_client(wsdl_url: str, timeout: float = 30) -> SOAPClient:
+    """Return the process-wide zeep client for a WSDL, building it once"""
+    key = (wsdl_url, timeout)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                transport = Transport(cache=_wsdl_cache(), timeout=timeout, operation_timeout=timeout)
+                client = _clients[key] = SOAPClient(wsdl=wsdl_url, transport=transport)
+    return client
+
+
+async def get_soap_client_async(wsdl_url: str, timeout: float = 30) -> SOAPClient:
+    """Build (or fetch) the zeep client without blocking the event loop"""
+    client = _clients.get((wsdl_url, timeout))
+    if client is not None:
+        return client
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, get_soap_client, wsdl_url, timeout)
+
+
+async def call_soap(carrier: str, service: Any, operation: str, **kwargs) -> Any:
+    """Run ``service.<operation>(**kwargs)`` on the SOAP executor"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        result = await loop.run_in_executor(_executor, functools.partial(getattr(service, operation), **kwargs))
+    except Exception:
+        soap_calls_total.labels(carrier=carrier, operation=operation, status="error").inc()
+        raise
+    finally:
+        soap_call_duration.labels(carrier=carrier, operation=operation).observe(time.perf_counter() - start)
+    soap_calls_total.labels(carrier=carrier, operation=operation, status="success").inc()
+    return result
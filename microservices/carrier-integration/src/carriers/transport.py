@@ -0,0 +1,260 @@
+"""
+Shared carrier HTTP transport
+Keeps one pooled httpx.AsyncClient per carrier (per event loop) so quote,
+label, tracking and pickup calls reuse keep-alive connections, and caches
+OAuth tokens in Redis so every API and Celery worker shares a single token
+per carrier account that is refreshed under a lock before it expires.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+import redis.asyncio as redis
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = structlog.get_logger()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/1")
+
+# Refresh tokens this many seconds before the carrier says they expire
+TOKEN_REFRESH_MARGIN = int(os.getenv("CARRIER_TOKEN_REFRESH_MARGIN", "120"))
+TOKEN_LOCK_TIMEOUT = 30
+
+DEFAULT_POOL = {
+    "max_connections": int(os.getenv("CARRIER_HTTP_MAX_CONNECTIONS", "20")),
+    "max_keepalive_connections": int(os.getenv("CARRIER_HTTP_MAX_KEEPALIVE", "10")),
+    "keepalive_expiry": float(os.getenv("CARRIER_HTTP_KEEPALIVE_EXPIRY", "30")),
+    "connect_timeout": float(os.getenv("CARRIER_HTTP_CONNECT_TIMEOUT", "5")),
+    "read_timeout": float(os.getenv("CARRIER_HTTP_READ_TIMEOUT", "30")),
+}
+
+# Carrier specific tuning, overridable with e.g. DHL_HTTP_MAX_CONNECTIONS
+CARRIER_POOLS = {
+    "DHL": {"max_connections": 30},
+    "FedEx": {"max_connections": 30},
+    "UPS": {"max_connections": 30},
+    "Interrapidisimo": {"max_connections": 10},
+    "Aeropost": {"max_connections": 10},
+    "Pickit": {"max_connections": 10},
+    "Coordinadora": {"max_connections": 20},
+    "Deprisa": {"max_connections": 20},
+}
+
+carrier_http_requests = Counter(
+    'carrier_http_requests_total',
+    'Outbound HTTP requests to carrier APIs',
+    ['carrier', 'status']
+)
+carrier_http_duration = Histogram(
+    'carrier_http_request_duration_seconds',
+    'Time until carrier API response headers were received',
+    ['carrier', 'method'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+carrier_http_connections_opened = Counter(
+    'carrier_http_connections_opened_total',
+    'New TCP connections opened to carrier APIs',
+    ['carrier']
+)
+carrier_http_inflight = Gauge(
+    'carrier_http_inflight_requests',
+    'Carrier API requests currently in flight',
+    ['carrier']
+)
+carrier_oauth_tokens = Counter(
+    'carrier_oauth_token_lookups_total',
+    'OAuth token lookups by where the token came from (memory, redis, refreshed, direct)',
+    ['carrier', 'source']
+)
+
+
+def _pool_settings(carrier: str) -> Dict[str, Any]:
+    settings = {**DEFAULT_POOL, **CARRIER_POOLS.get(carrier, {})}
+    prefix = carrier.upper()
+    for key in settings:
+        value = os.getenv(f"{prefix}_HTTP_{key.upper()}")
+        if value is not None:
+            settings[key] = type(settings[key])(value)
+    return settings
+
+
+class _MeteredTransport(httpx.AsyncHTTPTransport):
+    """Connection pool that records per-carrier request metrics"""
+
+    def __init__(self, carrier: str, **kwargs):
+        super().__init__(**kwargs)
+        self.carrier = carrier
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            carrier_http_connections_opened.labels(carrier=self.carrier).inc()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions = {**request.extensions, "trace": self._trace}
+        carrier_http_inflight.labels(carrier=self.carrier).inc()
+        start = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            carrier_http_requests.labels(carrier=self.carrier, status="error").inc()
+            raise
+        finally:
+            carrier_http_inflight.labels(carrier=self.carrier).dec()
+        carrier_http_duration.labels(carrier=self.carrier, method=request.method).observe(time.perf_counter() - start)
+        carrier_http_requests.labels(carrier=self.carrier, status=str(response.status_code)).inc()
+        return response
+
+
+def _build_client(carrier: str) -> httpx.AsyncClient:
+    settings = _pool_settings(carrier)
+    transport = _MeteredTransport(
+        carrier,
+        limits=httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"]
+        ),
+        retries=0
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(settings["read_timeout"], connect=settings["connect_timeout"])
+    )
+
+
+# Clients and Redis connections are bound to the loop that created them; Celery
+# tasks run on their own loops, so keep one set per loop and let it go with the loop.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_redis_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_carrier_client(carrier: str) -> httpx.AsyncClient:
+    """Return the shared pooled client for a carrier"""
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(carrier)
+    if client is None or client.is_closed:
+        client = clients[carrier] = _build_client(carrier)
+    return client
+
+
+class carrier_client:
+    """Drop-in for ``async with httpx.AsyncClient() as client`` that borrows the shared pool"""
+
+    def __init__(self, carrier: str):
+        self.carrier = carrier
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        return get_carrier_client(self.carrier)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # The pool outlives the call; it is closed by close_carrier_clients()
+        return None
+
+
+async def close_carrier_clients() -> None:
+    """Close the pooled clients and Redis connection of the running loop"""
+    loop = asyncio.get_running_loop()
+    for client in _clients.pop(loop, {}).values():
+        await client.aclose()
+    redis_client = _redis_clients.pop(loop, None)
+    if redis_client is not None:
+        await redis_client.close()
+
+
+def get_redis() -> redis.Redis:
+    """Redis connection for the running loop, closed with close_carrier_clients()"""
+    loop = asyncio.get_running_loop()
+    client = _redis_clients.get(loop)
+    if client is None:
+        client = _redis_clients[loop] = redis.from_url(REDIS_URL)
+    return client
+
+
+# Process-local copy of tokens already read from Redis: {key: (token, refresh_at)}
+_local_tokens: Dict[str, Tuple[str, float]] = {}
+
+
+def _token_key(carrier: str, account: str) -> str:
+    digest = hashlib.sha256(f"{carrier}:{account}".encode()).hexdigest()[:24]
+    return f"carrier:oauth:{carrier.lower()}:{digest}"
+
+
+def _usable(entry: Optional[Dict[str, Any]]) -> bool:
+    return bool(entry) and entry.get("refresh_at", 0) > time.time()
+
+
+async def get_oauth_token(
+    carrier: str,
+    account: str,
+    fetch: Callable[[], Awaitable[Tuple[str, int]]]
+) -> str:
+    """Return a valid OAuth token for a carrier account.
+
+    ``fetch`` performs the carrier's token request and returns
+    ``(access_token, expires_in_seconds)``. It runs at most once across all
+    workers per refresh: the first worker to find the token missing or close to
+    expiry takes a Redis lock, the others wait and then read its result.
+    """
+    key = _token_key(carrier, account)
+    local = _local_tokens.get(key)
+    if local and local[1] > time.time():
+        carrier_oauth_tokens.labels(carrier=carrier, source="memory").inc()
+        return local[0]
+
+    try:
+        client = get_redis()
+        entry = await _read_token(client, key)
+        if not _usable(entry):
+            async with client.lock(f"{key}:lock", timeout=TOKEN_LOCK_TIMEOUT, blocking_timeout=TOKEN_LOCK_TIMEOUT):
+                entry = await _read_token(client, key)
+                if not _usable(entry):
+                    entry = await _refresh_token(client, key, fetch)
+                    carrier_oauth_tokens.labels(carrier=carrier, source="refreshed").inc()
+                else:
+                    carrier_oauth_tokens.labels(carrier=carrier, source="redis").inc()
+        else:
+            carrier_oauth_tokens.labels(carrier=carrier, source="redis").inc()
+    except redis.RedisError as e:
+        # Never fail a carrier call because the shared cache is unavailable
+        logger.warning("Carrier token cache unavailable, fetching directly", carrier=carrier, error=str(e))
+        token, expires_in = await fetch()
+        entry = {"token": token, "refresh_at": time.time() + max(0, expires_in - TOKEN_REFRESH_MARGIN)}
+        carrier_oauth_tokens.labels(carrier=carrier, source="direct").inc()
+
+    _local_tokens[key] = (entry["token"], entry["refresh_at"])
+    return entry["token"]
+
+
+async def invalidate_oauth_token(carrier: str, account: str) -> None:
+    """Drop a token the carrier rejected so the next call refreshes it"""
+    key = _token_key(carrier, account)
+    _local_tokens.pop(key, None)
+    try:
+        await get_redis().delete(key)
+    except redis.RedisError as e:
+        logger.warning("Failed to invalidate carrier token", carrier=carrier, error=str(e))
+
+
+async def _read_token(client: redis.Redis, key: str) -> Optional[Dict[str, Any]]:
+    raw = await client.get(key)
+    return json.loads(raw) if raw else None
+
+
+async def _refresh_token(
+    client: redis.Redis,
+    key: str,
+    fetch: Callable[[], Awaitable[Tuple[str, int]]]
+) -> Dict[str, Any]:
+    token, expires_in = await fetch()
+    now = time.time()
+    entry = {"token": token, "refresh_at": now + max(0, expires_in - TOKEN_REFRESH_MARGIN)}
+    # Gone from Redis once the carrier would reject it anyway
+    await client.set(key, json.dumps(entry), ex=max(1, int(expires_in)))
+    return entry
@@ -1,7 +1,7 @@
 import httpx
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from tenacity import retry, stop_after_attempt, wait_exponential
 import structlog
@@ -11,6 +11,7 @@ from ..schemas import (
     TrackingResponse, TrackingEvent,
     PickupRequest, PickupResponse
 )
+from .transport import carrier_client, get_oauth_token
 
 logger = structlog.get_logger()
 
@@ -25,8 +26,6 @@ class UPSClient:
         self.credentials = credentials
         self.environment = environment or os.getenv('UPS_ENVIRONMENT', 'sandbox')
         self.base_url = self._get_base_url()
-        self.access_token = None
-        self.token_expires = None
 
     def _load_from_env(self) -> Dict[str, Any]:
         """Load UPS credentials from environment variables"""
@@ -46,11 +45,14 @@ class UPSClient:
         return "https://onlinetools.ups.com/api"
     
     async def _get_access_token(self) -> str:
-        """Get or refresh OAuth 2.0 access token"""
-        if self.access_token and self.token_expires and datetime.now() < self.token_expires:
-            return self.access_token
-        
-        async with httpx.AsyncClient() as client:
+        """Get the OAuth 2.0 access token shared by all workers"""
+        return await get_oauth_token(
+            "UPS", f"{self.environment}:{self.credentials['client_id']}", self._request_access_token
+        )
+
+    async def _request_access_token(self) -> Tuple[str, int]:
+        """Request a new OAuth 2.0 access token"""
+        async with carrier_client("UPS") as client:
             response = await client.post(
                 f"{self.base_url}/security/v1/oauth/token",
                 headers={
@@ -66,10 +68,7 @@ class UPSClient:
             response.raise_for_status()
             
             data = response.json()
-            self.access_token = data['access_token']
-            self.token_expires = datetime.now() + timedelta(seconds=data['expires_in'] - 60)
-            
-            return self.access_token
+            return data['access_token'], int(data['expires_in'])
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def get_quote(self, request: QuoteRequest) -> QuoteResponse:
@@ -77,7 +76,7 @@ class UPSClient:
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("UPS") as client:
                 payload = {
                     "RateRequest": {
                         "Request": {
@@ -184,7 +183,7 @@ class UPSClient:
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("UPS") as client:
                 payload = {
                     "ShipmentRequest": {
                         "Request": {
@@ -335,7 +334,7 @@ class UPSClient:
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("UPS") as client:
                 response = await client.get(
                     f"{self.base_url}/track/v1/details/{tracking_number}",
                     headers={
@@ -400,7 +399,7 @@ class UPSClient:
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("UPS") as client:
                 payload = {
                     "PickupCreationRequest": {
                         "RatePickupIndicator": "N",
@@ -480,7 +479,7 @@ class UPSClient:
         try:
             token = await self._get_access_token()
             
-            async with httpx.AsyncClient() as client:
+            async with carrier_client("UPS") as client:
                 response = await client.post(
                     f"{self.base_url}/addressvalidation/v1/addressvalidation",
                     headers={
@@ -1,5 +1,6 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_shutdown
 import os
 from kombu import Exchange, Queue
 
@@ -91,24 +92,78 @@ app.conf.update(
             'schedule': crontab(hour=7, minute=0),
             'options': {'queue': 'default'}
         },
-        # Sync tracking updates every 30 minutes
-        'sync-tracking-updates': {
-            'task': 'src.tasks.tracking_tasks.sync_all_tracking',
+        # Poll the shipments whose adaptive next-poll time has come, every minute
+        'poll-due-tracking': {
+            'task': 'src.tasks.tracking_tasks.poll_due_tracking',
+            'schedule': crontab(minute='*'),
+            'options': {'queue': 'tracking'}
+        },
+        # Drain the webhook ingestion stream; each run reads for up to 30 seconds
+        'drain-webhook-stream': {
+            'task': 'src.tasks.webhook_tasks.drain_webhook_stream',
+            'schedule': 30.0,
+            'options': {'queue': 'webhooks', 'expires': 30}
+        },
+        # Send due customer callbacks every 10 seconds
+        'dispatch-callbacks': {
+            'task': 'src.tasks.webhook_tasks.dispatch_callbacks',
+            'schedule': 10.0,
+            'options': {'queue': 'webhooks', 'expires': 10}
+        },
+        # Add new shipments to the poll schedule every 30 minutes
+        'enroll-active-tracking': {
+            'task': 'src.tasks.tracking_tasks.enroll_active_shipments',
             'schedule': crontab(minute='*/30'),
             'options': {'queue': 'tracking'}
         },
+        # Recompute carrier event cadence hourly
+        'refresh-tracking-cadence': {
+            'task': 'src.tasks.tracking_tasks.refresh_tracking_cadence',
+            'schedule': crontab(minute=15),
+            'options': {'queue': 'tracking'}
+        },
         # Health check all carriers every 5 minutes
         'health-check-carriers': {
             'task': 'src.tasks.carrier_tasks.health_check_all_carriers',
             'schedule': crontab(minute='*/5'),
             'options': {'queue': 'default'}
         },
+        # Re-validate carrier city codes daily at 3:00 AM
+        'refresh-city-codes': {
+            'task': 'src.tasks.carrier_tasks.refresh_city_codes',
+            'schedule': crontab(hour=3, minute=0),
+            'options': {'queue': 'default'}
+        },
+        # Create upcoming tracking event partitions daily at 1:30 AM
+        'create-tracking-partitions': {
+            'task': 'src.tasks.tracking_tasks.create_tracking_partitions',
+            'schedule': crontab(hour=1, minute=30),
+            'options': {'queue': 'default'}
+        },
+        # Create upcoming and drop expired API call log partitions daily at 1:45 AM
+        'maintain-api-call-log-partitions': {
+            'task': 'src.tasks.batch_tasks.maintain_api_call_log_partitions',
+            'schedule': crontab(hour=1, minute=45),
+            'options': {'queue': 'default'}
+        },
+        # Delete finished callback deliveries daily at 2:30 AM
+        'clean-old-callback-deliveries': {
+            'task': 'src.tasks.batch_tasks.clean_old_callback_deliveries',
+            'schedule': crontab(hour=2, minute=30),
+            'options': {'queue': 'default'}
+        },
         # Clean old tracking events daily at 2:00 AM
         'clean-old-tracking': {
             'task': 'src.tasks.tracking_tasks.clean_old_tracking_events',
             'schedule': crontab(hour=2, minute=0),
             'options': {'queue': 'default'}
         },
+        # Rebuild yesterday's carrier daily stats from the source tables at 00:30
+        'recompute-carrier-daily-stats': {
+            'task': 'src.tasks.batch_tasks.recompute_carrier_daily_stats',
+            'schedule': crontab(hour=0, minute=30),
+            'options': {'queue': 'batch'}
+        },
         # Generate daily reports at 11:00 PM
         'generate-daily-reports': {
             'task': 'src.tasks.batch_tasks.generate_daily_report',
@@ -118,6 +173,14 @@ app.conf.update(
     }
 )
 
+
+@worker_process_shutdown.connect
+def flush_api_call_logs(**kwargs):
+    """Write the audit records a worker process still holds before it exits"""
+    from .services.api_call_log import api_call_log
+    api_call_log.close()
+
+
 # Configure Celery to use JSON for serialization
 app.conf.task_serializer = 'json'
 app.conf.result_serializer = 'json'
@@ -1,22 +1,139 @@
 """
 Credential Manager for Carrier Integrations
 Manages encrypted storage and retrieval of carrier API credentials
+
+Reads are served from credential_store, a per-process copy of every active
+credential decrypted once and kept for CREDENTIAL_CACHE_TTL seconds. Writes
+publish on the carrier:credentials channel; every process listens there and
+reloads on its next read, so a rotation reaches all workers without waiting
+for the TTL.
 """
 
 import os
 import json
-from typing import Dict, Any, Optional
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, Any, Mapping, Optional
 from cryptography.fernet import Fernet
 from sqlalchemy.orm import Session
+import redis
 import structlog
-from datetime import datetime
 
 from .database import SessionLocal
-from .models import CarrierCredential, CarrierType
-from .utils.encryption import encrypt_data, decrypt_data
+from .models import CarrierCredential, CarrierType, EnvironmentType
+from .utils.encryption import encrypt_credentials, decrypt_credentials
 
 logger = structlog.get_logger()
 
+CREDENTIAL_CACHE_TTL = float(os.getenv("CREDENTIAL_CACHE_TTL", "300"))
+# Delay before retrying after a failed load (the previous copy stays in use)
+CREDENTIAL_CACHE_RETRY = float(os.getenv("CREDENTIAL_CACHE_RETRY", "5"))
+CREDENTIAL_CHANNEL = "carrier:credentials"
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/1")
+
+_NO_CREDENTIALS: Mapping[str, str] = MappingProxyType({})
+
+
+def carrier_environment(carrier: str) -> EnvironmentType:
+    """The environment a carrier's client runs against, from <CARRIER>_ENVIRONMENT"""
+    value = os.getenv(f"{carrier.upper()}_ENVIRONMENT", "sandbox").lower()
+    # Servientrega names its sandbox "test"
+    return EnvironmentType.PRODUCTION if value == "production" else EnvironmentType.SANDBOX
+
+
+class CredentialStore:
+    """Decrypted active credentials of this process, {carrier: {credential_type: value}}
+
+    Each carrier holds the credentials of the environment it is configured for.
+
+    The mappings handed out are read-only views; values never appear in reprs
+    or logs.
+    """
+
+    def __init__(self, ttl: float = CREDENTIAL_CACHE_TTL, listen: bool = True):
+        self.ttl = ttl
+        self.listen = listen
+        self._credentials: Mapping[str, Mapping[str, str]] = MappingProxyType({})
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._listener_pid: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"<CredentialStore carriers={sorted(self._credentials)}>"
+
+    def get(self, carrier: str, loader: Callable[[], Dict[str, Dict[str, str]]]) -> Mapping[str, str]:
+        """The carrier's credentials, loading them all with ``loader`` when stale"""
+        if time.monotonic() >= self._expires_at:
+            self._refresh(loader)
+        return self._credentials.get(carrier, _NO_CREDENTIALS)
+
+    def invalidate(self) -> None:
+        """Reload on the next read"""
+        self._generation += 1
+        self._expires_at = 0.0
+
+    def _refresh(self, loader: Callable[[], Dict[str, Dict[str, str]]]) -> None:
+        if self.listen:
+            self._ensure_listener()
+        with self._lock:
+            if time.monotonic() < self._expires_at:
+                return
+            generation = self._generation
+            started = time.monotonic()
+            try:
+                loaded = loader()
+            except Exception as e:
+                logger.error("Failed to load credentials", error=str(e))
+                self._expires_at = started + CREDENTIAL_CACHE_RETRY
+                return
+            self._credentials = MappingProxyType({
+                carrier: MappingProxyType(dict(values)) for carrier, values in loaded.items()
+            })
+            # An invalidation that arrived during the load may not be reflected in it
+            self._expires_at = started + self.ttl if generation == self._generation else 0.0
+            logger.info("Credentials loaded", carriers=len(loaded))
+
+    def _ensure_listener(self) -> None:
+        # Forked workers (Celery prefork) do not inherit the parent's thread
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        self._listener_pid = pid
+        threading.Thread(target=self._listen, name="credential-invalidations", daemon=True).start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = redis.Redis.from_url(REDIS_URL).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CREDENTIAL_CHANNEL)
+                # Rotations published while we were not subscribed were missed
+                self.invalidate()
+                for message in pubsub.listen():
+                    self.invalidate()
+                    logger.info("Credentials invalidated", carrier=message.get("data"))
+            except redis.RedisError as e:
+                logger.warning("Credential invalidation channel unavailable", error=str(e))
+                time.sleep(1)
+
+
+credential_store = CredentialStore()
+_publisher: Optional[redis.Redis] = None
+
+
+def publish_invalidation(carrier: str) -> None:
+    """Make this process and every other one reload credentials on their next read"""
+    global _publisher
+    credential_store.invalidate()
+    try:
+        if _publisher is None:
+            _publisher = redis.Redis.from_url(REDIS_URL)
+        _publisher.publish(CREDENTIAL_CHANNEL, carrier)
+    except redis.RedisError as e:
+        # Other processes pick the change up when their copy expires
+        logger.warning("Failed to publish credential invalidation", carrier=carrier, error=str(e))
+
 
 class CredentialManager:
     """Manages carrier API credentials with encryption"""
@@ -49,35 +166,27 @@ class CredentialManager:
             Boolean indicating success
         """
         try:
-            # Check if credential already exists
-            existing = self.db.query(CarrierCredential).filter(
-                CarrierCredential.carrier == CarrierType[carrier],
-                CarrierCredential.credential_type == credential_type
-            ).first()
-            
-            # Encrypt the credential
-            encrypted_value = encrypt_data(credential_value, self.encryption_key)
+            # All of a carrier's credentials live in one encrypted JSON row per environment
+            environment = carrier_environment(carrier)
+            existing = self._active_row(carrier, environment)
             
             if existing:
-                # Update existing credential
-                existing.encrypted_value = encrypted_value
-                existing.description = description or existing.description
-                existing.last_rotated = datetime.now()
+                values = decrypt_credentials(existing.credentials)
+                values[credential_type] = credential_value
+                existing.credentials = encrypt_credentials(values)
                 logger.info(f"Updated credential for {carrier} - {credential_type}")
             else:
-                # Create new credential
                 new_credential = CarrierCredential(
                     carrier=CarrierType[carrier],
-                    credential_type=credential_type,
-                    encrypted_value=encrypted_value,
-                    description=description,
-                    is_active=True,
-                    last_rotated=datetime.now()
+                    environment=environment,
+                    credentials=encrypt_credentials({credential_type: credential_value}),
+                    is_active=True
                 )
                 self.db.add(new_credential)
                 logger.info(f"Stored new credential for {carrier} - {credential_type}")
             
             self.db.commit()
+            publish_invalidation(carrier)
             return True
             
         except Exception as e:
@@ -87,7 +196,7 @@ class CredentialManager:
     
     def get_credential(self, carrier: str, credential_type: str) -> Optional[str]:
         """
-        Retrieve and decrypt a credential from the database
+        Retrieve a decrypted credential from the credential store
         
         Args:
             carrier: Carrier name
@@ -96,26 +205,10 @@ class CredentialManager:
         Returns:
             Decrypted credential value or None
         """
-        try:
-            credential = self.db.query(CarrierCredential).filter(
-                CarrierCredential.carrier == CarrierType[carrier],
-                CarrierCredential.credential_type == credential_type,
-                CarrierCredential.is_active == True
-            ).first()
-            
-            if credential:
-                decrypted_value = decrypt_data(
-                    credential.encrypted_value, 
-                    self.encryption_key
-                )
-                return decrypted_value
-            
+        value = credential_store.get(carrier, self._load_active_credentials).get(credential_type)
+        if value is None:
             logger.warning(f"No credential found for {carrier} - {credential_type}")
-            return None
-            
-        except Exception as e:
-            logger.error(f"Failed to retrieve credential: {str(e)}")
-            return None
+        return value
     
     def get_all_credentials(self, carrier: str) -> Dict[str, str]:
         """
@@ -127,25 +220,32 @@ class CredentialManager:
         Returns:
             Dictionary of credential_type: value pairs
         """
-        try:
-            credentials = self.db.query(CarrierCredential).filter(
-                CarrierCredential.carrier == CarrierType[carrier],
-                CarrierCredential.is_active == True
-            ).all()
-            
-            result = {}
-            for cred in credentials:
-                decrypted_value = decrypt_data(
-                    cred.encrypted_value,
-                    self.encryption_key
-                )
-                result[cred.credential_type] = decrypted_value
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Failed to retrieve credentials for {carrier}: {str(e)}")
-            return {}
+        return dict(credential_store.get(carrier, self._load_active_credentials))
+    
+    def _active_row(self, carrier: str, environment: EnvironmentType) -> Optional[CarrierCredential]:
+        return self.db.query(CarrierCredential).filter(
+            CarrierCredential.carrier == CarrierType[carrier],
+            CarrierCredential.environment == environment,
+            CarrierCredential.is_active == True
+        ).order_by(CarrierCredential.id.desc()).first()
+    
+    def _load_active_credentials(self) -> Dict[str, Dict[str, str]]:
+        """Query and decrypt every active credential, keyed by carrier name"""
+        credentials = self.db.query(CarrierCredential).filter(
+            CarrierCredential.is_active == True
+        ).order_by(CarrierCredential.id).all()
+        
+        result: Dict[str, Dict[str, str]] = {}
+        for cred in credentials:
+            carrier = cred.carrier.name
+            if cred.environment != carrier_environment(carrier):
+                continue
+            try:
+                # The newest active row wins
+                result[carrier] = decrypt_credentials(cred.credentials)
+            except Exception as e:
+                logger.error(f"Failed to decrypt credentials for {carrier} ({cred.environment.value}): {str(e)}")
+        return result
     
     def rotate_credential(self, carrier: str, credential_type: str, 
                          new_value: str) -> bool:
@@ -161,17 +261,7 @@ class CredentialManager:
             Boolean indicating success
         """
         try:
-            # Mark old credential as inactive
-            old_credential = self.db.query(CarrierCredential).filter(
-                CarrierCredential.carrier == CarrierType[carrier],
-                CarrierCredential.credential_type == credential_type,
-                CarrierCredential.is_active == True
-            ).first()
-            
-            if old_credential:
-                old_credential.is_active = False
-            
-            # Store new credential
+            # The new value replaces the old one in the carrier's credential row
             return self.store_credential(carrier, credential_type, new_value)
             
         except Exception as e:
@@ -190,19 +280,22 @@ class CredentialManager:
             Boolean indicating success
         """
         try:
-            credential = self.db.query(CarrierCredential).filter(
-                CarrierCredential.carrier == CarrierType[carrier],
-                CarrierCredential.credential_type == credential_type,
-                CarrierCredential.is_active == True
-            ).first()
+            credential = self._active_row(carrier, carrier_environment(carrier))
+            if credential is None:
+                return False
             
-            if credential:
-                credential.is_active = False
-                self.db.commit()
-                logger.info(f"Deactivated credential for {carrier} - {credential_type}")
-                return True
+            values = decrypt_credentials(credential.credentials)
+            if values.pop(credential_type, None) is None:
+                return False
             
-            return False
+            if values:
+                credential.credentials = encrypt_credentials(values)
+            else:
+                credential.is_active = False
+            self.db.commit()
+            publish_invalidation(carrier)
+            logger.info(f"Deactivated credential for {carrier} - {credential_type}")
+            return True
             
         except Exception as e:
             logger.error(f"Failed to deactivate credential: {str(e)}")
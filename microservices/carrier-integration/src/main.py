@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from fastapi.responses import Response
@@ -10,23 +10,29 @@ import os
 
 from .database import engine, Base, get_db
 from .models import CarrierCredential, CarrierHealthStatus, ExchangeRate
-from .middleware import RateLimitMiddleware, CarrierThrottlingMiddleware, WebhookAuthMiddleware
+from .middleware import RateLimitMiddleware, WebhookAuthMiddleware, DeadlineMiddleware, remaining_time
 from .webhooks import router as webhook_router
 from .routers.credentials import router as credentials_router
 from .routers.international_mailbox import router as mailbox_router
 from .routers.pickit import router as pickit_router
+from .routers.labels import router as labels_router
+from .routers.imports import router as imports_router
+from .routers.reports import router as reports_router
 from .carriers.dhl import DHLClient
 from .carriers.fedex import FedExClient
 from .carriers.ups import UPSClient
 from .carriers.servientrega import ServientregaClient
 from .carriers.interrapidisimo import InterrapidisimoClient
 from .carriers.pickit import PickitClient
+from .carriers.transport import close_carrier_clients
 from .exchange_rate.banco_republica import BancoRepublicaClient
 from .services.carrier_service import CarrierService
 from .services.fallback_service import FallbackService
 from .services.exchange_rate_service import ExchangeRateService
+from .services.api_call_log import api_call_log, ensure_api_call_log_partitions
+from .services.tracking_partitions import ensure_partitions
 from .schemas import (
-    QuoteRequest, QuoteResponse, 
+    QuoteRequest, BestQuoteResponse,
     LabelRequest, LabelResponse,
     TrackingRequest, TrackingResponse,
     PickupRequest, PickupResponse,
@@ -52,6 +58,14 @@ async def lifespan(app: FastAPI):
 
     # Create database tables
     Base.metadata.create_all(bind=engine)
+    try:
+        ensure_partitions(engine)
+    except Exception as e:
+        logger.error("Failed to create tracking event partitions", error=str(e))
+    try:
+        ensure_api_call_log_partitions(engine)
+    except Exception as e:
+        logger.error("Failed to create API call log partitions", error=str(e))
 
     # Initialize services
     app.state.carrier_service = CarrierService()
@@ -77,6 +91,8 @@ async def lifespan(app: FastAPI):
     # Cleanup
     logger.info("Shutting down Carrier Integration Service...")
     await app.state.exchange_rate_service.stop_scheduler()
+    await close_carrier_clients()
+    api_call_log.close()
     logger.info("Carrier Integration Service shut down")
 
 app = FastAPI(
@@ -96,24 +112,28 @@ app.add_middleware(
 )
 
 # Add rate limiting
-app.add_middleware(
-    RateLimitMiddleware,
-    redis_url=os.getenv("REDIS_URL", "redis://redis:6379/1"),
-    requests_per_minute=60,
-    requests_per_hour=1000
-)
-
-# Add carrier throttling
-app.add_middleware(CarrierThrottlingMiddleware)
+if os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true":
+    app.add_middleware(
+        RateLimitMiddleware,
+        redis_url=os.getenv("REDIS_URL", "redis://redis:6379/1"),
+        requests_per_minute=int(os.getenv("RATE_LIMIT_PER_MINUTE", "60")),
+        requests_per_hour=int(os.getenv("RATE_LIMIT_PER_HOUR", "1000"))
+    )
 
 # Add webhook authentication
 app.add_middleware(WebhookAuthMiddleware)
 
+# Honour the gateway-propagated request deadline
+app.add_middleware(DeadlineMiddleware)
+
 # Include routers
 app.include_router(webhook_router)
 app.include_router(credentials_router)
 app.include_router(mailbox_router)
 app.include_router(pickit_router)
+app.include_router(labels_router)
+app.include_router(imports_router)
+app.include_router(reports_router)
 
 # Request tracking middleware
 @app.middleware("http")
@@ -152,9 +172,10 @@ async def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 # Quote endpoints
-@app.post("/api/v1/quotes", response_model=QuoteResponse)
+@app.post("/api/v1/quotes", response_model=BestQuoteResponse)
 async def get_quote(
     request: QuoteRequest,
+    deadline_ms: Optional[int] = Query(None, ge=100, le=60000, description="Best-quote time budget"),
     carrier_service: CarrierService = Depends(lambda: app.state.carrier_service),
     fallback_service: FallbackService = Depends(lambda: app.state.fallback_service)
 ):
@@ -166,8 +187,14 @@ async def get_quote(
             # Get quote from specific carrier
             quote = await carrier_service.get_quote(request.carrier.value if hasattr(request.carrier, 'value') else request.carrier, request)
         else:
-            # Get best quote from available carriers
-            quote = await carrier_service.get_best_quote(request)
+            # Get the best quote available within the caller's (or gateway's) time budget
+            deadline = deadline_ms / 1000 if deadline_ms else None
+            propagated = remaining_time()
+            if propagated is not None:
+                # Leave a little of the gateway's budget for the response itself
+                propagated = max(0.0, propagated - 0.1)
+                deadline = propagated if deadline is None else min(deadline, propagated)
+            quote = await carrier_service.get_best_quote(request, deadline=deadline)
         
         logger.info("Quote generated successfully", carrier=quote.carrier, amount=quote.amount)
         return quote
@@ -269,6 +296,18 @@ async def save_carrier_credentials(
         logger.error("Failed to save credentials", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+# Circuit breaker state of every carrier, shared by all workers
+@app.get("/api/v1/carriers/health")
+async def get_carriers_health(
+    carrier_service: CarrierService = Depends(lambda: app.state.carrier_service)
+):
+    """Get breaker state per carrier and operation"""
+    try:
+        return await carrier_service.get_all_health_status()
+    except Exception as e:
+        logger.error("Failed to get carriers health", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Carrier health status
 @app.get("/api/v1/carriers/{carrier}/health")
 async def get_carrier_health(
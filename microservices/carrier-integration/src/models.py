@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, JSON, Text, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Date, DateTime, Boolean, JSON, Text, Enum as SQLEnum, UniqueConstraint, Index, DDL, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -15,6 +15,8 @@ class CarrierType(enum.Enum):
     PASAREX = "Pasarex"
     AEROPOST = "Aeropost"
     PICKIT = "Pickit"
+    COORDINADORA = "Coordinadora"
+    DEPRISA = "Deprisa"
 
 class EnvironmentType(enum.Enum):
     SANDBOX = "sandbox"
@@ -91,7 +93,10 @@ class ShippingLabel(Base):
     carrier = Column(SQLEnum(CarrierType), nullable=False)
     tracking_number = Column(String(100), unique=True, index=True)
     label_url = Column(Text, nullable=True)
-    label_data = Column(Text, nullable=True)  # Base64 encoded
+    label_data = Column(Text, nullable=True)  # Base64 encoded; only rows not moved to the label store yet
+    label_sha256 = Column(String(64), nullable=True, index=True)  # Blob in services/label_store.py
+    label_content_type = Column(String(50), nullable=True)
+    label_size = Column(Integer, nullable=True)
     awb_number = Column(String(100), nullable=True)  # For DHL
     service_type = Column(String(50), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
@@ -99,16 +104,31 @@ class ShippingLabel(Base):
 class TrackingEvent(Base):
     __tablename__ = "tracking_events"
     
-    id = Column(Integer, primary_key=True, index=True)
-    tracking_number = Column(String(100), nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    tracking_number = Column(String(100), nullable=False)
     carrier = Column(SQLEnum(CarrierType), nullable=False)
-    event_date = Column(DateTime, nullable=False)
+    # Partition key: part of the primary key as PostgreSQL requires
+    event_date = Column(DateTime, primary_key=True, nullable=False)
     status = Column(String(50), nullable=False)
     description = Column(Text, nullable=True)
     location = Column(String(200), nullable=True)
     raw_data = Column(JSON, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
+    # Monthly range partitions are managed by services/tracking_partitions.py
+    __table_args__ = (
+        UniqueConstraint('tracking_number', 'carrier', 'event_date', 'status', name='uq_tracking_events_natural_key'),
+        Index('ix_tracking_events_tracking_number_event_date', 'tracking_number', 'event_date'),
+        {'postgresql_partition_by': 'RANGE (event_date)'},
+    )
+
+# A fresh database gets the default partition with the table; monthly ones follow at startup
+event.listen(
+    TrackingEvent.__table__,
+    'after_create',
+    DDL('CREATE TABLE IF NOT EXISTS tracking_events_default PARTITION OF tracking_events DEFAULT')
+)
+
 class PickupSchedule(Base):
     __tablename__ = "pickup_schedules"
     
@@ -146,9 +166,10 @@ class FallbackEvent(Base):
     created_at = Column(DateTime, server_default=func.now())
 
 class ApiCallLog(Base):
+    """Written in batches by services/api_call_log.py"""
     __tablename__ = "api_call_logs"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     carrier = Column(SQLEnum(CarrierType), nullable=False)
     endpoint = Column(String(200), nullable=False)
     method = Column(String(10), nullable=False)
@@ -157,7 +178,151 @@ class ApiCallLog(Base):
     status_code = Column(Integer, nullable=True)
     latency_ms = Column(Float, nullable=False)
     error_message = Column(Text, nullable=True)
+    # Partition key: part of the primary key as PostgreSQL requires
+    created_at = Column(DateTime, primary_key=True, nullable=False, server_default=func.now())
+
+    # Daily range partitions are managed by services/api_call_log.py
+    __table_args__ = (
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+event.listen(
+    ApiCallLog.__table__,
+    'after_create',
+    DDL('CREATE TABLE IF NOT EXISTS api_call_logs_default PARTITION OF api_call_logs DEFAULT')
+)
+
+class CarrierDailyStats(Base):
+    """Per day and carrier counters, kept up to date by services/carrier_stats.py"""
+    __tablename__ = "carrier_daily_stats"
+
+    stat_date = Column(Date, primary_key=True)
+    carrier = Column(SQLEnum(CarrierType), primary_key=True)
+    labels_generated = Column(Integer, nullable=False, default=0, server_default="0")
+    quotes_generated = Column(Integer, nullable=False, default=0, server_default="0")
+    quote_amount = Column(Float, nullable=False, default=0, server_default="0")  # Sum of quoted amounts
+    tracking_events = Column(Integer, nullable=False, default=0, server_default="0")
+    delivered = Column(Integer, nullable=False, default=0, server_default="0")
+    in_transit = Column(Integer, nullable=False, default=0, server_default="0")
+    exceptions = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class RouteDailyStats(Base):
+    """Quotes per day and route, for the daily report's top routes"""
+    __tablename__ = "route_daily_stats"
+
+    stat_date = Column(Date, primary_key=True)
+    origin_city = Column(String(100), primary_key=True)
+    destination_city = Column(String(100), primary_key=True)
+    quotes = Column(Integer, nullable=False, default=0, server_default="0")
+    quote_amount = Column(Float, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class CarrierCityCode(Base):
+    """Carrier-specific city codes, cached so quotes do not look them up remotely"""
+    __tablename__ = "carrier_city_codes"
+    __table_args__ = (
+        UniqueConstraint('carrier', 'city_key', name='uq_carrier_city_codes_carrier_city'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    carrier = Column(String(50), nullable=False)
+    city_key = Column(String(200), nullable=False)  # Normalized name used for lookups
+    city_name = Column(String(200), nullable=False)
+    department = Column(String(100), nullable=True)
+    postal_code = Column(String(20), nullable=True)
+    code = Column(String(20), nullable=False)
+    details = Column(JSON, nullable=True)
+    refreshed_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+# Shipment CSV imports (services/shipment_import.py)
+
+class ShipmentImportJob(Base):
+    __tablename__ = "shipment_import_jobs"
+
+    id = Column(String(36), primary_key=True)  # UUID handed to the client for polling
+    # uploaded -> validating -> validated -> processing -> completed, or failed
+    status = Column(String(20), nullable=False, default="uploaded")
+    filename = Column(String(255), nullable=True)
+    file_digest = Column(String(64), nullable=False)  # SHA-256 of the upload in the import store
+    file_size = Column(BigInteger, nullable=False)
+    auto_process = Column(Boolean, default=False)  # Create labels for valid rows
+    total_rows = Column(Integer, default=0)
+    chunks_total = Column(Integer, default=0)
+    chunks_done = Column(Integer, default=0)
+    rows_valid = Column(Integer, default=0)
+    rows_invalid = Column(Integer, default=0)
+    labels_created = Column(Integer, default=0)
+    labels_failed = Column(Integer, default=0)
+    error = Column(Text, nullable=True)  # Why the whole job failed
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, onupdate=func.now())
+    completed_at = Column(DateTime, nullable=True)
+
+class ShipmentImportChunk(Base):
+    """Byte range of an import file handled by one chunk task"""
+    __tablename__ = "shipment_import_chunks"
+    __table_args__ = (
+        UniqueConstraint('job_id', 'start_offset', name='uq_shipment_import_chunks_job_start'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(36), nullable=False)
+    start_offset = Column(BigInteger, nullable=False)
+    end_offset = Column(BigInteger, nullable=False)
+    first_row = Column(Integer, nullable=False)  # File row number of the first record (header is row 1)
+    row_count = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, done
+    validated = Column(Boolean, default=False)  # Validation errors already recorded
+    attempts = Column(Integer, default=0)
+    claimed_at = Column(DateTime, nullable=True)
+
+class ShipmentImportError(Base):
+    __tablename__ = "shipment_import_errors"
+    __table_args__ = (
+        Index('ix_shipment_import_errors_job_row', 'job_id', 'row_number'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(36), nullable=False)
+    row_number = Column(Integer, nullable=False)
+    field = Column(String(100), nullable=True)
+    message = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+# Outbound customer callbacks (services/callback_dispatcher.py)
+
+class CallbackDelivery(Base):
+    """One notification to a customer URL, retried until delivered or out of attempts"""
+    __tablename__ = "callback_deliveries"
+    __table_args__ = (
+        Index('ix_callback_deliveries_due', 'status', 'next_attempt_at'),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    url = Column(String(500), nullable=False)
+    endpoint = Column(String(255), nullable=False, index=True)  # scheme://host[:port], the circuit's key
+    event = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, sending, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, server_default=func.now())
+    claimed_at = Column(DateTime, nullable=True)
+    last_status_code = Column(Integer, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    delivered_at = Column(DateTime, nullable=True)
+
+class CallbackEndpoint(Base):
+    """Circuit state of a customer endpoint"""
+    __tablename__ = "callback_endpoints"
+
+    endpoint = Column(String(255), primary_key=True)
+    failures = Column(Integer, nullable=False, default=0)  # Consecutive failed requests
+    open_for = Column(Float, nullable=True)  # Current cool-down in seconds; set until a request succeeds
+    open_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 # International Mailbox Models
 
@@ -178,6 +343,10 @@ class InternationalMailbox(Base):
 
 class PackagePrealert(Base):
     __tablename__ = "package_prealerts"
+    __table_args__ = (
+        # Arrived packages waiting for consolidation, read by the nightly run
+        Index('ix_package_prealerts_arrived', 'mailbox_id', postgresql_where=text("status = 'arrived'")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     mailbox_id = Column(String(100), nullable=False, index=True)
@@ -0,0 +1,99 @@
+"""
+Shipment CSV imports
+The upload is streamed to the import store and handed to the batch workers
+as a job id; clients poll the job for progress and page through row errors.
+"""
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import structlog
+
+from ..database import get_db
+from ..models import ShipmentImportError, ShipmentImportJob
+from ..services.shipment_import import create_import_job, job_summary, start_processing, store_upload
+from ..tasks.batch_tasks import plan_shipment_import, queue_import_chunks
+
+logger = structlog.get_logger()
+
+router = APIRouter(
+    prefix="/api/v1/imports",
+    tags=["Imports"],
+    responses={404: {"description": "Not found"}}
+)
+
+
+def _get_job(db: Session, job_id: str) -> ShipmentImportJob:
+    job = db.get(ShipmentImportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return job
+
+
+@router.post("/shipments", status_code=status.HTTP_202_ACCEPTED, response_model=Dict[str, Any])
+def upload_shipments(
+    file: UploadFile = File(...),
+    auto_process: bool = Query(False, description="Generate labels for the valid rows"),
+    db: Session = Depends(get_db)
+):
+    """Upload a shipments CSV; validation (and processing) runs in the background"""
+    try:
+        digest, size = store_upload(file.file)
+    except OSError as e:
+        logger.error("Failed to store import upload", filename=file.filename, error=str(e))
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not store the upload")
+
+    job = create_import_job(db, digest, size, file.filename, auto_process)
+    plan_shipment_import.delay(job.id)
+    logger.info("Shipment import uploaded", job_id=job.id, size=size, auto_process=auto_process)
+    return job_summary(job)
+
+
+@router.get("/{job_id}", response_model=Dict[str, Any])
+def get_import(job_id: str, db: Session = Depends(get_db)):
+    """Progress of an import job"""
+    return job_summary(_get_job(db, job_id))
+
+
+@router.get("/{job_id}/errors", response_model=Dict[str, Any])
+def get_import_errors(
+    job_id: str,
+    after_row: int = Query(0, ge=0, description="Return errors of rows after this row number"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Row errors of an import job, in row order"""
+    _get_job(db, job_id)
+    errors = db.scalars(
+        select(ShipmentImportError)
+        .where(ShipmentImportError.job_id == job_id, ShipmentImportError.row_number > after_row)
+        .order_by(ShipmentImportError.row_number, ShipmentImportError.id)
+        .limit(limit)
+    ).all()
+    full = len(errors) == limit
+    # Never cut a row's errors in half: the next page starts after the last complete row
+    if full and errors[0].row_number != errors[-1].row_number:
+        last_row = errors[-1].row_number
+        errors = [error for error in errors if error.row_number != last_row]
+    return {
+        'job_id': job_id,
+        'errors': [
+            {'row': error.row_number, 'field': error.field, 'message': error.message}
+            for error in errors
+        ],
+        'next_after_row': errors[-1].row_number if full else None,
+    }
+
+
+@router.post("/{job_id}/process", status_code=status.HTTP_202_ACCEPTED, response_model=Dict[str, Any])
+def process_import(job_id: str, db: Session = Depends(get_db)):
+    """Generate labels for the valid rows of a validated import"""
+    job = _get_job(db, job_id)
+    try:
+        start_processing(db, job)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    queue_import_chunks.delay(job_id)
+    return job_summary(job)
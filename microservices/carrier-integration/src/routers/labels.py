@@ -0,0 +1,125 @@
+"""
+Label document downloads
+Streams stored labels from the content-addressed blob store with a strong
+ETag (the SHA-256 digest) and single byte-range support.
+"""
+
+import re
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy.orm import Session
+import structlog
+
+from ..database import get_db
+from ..models import ShippingLabel
+from ..services.label_store import decode_label_data, get_label_store
+
+logger = structlog.get_logger()
+
+router = APIRouter(
+    prefix="/api/v1/labels",
+    tags=["Labels"],
+    responses={404: {"description": "Not found"}}
+)
+
+EXTENSIONS = {
+    "application/pdf": "pdf",
+    "application/x-zpl": "zpl",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/jpeg": "jpg",
+}
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single byte range, None to send the whole document.
+
+    Raises ValueError for a range that cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Multiple ranges or another unit: answering with the full document is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+@router.get("/{label_id}")
+def download_label(label_id: int, request: Request, db: Session = Depends(get_db)):
+    """Download a label document"""
+    label = db.get(ShippingLabel, label_id)
+    if label is None:
+        raise HTTPException(status_code=404, detail="Label not found")
+
+    if label.label_sha256 is None:
+        if not label.label_data:
+            raise HTTPException(status_code=404, detail="Label has no stored document")
+        # Not moved to the blob store yet
+        return Response(content=decode_label_data(label.label_data), media_type="application/octet-stream")
+
+    digest = label.label_sha256
+    content_type = label.label_content_type or "application/octet-stream"
+    etag = f'"{digest}"'
+    filename = f"{label.tracking_number or label.id}.{EXTENSIONS.get(content_type, 'bin')}"
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # The URL always returns the same bytes for a given digest
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Content-Disposition": f'inline; filename="{filename}"',
+    }
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    store = get_label_store()
+    try:
+        size = label.label_size if label.label_size is not None else store.backend.size(digest)
+    except FileNotFoundError:
+        logger.error("Label blob missing", label_id=label_id, digest=digest)
+        raise HTTPException(status_code=404, detail="Label document not found")
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is not None:
+        start, end = byte_range
+        return StreamingResponse(
+            store.backend.iter_range(digest, start, end),
+            status_code=206,
+            media_type=content_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)}
+        )
+
+    path = store.backend.local_path(digest)
+    if path is not None:
+        # Sent with the server's zero-copy sendfile extension when it offers one
+        return FileResponse(path, media_type=content_type, headers=headers)
+    return StreamingResponse(
+        store.backend.iter_range(digest, 0, size - 1),
+        media_type=content_type,
+        headers={**headers, "Content-Length": str(size)}
+    )
@@ -0,0 +1,27 @@
+"""
+Carrier reports
+Served from the carrier_daily_stats and route_daily_stats rollups.
+"""
+
+from datetime import date as date_type, datetime
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..services.carrier_stats import build_daily_report
+
+router = APIRouter(
+    prefix="/api/v1/reports",
+    tags=["Reports"]
+)
+
+
+@router.get("/daily", response_model=Dict[str, Any])
+def daily_report(
+    date: Optional[date_type] = Query(None, description="Report date (YYYY-MM-DD), defaults to today"),
+    db: Session = Depends(get_db)
+):
+    """Labels, quotes and tracking events per carrier for one day"""
+    return build_daily_report(db, date or datetime.now().date())
@@ -9,6 +9,8 @@ class CarrierEnum(str, Enum):
     UPS = "UPS"
     SERVIENTREGA = "Servientrega"
     INTERRAPIDISIMO = "Interrapidisimo"
+    COORDINADORA = "Coordinadora"
+    DEPRISA = "Deprisa"
 
 class ServiceTypeEnum(str, Enum):
     EXPRESS = "express"
@@ -46,6 +48,7 @@ class QuoteRequest(BaseModel):
     pickup_date: Optional[datetime] = None
     insurance_required: bool = False
     customs_value: Optional[float] = None
+    firm_quote: bool = False  # skip the quote cache, e.g. right before booking
 
 class QuoteResponse(BaseModel):
     quote_id: str
@@ -58,6 +61,14 @@ class QuoteResponse(BaseModel):
     breakdown: Optional[Dict[str, float]] = None
     notes: Optional[List[str]] = None
 
+class BestQuoteResponse(QuoteResponse):
+    """Cheapest quote of a fan-out, with which carriers did not make the deadline"""
+    carriers_quoted: List[str] = []
+    carriers_failed: List[str] = []
+    carriers_timed_out: List[str] = []
+    carriers_skipped: List[str] = []  # still pending when the quorum was reached
+    elapsed_ms: Optional[float] = None
+
 class LabelRequest(BaseModel):
     carrier: CarrierEnum
     order_id: str
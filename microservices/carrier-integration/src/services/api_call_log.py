@@ -0,0 +1,247 @@
+"""
+Buffered api_call_logs writer
+Callers hand audit records to api_call_log.record(), which only appends them
+to an in-process queue; a background thread writes the queue with multi-row
+INSERTs every API_CALL_LOG_FLUSH_ROWS records or API_CALL_LOG_FLUSH_MS
+milliseconds, in its own transaction. Audit writes therefore never sit in a
+webhook's or a quote's transaction or on its latency.
+
+When the database falls behind, the queue is the buffer: above
+API_CALL_LOG_PAYLOAD_HIGH_WATER of its size, debug-level records lose their
+request and response payloads, and once it is full new records are dropped.
+Both are counted in api_call_log_records_total.
+
+api_call_logs is range-partitioned by created_at, one partition per day plus
+a default one; retention drops whole days.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional
+
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from ..database import engine as default_engine
+from ..models import ApiCallLog, CarrierType
+from . import partitions
+from .partitions import PartitionScheme
+
+logger = structlog.get_logger()
+
+API_CALL_LOG_ENABLED = os.getenv("API_CALL_LOG_ENABLED", "true").lower() == "true"
+API_CALL_LOG_FLUSH_ROWS = int(os.getenv("API_CALL_LOG_FLUSH_ROWS", "500"))
+API_CALL_LOG_FLUSH_MS = int(os.getenv("API_CALL_LOG_FLUSH_MS", "200"))
+API_CALL_LOG_QUEUE_SIZE = int(os.getenv("API_CALL_LOG_QUEUE_SIZE", "20000"))
+# Queue fill ratio above which debug-level records are stored without payloads
+API_CALL_LOG_PAYLOAD_HIGH_WATER = float(os.getenv("API_CALL_LOG_PAYLOAD_HIGH_WATER", "0.5"))
+API_CALL_LOG_PARTITION_DAYS_AHEAD = int(os.getenv("API_CALL_LOG_PARTITION_DAYS_AHEAD", "7"))
+API_CALL_LOG_RETENTION_DAYS = int(os.getenv("API_CALL_LOG_RETENTION_DAYS", "30"))
+API_CALL_LOG_PARTITION_LOCK_TIMEOUT = os.getenv("API_CALL_LOG_PARTITION_LOCK_TIMEOUT", "5s")
+
+PARENT_TABLE = "api_call_logs"
+DEFAULT_PARTITION = "api_call_logs_default"
+
+api_call_log_records = Counter(
+    'api_call_log_records_total',
+    'API call log records by outcome',
+    ['outcome', 'level']
+)
+api_call_log_queue_depth = Gauge(
+    'api_call_log_queue_depth',
+    'API call log records waiting to be written'
+)
+api_call_log_flush_duration = Histogram(
+    'api_call_log_flush_duration_seconds',
+    'Time to write one batch of API call log records'
+)
+
+
+def _carrier_type(carrier: Any) -> Optional[CarrierType]:
+    if isinstance(carrier, CarrierType):
+        return carrier
+    name = str(getattr(carrier, "value", carrier))
+    for member in CarrierType:
+        if name in (member.value, member.name) or name.upper() == member.name:
+            return member
+    return None
+
+
+class ApiCallLogWriter:
+    """In-process queue of api_call_logs rows, written in batches by a thread"""
+
+    def __init__(
+        self,
+        engine=None,
+        enabled: bool = API_CALL_LOG_ENABLED,
+        flush_rows: int = API_CALL_LOG_FLUSH_ROWS,
+        flush_ms: int = API_CALL_LOG_FLUSH_MS,
+        queue_size: int = API_CALL_LOG_QUEUE_SIZE,
+        payload_high_water: float = API_CALL_LOG_PAYLOAD_HIGH_WATER
+    ):
+        self.engine = engine
+        self.enabled = enabled
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_ms / 1000
+        self.queue_size = queue_size
+        self.payload_limit = int(queue_size * payload_high_water)
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._pid: Optional[int] = None
+        self._closing = False
+
+    def record(
+        self,
+        carrier: Any,
+        endpoint: str,
+        method: str,
+        latency_ms: float,
+        status_code: Optional[int] = None,
+        request_data: Any = None,
+        response_data: Any = None,
+        error_message: Optional[str] = None,
+        level: str = "debug"
+    ) -> None:
+        """Queue one audit record; never blocks on the database"""
+        if not self.enabled:
+            return
+        carrier_type = _carrier_type(carrier)
+        if carrier_type is None:
+            # The column's enum has no value for it; one bad row would fail the whole batch
+            api_call_log_records.labels(outcome="skipped", level=level).inc()
+            return
+        self._ensure_flusher()
+
+        row = {
+            "carrier": carrier_type,
+            "endpoint": endpoint[:200],
+            "method": method,
+            "request_data": request_data,
+            "response_data": response_data,
+            "status_code": status_code,
+            "latency_ms": latency_ms,
+            "error_message": error_message,
+            "created_at": datetime.now(),
+        }
+        with self._cond:
+            depth = len(self._queue)
+            if depth >= self.queue_size:
+                api_call_log_records.labels(outcome="dropped", level=level).inc()
+                return
+            if level == "debug" and depth >= self.payload_limit:
+                row["request_data"] = row["response_data"] = None
+                api_call_log_records.labels(outcome="payload_dropped", level=level).inc()
+            self._queue.append(row)
+            if depth + 1 >= self.flush_rows:
+                self._cond.notify()
+
+    def flush(self) -> int:
+        """Write everything queued now, from the calling thread; returns rows written"""
+        written = 0
+        while True:
+            batch = self._take()
+            if not batch or not self._write(batch):
+                return written
+            written += len(batch)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self.flush()
+
+    def _ensure_flusher(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._cond:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                # Forked: the parent writes the rows it queued
+                self._queue.clear()
+            self._pid = pid
+            self._closing = False
+        threading.Thread(target=self._run, name="api-call-log-writer", daemon=True).start()
+        atexit.register(self.close)
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            count = min(len(self._queue), self.flush_rows)
+            batch = [self._queue.popleft() for _ in range(count)]
+            api_call_log_queue_depth.set(len(self._queue))
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._queue) < self.flush_rows and not self._closing:
+                    self._cond.wait(self.flush_interval)
+                closing = self._closing
+            batch = self._take()
+            if batch and not self._write(batch):
+                # Back off; rows that failed on a lost connection went back to the queue
+                time.sleep(1)
+            elif not batch and closing:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        started = time.monotonic()
+        try:
+            with (self.engine or default_engine).begin() as conn:
+                conn.execute(insert(ApiCallLog.__table__), batch)
+        except (OperationalError, InterfaceError) as e:
+            with self._cond:
+                kept = batch[:max(0, self.queue_size - len(self._queue))]
+                self._queue.extendleft(reversed(kept))
+            if len(kept) < len(batch):
+                api_call_log_records.labels(outcome="dropped", level="any").inc(len(batch) - len(kept))
+            logger.warning("API call log database unavailable", rows=len(batch), requeued=len(kept), error=str(e))
+            return False
+        except Exception as e:
+            api_call_log_records.labels(outcome="failed", level="any").inc(len(batch))
+            logger.error("Failed to write API call logs", rows=len(batch), error=str(e))
+            return False
+        api_call_log_flush_duration.observe(time.monotonic() - started)
+        api_call_log_records.labels(outcome="written", level="any").inc(len(batch))
+        return True
+
+
+api_call_log = ApiCallLogWriter()
+
+
+def day_start(value: datetime) -> datetime:
+    return datetime.combine(value.date(), datetime.min.time())
+
+
+def add_days(day: datetime, days: int) -> datetime:
+    return day + timedelta(days=days)
+
+
+API_CALL_LOGS = PartitionScheme(PARENT_TABLE, DEFAULT_PARTITION, "created_at", day_start, add_days, "%Y%m%d")
+
+
+def partition_name(day: date) -> str:
+    return API_CALL_LOGS.partition_name(day)
+
+
+def ensure_api_call_log_partitions(
+    engine, days_ahead: int = API_CALL_LOG_PARTITION_DAYS_AHEAD, now: Optional[datetime] = None
+) -> List[str]:
+    """Create the daily partitions from today to ``days_ahead`` days out"""
+    return partitions.ensure_partitions(engine, API_CALL_LOGS, days_ahead, now)
+
+
+def drop_expired_api_call_log_partitions(
+    engine, days_to_keep: int = API_CALL_LOG_RETENTION_DAYS, now: Optional[datetime] = None
+) -> Dict[str, object]:
+    """Detach and drop every daily partition older than the retention window"""
+    return partitions.drop_expired_partitions(
+        engine, API_CALL_LOGS, days_to_keep, API_CALL_LOG_PARTITION_LOCK_TIMEOUT, now
+    )
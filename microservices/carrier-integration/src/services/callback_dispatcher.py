@@ -0,0 +1,374 @@
+"""
+Outbound customer callbacks
+Notifications for customer URLs (mailbox results, tracking updates) are
+stored in callback_deliveries by enqueue_callback() and sent by the
+dispatch_callbacks task, never from the task that produced them.
+
+Each dispatch round claims due deliveries, at most CALLBACK_BATCH_SIZE per
+URL so one busy or dead URL cannot fill the round, and sends every URL's
+deliveries as one signed POST. Requests run concurrently on pooled
+keep-alive connections, one pool per endpoint (scheme, host and port),
+with at most CALLBACK_ENDPOINT_CONCURRENCY requests in flight per endpoint.
+
+Failed deliveries are retried with jittered exponential backoff, the next
+attempt time being stored on the row. After CALLBACK_CIRCUIT_THRESHOLD
+consecutive failures an endpoint's circuit opens: its deliveries are not
+claimed until the cool-down ends, then one batch probes it; each failed
+probe doubles the cool-down up to CALLBACK_CIRCUIT_MAX_SECONDS.
+
+Bodies are signed with HMAC-SHA256 over "<timestamp>.<body>" using
+CALLBACK_SIGNING_SECRET; receivers verify X-Quenty-Signature against the
+X-Quenty-Timestamp header and the raw body.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+import weakref
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import structlog
+from prometheus_client import Counter, Histogram
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import CallbackDelivery, CallbackEndpoint
+
+logger = structlog.get_logger()
+
+CALLBACK_SIGNING_SECRET = os.getenv("CALLBACK_SIGNING_SECRET", "")
+CALLBACK_BATCH_SIZE = int(os.getenv("CALLBACK_BATCH_SIZE", "50"))
+CALLBACK_CLAIM_LIMIT = int(os.getenv("CALLBACK_CLAIM_LIMIT", "1000"))
+CALLBACK_ENDPOINT_CONCURRENCY = int(os.getenv("CALLBACK_ENDPOINT_CONCURRENCY", "4"))
+CALLBACK_CONNECT_TIMEOUT = float(os.getenv("CALLBACK_CONNECT_TIMEOUT", "3"))
+CALLBACK_TIMEOUT = float(os.getenv("CALLBACK_TIMEOUT", "10"))
+CALLBACK_MAX_ATTEMPTS = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "10"))
+CALLBACK_RETRY_BASE_SECONDS = float(os.getenv("CALLBACK_RETRY_BASE_SECONDS", "30"))
+CALLBACK_RETRY_MAX_SECONDS = float(os.getenv("CALLBACK_RETRY_MAX_SECONDS", "21600"))
+CALLBACK_CIRCUIT_THRESHOLD = int(os.getenv("CALLBACK_CIRCUIT_THRESHOLD", "5"))
+CALLBACK_CIRCUIT_OPEN_SECONDS = float(os.getenv("CALLBACK_CIRCUIT_OPEN_SECONDS", "60"))
+CALLBACK_CIRCUIT_MAX_SECONDS = float(os.getenv("CALLBACK_CIRCUIT_MAX_SECONDS", "3600"))
+# A delivery left "sending" this long belonged to a worker that died; it may be claimed again
+CALLBACK_LEASE_SECONDS = int(os.getenv("CALLBACK_LEASE_SECONDS", "300"))
+
+CALLBACK_RETENTION_DAYS = int(os.getenv("CALLBACK_RETENTION_DAYS", "14"))
+
+# Responses worth retrying; any other 4xx will not change by sending again
+RETRYABLE_STATUS = {408, 425, 429}
+
+callback_deliveries = Counter(
+    'callback_deliveries_total',
+    'Customer callback deliveries by outcome (delivered, retry, failed)',
+    ['event', 'outcome']
+)
+callback_request_duration = Histogram(
+    'callback_request_duration_seconds',
+    'Time until a customer endpoint answered a callback batch',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+callback_circuit_opened = Counter(
+    'callback_circuit_opened_total',
+    'Times a customer endpoint circuit was opened'
+)
+
+
+class CallbackBatch(NamedTuple):
+    url: str
+    endpoint: str
+    items: List[Dict[str, Any]]  # id, event, created_at, data
+
+
+class CallbackResult(NamedTuple):
+    batch: CallbackBatch
+    status_code: Optional[int]
+    error: Optional[str]
+    retry_after: Optional[float] = None
+
+    @property
+    def delivered(self) -> bool:
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+    @property
+    def retryable(self) -> bool:
+        # No answer, a server error or an explicit "later"
+        return (
+            self.status_code is None
+            or self.status_code >= 500
+            or self.status_code in RETRYABLE_STATUS
+        )
+
+
+def endpoint_of(url: str) -> str:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Invalid callback URL: {url}")
+    port = f":{parts.port}" if parts.port else ""
+    return f"{parts.scheme}://{parts.hostname.lower()}{port}"
+
+
+def sign(body: bytes, timestamp: int, secret: str = None) -> str:
+    secret = CALLBACK_SIGNING_SECRET if secret is None else secret
+    message = f"{timestamp}.".encode() + body
+    return "sha256=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def retry_delay(attempts: int, retry_after: Optional[float] = None) -> float:
+    """Seconds until the next attempt after ``attempts`` failed ones
+
+    Exponential from CALLBACK_RETRY_BASE_SECONDS, capped, with the upper half
+    jittered so retries from one outage spread out; never before the
+    endpoint's own Retry-After.
+    """
+    ceiling = min(CALLBACK_RETRY_MAX_SECONDS, CALLBACK_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+    return max(delay, retry_after or 0)
+
+
+def next_open_for(failures: int, open_for: Optional[float]) -> Optional[float]:
+    """Cool-down after another failure, or None while the circuit stays closed"""
+    if open_for is not None:
+        # Failed probe
+        return min(open_for * 2, CALLBACK_CIRCUIT_MAX_SECONDS)
+    if failures >= CALLBACK_CIRCUIT_THRESHOLD:
+        return CALLBACK_CIRCUIT_OPEN_SECONDS
+    return None
+
+
+def _jsonable(payload: Any) -> Any:
+    return json.loads(json.dumps(payload, default=str))
+
+
+def enqueue_callback(db, url: str, event: str, payload: Any) -> CallbackDelivery:
+    """Store a notification for ``url``; sent once the caller commits"""
+    delivery = CallbackDelivery(
+        url=url,
+        endpoint=endpoint_of(url),
+        event=event,
+        payload=_jsonable(payload),
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.now()
+    )
+    db.add(delivery)
+    return delivery
+
+
+def claim_deliveries(
+    db, limit: int = CALLBACK_CLAIM_LIMIT, batch_size: int = CALLBACK_BATCH_SIZE, now: Optional[datetime] = None
+) -> List[CallbackBatch]:
+    """Mark due deliveries "sending" and group them into one batch per URL
+
+    Deliveries to an endpoint whose circuit is open are left alone, and each
+    URL contributes at most ``batch_size`` deliveries, oldest first.
+    """
+    now = now or datetime.now()
+    stale = now - timedelta(seconds=CALLBACK_LEASE_SECONDS)
+    claimable = or_(
+        and_(CallbackDelivery.status == "pending", CallbackDelivery.next_attempt_at <= now),
+        and_(CallbackDelivery.status == "sending", CallbackDelivery.claimed_at < stale)
+    )
+    circuit_open = exists().where(
+        CallbackEndpoint.endpoint == CallbackDelivery.endpoint,
+        CallbackEndpoint.open_until > now
+    )
+    ranked = (
+        select(
+            CallbackDelivery.id,
+            func.row_number().over(partition_by=CallbackDelivery.url, order_by=CallbackDelivery.id).label("position")
+        )
+        .where(claimable, ~circuit_open)
+        .subquery()
+    )
+    candidates = select(ranked.c.id).where(ranked.c.position <= batch_size).order_by(ranked.c.id).limit(limit)
+
+    # Re-checking claimable under the row lock makes concurrent dispatchers claim each row once
+    claimed = db.execute(
+        update(CallbackDelivery)
+        .where(CallbackDelivery.id.in_(candidates), claimable)
+        .values(status="sending", claimed_at=now)
+        .returning(
+            CallbackDelivery.id,
+            CallbackDelivery.url,
+            CallbackDelivery.endpoint,
+            CallbackDelivery.event,
+            CallbackDelivery.payload,
+            CallbackDelivery.created_at
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+
+    batches: Dict[str, CallbackBatch] = {}
+    for delivery_id, url, endpoint, event, payload, created_at in sorted(claimed):
+        batch = batches.setdefault(url, CallbackBatch(url, endpoint, []))
+        batch.items.append({
+            "id": delivery_id,
+            "event": event,
+            "created_at": created_at.isoformat() if created_at else None,
+            "data": payload,
+        })
+    return list(batches.values())
+
+
+# Pools and concurrency limits are bound to the loop that created them
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+def get_callback_client(endpoint: str) -> httpx.AsyncClient:
+    """Return the pooled client for a customer endpoint"""
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(endpoint)
+    if client is None or client.is_closed:
+        client = clients[endpoint] = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=CALLBACK_ENDPOINT_CONCURRENCY,
+                max_keepalive_connections=CALLBACK_ENDPOINT_CONCURRENCY
+            ),
+            timeout=httpx.Timeout(CALLBACK_TIMEOUT, connect=CALLBACK_CONNECT_TIMEOUT),
+            follow_redirects=False
+        )
+    return client
+
+
+def _endpoint_limit(endpoint: str) -> asyncio.Semaphore:
+    limits = _limits.setdefault(asyncio.get_running_loop(), {})
+    if endpoint not in limits:
+        limits[endpoint] = asyncio.Semaphore(CALLBACK_ENDPOINT_CONCURRENCY)
+    return limits[endpoint]
+
+
+async def close_callback_clients() -> None:
+    """Close the pooled callback clients of the running loop"""
+    loop = asyncio.get_running_loop()
+    _limits.pop(loop, None)
+    for client in _clients.pop(loop, {}).values():
+        await client.aclose()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+async def send_batch(batch: CallbackBatch) -> CallbackResult:
+    """POST one URL's deliveries as a single signed request"""
+    body = json.dumps({"deliveries": batch.items}, separators=(",", ":")).encode()
+    timestamp = int(time.time())
+    headers = {
+        "Content-Type": "application/json",
+        "X-Quenty-Timestamp": str(timestamp),
+        "X-Quenty-Delivery": ",".join(str(item["id"]) for item in batch.items),
+    }
+    if CALLBACK_SIGNING_SECRET:
+        headers["X-Quenty-Signature"] = sign(body, timestamp)
+
+    async with _endpoint_limit(batch.endpoint):
+        started = time.perf_counter()
+        try:
+            response = await get_callback_client(batch.endpoint).post(batch.url, content=body, headers=headers)
+        except httpx.HTTPError as e:
+            return CallbackResult(batch, None, f"{type(e).__name__}: {e}")
+        finally:
+            callback_request_duration.observe(time.perf_counter() - started)
+
+    error = None if 200 <= response.status_code < 300 else f"HTTP {response.status_code}"
+    return CallbackResult(batch, response.status_code, error, _retry_after(response))
+
+
+async def send_batches(batches: List[CallbackBatch]) -> List[CallbackResult]:
+    return list(await asyncio.gather(*(send_batch(batch) for batch in batches)))
+
+
+def _record_endpoint(db, endpoint: str, ok: bool, error: Optional[str], now: datetime) -> None:
+    db.execute(
+        insert(CallbackEndpoint)
+        .values(endpoint=endpoint, failures=0)
+        .on_conflict_do_nothing(index_elements=["endpoint"])
+    )
+    state = db.query(CallbackEndpoint).filter(CallbackEndpoint.endpoint == endpoint).with_for_update().one()
+    if ok:
+        state.failures = 0
+        state.open_for = None
+        state.open_until = None
+        return
+
+    state.failures += 1
+    state.last_error = error
+    open_for = next_open_for(state.failures, state.open_for)
+    if open_for is not None:
+        state.open_for = open_for
+        state.open_until = now + timedelta(seconds=open_for)
+        callback_circuit_opened.inc()
+        logger.warning("Callback endpoint circuit opened",
+                      endpoint=endpoint,
+                      failures=state.failures,
+                      open_for=open_for)
+
+
+def record_results(db, results: List[CallbackResult], now: Optional[datetime] = None) -> Dict[str, int]:
+    """Store the outcome of a dispatch round; returns deliveries per outcome"""
+    now = now or datetime.now()
+    totals: Dict[str, int] = defaultdict(int)
+
+    # Endpoint rows are locked in one order so concurrent dispatchers cannot deadlock
+    for result in sorted(results, key=lambda r: r.batch.endpoint):
+        ids = [item["id"] for item in result.batch.items]
+        deliveries = db.query(CallbackDelivery).filter(CallbackDelivery.id.in_(ids)).all()
+        for delivery in deliveries:
+            delivery.attempts += 1
+            delivery.last_status_code = result.status_code
+            delivery.claimed_at = None
+            if result.delivered:
+                delivery.status = "delivered"
+                delivery.delivered_at = now
+                delivery.last_error = None
+                outcome = "delivered"
+            elif result.retryable and delivery.attempts < CALLBACK_MAX_ATTEMPTS:
+                delivery.status = "pending"
+                delivery.next_attempt_at = now + timedelta(
+                    seconds=retry_delay(delivery.attempts, result.retry_after)
+                )
+                delivery.last_error = result.error
+                outcome = "retry"
+            else:
+                delivery.status = "failed"
+                delivery.last_error = result.error
+                outcome = "failed"
+            totals[outcome] += 1
+            callback_deliveries.labels(event=delivery.event, outcome=outcome).inc()
+
+        # Only an answer counts for the circuit; a 4xx means the endpoint is up
+        _record_endpoint(db, result.batch.endpoint, not result.retryable, result.error, now)
+        if not result.delivered:
+            logger.warning("Callback delivery failed",
+                          url=result.batch.url,
+                          deliveries=len(ids),
+                          status_code=result.status_code,
+                          error=result.error)
+
+    db.commit()
+    return dict(totals)
+
+
+def purge_deliveries(db, days_to_keep: int = CALLBACK_RETENTION_DAYS, now: Optional[datetime] = None) -> int:
+    """Delete delivered and failed deliveries older than the retention window"""
+    cutoff = (now or datetime.now()) - timedelta(days=days_to_keep)
+    deleted = db.execute(
+        delete(CallbackDelivery)
+        .where(CallbackDelivery.status.in_(("delivered", "failed")), CallbackDelivery.created_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return deleted
@@ -0,0 +1,309 @@
+"""
+Shared carrier circuit breakers
+One breaker per carrier and operation (quote, label, tracking, pickup), kept
+in Redis so every API and Celery worker sees the same state. Each process
+holds a copy of the state refreshed at most every BREAKER_SYNC_INTERVAL, so a
+call to an open carrier is rejected from memory without touching the network.
+
+After the cool-down, exactly one call across all workers is let through as
+the half-open probe (whoever takes the probe lock in Redis); every other call
+keeps failing fast until the probe closes or re-opens the breaker. Each failed
+probe doubles the cool-down up to BREAKER_MAX_OPEN_SECONDS.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+import structlog
+from prometheus_client import Counter, Gauge
+
+from ..carriers.transport import get_redis
+from ..error_handlers import CarrierException, CarrierErrorType
+from .carrier_quota import QuotaExceededError
+
+logger = structlog.get_logger()
+
+OPERATIONS = ("quote", "label", "tracking", "pickup")
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv("BREAKER_MAX_OPEN_SECONDS", "600"))
+BREAKER_PROBE_TIMEOUT = float(os.getenv("BREAKER_PROBE_TIMEOUT", "35"))
+BREAKER_SYNC_INTERVAL = float(os.getenv("BREAKER_SYNC_INTERVAL", "1"))
+
+# Carrier responses that say nothing about the carrier's health
+CLIENT_ERRORS = {
+    CarrierErrorType.INVALID_ADDRESS,
+    CarrierErrorType.INVALID_PACKAGE,
+    CarrierErrorType.INVALID_TRACKING,
+    CarrierErrorType.INSUFFICIENT_FUNDS,
+    CarrierErrorType.COVERAGE_UNAVAILABLE,
+    CarrierErrorType.CUSTOMS_REQUIRED,
+}
+
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+breaker_state = Gauge(
+    'carrier_breaker_state',
+    'Carrier circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ['carrier', 'operation']
+)
+breaker_transitions = Counter(
+    'carrier_breaker_transitions_total',
+    'Carrier circuit breaker state changes made by this process',
+    ['carrier', 'operation', 'state']
+)
+breaker_rejections = Counter(
+    'carrier_breaker_rejections_total',
+    'Carrier calls rejected because the breaker was open',
+    ['carrier', 'operation']
+)
+
+# KEYS[1] breaker hash; ARGV: now, threshold, base open seconds, max open seconds, error
+RECORD_FAILURE = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+local now = tonumber(ARGV[1])
+redis.call('HSET', KEYS[1], 'last_failure', ARGV[1], 'last_error', ARGV[5])
+local open_for = tonumber(redis.call('HGET', KEYS[1], 'open_for') or ARGV[3])
+local reopen = false
+if state == 'half_open' then
+    open_for = math.min(open_for * 2, tonumber(ARGV[4]))
+    reopen = true
+elseif state == 'closed' and failures >= tonumber(ARGV[2]) then
+    open_for = tonumber(ARGV[3])
+    reopen = true
+end
+if reopen then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', ARGV[1],
+               'open_until', tostring(now + open_for), 'open_for', tostring(open_for))
+    state = 'open'
+end
+return {state, failures, redis.call('HGET', KEYS[1], 'open_until') or '0'}
+"""
+
+# KEYS[1] breaker hash; ARGV: now
+RECORD_SUCCESS = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+redis.call('HSET', KEYS[1], 'state', 'closed', 'failures', 0, 'last_success', ARGV[1])
+redis.call('HDEL', KEYS[1], 'open_for', 'open_until')
+return state
+"""
+
+# KEYS[1] breaker hash; moves an expired open breaker to half-open for the probe
+START_PROBE = """
+if redis.call('HGET', KEYS[1], 'state') == 'open' then
+    redis.call('HSET', KEYS[1], 'state', 'half_open')
+    return 1
+end
+return 0
+"""
+
+
+@dataclass
+class BreakerSnapshot:
+    state: str = "closed"
+    failures: int = 0
+    open_until: float = 0.0
+    fetched_at: float = 0.0
+
+
+class CircuitOpenError(CarrierException):
+    """Raised instead of calling a carrier whose breaker is open"""
+
+    def __init__(self, carrier: str, operation: str, retry_after: float):
+        super().__init__(
+            carrier,
+            CarrierErrorType.SERVICE_UNAVAILABLE,
+            f"{carrier} {operation} circuit is open",
+            details={"operation": operation},
+            retry_after=max(1, int(retry_after))
+        )
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """Whether an error says the carrier itself is unhealthy"""
+    if isinstance(error, (CircuitOpenError, QuotaExceededError)):
+        return False
+    if isinstance(error, CarrierException):
+        return error.error_type not in CLIENT_ERRORS
+    return isinstance(error, Exception) and not isinstance(error, ValueError)
+
+
+def _key(carrier: str, operation: str) -> str:
+    return f"carrier:breaker:{carrier.lower()}:{operation}"
+
+
+class CarrierBreakers:
+    """Redis-backed per-carrier, per-operation circuit breakers"""
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._snapshots: Dict[Tuple[str, str], BreakerSnapshot] = {}
+
+    def is_available(self, carrier: str, operation: str) -> bool:
+        """Cheap local check: False only while the breaker is open and cooling down"""
+        snapshot = self._snapshots.get((carrier, operation))
+        if snapshot is None or snapshot.state == "closed":
+            return True
+        return snapshot.state == "open" and time.time() >= snapshot.open_until
+
+    def reject_if_open(self, carrier: str, operation: str) -> None:
+        """Raise CircuitOpenError from the local snapshot while the breaker is cooling down"""
+        carrier = getattr(carrier, "value", carrier)
+        snapshot = self._snapshots.get((carrier, operation))
+        now = time.time()
+        if snapshot is not None and snapshot.state == "open" and now < snapshot.open_until:
+            breaker_rejections.labels(carrier=carrier, operation=operation).inc()
+            raise CircuitOpenError(carrier, operation, snapshot.open_until - now)
+
+    def guard(self, carrier: str, operation: str) -> "_BreakerGuard":
+        """``async with breakers.guard(carrier, op):`` around one carrier call"""
+        return _BreakerGuard(self, getattr(carrier, "value", carrier), operation)
+
+    async def _before_call(self, carrier: str, operation: str) -> bool:
+        """Admit or reject a call; returns True when the call is the half-open probe"""
+        snapshot = await self._snapshot(carrier, operation)
+        if snapshot.state == "closed":
+            return False
+
+        now = time.time()
+        if snapshot.state == "open" and now < snapshot.open_until:
+            breaker_rejections.labels(carrier=carrier, operation=operation).inc()
+            raise CircuitOpenError(carrier, operation, snapshot.open_until - now)
+
+        key = _key(carrier, operation)
+        try:
+            client = get_redis()
+            leader = await client.set(f"{key}:probe", self.worker_id, nx=True, px=int(BREAKER_PROBE_TIMEOUT * 1000))
+            if not leader:
+                # Another worker is probing; keep rejecting locally until the next sync
+                snapshot.state = "open"
+                snapshot.open_until = now + BREAKER_SYNC_INTERVAL
+                breaker_rejections.labels(carrier=carrier, operation=operation).inc()
+                raise CircuitOpenError(carrier, operation, BREAKER_SYNC_INTERVAL)
+            if await client.eval(START_PROBE, 1, key):
+                self._transition(carrier, operation, "half_open")
+        except redis.RedisError as e:
+            logger.warning("Breaker state unavailable, allowing call", carrier=carrier, error=str(e))
+            return False
+        snapshot.state = "half_open"
+        logger.info("Probing carrier", carrier=carrier, operation=operation)
+        return True
+
+    async def _after_call(self, carrier: str, operation: str, probe: bool, error: Optional[BaseException]) -> None:
+        key = _key(carrier, operation)
+        snapshot = self._snapshots.setdefault((carrier, operation), BreakerSnapshot())
+        # Neither a cancelled call nor one that never got quota says anything about the carrier
+        inconclusive = isinstance(error, (asyncio.CancelledError, QuotaExceededError))
+        try:
+            client = get_redis()
+            if inconclusive:
+                pass
+            elif error is not None and counts_as_failure(error):
+                state, failures, open_until = await client.eval(
+                    RECORD_FAILURE, 1, key,
+                    time.time(), BREAKER_FAILURE_THRESHOLD, BREAKER_OPEN_SECONDS, BREAKER_MAX_OPEN_SECONDS,
+                    str(error)[:500]
+                )
+                state = state.decode() if isinstance(state, bytes) else state
+                if state == "open" and snapshot.state != "open":
+                    self._transition(carrier, operation, "open")
+                    logger.warning("Carrier circuit opened", carrier=carrier, operation=operation,
+                                   failures=int(failures), error=str(error))
+                self._store(carrier, operation, state, int(failures), float(open_until))
+            elif snapshot.state != "closed" or snapshot.failures:
+                # Skip the write on the common path: closed with no failures to reset
+                previous = await client.eval(RECORD_SUCCESS, 1, key, time.time())
+                previous = previous.decode() if isinstance(previous, bytes) else previous
+                if previous != "closed":
+                    self._transition(carrier, operation, "closed")
+                    logger.info("Carrier circuit closed", carrier=carrier, operation=operation)
+                self._store(carrier, operation, "closed", 0, 0.0)
+            if probe:
+                await client.delete(f"{key}:probe")
+        except redis.RedisError as e:
+            logger.warning("Failed to record breaker result", carrier=carrier, error=str(e))
+
+    async def _snapshot(self, carrier: str, operation: str) -> BreakerSnapshot:
+        snapshot = self._snapshots.get((carrier, operation))
+        if snapshot is not None and time.monotonic() - snapshot.fetched_at < BREAKER_SYNC_INTERVAL:
+            return snapshot
+        try:
+            raw = await get_redis().hgetall(_key(carrier, operation))
+        except redis.RedisError as e:
+            logger.warning("Breaker state unavailable", carrier=carrier, error=str(e))
+            raw = {}
+        data = _decode(raw)
+        return self._store(
+            carrier, operation,
+            data.get("state", "closed"),
+            int(data.get("failures", 0)),
+            float(data.get("open_until", 0))
+        )
+
+    def _store(self, carrier: str, operation: str, state: str, failures: int, open_until: float) -> BreakerSnapshot:
+        snapshot = BreakerSnapshot(state, failures, open_until, time.monotonic())
+        self._snapshots[(carrier, operation)] = snapshot
+        breaker_state.labels(carrier=carrier, operation=operation).set(STATE_VALUES.get(state, 0))
+        return snapshot
+
+    def _transition(self, carrier: str, operation: str, state: str) -> None:
+        breaker_transitions.labels(carrier=carrier, operation=operation, state=state).inc()
+
+    async def describe(self, carriers: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Current breaker state of every carrier and operation, read from Redis"""
+        keys = [(carrier, operation) for carrier in carriers for operation in OPERATIONS]
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for carrier, operation in keys:
+                pipe.hgetall(_key(carrier, operation))
+            results = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Breaker state unavailable", error=str(e))
+            results = [{} for _ in keys]
+
+        health: Dict[str, Dict[str, Any]] = {carrier: {} for carrier in carriers}
+        for (carrier, operation), raw in zip(keys, results):
+            data = _decode(raw)
+            state = data.get("state", "closed")
+            self._store(carrier, operation, state, int(data.get("failures", 0)), float(data.get("open_until", 0)))
+            health[carrier][operation] = {
+                "state": state,
+                "consecutive_failures": int(data.get("failures", 0)),
+                "open_until": _timestamp(data.get("open_until")),
+                "last_success": _timestamp(data.get("last_success")),
+                "last_failure": _timestamp(data.get("last_failure")),
+                "last_error": data.get("last_error"),
+            }
+        return health
+
+
+class _BreakerGuard:
+    def __init__(self, breakers: CarrierBreakers, carrier: str, operation: str):
+        self.breakers = breakers
+        self.carrier = carrier
+        self.operation = operation
+        self.probe = False
+
+    async def __aenter__(self) -> None:
+        self.probe = await self.breakers._before_call(self.carrier, self.operation)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.breakers._after_call(self.carrier, self.operation, self.probe, exc)
+
+
+def _decode(raw: Dict[Any, Any]) -> Dict[str, str]:
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in (raw or {}).items()
+    }
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    return float(value) if value else None
@@ -0,0 +1,205 @@
+"""
+Outbound carrier quotas
+Every call CarrierService makes to a carrier first takes a token from the
+carrier's bucket and a slot from its concurrency limit, both kept in Redis so
+the limits hold across every API and Celery worker. One Lua script refills
+the bucket from Redis' clock, takes the token and leases the slot; a lease
+expires after CARRIER_QUOTA_LEASE_SECONDS, so a worker that dies mid-call
+does not hold its slot forever.
+
+Quotes, labels and pickups are interactive; tracking is background and may
+not dip into the last CARRIER_QUOTA_INTERACTIVE_RESERVE of the bucket or the
+slots, so a tracking sweep leaves room for the quotes a customer is waiting
+on. A caller that finds no quota waits for it, up to
+CARRIER_QUOTA_INTERACTIVE_WAIT or CARRIER_QUOTA_BACKGROUND_WAIT, and then
+gets QuotaExceededError.
+"""
+
+import asyncio
+import math
+import os
+import time
+import uuid
+from typing import Dict, NamedTuple, Optional
+
+import redis.asyncio as redis
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..carriers.transport import get_redis
+from ..error_handlers import CarrierErrorType, CarrierException
+
+logger = structlog.get_logger()
+
+# Share of each carrier's tokens and slots only interactive calls may use
+CARRIER_QUOTA_INTERACTIVE_RESERVE = float(os.getenv("CARRIER_QUOTA_INTERACTIVE_RESERVE", "0.3"))
+CARRIER_QUOTA_INTERACTIVE_WAIT = float(os.getenv("CARRIER_QUOTA_INTERACTIVE_WAIT", "5"))
+CARRIER_QUOTA_BACKGROUND_WAIT = float(os.getenv("CARRIER_QUOTA_BACKGROUND_WAIT", "60"))
+CARRIER_QUOTA_LEASE_SECONDS = float(os.getenv("CARRIER_QUOTA_LEASE_SECONDS", "120"))
+# How long to wait before asking again when every concurrency slot is taken
+CARRIER_QUOTA_SLOT_POLL = float(os.getenv("CARRIER_QUOTA_SLOT_POLL", "0.05"))
+
+BACKGROUND_OPERATIONS = {"tracking"}
+
+
+class CarrierQuota(NamedTuple):
+    per_minute: int
+    burst: int
+    concurrency: int
+
+
+# Contractual limits per carrier; overridable with <CARRIER>_QUOTA_PER_MINUTE,
+# <CARRIER>_QUOTA_BURST and <CARRIER>_QUOTA_CONCURRENCY
+CARRIER_QUOTAS: Dict[str, CarrierQuota] = {
+    "DHL": CarrierQuota(300, 10, 10),
+    "FedEx": CarrierQuota(500, 15, 15),
+    "UPS": CarrierQuota(400, 10, 10),
+    "Servientrega": CarrierQuota(200, 5, 5),
+    "Interrapidisimo": CarrierQuota(300, 8, 8),
+}
+DEFAULT_QUOTA = CarrierQuota(300, 10, 10)
+
+# KEYS: bucket hash, in-flight lease zset; ARGV: tokens per second, capacity,
+# tokens that must stay in the bucket, slots usable, lease id, lease ms.
+# Returns {admitted, wait ms (-1: waiting for a slot), tokens left, in flight}.
+ACQUIRE = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local floor_tokens = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local in_flight = redis.call('ZCARD', KEYS[2])
+if tokens < floor_tokens + 1 then
+    return {0, math.ceil((floor_tokens + 1 - tokens) * 1000 / rate), tostring(tokens), in_flight}
+end
+if in_flight >= tonumber(ARGV[4]) then
+    return {0, -1, tostring(tokens), in_flight}
+end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[6]), ARGV[5])
+redis.call('PEXPIRE', KEYS[2], tonumber(ARGV[6]))
+return {1, 0, tostring(tokens), in_flight + 1}
+"""
+
+quota_utilisation = Gauge(
+    'carrier_quota_utilisation',
+    'Share of the carrier budget in use (rate: bucket drained, concurrency: slots taken)',
+    ['carrier', 'budget']
+)
+quota_wait = Histogram(
+    'carrier_quota_wait_seconds',
+    'Time carrier calls waited for quota',
+    ['carrier', 'priority'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+quota_rejections = Counter(
+    'carrier_quota_rejections_total',
+    'Carrier calls given up for lack of quota',
+    ['carrier', 'priority']
+)
+
+
+def carrier_quota(carrier: str) -> CarrierQuota:
+    default = CARRIER_QUOTAS.get(carrier, DEFAULT_QUOTA)
+    prefix = carrier.upper()
+    return CarrierQuota(
+        int(os.getenv(f"{prefix}_QUOTA_PER_MINUTE", str(default.per_minute))),
+        int(os.getenv(f"{prefix}_QUOTA_BURST", str(default.burst))),
+        int(os.getenv(f"{prefix}_QUOTA_CONCURRENCY", str(default.concurrency))),
+    )
+
+
+def priority_for(operation: str) -> str:
+    return "background" if operation in BACKGROUND_OPERATIONS else "interactive"
+
+
+class QuotaExceededError(CarrierException):
+    """Raised instead of calling a carrier whose quota stayed exhausted"""
+
+    def __init__(self, carrier: str, operation: str, retry_after: float):
+        super().__init__(
+            carrier,
+            CarrierErrorType.RATE_LIMIT,
+            f"{carrier} {operation} quota exhausted",
+            details={"operation": operation},
+            retry_after=max(1, math.ceil(retry_after))
+        )
+
+
+def _keys(carrier: str):
+    # The hash tag keeps both keys in one cluster slot
+    base = f"carrier:quota:{{{carrier.lower()}}}"
+    return [f"{base}:tokens", f"{base}:in_flight"]
+
+
+class CarrierQuotas:
+    """Redis-backed per-carrier token buckets and concurrency limits"""
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def acquire(self, carrier: str, operation: str) -> "_QuotaLease":
+        """``async with quotas.acquire(carrier, op):`` around one carrier call"""
+        return _QuotaLease(self, getattr(carrier, "value", carrier), operation)
+
+    async def _acquire(self, carrier: str, operation: str) -> Optional[str]:
+        """Wait for a token and a slot; returns the lease id (None if Redis is down)"""
+        priority = priority_for(operation)
+        quota = carrier_quota(carrier)
+        reserve = CARRIER_QUOTA_INTERACTIVE_RESERVE if priority == "background" else 0.0
+        floor_tokens = quota.burst * reserve
+        # The reserve is rounded up, so every carrier keeps at least its share for interactive calls
+        slots = max(1, quota.concurrency - math.ceil(quota.concurrency * reserve - 1e-9))
+        lease = f"{self.worker_id}:{uuid.uuid4().hex[:12]}"
+        args = [quota.per_minute / 60, quota.burst, floor_tokens, slots, lease, int(CARRIER_QUOTA_LEASE_SECONDS * 1000)]
+        max_wait = CARRIER_QUOTA_BACKGROUND_WAIT if priority == "background" else CARRIER_QUOTA_INTERACTIVE_WAIT
+        started = time.monotonic()
+
+        while True:
+            try:
+                admitted, wait_ms, tokens, in_flight = await get_redis().eval(ACQUIRE, 2, *_keys(carrier), *args)
+            except redis.RedisError as e:
+                logger.warning("Carrier quota unavailable, allowing call", carrier=carrier, error=str(e))
+                return None
+
+            quota_utilisation.labels(carrier=carrier, budget="rate").set(1 - float(tokens) / quota.burst)
+            quota_utilisation.labels(carrier=carrier, budget="concurrency").set(int(in_flight) / quota.concurrency)
+            waited = time.monotonic() - started
+            if admitted:
+                quota_wait.labels(carrier=carrier, priority=priority).observe(waited)
+                return lease
+
+            delay = CARRIER_QUOTA_SLOT_POLL if wait_ms < 0 else wait_ms / 1000
+            if waited + delay > max_wait:
+                quota_rejections.labels(carrier=carrier, priority=priority).inc()
+                logger.warning("Carrier quota exhausted", carrier=carrier, operation=operation, waited=round(waited, 3))
+                raise QuotaExceededError(carrier, operation, delay)
+            await asyncio.sleep(delay)
+
+    async def _release(self, carrier: str, lease: str) -> None:
+        try:
+            await get_redis().zrem(_keys(carrier)[1], lease)
+        except redis.RedisError as e:
+            logger.warning("Failed to release carrier quota slot", carrier=carrier, error=str(e))
+
+
+class _QuotaLease:
+    def __init__(self, quotas: CarrierQuotas, carrier: str, operation: str):
+        self.quotas = quotas
+        self.carrier = carrier
+        self.operation = operation
+        self.lease: Optional[str] = None
+
+    async def __aenter__(self) -> None:
+        self.lease = await self.quotas._acquire(self.carrier, self.operation)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self.lease is not None:
+            await self.quotas._release(self.carrier, self.lease)
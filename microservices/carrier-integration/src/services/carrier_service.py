@@ -1,9 +1,10 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 import asyncio
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 import structlog
 from sqlalchemy.orm import Session
-from circuitbreaker import circuit
 from ..models import CarrierCredential, CarrierHealthStatus, CarrierType, ServiceStatus
 from ..carriers.dhl import DHLClient
 from ..carriers.fedex import FedExClient
@@ -13,23 +14,60 @@ from ..carriers.interrapidisimo import InterrapidisimoClient
 from ..carriers.pasarex import PasarexClient
 from ..carriers.aeropost import AeropostClient
 from ..carriers.pickit import PickitClient
+from ..carriers.coordinadora import CoordinadoraClient
+from ..carriers.deprisa import DeprisaClient
 from ..schemas import (
-    QuoteRequest, QuoteResponse,
+    QuoteRequest, QuoteResponse, BestQuoteResponse,
     LabelRequest, LabelResponse,
     TrackingResponse,
     PickupRequest, PickupResponse,
     CarrierCredentialCreate
 )
 from ..utils.encryption import encrypt_credentials, decrypt_credentials
+from .quote_orchestrator import QuoteOrchestrator
+from .quote_cache import QuoteCache
+from .api_call_log import api_call_log
+from .carrier_health import CarrierBreakers, OPERATIONS
+from .carrier_quota import CarrierQuotas
 
 logger = structlog.get_logger()
 
+# HTTP method recorded in api_call_logs for each carrier operation
+OPERATION_METHODS = {"quote": "POST", "label": "POST", "tracking": "GET", "pickup": "POST"}
+
 class CarrierService:
     """Service to manage all carrier integrations"""
     
     def __init__(self):
         self.carriers = {}
-        self.health_status = {}
+        self.breakers = CarrierBreakers()
+        self.quotas = CarrierQuotas()
+        self.quote_orchestrator = QuoteOrchestrator(self)
+        self.quote_cache = QuoteCache()
+        
+    @asynccontextmanager
+    async def _carrier_call(self, carrier: str, operation: str) -> AsyncIterator[None]:
+        """The carrier's shared quota, then the breaker, around one carrier call
+
+        Quota is taken before the breaker admits the call: a half-open probe that
+        waited for quota (up to CARRIER_QUOTA_BACKGROUND_WAIT) could outlive its
+        BREAKER_PROBE_TIMEOUT lock and let a second worker probe alongside it.
+        An open breaker is still rejected up front, without waiting for quota.
+        """
+        self.breakers.reject_if_open(carrier, operation)
+        async with self.quotas.acquire(carrier, operation), self.breakers.guard(carrier, operation):
+            started = time.monotonic()
+            try:
+                yield
+            except Exception as e:
+                api_call_log.record(
+                    carrier, operation, OPERATION_METHODS[operation], (time.monotonic() - started) * 1000,
+                    error_message=str(e), level="error"
+                )
+                raise
+            api_call_log.record(
+                carrier, operation, OPERATION_METHODS[operation], (time.monotonic() - started) * 1000, status_code=200
+            )
         
     async def initialize_carrier(self, carrier: str, credentials: Dict[str, Any] = None, environment: str = None):
         """Initialize a carrier client with credentials or environment variables"""
@@ -42,7 +80,8 @@ class CarrierService:
             elif carrier == "UPS":
                 client = UPSClient(credentials, environment)
             elif carrier == "Servientrega":
-                client = ServientregaClient(credentials, environment)
+                # Loading the WSDL blocks, so build the SOAP client off the event loop
+                client = await asyncio.to_thread(ServientregaClient, credentials, environment)
             elif carrier == "Interrapidisimo":
                 client = InterrapidisimoClient(credentials, environment)
             elif carrier == "Pasarex":
@@ -51,6 +90,10 @@ class CarrierService:
                 client = AeropostClient(credentials, environment)
             elif carrier == "Pickit":
                 client = PickitClient()
+            elif carrier == "Coordinadora":
+                client = CoordinadoraClient(credentials, environment)
+            elif carrier == "Deprisa":
+                client = DeprisaClient(credentials, environment)
             else:
                 raise ValueError(f"Unsupported carrier: {carrier}")
 
@@ -62,110 +105,80 @@ class CarrierService:
             logger.error("Failed to initialize carrier", carrier=carrier, error=str(e))
             raise
     
-    @circuit(failure_threshold=5, recovery_timeout=60)
-    async def get_quote(self, carrier: str, request: QuoteRequest) -> QuoteResponse:
-        """Get quote from specific carrier with circuit breaker"""
+    async def get_quote(self, carrier: str, request: QuoteRequest, coalesce: bool = True) -> QuoteResponse:
+        """Get quote from specific carrier, served from the quote cache when possible"""
         if carrier not in self.carriers:
             raise ValueError(f"Carrier {carrier} not initialized")
         
-        try:
-            client = self.carriers[carrier]
-            quote = await client.get_quote(request)
-            
-            # Update health status
-            await self._update_health_status(carrier, True)
-            
-            return quote
-            
-        except Exception as e:
-            # Update health status
-            await self._update_health_status(carrier, False, str(e))
-            raise
+        return await self.quote_cache.get_or_fetch(
+            carrier, request, lambda: self._fetch_quote(carrier, request),
+            bypass=request.firm_quote, coalesce=coalesce
+        )
     
-    async def get_best_quote(self, request: QuoteRequest) -> QuoteResponse:
-        """Get best quote from all available carriers"""
-        quotes = []
-        
-        # Get quotes from all carriers in parallel
-        tasks = []
-        for carrier in self.carriers:
-            if self._is_carrier_healthy(carrier):
-                tasks.append(self._get_quote_safe(carrier, request))
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Filter successful quotes
-        for result in results:
-            if isinstance(result, QuoteResponse):
-                quotes.append(result)
-        
-        if not quotes:
-            raise Exception("No carriers available for quote")
-        
-        # Return cheapest quote
-        return min(quotes, key=lambda q: q.amount)
+    async def _fetch_quote(self, carrier: str, request: QuoteRequest) -> QuoteResponse:
+        """Get a live quote from the carrier behind its quote circuit breaker"""
+        client = self.carriers[carrier]
+        async with self._carrier_call(carrier, "quote"):
+            started = time.monotonic()
+            quote = await client.get_quote(request)
+        # Only live calls feed the hedging percentiles, never cache hits
+        self.quote_orchestrator.latency.observe(carrier, time.monotonic() - started)
+        return quote
     
-    async def _get_quote_safe(self, carrier: str, request: QuoteRequest) -> Optional[QuoteResponse]:
-        """Get quote with error handling"""
-        try:
-            return await self.get_quote(carrier, request)
-        except Exception as e:
-            logger.warning("Failed to get quote from carrier", carrier=carrier, error=str(e))
-            return None
+    async def get_best_quote(
+        self,
+        request: QuoteRequest,
+        deadline: Optional[float] = None,
+        quorum: Optional[int] = None
+    ) -> BestQuoteResponse:
+        """Get the best quote the healthy carriers return within ``deadline`` seconds"""
+        carriers = [carrier for carrier in self.carriers if self.breakers.is_available(carrier, "quote")]
+        return await self.quote_orchestrator.best_quote(request, carriers, deadline=deadline, quorum=quorum)
     
-    @circuit(failure_threshold=5, recovery_timeout=60)
     async def generate_label(self, carrier: str, request: LabelRequest) -> LabelResponse:
         """Generate label with specific carrier"""
         if carrier not in self.carriers:
             raise ValueError(f"Carrier {carrier} not initialized")
         
-        try:
-            client = self.carriers[carrier]
-            label = await client.generate_label(request)
-            
-            await self._update_health_status(carrier, True)
-            
-            return label
-            
-        except Exception as e:
-            await self._update_health_status(carrier, False, str(e))
-            raise
+        async with self._carrier_call(carrier, "label"):
+            return await self.carriers[carrier].generate_label(request)
     
-    @circuit(failure_threshold=5, recovery_timeout=60)
     async def track_shipment(self, carrier: str, tracking_number: str) -> TrackingResponse:
         """Track shipment with specific carrier"""
         if carrier not in self.carriers:
             raise ValueError(f"Carrier {carrier} not initialized")
         
-        try:
-            client = self.carriers[carrier]
-            tracking = await client.track_shipment(tracking_number)
-            
-            await self._update_health_status(carrier, True)
-            
-            return tracking
-            
-        except Exception as e:
-            await self._update_health_status(carrier, False, str(e))
-            raise
+        async with self._carrier_call(carrier, "tracking"):
+            return await self.carriers[carrier].track_shipment(tracking_number)
+    
+    async def track_shipments(self, carrier: str, tracking_numbers: List[str]) -> Dict[str, Any]:
+        """Track several shipments of one carrier.
+
+        Uses the carrier's multi-tracking request when it has one, otherwise one
+        call per number. Returns {tracking_number: TrackingResponse or Exception};
+        numbers the carrier did not report on are left out.
+        """
+        if carrier not in self.carriers:
+            raise ValueError(f"Carrier {carrier} not initialized")
+        
+        client = self.carriers[carrier]
+        if hasattr(client, "track_shipments"):
+            async with self._carrier_call(carrier, "tracking"):
+                return await client.track_shipments(tracking_numbers)
+        
+        results = await asyncio.gather(
+            *(self.track_shipment(carrier, number) for number in tracking_numbers),
+            return_exceptions=True
+        )
+        return dict(zip(tracking_numbers, results))
     
-    @circuit(failure_threshold=5, recovery_timeout=60)
     async def schedule_pickup(self, carrier: str, request: PickupRequest) -> PickupResponse:
         """Schedule pickup with specific carrier"""
         if carrier not in self.carriers:
             raise ValueError(f"Carrier {carrier} not initialized")
         
-        try:
-            client = self.carriers[carrier]
-            pickup = await client.schedule_pickup(request)
-            
-            await self._update_health_status(carrier, True)
-            
-            return pickup
-            
-        except Exception as e:
-            await self._update_health_status(carrier, False, str(e))
-            raise
+        async with self._carrier_call(carrier, "pickup"):
+            return await self.carriers[carrier].schedule_pickup(request)
     
     async def validate_credentials(self, carrier: str, credentials: CarrierCredentialCreate) -> bool:
         """Validate carrier credentials"""
@@ -178,9 +191,13 @@ class CarrierService:
             elif carrier == "UPS":
                 client = UPSClient(credentials.credentials, credentials.environment)
             elif carrier == "Servientrega":
-                client = ServientregaClient(credentials.credentials, credentials.environment)
+                client = await asyncio.to_thread(ServientregaClient, credentials.credentials, credentials.environment)
             elif carrier == "Interrapidisimo":
                 client = InterrapidisimoClient(credentials.credentials, credentials.environment)
+            elif carrier == "Coordinadora":
+                client = CoordinadoraClient(credentials.credentials, credentials.environment)
+            elif carrier == "Deprisa":
+                client = DeprisaClient(credentials.credentials, credentials.environment)
             else:
                 return False
             
@@ -219,49 +236,35 @@ class CarrierService:
             raise
     
     async def get_health_status(self, carrier: str) -> Dict[str, Any]:
-        """Get health status for a carrier"""
-        if carrier not in self.health_status:
-            return {
-                "carrier": carrier,
-                "status": "unknown",
-                "message": "No health data available"
-            }
-        
-        return self.health_status[carrier]
+        """Get health status for a carrier from its shared circuit breakers"""
+        return (await self.get_all_health_status([carrier]))[carrier]
     
-    def _is_carrier_healthy(self, carrier: str) -> bool:
-        """Check if carrier is healthy"""
-        if carrier not in self.health_status:
-            return True  # Assume healthy if no data
+    async def get_all_health_status(self, carriers: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Breaker state per operation plus quote latency for every (or the given) carrier"""
+        carriers = carriers or list(self.carriers)
+        breakers = await self.breakers.describe(carriers)
+        latency = self.quote_orchestrator.latency.snapshot()
         
-        status = self.health_status[carrier]
-        return status.get("status") != ServiceStatus.DOWN
-    
-    async def _update_health_status(self, carrier: str, success: bool, error: Optional[str] = None):
-        """Update carrier health status"""
-        if carrier not in self.health_status:
-            self.health_status[carrier] = {
+        health = {}
+        for carrier in carriers:
+            operations = breakers[carrier]
+            open_count = sum(1 for op in operations.values() if op["state"] != "closed")
+            if open_count == 0:
+                status = ServiceStatus.OPERATIONAL
+            elif open_count == len(OPERATIONS):
+                status = ServiceStatus.DOWN
+            else:
+                status = ServiceStatus.DEGRADED
+            successes = [op["last_success"] for op in operations.values() if op["last_success"]]
+            quote_latency = latency.get(carrier, {})
+            health[carrier] = {
                 "carrier": carrier,
-                "status": ServiceStatus.OPERATIONAL,
-                "consecutive_failures": 0,
-                "last_check": datetime.now(),
-                "last_success": datetime.now() if success else None
+                "initialized": carrier in self.carriers,
+                "status": status.value,
+                "circuit_breaker_open": operations["quote"]["state"] != "closed",
+                "latency_ms": quote_latency["p50"] * 1000 if quote_latency.get("p50") is not None else None,
+                "quote_latency": quote_latency or None,
+                "last_success": datetime.fromtimestamp(max(successes)) if successes else None,
+                "operations": operations
             }
-        
-        status = self.health_status[carrier]
-        status["last_check"] = datetime.now()
-        
-        if success:
-            status["status"] = ServiceStatus.OPERATIONAL
-            status["consecutive_failures"] = 0
-            status["last_success"] = datetime.now()
-        else:
-            status["consecutive_failures"] += 1
-            
-            if status["consecutive_failures"] >= 5:
-                status["status"] = ServiceStatus.DOWN
-            elif status["consecutive_failures"] >= 3:
-                status["status"] = ServiceStatus.DEGRADED
-            
-            if error:
-                status["last_error"] = error
\ No newline at end of file
+        return health
@@ -0,0 +1,209 @@
+"""
+Carrier daily statistics
+carrier_daily_stats holds one row per day and carrier, route_daily_stats one
+per day and quoted route. Writers add to them in the transaction that stores
+the labels, quotes or tracking events (INSERT ... ON CONFLICT DO UPDATE
+adding to the counters, dated with the database's current_date like the
+created_at columns), so the daily report reads a few dozen rows instead of
+scanning the day's shipments. recompute_daily_stats rebuilds a day from the
+source tables with GROUP BY queries.
+"""
+
+from collections import Counter as Tally, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+import structlog
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import CarrierDailyStats, CarrierType, RouteDailyStats, ShippingLabel, ShippingQuote, TrackingEvent
+
+logger = structlog.get_logger()
+
+CARRIER_COUNTERS = (
+    "labels_generated", "quotes_generated", "quote_amount",
+    "tracking_events", "delivered", "in_transit", "exceptions",
+)
+ROUTE_COUNTERS = ("quotes", "quote_amount")
+
+# Tracking event statuses counted by the report (compared lower-cased)
+REPORT_STATUSES = {
+    "delivered": ("delivered", "entregado"),
+    "in_transit": ("in transit", "en transito"),
+    "exceptions": ("exception", "failed"),
+}
+TOP_ROUTES = 10
+
+
+def _add(db, model, key_columns: Tuple[str, ...], counter_columns: Tuple[str, ...], increments: Dict[Tuple, Dict[str, float]], stat_date=None) -> None:
+    if not increments:
+        return
+    # Rows are locked in key order, so concurrent writers cannot deadlock
+    rows = [
+        {
+            "stat_date": stat_date if stat_date is not None else func.current_date(),
+            **dict(zip(key_columns, key)),
+            **{column: counters.get(column, 0) for column in counter_columns},
+        }
+        for key, counters in sorted(increments.items(), key=lambda item: [str(part) for part in item[0]])
+    ]
+    statement = insert(model).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["stat_date", *key_columns],
+        set_={
+            **{column: model.__table__.c[column] + statement.excluded[column] for column in counter_columns},
+            "updated_at": func.now(),
+        }
+    )
+    db.execute(statement)
+
+
+def record_labels(db, carriers: Iterable[CarrierType]) -> None:
+    """Count labels created in the caller's transaction"""
+    tally = Tally(carriers)
+    _add(db, CarrierDailyStats, ("carrier",), CARRIER_COUNTERS, {
+        (carrier,): {"labels_generated": count} for carrier, count in tally.items()
+    })
+
+
+def record_quote(db, carrier: CarrierType, amount: float, origin_city: str, destination_city: str) -> None:
+    """Count a quote stored in the caller's transaction"""
+    _add(db, CarrierDailyStats, ("carrier",), CARRIER_COUNTERS, {
+        (carrier,): {"quotes_generated": 1, "quote_amount": amount}
+    })
+    _add(db, RouteDailyStats, ("origin_city", "destination_city"), ROUTE_COUNTERS, {
+        (origin_city, destination_city): {"quotes": 1, "quote_amount": amount}
+    })
+
+
+def record_tracking_events(db, rows: Iterable[Dict[str, Any]]) -> None:
+    """Count tracking event rows inserted in the caller's transaction"""
+    increments: Dict[Tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        counters = increments[(row["carrier"],)]
+        counters["tracking_events"] += 1
+        status = (row["status"] or "").lower()
+        for column, statuses in REPORT_STATUSES.items():
+            if status in statuses:
+                counters[column] += 1
+    _add(db, CarrierDailyStats, ("carrier",), CARRIER_COUNTERS, increments)
+
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def recompute_daily_stats(db, day: date) -> Dict[str, int]:
+    """Rebuild one day's rows from the source tables; the caller commits
+
+    Meant for closed days and repairs: rows written while it runs for the
+    current day may be counted by the increments and the recount alike.
+    """
+    start, end = _day_bounds(day)
+    db.execute(delete(CarrierDailyStats).where(CarrierDailyStats.stat_date == day))
+    db.execute(delete(RouteDailyStats).where(RouteDailyStats.stat_date == day))
+
+    increments: Dict[Tuple, Dict[str, float]] = defaultdict(dict)
+    labels = db.execute(
+        select(ShippingLabel.carrier, func.count())
+        .where(ShippingLabel.created_at >= start, ShippingLabel.created_at < end)
+        .group_by(ShippingLabel.carrier)
+    )
+    for carrier, count in labels:
+        increments[(carrier,)]["labels_generated"] = count
+
+    quotes = db.execute(
+        select(ShippingQuote.carrier, func.count(), func.coalesce(func.sum(ShippingQuote.amount), 0))
+        .where(ShippingQuote.created_at >= start, ShippingQuote.created_at < end)
+        .group_by(ShippingQuote.carrier)
+    )
+    for carrier, count, amount in quotes:
+        increments[(carrier,)].update(quotes_generated=count, quote_amount=amount)
+
+    status = func.lower(TrackingEvent.status)
+    events = db.execute(
+        select(
+            TrackingEvent.carrier,
+            func.count(),
+            *(func.count().filter(status.in_(statuses)) for statuses in REPORT_STATUSES.values())
+        )
+        .where(TrackingEvent.created_at >= start, TrackingEvent.created_at < end)
+        .group_by(TrackingEvent.carrier)
+    )
+    for carrier, count, *by_status in events:
+        increments[(carrier,)]["tracking_events"] = count
+        increments[(carrier,)].update(zip(REPORT_STATUSES, by_status))
+
+    _add(db, CarrierDailyStats, ("carrier",), CARRIER_COUNTERS, increments, stat_date=day)
+
+    route_rows = db.execute(
+        select(
+            ShippingQuote.origin_city,
+            ShippingQuote.destination_city,
+            func.count(),
+            func.coalesce(func.sum(ShippingQuote.amount), 0)
+        )
+        .where(ShippingQuote.created_at >= start, ShippingQuote.created_at < end)
+        .group_by(ShippingQuote.origin_city, ShippingQuote.destination_city)
+    )
+    routes = {
+        (origin, destination): {"quotes": count, "quote_amount": amount}
+        for origin, destination, count, amount in route_rows
+    }
+    _add(db, RouteDailyStats, ("origin_city", "destination_city"), ROUTE_COUNTERS, routes, stat_date=day)
+
+    logger.info("Carrier daily stats recomputed", date=day.isoformat(), carriers=len(increments), routes=len(routes))
+    return {"carriers": len(increments), "routes": len(routes)}
+
+
+def build_daily_report(db, day: date) -> Dict[str, Any]:
+    """The daily report, read from the rollup tables"""
+    stats = {row.carrier: row for row in db.scalars(select(CarrierDailyStats).where(CarrierDailyStats.stat_date == day))}
+
+    carrier_stats = {}
+    for carrier in CarrierType:
+        row = stats.get(carrier)
+        quotes = row.quotes_generated if row else 0
+        amount = row.quote_amount if row else 0
+        carrier_stats[carrier.value] = {
+            'labels_generated': row.labels_generated if row else 0,
+            'quotes_generated': quotes,
+            'total_value': amount,
+            'avg_quote_value': amount / quotes if quotes else 0
+        }
+
+    def total(column: str) -> int:
+        return sum(getattr(row, column) for row in stats.values())
+
+    routes = db.scalars(
+        select(RouteDailyStats)
+        .where(RouteDailyStats.stat_date == day)
+        .order_by(RouteDailyStats.quotes.desc())
+        .limit(TOP_ROUTES)
+    )
+    top_routes: List[Dict[str, Any]] = [
+        {
+            'route': f"{route.origin_city}-{route.destination_city}",
+            'count': route.quotes,
+            'total_value': route.quote_amount,
+            'avg_value': route.quote_amount / route.quotes if route.quotes else 0
+        }
+        for route in routes
+    ]
+
+    return {
+        'date': day.isoformat(),
+        'summary': {
+            'total_labels': total("labels_generated"),
+            'total_quotes': total("quotes_generated"),
+            'total_tracking_events': total("tracking_events"),
+            'delivered': total("delivered"),
+            'in_transit': total("in_transit"),
+            'exceptions': total("exceptions")
+        },
+        'carrier_breakdown': carrier_stats,
+        'top_routes': top_routes,
+        'generated_at': datetime.now().isoformat()
+    }
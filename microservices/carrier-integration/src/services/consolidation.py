@@ -0,0 +1,234 @@
+"""
+Package consolidation planner
+Groups each customer's arrived mailbox packages into consolidated boxes and
+prices every box against the carrier's dimensional-weight tariff: a box is
+billed on the larger of its actual and volumetric weight, rounded up to a
+whole pound, plus a handling fee per shipment.
+
+Grouping is a two-dimensional bin-packing problem (weight and volume per
+box). Packages are taken largest first and put into the open box where
+adding them saves the most, or into a new box when no box can take them at
+a saving; a box is closed as soon as the smallest package left no longer
+fits it, and only the CONSOLIDATION_OPEN_BOXES newest boxes stay open so a
+customer with thousands of packages is still planned in linear time.
+Arrived packages are read joined to their mailbox in one query, ordered by
+customer and carrier, and planned one customer at a time.
+"""
+
+import itertools
+import math
+import os
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import structlog
+from sqlalchemy.orm import Session
+
+from ..models import CarrierType, InternationalMailbox, PackagePrealert
+
+logger = structlog.get_logger()
+
+# Largest box the warehouse builds
+CONSOLIDATION_MAX_WEIGHT_LB = float(os.getenv("CONSOLIDATION_MAX_WEIGHT_LB", "110"))
+CONSOLIDATION_MAX_VOLUME_IN3 = float(os.getenv("CONSOLIDATION_MAX_VOLUME_IN3", "20000"))
+# Share of a consolidated box filled by the repacked contents
+CONSOLIDATION_FILL_RATIO = float(os.getenv("CONSOLIDATION_FILL_RATIO", "0.85"))
+# Boxes still open for more packages; older (fuller) boxes are closed first
+CONSOLIDATION_OPEN_BOXES = int(os.getenv("CONSOLIDATION_OPEN_BOXES", "16"))
+CONSOLIDATION_FETCH_SIZE = int(os.getenv("CONSOLIDATION_FETCH_SIZE", "5000"))
+
+
+class Tariff(NamedTuple):
+    rate_per_lb: float
+    dim_divisor: float  # cubic inches per volumetric pound
+    handling_fee: float  # USD per shipment
+    min_billable_lb: float = 1.0
+
+
+# The carriers' published per-pound rates; handling fees are the COP fees of the
+# import cost fallbacks at their 4200 COP/USD rate
+TARIFFS = {
+    CarrierType.PASAREX: Tariff(rate_per_lb=8.50, dim_divisor=166, handling_fee=11.90),
+    CarrierType.AEROPOST: Tariff(rate_per_lb=7.50, dim_divisor=166, handling_fee=8.33),
+}
+
+
+class PackageSize(NamedTuple):
+    package_id: str
+    weight_lb: float
+    volume_in3: float
+
+
+class ConsolidationGroup(NamedTuple):
+    package_ids: List[str]
+    weight_lb: float
+    volumetric_weight_lb: float
+    billable_weight_lb: float
+    cost_usd: float
+    savings_usd: float
+
+
+class ConsolidationPlan(NamedTuple):
+    customer_id: str
+    carrier: CarrierType
+    packages: int
+    groups: List[ConsolidationGroup]  # boxes of two or more packages
+    individual_cost_usd: float
+    consolidated_cost_usd: float
+
+    @property
+    def savings_usd(self) -> float:
+        return round(self.individual_cost_usd - self.consolidated_cost_usd, 2)
+
+
+def package_volume(dimensions: Optional[Dict[str, Any]]) -> float:
+    """Cubic inches from a prealert's {length, width, height}; 0 when unknown"""
+    if not dimensions:
+        return 0.0
+    try:
+        volume = float(dimensions["length"]) * float(dimensions["width"]) * float(dimensions["height"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+    return max(volume, 0.0)
+
+
+def billable_weight(tariff: Tariff, weight_lb: float, volume_in3: float) -> float:
+    return max(tariff.min_billable_lb, float(math.ceil(max(weight_lb, volume_in3 / tariff.dim_divisor) - 1e-9)))
+
+
+def shipping_cost(tariff: Tariff, weight_lb: float, volume_in3: float) -> float:
+    return tariff.handling_fee + tariff.rate_per_lb * billable_weight(tariff, weight_lb, volume_in3)
+
+
+class _Box:
+    __slots__ = ("packages", "weight", "volume", "cost")
+
+    def __init__(self, tariff: Tariff, package: PackageSize):
+        self.packages = [package]
+        self.weight = package.weight_lb
+        self.volume = package.volume_in3
+        self.cost = shipping_cost(tariff, self.weight, self.volume)
+
+
+def _box_volume(volume: float, count: int) -> float:
+    # A single package ships in its own box; repacked contents never fill a box
+    return volume if count == 1 else volume / CONSOLIDATION_FILL_RATIO
+
+
+def price_group(tariff: Tariff, packages: List[PackageSize]) -> ConsolidationGroup:
+    """Price packages shipped together in one box against shipping each alone"""
+    weight = sum(p.weight_lb for p in packages)
+    volume = _box_volume(sum(p.volume_in3 for p in packages), len(packages))
+    cost = shipping_cost(tariff, weight, volume)
+    return ConsolidationGroup(
+        package_ids=[p.package_id for p in packages],
+        weight_lb=round(weight, 2),
+        volumetric_weight_lb=round(volume / tariff.dim_divisor, 2),
+        billable_weight_lb=billable_weight(tariff, weight, volume),
+        cost_usd=round(cost, 2),
+        savings_usd=round(sum(shipping_cost(tariff, p.weight_lb, p.volume_in3) for p in packages) - cost, 2),
+    )
+
+
+def plan_consolidation(
+    tariff: Tariff,
+    packages: Iterable[PackageSize],
+    max_weight_lb: float = CONSOLIDATION_MAX_WEIGHT_LB,
+    max_volume_in3: float = CONSOLIDATION_MAX_VOLUME_IN3,
+) -> Tuple[List[ConsolidationGroup], float, float]:
+    """Pack one customer's packages for one carrier
+
+    Returns the boxes of two or more packages, the cost of shipping every
+    package on its own and the cost of the plan (single packages included).
+    """
+    packages = list(packages)
+    individual = sum(shipping_cost(tariff, p.weight_lb, p.volume_in3) for p in packages)
+
+    fits, alone = [], []
+    for package in packages:
+        if package.weight_lb <= max_weight_lb and package.volume_in3 / CONSOLIDATION_FILL_RATIO <= max_volume_in3:
+            fits.append(package)
+        else:
+            alone.append(package)
+    fits.sort(key=lambda p: max(p.weight_lb / max_weight_lb, p.volume_in3 / max_volume_in3), reverse=True)
+
+    # Smallest weight and volume among the packages still to place, for closing boxes
+    min_weight = [math.inf] * (len(fits) + 1)
+    min_volume = [math.inf] * (len(fits) + 1)
+    for i in range(len(fits) - 1, -1, -1):
+        min_weight[i] = min(min_weight[i + 1], fits[i].weight_lb)
+        min_volume[i] = min(min_volume[i + 1], fits[i].volume_in3)
+
+    open_boxes: List[_Box] = []
+    boxes: List[_Box] = []
+    for i, package in enumerate(fits):
+        package_cost = shipping_cost(tariff, package.weight_lb, package.volume_in3)
+        best, best_cost, best_saving = None, 0.0, 0.0
+        for box in open_boxes:
+            weight = box.weight + package.weight_lb
+            volume = _box_volume(box.volume + package.volume_in3, len(box.packages) + 1)
+            if weight > max_weight_lb or volume > max_volume_in3:
+                continue
+            cost = shipping_cost(tariff, weight, volume)
+            saving = box.cost + package_cost - cost
+            if saving > best_saving + 1e-9:
+                best, best_cost, best_saving = box, cost, saving
+
+        if best is None:
+            best = _Box(tariff, package)
+            open_boxes.append(best)
+            boxes.append(best)
+            if len(open_boxes) > CONSOLIDATION_OPEN_BOXES:
+                open_boxes.pop(0)
+        else:
+            best.packages.append(package)
+            best.weight += package.weight_lb
+            best.volume += package.volume_in3
+            best.cost = best_cost
+
+        # Packages only get smaller from here; drop boxes none of them fits in
+        open_boxes = [
+            box for box in open_boxes
+            if box.weight + min_weight[i + 1] <= max_weight_lb
+            and _box_volume(box.volume + min_volume[i + 1], len(box.packages) + 1) <= max_volume_in3
+        ]
+
+    groups = []
+    consolidated = sum(shipping_cost(tariff, p.weight_lb, p.volume_in3) for p in alone)
+    for box in boxes:
+        consolidated += box.cost
+        if len(box.packages) >= 2:
+            groups.append(price_group(tariff, box.packages))
+    return groups, round(individual, 2), round(consolidated, 2)
+
+
+def arrived_packages(db: Session):
+    """Arrived packages with their customer, ordered by customer and carrier"""
+    return db.query(
+        InternationalMailbox.customer_id,
+        PackagePrealert.carrier,
+        PackagePrealert.tracking_number,
+        PackagePrealert.weight_lb,
+        PackagePrealert.dimensions,
+    ).join(
+        InternationalMailbox, InternationalMailbox.mailbox_id == PackagePrealert.mailbox_id
+    ).filter(
+        PackagePrealert.status == "arrived",
+        PackagePrealert.arrived_at.isnot(None)
+    ).order_by(
+        InternationalMailbox.customer_id, PackagePrealert.carrier
+    ).yield_per(CONSOLIDATION_FETCH_SIZE)
+
+
+def plan_arrived_packages(db: Session) -> Iterator[ConsolidationPlan]:
+    """One plan per customer and carrier with arrived packages"""
+    for (customer_id, carrier), rows in itertools.groupby(arrived_packages(db), key=lambda row: (row[0], row[1])):
+        packages = [
+            PackageSize(tracking_number, float(weight_lb or 0), package_volume(dimensions))
+            for _, _, tracking_number, weight_lb, dimensions in rows
+        ]
+        tariff = TARIFFS.get(carrier)
+        if tariff is None:
+            logger.warning("No consolidation tariff for carrier", carrier=str(carrier), customer_id=customer_id)
+            continue
+        groups, individual, consolidated = plan_consolidation(tariff, packages)
+        yield ConsolidationPlan(customer_id, carrier, len(packages), groups, individual, consolidated)
@@ -0,0 +1,263 @@
+"""
+Content-addressed label storage
+Label documents (PDF, ZPL, PNG...) are written once under their SHA-256
+digest, and shipping_labels rows keep only the digest, size and content type.
+Identical labels (reprints, retries) share one blob. The filesystem backend
+is the default; S3BlobBackend talks to any S3-compatible service (requires
+boto3).
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import structlog
+from prometheus_client import Counter
+
+logger = structlog.get_logger()
+
+LABEL_STORE_BACKEND = os.getenv("LABEL_STORE_BACKEND", "filesystem")
+LABEL_STORE_PATH = os.getenv("LABEL_STORE_PATH", "/var/lib/carrier-integration/labels")
+LABEL_S3_BUCKET = os.getenv("LABEL_S3_BUCKET")
+LABEL_S3_PREFIX = os.getenv("LABEL_S3_PREFIX", "labels/")
+LABEL_S3_ENDPOINT_URL = os.getenv("LABEL_S3_ENDPOINT_URL")
+CHUNK_SIZE = 64 * 1024
+
+label_store_writes = Counter(
+    'label_store_writes_total',
+    'Label blobs offered to the store by result (stored, deduplicated)',
+    ['result']
+)
+label_store_bytes = Counter(
+    'label_store_bytes_written_total',
+    'Label bytes written to the blob store'
+)
+
+
+@dataclass
+class StoredLabel:
+    digest: str
+    size: int
+    content_type: str
+
+
+def detect_content_type(data: bytes) -> str:
+    """Label format from its leading bytes"""
+    head = data[:16].lstrip()
+    if head.startswith(b"%PDF"):
+        return "application/pdf"
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"GIF8"):
+        return "image/gif"
+    if head.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if head.startswith(b"^XA") or head.startswith(b"~"):
+        return "application/x-zpl"
+    return "application/octet-stream"
+
+
+class BlobBackend:
+    """Where label bytes live; blobs are immutable and addressed by digest"""
+
+    def exists(self, digest: str) -> bool:
+        raise NotImplementedError
+
+    def write(self, digest: str, data: bytes, content_type: str) -> None:
+        raise NotImplementedError
+
+    def size(self, digest: str) -> int:
+        raise NotImplementedError
+
+    def iter_range(self, digest: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Bytes ``start`` to ``end`` inclusive"""
+        raise NotImplementedError
+
+    def local_path(self, digest: str) -> Optional[str]:
+        """Filesystem path when the blob can be sent straight from disk"""
+        return None
+
+    def delete(self, digest: str) -> None:
+        raise NotImplementedError
+
+
+class FilesystemBlobBackend(BlobBackend):
+    def __init__(self, root: str = LABEL_STORE_PATH):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def write(self, digest: str, data: bytes, content_type: str) -> None:
+        path = self._path(digest)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename, so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def adopt(self, digest: str, temp_path: str) -> None:
+        """Move a file already written on the same filesystem into place as ``digest``"""
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self._path(digest))
+
+    def iter_range(self, digest: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self._path(digest), "rb") as handle:
+            handle.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = handle.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def local_path(self, digest: str) -> Optional[str]:
+        return self._path(digest)
+
+    def delete(self, digest: str) -> None:
+        try:
+            os.unlink(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobBackend(BlobBackend):
+    def __init__(self, bucket: str = LABEL_S3_BUCKET, prefix: str = LABEL_S3_PREFIX, endpoint_url: str = LABEL_S3_ENDPOINT_URL):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("LABEL_STORE_BACKEND=s3 requires boto3") from e
+        if not bucket:
+            raise RuntimeError("LABEL_S3_BUCKET is not set")
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}{digest[:2]}/{digest}"
+
+    def _head(self, digest: str) -> Optional[dict]:
+        try:
+            return self._client.head_object(Bucket=self.bucket, Key=self._key(digest))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, digest: str) -> bool:
+        return self._head(digest) is not None
+
+    def write(self, digest: str, data: bytes, content_type: str) -> None:
+        self._client.put_object(Bucket=self.bucket, Key=self._key(digest), Body=data, ContentType=content_type)
+
+    def size(self, digest: str) -> int:
+        head = self._head(digest)
+        if head is None:
+            raise FileNotFoundError(digest)
+        return head["ContentLength"]
+
+    def iter_range(self, digest: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        response = self._client.get_object(Bucket=self.bucket, Key=self._key(digest), Range=f"bytes={start}-{end}")
+        yield from response["Body"].iter_chunks(chunk_size)
+
+    def delete(self, digest: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self._key(digest))
+
+
+class LabelStore:
+    """Writes label documents once per content digest"""
+
+    def __init__(self, backend: BlobBackend):
+        self.backend = backend
+
+    def put(self, data: bytes, content_type: Optional[str] = None) -> StoredLabel:
+        digest = hashlib.sha256(data).hexdigest()
+        content_type = content_type or detect_content_type(data)
+        if self.backend.exists(digest):
+            label_store_writes.labels(result="deduplicated").inc()
+        else:
+            self.backend.write(digest, data, content_type)
+            label_store_writes.labels(result="stored").inc()
+            label_store_bytes.inc(len(data))
+        return StoredLabel(digest=digest, size=len(data), content_type=content_type)
+
+    def put_base64(self, encoded: str) -> StoredLabel:
+        """Store a label as returned by the carrier clients (base64 text)"""
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Label data is not valid base64: {e}") from e
+        return self.put(data)
+
+    def put_label(self, label_data: str) -> StoredLabel:
+        """Store label data from a carrier, as raw text when it is not strict base64"""
+        try:
+            return self.put_base64(label_data)
+        except ValueError as e:
+            # Some carriers answer with the document itself (ZPL, EPL) instead of base64
+            logger.warning("Label data is not base64, storing it as sent", error=str(e))
+            return self.put(label_data.encode())
+
+
+def decode_label_data(label_data: str) -> bytes:
+    """Document bytes of carrier label data: strict base64, or the document itself (ZPL, EPL)"""
+    try:
+        return base64.b64decode(label_data, validate=True)
+    except (binascii.Error, ValueError):
+        return label_data.encode()
+
+
+_store: Optional[LabelStore] = None
+
+
+def get_label_store() -> LabelStore:
+    global _store
+    if _store is None:
+        if LABEL_STORE_BACKEND == "s3":
+            backend: BlobBackend = S3BlobBackend()
+        elif LABEL_STORE_BACKEND == "filesystem":
+            backend = FilesystemBlobBackend()
+        else:
+            raise RuntimeError(f"Unknown LABEL_STORE_BACKEND: {LABEL_STORE_BACKEND}")
+        _store = LabelStore(backend)
+    return _store
+
+
+def store_issued_label(label_data: Optional[str]) -> Optional[StoredLabel]:
+    """Store a label the carrier has already issued; never raises
+
+    The shipment exists at the carrier by now, so failing the caller would
+    only create a duplicate shipment on retry. Returns None when there is no
+    label or the store is unavailable; the caller then keeps label_data on
+    the row and migrate_label_blobs moves it later.
+    """
+    if not label_data:
+        return None
+    try:
+        return get_label_store().put_label(label_data)
+    except Exception as e:
+        logger.error("Failed to store label, keeping it on the row", error=str(e))
+        return None
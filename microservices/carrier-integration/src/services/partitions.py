@@ -0,0 +1,155 @@
+"""
+Range partition maintenance
+Shared by the tables that are range-partitioned by a timestamp column, one
+partition per period (a month for tracking_events, a day for api_call_logs)
+plus a default partition that catches rows dated outside every range.
+Partitions are created a few periods ahead; retention detaches and drops
+whole periods instead of deleting rows.
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import structlog
+from sqlalchemy import text
+
+logger = structlog.get_logger()
+
+_BOUNDS = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+class Partition(NamedTuple):
+    name: str
+    lower: Optional[datetime]  # None for MINVALUE
+    upper: Optional[datetime]  # None for MAXVALUE
+    is_default: bool
+
+
+class PartitionScheme(NamedTuple):
+    parent: str
+    default_partition: str
+    key_column: str
+    period_start: Callable[[datetime], datetime]  # start of the period a moment falls in
+    step: Callable[[datetime, int], datetime]  # period start moved by n periods
+    name_format: str  # strftime suffix of the partition names
+
+    def partition_name(self, start: datetime) -> str:
+        return f"{self.parent}_p{start:{self.name_format}}"
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def list_partitions(conn, parent: str) -> List[Partition]:
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+        ORDER BY c.relname
+    """), {"parent": parent})
+
+    partitions = []
+    for name, bound in rows:
+        if bound == "DEFAULT":
+            partitions.append(Partition(name, None, None, True))
+            continue
+        match = _BOUNDS.search(bound)
+        if match:
+            partitions.append(Partition(name, _parse_bound(match.group(1)), _parse_bound(match.group(2)), False))
+    return partitions
+
+
+def _covers(partition: Partition, moment: datetime) -> bool:
+    return (
+        not partition.is_default
+        and (partition.lower is None or partition.lower <= moment)
+        and (partition.upper is None or moment < partition.upper)
+    )
+
+
+def ensure_partitions(engine, scheme: PartitionScheme, periods_ahead: int, now: Optional[datetime] = None) -> List[str]:
+    """Create the partitions from the current period to ``periods_ahead`` periods out"""
+    first = scheme.period_start(now or datetime.now())
+    created = []
+    with engine.begin() as conn:
+        partitions = list_partitions(conn, scheme.parent)
+        has_default = any(p.is_default for p in partitions)
+        for offset in range(periods_ahead + 1):
+            start = scheme.step(first, offset)
+            if any(_covers(p, start) for p in partitions):
+                continue
+            end = scheme.step(start, 1)
+            name = scheme.partition_name(start)
+            conn.execute(text(f'CREATE TABLE "{name}" (LIKE {scheme.parent} INCLUDING DEFAULTS)'))
+            if has_default:
+                # Rows that landed in the default partition must move before the range can attach
+                conn.execute(text(f"""
+                    WITH moved AS (
+                        DELETE FROM {scheme.default_partition}
+                        WHERE {scheme.key_column} >= :start AND {scheme.key_column} < :end
+                        RETURNING *
+                    )
+                    INSERT INTO "{name}" SELECT * FROM moved
+                """), {"start": start, "end": end})
+            conn.execute(text(
+                f"ALTER TABLE {scheme.parent} ATTACH PARTITION \"{name}\" "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            partitions.append(Partition(name, start, end, False))
+            created.append(name)
+
+    if created:
+        logger.info("Partitions created", table=scheme.parent, partitions=created)
+    return created
+
+
+def drop_expired_partitions(
+    engine,
+    scheme: PartitionScheme,
+    days_to_keep: int,
+    lock_timeout: str,
+    now: Optional[datetime] = None
+) -> Dict[str, object]:
+    """Detach and drop every partition whose whole range is older than the retention window"""
+    cutoff = (now or datetime.now()) - timedelta(days=days_to_keep)
+    with engine.connect() as conn:
+        expired = [
+            p for p in list_partitions(conn, scheme.parent)
+            if not p.is_default and p.upper is not None and p.upper <= cutoff
+        ]
+
+    dropped, skipped = [], []
+    for partition in expired:
+        try:
+            # Detaching locks the parent briefly; give up rather than queue behind long queries
+            with engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+                conn.execute(text(f'ALTER TABLE {scheme.parent} DETACH PARTITION "{partition.name}"'))
+            # Detached, the table no longer locks the parent when it is dropped
+            with engine.begin() as conn:
+                conn.execute(text(f'DROP TABLE "{partition.name}"'))
+            dropped.append(partition.name)
+        except Exception as e:
+            logger.warning("Failed to drop partition", table=scheme.parent, partition=partition.name, error=str(e))
+            skipped.append(partition.name)
+
+    # Stray rows dated before the ranges are few; delete them in place
+    with engine.begin() as conn:
+        default_deleted = conn.execute(
+            text(f"DELETE FROM {scheme.default_partition} WHERE {scheme.key_column} < :cutoff"),
+            {"cutoff": cutoff}
+        ).rowcount
+
+    return {
+        "cutoff": cutoff.isoformat(),
+        "dropped": dropped,
+        "skipped": skipped,
+        "default_rows_deleted": default_deleted,
+    }
@@ -0,0 +1,207 @@
+"""
+Carrier quote cache
+Quotes are cached per carrier in Redis under a canonical key built from the
+route, banded package weight and dimensions, service type and customs flags,
+so repeated checkout quotes for the same lane are answered without calling
+the carrier. Each entry lives until the carrier's own valid_until (capped by
+QUOTE_CACHE_MAX_TTL). Identical requests that arrive while a carrier call is
+in flight wait for that call instead of starting another one.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import weakref
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import redis.asyncio as redis
+import structlog
+from prometheus_client import Counter
+
+from ..carriers.city_codes import normalize_city
+from ..carriers.transport import get_redis
+from ..schemas import QuoteRequest, QuoteResponse
+
+logger = structlog.get_logger()
+
+QUOTE_CACHE_ENABLED = os.getenv("QUOTE_CACHE_ENABLED", "true").lower() == "true"
+QUOTE_CACHE_MAX_TTL = int(os.getenv("QUOTE_CACHE_MAX_TTL", "3600"))
+# Band widths: quotes for packages inside the same band share a cache entry
+QUOTE_CACHE_WEIGHT_BAND_KG = float(os.getenv("QUOTE_CACHE_WEIGHT_BAND_KG", "0.5"))
+QUOTE_CACHE_DIMENSION_BAND_CM = float(os.getenv("QUOTE_CACHE_DIMENSION_BAND_CM", "5"))
+QUOTE_CACHE_VALUE_BAND = float(os.getenv("QUOTE_CACHE_VALUE_BAND", "50000"))
+
+KEY_VERSION = "v1"
+
+quote_cache_requests = Counter(
+    'carrier_quote_cache_requests_total',
+    'Quote cache lookups by result (hit, miss, coalesced, bypass, error)',
+    ['carrier', 'result']
+)
+quote_cache_saved_calls = Counter(
+    'carrier_quote_cache_saved_calls_total',
+    'Carrier quote calls avoided by the cache or by request coalescing',
+    ['carrier']
+)
+
+
+def _band(value: float, width: float) -> float:
+    """Upper edge of the band ``value`` falls in (carriers round weight up)"""
+    if not value or value <= 0:
+        return 0.0
+    return round(math.ceil(value / width - 1e-9) * width, 3)
+
+
+def _address_key(address) -> Dict[str, str]:
+    return {
+        "country": (address.country or "").strip().upper(),
+        "city": normalize_city(address.city),
+        "postal_code": "".join((address.postal_code or "").split()).upper(),
+    }
+
+
+def normalize_quote_request(request: QuoteRequest) -> Dict[str, Any]:
+    """Canonical form of the fields that determine a carrier's price"""
+    packages: List[List[float]] = []
+    for package in request.packages:
+        dimensions = sorted(
+            (_band(d, QUOTE_CACHE_DIMENSION_BAND_CM) for d in (package.length_cm, package.width_cm, package.height_cm)),
+            reverse=True
+        )
+        packages.append([_band(package.weight_kg, QUOTE_CACHE_WEIGHT_BAND_KG), *dimensions])
+    packages.sort()
+
+    declared = sum(p.declared_value or 0 for p in request.packages)
+    return {
+        "origin": _address_key(request.origin),
+        "destination": _address_key(request.destination),
+        "packages": packages,
+        "service_type": request.service_type.value if request.service_type else None,
+        "insurance": request.insurance_required,
+        "declared_value": _band(declared, QUOTE_CACHE_VALUE_BAND) if request.insurance_required else None,
+        "customs": request.customs_value is not None,
+        "customs_value": _band(request.customs_value, QUOTE_CACHE_VALUE_BAND) if request.customs_value else None,
+        "pickup_date": request.pickup_date.date().isoformat() if request.pickup_date else None,
+    }
+
+
+def quote_cache_key(carrier: str, request: QuoteRequest) -> str:
+    canonical = json.dumps(normalize_quote_request(request), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode()).hexdigest()[:32]
+    return f"carrier:quote:{KEY_VERSION}:{carrier.lower()}:{digest}"
+
+
+def _ttl(quote: QuoteResponse) -> int:
+    valid_until = quote.valid_until
+    now = datetime.now(timezone.utc) if valid_until.tzinfo else datetime.now()
+    return min(QUOTE_CACHE_MAX_TTL, int((valid_until - now).total_seconds()))
+
+
+class QuoteCache:
+    """Redis-backed per-carrier quote cache with in-process request coalescing"""
+
+    def __init__(self, enabled: bool = QUOTE_CACHE_ENABLED):
+        self.enabled = enabled
+        # In-flight carrier calls per event loop: {key: future}
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def get_or_fetch(
+        self,
+        carrier: str,
+        request: QuoteRequest,
+        fetch: Callable[[], Awaitable[QuoteResponse]],
+        bypass: bool = False,
+        coalesce: bool = True
+    ) -> QuoteResponse:
+        """Cached quote for ``request``, calling ``fetch`` at most once per key on a miss.
+
+        ``bypass`` skips the cached copy (firm quotes); ``coalesce=False`` makes
+        a live call even when an identical one is in flight (hedged requests).
+        """
+        if not self.enabled or bypass:
+            quote_cache_requests.labels(carrier=carrier, result="bypass").inc()
+            quote = await fetch()
+            # A firm quote is still the freshest price for the lane
+            await self._store(carrier, quote_cache_key(carrier, request), quote)
+            return quote
+
+        key = quote_cache_key(carrier, request)
+        cached = await self._load(carrier, key)
+        if cached is not None:
+            quote_cache_requests.labels(carrier=carrier, result="hit").inc()
+            quote_cache_saved_calls.labels(carrier=carrier).inc()
+            return cached
+
+        if not coalesce:
+            quote_cache_requests.labels(carrier=carrier, result="miss").inc()
+            quote = await fetch()
+            await self._store(carrier, key, quote)
+            return quote
+
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        future = inflight.get(key)
+        if future is not None:
+            quote_cache_requests.labels(carrier=carrier, result="coalesced").inc()
+            quote_cache_saved_calls.labels(carrier=carrier).inc()
+            try:
+                # shield: a cancelled waiter must not cancel the shared call
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The caller that owned the call was cancelled (e.g. its deadline passed)
+                return await fetch()
+
+        quote_cache_requests.labels(carrier=carrier, result="miss").inc()
+        future = inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            quote = await fetch()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody waited for is not logged
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(quote)
+            await self._store(carrier, key, quote)
+            return quote
+        finally:
+            inflight.pop(key, None)
+
+    async def invalidate(self, carrier: str, request: QuoteRequest) -> None:
+        try:
+            await get_redis().delete(quote_cache_key(carrier, request))
+        except redis.RedisError as e:
+            logger.warning("Failed to invalidate cached quote", carrier=carrier, error=str(e))
+
+    async def _load(self, carrier: str, key: str) -> Optional[QuoteResponse]:
+        try:
+            raw = await get_redis().get(key)
+        except redis.RedisError as e:
+            # The cache is an optimisation; never fail a quote because Redis is down
+            quote_cache_requests.labels(carrier=carrier, result="error").inc()
+            logger.warning("Quote cache unavailable", carrier=carrier, error=str(e))
+            return None
+        if not raw:
+            return None
+        try:
+            return QuoteResponse.model_validate_json(raw)
+        except ValueError:
+            return None
+
+    async def _store(self, carrier: str, key: str, quote: QuoteResponse) -> None:
+        ttl = _ttl(quote)
+        if ttl <= 0:
+            return
+        try:
+            await get_redis().set(key, quote.model_dump_json(), ex=ttl)
+        except redis.RedisError as e:
+            logger.warning("Failed to cache quote", carrier=carrier, error=str(e))
@@ -0,0 +1,201 @@
+"""
+Deadline-bounded best-quote fan-out
+Every healthy carrier is asked for a quote at once and the cheapest answer
+received before the deadline wins. The fan-out returns as soon as a quorum of
+carriers has answered, and carriers that are slower than their own recent
+latency percentile get a second (hedged) request, whichever answers first is
+used. Carriers still outstanding at return time are reported, not awaited.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import structlog
+from prometheus_client import Counter, Histogram
+
+from ..schemas import QuoteRequest, QuoteResponse, BestQuoteResponse
+
+logger = structlog.get_logger()
+
+QUOTE_DEADLINE_SECONDS = float(os.getenv("QUOTE_DEADLINE_SECONDS", "8"))
+QUOTE_QUORUM = int(os.getenv("QUOTE_QUORUM", "3"))
+# Hedge once a request is slower than this percentile of the carrier's recent latency
+QUOTE_HEDGE_PERCENTILE = float(os.getenv("QUOTE_HEDGE_PERCENTILE", "95"))
+# Samples needed before a carrier is hedged at all
+QUOTE_HEDGE_MIN_SAMPLES = int(os.getenv("QUOTE_HEDGE_MIN_SAMPLES", "20"))
+QUOTE_LATENCY_WINDOW = int(os.getenv("QUOTE_LATENCY_WINDOW", "200"))
+
+quote_fanout_duration = Histogram(
+    'carrier_quote_fanout_duration_seconds',
+    'Best-quote fan-out duration',
+    ['outcome'],
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0)
+)
+quote_carrier_outcomes = Counter(
+    'carrier_quote_outcomes_total',
+    'Per-carrier results of best-quote fan-outs',
+    ['carrier', 'outcome']
+)
+quote_hedges = Counter(
+    'carrier_quote_hedges_total',
+    'Hedged quote requests by which request answered first',
+    ['carrier', 'winner']
+)
+
+
+class LatencyTracker:
+    """Rolling window of recent quote latencies per carrier"""
+
+    def __init__(self, window: int = QUOTE_LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, carrier: str, seconds: float) -> None:
+        samples = self._samples.get(carrier)
+        if samples is None:
+            samples = self._samples[carrier] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, carrier: str, pct: float) -> Optional[float]:
+        samples = self._samples.get(carrier)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        # Nearest rank: the smallest sample with at least pct% of the samples at or below it
+        rank = math.ceil(pct * len(ordered) / 100 - 1e-9)
+        return ordered[min(len(ordered), max(rank, 1)) - 1]
+
+    def hedge_delay(self, carrier: str) -> Optional[float]:
+        """How long to wait before hedging a carrier, None if it has too little history"""
+        samples = self._samples.get(carrier)
+        if samples is None or len(samples) < QUOTE_HEDGE_MIN_SAMPLES:
+            return None
+        return self.percentile(carrier, QUOTE_HEDGE_PERCENTILE)
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return {
+            carrier: {
+                "samples": len(samples),
+                "p50": self.percentile(carrier, 50),
+                "p95": self.percentile(carrier, 95),
+                "p99": self.percentile(carrier, 99),
+            }
+            for carrier, samples in self._samples.items()
+        }
+
+
+class QuoteOrchestrator:
+    """Runs the best-quote fan-out for a CarrierService"""
+
+    def __init__(self, carrier_service, latency: Optional[LatencyTracker] = None, quorum: int = QUOTE_QUORUM):
+        self.carrier_service = carrier_service
+        self.latency = latency or LatencyTracker()
+        self.quorum = quorum
+
+    async def best_quote(
+        self,
+        request: QuoteRequest,
+        carriers: List[str],
+        deadline: Optional[float] = None,
+        quorum: Optional[int] = None
+    ) -> BestQuoteResponse:
+        """Cheapest quote among ``carriers`` received within ``deadline`` seconds"""
+        if not carriers:
+            raise Exception("No carriers available for quote")
+
+        deadline = QUOTE_DEADLINE_SECONDS if deadline is None else deadline
+        quorum = min(quorum or self.quorum, len(carriers))
+        started = time.monotonic()
+        ends_at = started + deadline
+
+        tasks = {asyncio.create_task(self._quote_carrier(carrier, request)): carrier for carrier in carriers}
+        pending = set(tasks)
+        quotes: List[QuoteResponse] = []
+        failed: List[str] = []
+
+        try:
+            while pending and len(quotes) < quorum:
+                remaining = ends_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    carrier = tasks[task]
+                    if task.exception() is None:
+                        quotes.append(task.result())
+                    else:
+                        failed.append(carrier)
+                        quote_carrier_outcomes.labels(carrier=carrier, outcome="error").inc()
+                        logger.warning("Failed to get quote from carrier", carrier=carrier, error=str(task.exception()))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        deadline_hit = bool(pending) and len(quotes) < quorum
+        outstanding = sorted(tasks[task] for task in pending)
+        for carrier in outstanding:
+            quote_carrier_outcomes.labels(carrier=carrier, outcome="timeout" if deadline_hit else "skipped").inc()
+
+        elapsed = time.monotonic() - started
+        if not quotes:
+            quote_fanout_duration.labels(outcome="no_quote").observe(elapsed)
+            raise Exception(
+                f"No carrier quoted within {deadline:.1f}s "
+                f"(failed: {', '.join(failed) or 'none'}; timed out: {', '.join(outstanding) or 'none'})"
+            )
+
+        best = min(quotes, key=lambda q: q.amount)
+        for quote in quotes:
+            quote_carrier_outcomes.labels(
+                carrier=_carrier_name(quote), outcome="won" if quote is best else "answered"
+            ).inc()
+        quote_fanout_duration.labels(outcome="deadline" if deadline_hit else "complete").observe(elapsed)
+
+        return BestQuoteResponse(
+            **best.model_dump(),
+            carriers_quoted=sorted(_carrier_name(q) for q in quotes),
+            carriers_failed=sorted(failed),
+            carriers_timed_out=outstanding if deadline_hit else [],
+            carriers_skipped=[] if deadline_hit else outstanding,
+            elapsed_ms=round(elapsed * 1000, 1)
+        )
+
+    async def _quote_carrier(self, carrier: str, request: QuoteRequest) -> QuoteResponse:
+        """One carrier's quote, hedged with a second request once it runs slow"""
+        primary = asyncio.create_task(self.carrier_service.get_quote(carrier, request))
+        delay = self.latency.hedge_delay(carrier)
+        if delay is None:
+            return await primary
+
+        attempts = {primary}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done:
+                return primary.result()
+
+            # The hedge must not coalesce onto the stalled request it is racing
+            hedge = asyncio.create_task(self.carrier_service.get_quote(carrier, request, coalesce=False))
+            attempts.add(hedge)
+            logger.debug("Hedging slow carrier quote", carrier=carrier, after_seconds=round(delay, 3))
+
+            error: Optional[BaseException] = None
+            while attempts:
+                done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        quote_hedges.labels(carrier=carrier, winner="hedge" if task is hedge else "primary").inc()
+                        return task.result()
+                    error = task.exception()
+            quote_hedges.labels(carrier=carrier, winner="none").inc()
+            raise error
+        finally:
+            for task in attempts:
+                task.cancel()
+
+
+def _carrier_name(quote: QuoteResponse) -> str:
+    return quote.carrier.value if hasattr(quote.carrier, "value") else str(quote.carrier)
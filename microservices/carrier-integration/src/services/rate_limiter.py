@@ -0,0 +1,196 @@
+"""
+API rate limiter
+Every limit (requests per period) is a GCRA window: Redis keeps one
+theoretical arrival time per client and window, and a single Lua script
+checks and advances all of a client's windows at once, so a request costs
+one EVALSHA instead of an INCR and EXPIRE per window, and there is no
+fixed-window edge where twice the limit gets through.
+
+Each process also reserves tokens in small batches and spends them locally:
+a client that keeps its batch busy gets a bigger one next time (up to a
+tenth of its tightest limit), one that lets a batch expire goes back to
+single tokens. Reserved tokens count against the client in Redis, so local
+spending can never exceed the limits; tokens left when a batch expires are
+simply lost. A denied client is remembered until its retry time, so blocked
+clients do not reach Redis either.
+"""
+
+import os
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import redis.asyncio as redis
+import structlog
+from prometheus_client import Counter
+
+from ..carriers.transport import get_redis
+
+logger = structlog.get_logger()
+
+# Largest token batch a process reserves for one client
+RATE_LIMIT_LOCAL_BATCH = int(os.getenv("RATE_LIMIT_LOCAL_BATCH", "20"))
+# How long reserved tokens may be spent locally
+RATE_LIMIT_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "1"))
+# Clients tracked locally before stale entries are dropped
+RATE_LIMIT_LOCAL_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_KEYS", "10000"))
+
+# KEYS: one theoretical arrival time per window; ARGV: now (ms), tokens wanted,
+# then emission interval and period (ms) per window. Grants as many of the
+# wanted tokens as every window allows and returns
+# {granted, remaining, retry_after_ms, reset_after_ms, binding window}.
+GCRA = """
+local now = tonumber(ARGV[1])
+local granted = tonumber(ARGV[2])
+local tats = {}
+for i = 1, #KEYS do
+    local emission = tonumber(ARGV[1 + 2 * i])
+    local period = tonumber(ARGV[2 + 2 * i])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[i]) or now), now)
+    tats[i] = tat
+    granted = math.min(granted, math.floor((now + period - tat) / emission))
+end
+if granted < 1 then
+    local binding, wait = 1, 0
+    for i = 1, #KEYS do
+        local until_free = tats[i] + tonumber(ARGV[1 + 2 * i]) - tonumber(ARGV[2 + 2 * i]) - now
+        if until_free > wait then
+            binding, wait = i, until_free
+        end
+    end
+    return {0, 0, wait, tats[binding] - now, binding}
+end
+local binding, remaining, reset = 1, -1, 0
+for i = 1, #KEYS do
+    local emission = tonumber(ARGV[1 + 2 * i])
+    local period = tonumber(ARGV[2 + 2 * i])
+    local tat = tats[i] + granted * emission
+    redis.call('SET', KEYS[i], tat, 'PX', math.ceil(tat - now))
+    local left = math.floor((now + period - tat) / emission)
+    if remaining < 0 or left < remaining then
+        binding, remaining, reset = i, left, tat - now
+    end
+end
+return {granted, remaining, 0, reset, binding}
+"""
+
+rate_limit_checks = Counter(
+    'rate_limit_checks_total',
+    'API rate limit decisions',
+    ['result', 'source']
+)
+
+
+class RateLimit(NamedTuple):
+    requests: int
+    period: int  # seconds
+
+    @property
+    def emission_ms(self) -> int:
+        """Milliseconds one request adds to the client's arrival time"""
+        return max(1, round(self.period * 1000 / self.requests))
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int          # requests of the window closest to running out
+    remaining: int
+    reset_after: float  # seconds until that window is full again
+    retry_after: float  # seconds until a denied client may retry
+    source: str         # "local" or "redis"
+
+
+@dataclass
+class _Lease:
+    tokens: int
+    expires_at: float
+    batch: int
+    limit: int
+    remaining: int
+    reset_at: float
+    blocked_until: float = 0.0
+
+
+class RateLimiter:
+    """GCRA limits shared through Redis, spent locally in reserved batches"""
+
+    def __init__(
+        self,
+        limits: Sequence[RateLimit],
+        prefix: str = "rate_limit",
+        get_client: Callable[[], redis.Redis] = get_redis,
+        local_batch: int = RATE_LIMIT_LOCAL_BATCH,
+        lease_seconds: float = RATE_LIMIT_LEASE_SECONDS
+    ):
+        self.limits: List[RateLimit] = sorted(limits, key=lambda limit: limit.period)
+        self.prefix = prefix
+        self.get_client = get_client
+        self.max_batch = max(1, min(local_batch, min(limit.requests for limit in self.limits) // 10))
+        self.lease_seconds = lease_seconds
+        self._leases: Dict[str, _Lease] = {}
+        self._scripts: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    async def check(self, key: str) -> Decision:
+        """Take one request from ``key``'s limits; Redis errors propagate"""
+        now = time.time()
+        lease = self._leases.get(key)
+        if lease is not None:
+            if lease.blocked_until > now:
+                return self._decide(lease, now, False, "local")
+            if lease.tokens > 0 and lease.expires_at > now:
+                lease.tokens -= 1
+                return self._decide(lease, now, True, "local")
+
+        batch = self._next_batch(lease)
+        granted, remaining, retry_ms, reset_ms, binding = await self._reserve(key, batch, now)
+        lease = _Lease(
+            tokens=max(0, granted - 1),
+            expires_at=now + self.lease_seconds,
+            batch=batch,
+            limit=self.limits[binding - 1].requests,
+            remaining=remaining,
+            reset_at=now + reset_ms / 1000,
+            blocked_until=now + retry_ms / 1000 if granted < 1 else 0.0,
+        )
+        self._store(key, lease)
+        return self._decide(lease, now, granted >= 1, "redis")
+
+    def _next_batch(self, lease: Optional[_Lease]) -> int:
+        if lease is None or lease.blocked_until:
+            return 1
+        if lease.tokens == 0:
+            return min(lease.batch * 2, self.max_batch)
+        # The last batch expired unspent
+        return max(1, lease.batch // 2)
+
+    async def _reserve(self, key: str, batch: int, now: float) -> List[int]:
+        client = self.get_client()
+        script = self._scripts.get(client)
+        if script is None:
+            # register_script runs EVALSHA and loads the script on NOSCRIPT
+            script = self._scripts[client] = client.register_script(GCRA)
+        args = [int(now * 1000), batch]
+        for limit in self.limits:
+            args += [limit.emission_ms, limit.period * 1000]
+        # The hash tag keeps a client's windows in one cluster slot
+        keys = [f"{self.prefix}:{{{key}}}:{limit.period}" for limit in self.limits]
+        return [int(value) for value in await script(keys=keys, args=args)]
+
+    def _store(self, key: str, lease: _Lease) -> None:
+        self._leases[key] = lease
+        if len(self._leases) > RATE_LIMIT_LOCAL_KEYS:
+            now = time.time()
+            for stale in [k for k, l in self._leases.items() if l.expires_at <= now and l.blocked_until <= now]:
+                del self._leases[stale]
+
+    def _decide(self, lease: _Lease, now: float, allowed: bool, source: str) -> Decision:
+        rate_limit_checks.labels(result="allowed" if allowed else "limited", source=source).inc()
+        return Decision(
+            allowed=allowed,
+            limit=lease.limit,
+            remaining=lease.remaining + lease.tokens if allowed else 0,
+            reset_after=max(0.0, lease.reset_at - now),
+            retry_after=0.0 if allowed else max(0.0, lease.blocked_until - now),
+            source=source,
+        )
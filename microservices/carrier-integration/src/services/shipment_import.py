@@ -0,0 +1,535 @@
+"""
+Streaming shipment CSV imports
+An upload is copied block by block into the import store (content-addressed
+files under IMPORT_STORE_PATH), scanned once to split it into chunks of
+IMPORT_CHUNK_ROWS records at record boundaries, and every chunk is read back
+from its byte offsets by its own task. Chunks are validated column by column;
+when the job processes its rows, labels are generated with a concurrency
+limit per carrier. Progress and per-row errors live in the
+shipment_import_* tables, and no step holds more than one chunk in memory.
+"""
+
+import asyncio
+import codecs
+import csv
+import hashlib
+import math
+import os
+import tempfile
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import structlog
+from prometheus_client import Counter
+from pydantic import ValidationError
+from sqlalchemy import and_, insert, or_, select, update
+
+from ..models import CarrierType, ShipmentImportChunk, ShipmentImportError, ShipmentImportJob
+from ..schemas import CarrierEnum, LabelRequest, ServiceTypeEnum
+from .label_store import FilesystemBlobBackend
+
+logger = structlog.get_logger()
+
+IMPORT_STORE_PATH = os.getenv("IMPORT_STORE_PATH", "/var/lib/carrier-integration/imports")
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "500"))
+IMPORT_CARRIER_CONCURRENCY = int(os.getenv("IMPORT_CARRIER_CONCURRENCY", "4"))
+# A record still open after this many bytes has an unterminated quoted field
+IMPORT_MAX_RECORD_BYTES = int(os.getenv("IMPORT_MAX_RECORD_BYTES", str(64 * 1024)))
+# A chunk left running this long belonged to a worker that died; it may be claimed again
+IMPORT_CHUNK_LEASE_SECONDS = int(os.getenv("IMPORT_CHUNK_LEASE_SECONDS", "3600"))
+COPY_BLOCK_SIZE = 1024 * 1024
+# Chunk rows inserted per statement while planning
+PLAN_INSERT_BATCH = 1000
+
+ADDRESS_FIELDS = ("street", "city", "state", "postal_code", "country", "contact_name", "contact_phone", "contact_email")
+REQUIRED_ADDRESS_FIELDS = ("street", "city", "postal_code", "country", "contact_name", "contact_phone")
+ADDRESS_PREFIXES = {"origin": "origin", "destination": "dest"}
+REQUIRED_COLUMNS = tuple(
+    f"{prefix}_{field}" for prefix in ADDRESS_PREFIXES.values() for field in REQUIRED_ADDRESS_FIELDS
+) + ("carrier", "order_id")
+# Package columns and the value used for an empty cell
+PACKAGE_DEFAULTS = {
+    "weight_kg": 1.0,
+    "length_cm": 10.0,
+    "width_cm": 10.0,
+    "height_cm": 10.0,
+    "declared_value": 0.0,
+}
+# Carriers a file may name: known to the API and storable in shipping_labels
+IMPORT_CARRIERS = {
+    carrier.value.lower(): carrier.value
+    for carrier in CarrierType
+    if carrier.value in {option.value for option in CarrierEnum}
+}
+SERVICE_TYPES = {option.value for option in ServiceTypeEnum}
+
+shipment_import_rows = Counter(
+    'shipment_import_rows_total',
+    'Shipment import rows by outcome (valid, invalid, label_created, label_failed)',
+    ['result']
+)
+
+
+class ImportFileError(ValueError):
+    """The file as a whole cannot be imported"""
+
+
+class RowError(NamedTuple):
+    row_number: int
+    field: Optional[str]
+    message: str
+
+
+class ChunkSpan(NamedTuple):
+    start: int
+    end: int
+    first_row: int  # File row number of the first record; the header is row 1
+    row_count: int  # Non-blank records
+
+
+def get_import_store() -> FilesystemBlobBackend:
+    return FilesystemBlobBackend(IMPORT_STORE_PATH)
+
+
+def store_upload(source: BinaryIO, backend: Optional[FilesystemBlobBackend] = None) -> Tuple[str, int]:
+    """Copy an upload into the import store in fixed-size blocks; returns (digest, size)"""
+    backend = backend or get_import_store()
+    os.makedirs(backend.root, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=backend.root, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            while True:
+                block = source.read(COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                size += len(block)
+                handle.write(block)
+            handle.flush()
+            os.fsync(handle.fileno())
+        backend.adopt(digest.hexdigest(), temp_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return digest.hexdigest(), size
+
+
+def _read_line(handle: BinaryIO, record_start: int, record_size: int) -> bytes:
+    line = handle.readline(IMPORT_MAX_RECORD_BYTES + 1)
+    if record_size + len(line) > IMPORT_MAX_RECORD_BYTES:
+        raise ImportFileError(
+            f"Record at byte {record_start} is longer than {IMPORT_MAX_RECORD_BYTES} bytes "
+            "(unterminated quoted field?)"
+        )
+    return line
+
+
+def iter_records(handle: BinaryIO, start: int, end: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, raw bytes) of every CSV record starting in [start, end)
+
+    A record runs over several lines while it holds an odd number of quote
+    characters, so quoted fields may contain line breaks.
+    """
+    handle.seek(start)
+    offset = start
+    while offset < end:
+        record = _read_line(handle, offset, 0)
+        if not record:
+            break
+        quotes = record.count(b'"')
+        while quotes % 2:
+            line = _read_line(handle, offset, len(record))
+            if not line:
+                break
+            record += line
+            quotes += line.count(b'"')
+        yield offset, record
+        offset += len(record)
+
+
+def parse_record(record: bytes) -> List[str]:
+    """Cells of one raw record; raises ValueError when it is not valid UTF-8 CSV"""
+    try:
+        text = record.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise ValueError(f"Row is not valid UTF-8: {e.reason} at byte {e.start}") from e
+    try:
+        rows = list(csv.reader([text]))
+    except csv.Error as e:
+        raise ValueError(f"Row is not valid CSV: {e}") from e
+    return rows[0] if rows else []
+
+
+def read_header(handle: BinaryIO) -> Tuple[List[str], int]:
+    """Normalized column names and the offset where data records start"""
+    first = next(iter_records(handle, 0, math.inf), None)
+    if first is None:
+        raise ImportFileError("File is empty")
+    _, record = first
+    data_start = len(record)
+    if record.startswith(codecs.BOM_UTF8):
+        record = record[len(codecs.BOM_UTF8):]
+    try:
+        header = [name.strip().lower() for name in parse_record(record)]
+    except ValueError as e:
+        raise ImportFileError(f"Invalid header: {e}") from e
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ImportFileError(f"Missing columns: {', '.join(missing)}")
+    return header, data_start
+
+
+def plan_chunks(handle: BinaryIO, data_start: int, chunk_rows: int = IMPORT_CHUNK_ROWS) -> Iterator[ChunkSpan]:
+    """Split the records after the header into spans of ``chunk_rows`` non-blank records"""
+    start = None
+    first_row = row = 2
+    count = 0
+    end = data_start
+    for offset, record in iter_records(handle, data_start, math.inf):
+        end = offset + len(record)
+        if record.strip():
+            if start is None:
+                start, first_row = offset, row
+            count += 1
+        row += 1
+        if count == chunk_rows:
+            yield ChunkSpan(start, end, first_row, count)
+            start, count = None, 0
+    if start is not None:
+        yield ChunkSpan(start, end, first_row, count)
+
+
+def read_chunk(handle: BinaryIO, start: int, end: int, first_row: int) -> Tuple[List[Tuple[int, List[str]]], List[RowError]]:
+    """(row number, cells) of the non-blank records in a span, and the rows that could not be parsed"""
+    rows, errors = [], []
+    row = first_row
+    for _, record in iter_records(handle, start, end):
+        if record.strip():
+            try:
+                rows.append((row, parse_record(record)))
+            except ValueError as e:
+                errors.append(RowError(row, None, str(e)))
+        row += 1
+    shipment_import_rows.labels(result="invalid").inc(len(errors))
+    return rows, errors
+
+
+def _to_float(value: str, default: float) -> Optional[float]:
+    if not value:
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def validate_chunk(header: List[str], rows: List[Tuple[int, List[str]]]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[RowError]]:
+    """Validate a chunk one column at a time
+
+    Returns (row number, label request data) for the valid rows and the errors
+    of the others, ordered by row.
+    """
+    width = len(header)
+    numbers = [number for number, _ in rows]
+    errors: Dict[int, List[RowError]] = defaultdict(list)
+
+    def fail(position: int, field: Optional[str], message: str) -> None:
+        errors[position].append(RowError(numbers[position], field, message))
+
+    for position, (_, cells) in enumerate(rows):
+        if len(cells) > width:
+            fail(position, None, f"Row has {len(cells)} fields, the header has {width}")
+
+    columns = {
+        name: [cells[index].strip() if index < len(cells) else "" for _, cells in rows]
+        for index, name in enumerate(header)
+    }
+    empty = [""] * len(rows)
+
+    def column(name: str) -> List[str]:
+        return columns.get(name, empty)
+
+    for name in REQUIRED_COLUMNS:
+        for position, value in enumerate(column(name)):
+            if not value:
+                fail(position, name, "is required")
+
+    packages: Dict[str, List[Optional[float]]] = {}
+    for name, default in PACKAGE_DEFAULTS.items():
+        values = [_to_float(value, default) for value in column(name)]
+        for position, value in enumerate(values):
+            if value is None:
+                fail(position, name, "is not a number")
+            elif name == "declared_value" and value < 0:
+                fail(position, name, "must not be negative")
+            elif name != "declared_value" and value <= 0:
+                fail(position, name, "must be greater than zero")
+        packages[name] = values
+
+    carriers = [IMPORT_CARRIERS.get(value.lower()) for value in column("carrier")]
+    for position, (value, carrier) in enumerate(zip(column("carrier"), carriers)):
+        if value and carrier is None:
+            fail(position, "carrier", f"unknown carrier '{value}'")
+
+    services = [value.lower() or "standard" for value in column("service_type")]
+    for position, service in enumerate(services):
+        if service not in SERVICE_TYPES:
+            fail(position, "service_type", f"unknown service type '{service}'")
+
+    currencies = [value.upper() or "USD" for value in column("currency")]
+    for position, currency in enumerate(currencies):
+        if len(currency) != 3 or not currency.isalpha():
+            fail(position, "currency", f"'{currency}' is not a currency code")
+
+    valid = []
+    for position, number in enumerate(numbers):
+        if position in errors:
+            continue
+        data = {
+            key: {
+                field: column(f"{prefix}_{field}")[position] or None
+                for field in ADDRESS_FIELDS
+            }
+            for key, prefix in ADDRESS_PREFIXES.items()
+        }
+        data.update({
+            'packages': [{
+                **{name: values[position] for name, values in packages.items()},
+                'currency': currencies[position]
+            }],
+            'service_type': services[position],
+            'carrier': carriers[position],
+            'order_id': column("order_id")[position]
+        })
+        try:
+            LabelRequest(**data)
+        except ValidationError as e:
+            for error in e.errors():
+                fail(position, ".".join(str(part) for part in error["loc"]), error["msg"])
+            continue
+        valid.append((number, data))
+
+    shipment_import_rows.labels(result="valid").inc(len(valid))
+    shipment_import_rows.labels(result="invalid").inc(len(errors))
+    return valid, [error for position in sorted(errors) for error in errors[position]]
+
+
+async def create_labels(
+    carrier_service,
+    shipments: List[Tuple[int, Dict[str, Any]]],
+    concurrency: Optional[Dict[str, int]] = None
+) -> List[Tuple[int, Dict[str, Any], Any]]:
+    """Generate a label per valid row with at most N requests in flight per carrier
+
+    Returns (row number, data, LabelResponse or the exception raised).
+    """
+    concurrency = concurrency or {}
+    semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def limit(carrier: str) -> int:
+        if carrier in concurrency:
+            return concurrency[carrier]
+        return int(os.getenv(f"{carrier.upper()}_IMPORT_CONCURRENCY", str(IMPORT_CARRIER_CONCURRENCY)))
+
+    async def create(number: int, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Any]:
+        carrier = data["carrier"]
+        if carrier not in semaphores:
+            semaphores[carrier] = asyncio.Semaphore(limit(carrier))
+        async with semaphores[carrier]:
+            try:
+                label = await carrier_service.generate_label(carrier, LabelRequest(**data))
+            except Exception as e:
+                shipment_import_rows.labels(result="label_failed").inc()
+                return number, data, e
+        shipment_import_rows.labels(result="label_created").inc()
+        return number, data, label
+
+    return list(await asyncio.gather(*(create(number, data) for number, data in shipments)))
+
+
+def create_import_job(db, digest: str, size: int, filename: Optional[str], auto_process: bool) -> ShipmentImportJob:
+    job = ShipmentImportJob(
+        id=str(uuid.uuid4()),
+        status="uploaded",
+        filename=filename,
+        file_digest=digest,
+        file_size=size,
+        auto_process=auto_process
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def plan_import(db, job: ShipmentImportJob, chunk_rows: int = IMPORT_CHUNK_ROWS) -> int:
+    """Record the chunk spans of an uploaded job; returns the number of chunks
+
+    Marks the job failed when the file cannot be imported at all.
+    """
+    path = get_import_store().local_path(job.file_digest)
+    chunks = rows = 0
+    batch: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        if batch:
+            db.execute(insert(ShipmentImportChunk), batch)
+            batch.clear()
+
+    try:
+        with open(path, "rb") as handle:
+            _, data_start = read_header(handle)
+            for span in plan_chunks(handle, data_start, chunk_rows):
+                batch.append({
+                    'job_id': job.id,
+                    'start_offset': span.start,
+                    'end_offset': span.end,
+                    'first_row': span.first_row,
+                    'row_count': span.row_count,
+                    'status': 'pending',
+                    'validated': False,
+                    'attempts': 0
+                })
+                chunks += 1
+                rows += span.row_count
+                if len(batch) >= PLAN_INSERT_BATCH:
+                    flush()
+        flush()
+    except (ImportFileError, OSError) as e:
+        db.rollback()
+        job.status = "failed"
+        job.error = str(e)
+        job.completed_at = datetime.now()
+        db.commit()
+        logger.warning("Shipment import rejected", job_id=job.id, error=str(e))
+        return 0
+
+    job.total_rows = rows
+    job.chunks_total = chunks
+    job.chunks_done = 0
+    if chunks == 0:
+        job.status = "completed"
+        job.completed_at = datetime.now()
+    else:
+        job.status = "processing" if job.auto_process else "validating"
+    db.commit()
+    return chunks
+
+
+def start_processing(db, job: ShipmentImportJob) -> None:
+    """Turn a validated job into one that generates labels for its valid rows"""
+    if job.status != "validated":
+        raise ValueError(f"Import job is {job.status}, only validated jobs can be processed")
+    db.execute(
+        update(ShipmentImportChunk)
+        .where(ShipmentImportChunk.job_id == job.id)
+        .values(status="pending", attempts=0, claimed_at=None)
+    )
+    job.status = "processing"
+    job.auto_process = True
+    job.chunks_done = 0
+    job.completed_at = None
+    db.commit()
+
+
+def iter_pending_chunks(db, job_id: str) -> Iterator[Tuple[int, int, int]]:
+    """(start, end, first row) of the chunks still to run, streamed from the database"""
+    query = (
+        select(ShipmentImportChunk.start_offset, ShipmentImportChunk.end_offset, ShipmentImportChunk.first_row)
+        .where(ShipmentImportChunk.job_id == job_id, ShipmentImportChunk.status == "pending")
+        .order_by(ShipmentImportChunk.start_offset)
+        .execution_options(yield_per=PLAN_INSERT_BATCH)
+    )
+    for start, end, first_row in db.execute(query):
+        yield start, end, first_row
+
+
+def claim_chunk(db, job_id: str, start_offset: int) -> Optional[ShipmentImportChunk]:
+    """Mark a chunk running; None when another task has it or it is done
+
+    Deliveries of the same chunk task (late acks, worker restarts) run it once.
+    """
+    now = datetime.now()
+    stale = now - timedelta(seconds=IMPORT_CHUNK_LEASE_SECONDS)
+    chunk_id = db.execute(
+        update(ShipmentImportChunk)
+        .where(
+            ShipmentImportChunk.job_id == job_id,
+            ShipmentImportChunk.start_offset == start_offset,
+            or_(
+                ShipmentImportChunk.status == "pending",
+                and_(ShipmentImportChunk.status == "running", ShipmentImportChunk.claimed_at < stale)
+            )
+        )
+        .values(status="running", claimed_at=now, attempts=ShipmentImportChunk.attempts + 1)
+        .returning(ShipmentImportChunk.id)
+    ).scalar()
+    db.commit()
+    return db.get(ShipmentImportChunk, chunk_id) if chunk_id is not None else None
+
+
+def release_chunk(db, chunk_id: int) -> None:
+    """Put a chunk whose task failed back to pending"""
+    db.execute(
+        update(ShipmentImportChunk)
+        .where(ShipmentImportChunk.id == chunk_id, ShipmentImportChunk.status == "running")
+        .values(status="pending", claimed_at=None)
+    )
+    db.commit()
+
+
+def finish_chunk(db, chunk: ShipmentImportChunk, errors: List[RowError], counters: Dict[str, int]) -> Optional[str]:
+    """Store a chunk's errors and counters; returns the job's final status once its last chunk is done"""
+    if errors:
+        db.execute(insert(ShipmentImportError), [
+            {'job_id': chunk.job_id, 'row_number': error.row_number, 'field': error.field, 'message': error.message[:2000]}
+            for error in errors
+        ])
+    chunk.status = "done"
+    # Counters are incremented in SQL, chunks of a job finish concurrently
+    values = {name: getattr(ShipmentImportJob, name) + amount for name, amount in counters.items() if amount}
+    values["chunks_done"] = ShipmentImportJob.chunks_done + 1
+    values["updated_at"] = datetime.now()
+    done, total, status = db.execute(
+        update(ShipmentImportJob)
+        .where(ShipmentImportJob.id == chunk.job_id)
+        .values(**values)
+        .returning(ShipmentImportJob.chunks_done, ShipmentImportJob.chunks_total, ShipmentImportJob.status)
+    ).one()
+
+    final = None
+    if done >= total and status in ("validating", "processing"):
+        final = "validated" if status == "validating" else "completed"
+        db.execute(
+            update(ShipmentImportJob)
+            .where(ShipmentImportJob.id == chunk.job_id)
+            .values(status=final, completed_at=datetime.now())
+        )
+    db.commit()
+    return final
+
+
+def job_summary(job: ShipmentImportJob) -> Dict[str, Any]:
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'filename': job.filename,
+        'file_size': job.file_size,
+        'auto_process': job.auto_process,
+        'total_rows': job.total_rows,
+        'chunks_total': job.chunks_total,
+        'chunks_done': job.chunks_done,
+        'progress': round(job.chunks_done / job.chunks_total, 4) if job.chunks_total else (1.0 if job.completed_at else 0.0),
+        'rows_valid': job.rows_valid,
+        'rows_invalid': job.rows_invalid,
+        'labels_created': job.labels_created,
+        'labels_failed': job.labels_failed,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+    }
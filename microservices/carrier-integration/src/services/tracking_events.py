@@ -0,0 +1,107 @@
+"""
+Tracking event writer
+Tracking events are identified by their natural key (tracking number,
+carrier, event timestamp, status). Batches are written with
+INSERT ... ON CONFLICT DO NOTHING RETURNING, so re-syncing a shipment,
+a redelivered webhook or two workers racing on the same shipment never
+duplicate an event, and callers learn which events are genuinely new.
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+from prometheus_client import Counter
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import CarrierType, TrackingEvent
+from .carrier_stats import record_tracking_events
+
+logger = structlog.get_logger()
+
+# Rows per INSERT statement (7 bind parameters per row, PostgreSQL allows 65535)
+TRACKING_EVENT_INSERT_CHUNK = int(os.getenv("TRACKING_EVENT_INSERT_CHUNK", "5000"))
+
+NATURAL_KEY_CONSTRAINT = "uq_tracking_events_natural_key"
+
+tracking_events_written = Counter(
+    'tracking_events_written_total',
+    'Tracking events offered to the writer by result (inserted, duplicate)',
+    ['result']
+)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # event_date is a timestamp without time zone; keep keys comparable across sources
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def event_row(
+    tracking_number: str,
+    carrier: CarrierType,
+    event_date: datetime,
+    status: str,
+    description: Optional[str] = None,
+    location: Optional[str] = None,
+    raw_data: Optional[Any] = None
+) -> Dict[str, Any]:
+    """A tracking_events row ready for insert_tracking_events"""
+    return {
+        "tracking_number": tracking_number,
+        "carrier": carrier,
+        "event_date": _naive_utc(event_date),
+        "status": status,
+        "description": description,
+        "location": location,
+        "raw_data": raw_data,
+    }
+
+
+def event_key(row: Dict[str, Any]) -> Tuple[str, CarrierType, datetime, str]:
+    return row["tracking_number"], row["carrier"], row["event_date"], row["status"]
+
+
+def insert_tracking_events(db, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert rows not stored yet and return them; the caller commits.
+
+    Rows repeated within the batch are sent once. The returned rows are the
+    input dicts of the events that were actually inserted, with their new id.
+    The carrier daily stats are updated in the same transaction.
+    """
+    unique: Dict[Tuple, Dict[str, Any]] = {}
+    offered = 0
+    for row in rows:
+        offered += 1
+        unique.setdefault(event_key(row), row)
+    if not unique:
+        return []
+
+    pending = list(unique.values())
+    inserted: List[Dict[str, Any]] = []
+    for start in range(0, len(pending), TRACKING_EVENT_INSERT_CHUNK):
+        chunk = pending[start:start + TRACKING_EVENT_INSERT_CHUNK]
+        statement = (
+            insert(TrackingEvent)
+            .values(chunk)
+            .on_conflict_do_nothing(constraint=NATURAL_KEY_CONSTRAINT)
+            .returning(
+                TrackingEvent.id,
+                TrackingEvent.tracking_number,
+                TrackingEvent.carrier,
+                TrackingEvent.event_date,
+                TrackingEvent.status
+            )
+        )
+        for event_id, tracking_number, carrier, event_date, status in db.execute(statement):
+            row = unique[(tracking_number, carrier, event_date, status)]
+            inserted.append({**row, "id": event_id})
+
+    if inserted:
+        record_tracking_events(db, inserted)
+
+    tracking_events_written.labels(result="inserted").inc(len(inserted))
+    tracking_events_written.labels(result="duplicate").inc(offered - len(inserted))
+    return inserted
@@ -0,0 +1,50 @@
+"""
+tracking_events partition maintenance
+tracking_events is range-partitioned by event_date, one partition per month
+(tracking_events_pYYYY_MM) plus a default partition that catches events
+dated outside every monthly range. Partitions are created a few months
+ahead; retention detaches and drops whole months instead of deleting rows.
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from . import partitions
+from .partitions import Partition, PartitionScheme
+
+PARENT_TABLE = "tracking_events"
+DEFAULT_PARTITION = "tracking_events_default"
+TRACKING_PARTITION_MONTHS_AHEAD = int(os.getenv("TRACKING_PARTITION_MONTHS_AHEAD", "3"))
+# Detaching locks the parent briefly; give up rather than queue behind long queries
+TRACKING_PARTITION_LOCK_TIMEOUT = os.getenv("TRACKING_PARTITION_LOCK_TIMEOUT", "5s")
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    years, index = divmod(month.month - 1 + months, 12)
+    return datetime(month.year + years, index + 1, 1)
+
+
+TRACKING_EVENTS = PartitionScheme(PARENT_TABLE, DEFAULT_PARTITION, "event_date", month_start, add_months, "%Y_%m")
+
+
+def partition_name(month: datetime) -> str:
+    return TRACKING_EVENTS.partition_name(month)
+
+
+def list_partitions(conn) -> List[Partition]:
+    return partitions.list_partitions(conn, PARENT_TABLE)
+
+
+def ensure_partitions(engine, months_ahead: int = TRACKING_PARTITION_MONTHS_AHEAD, now: Optional[datetime] = None) -> List[str]:
+    """Create the monthly partitions from the current month to ``months_ahead`` months out"""
+    return partitions.ensure_partitions(engine, TRACKING_EVENTS, months_ahead, now)
+
+
+def drop_expired_partitions(engine, days_to_keep: int, now: Optional[datetime] = None) -> Dict[str, object]:
+    """Detach and drop every monthly partition older than the retention window"""
+    return partitions.drop_expired_partitions(engine, TRACKING_EVENTS, days_to_keep, TRACKING_PARTITION_LOCK_TIMEOUT, now)
@@ -0,0 +1,347 @@
+"""
+Adaptive tracking poll scheduler
+Every active shipment has its own next-poll time in a Redis sorted set
+(member "carrier|tracking_number", score = due epoch), and each scheduler
+tick claims only the shipments that are due. The interval after a poll
+depends on the shipment's phase (from its latest status), the carrier's
+median gap between events in that phase over the last days, and whether the
+carrier's webhooks are currently arriving: a shipment out for delivery is
+polled often, one in customs or covered by webhooks rarely.
+
+Claimed shipments are leased rather than removed, so a shipment whose sync
+never finishes comes back after TRACKING_POLL_LEASE instead of being lost.
+Each further lease without a finished sync doubles, up to
+TRACKING_POLL_MAX_INTERVAL, and after TRACKING_POLL_MAX_LEASES of them the
+shipment is parked (score +inf): never claimed again, and not re-enrolled
+while it stays active. Each enrollment run prunes the members that are no
+longer active (cancelled, older than TRACKING_SYNC_DAYS, finished while a
+sync was failing), parked ones included.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as redis
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import text
+
+from ..carriers.transport import get_redis
+from ..models import CarrierType
+from ..schemas import TrackingResponse
+from .tracking_sync import EXCEPTION_STATUSES, ActiveShipment, is_terminal
+
+logger = structlog.get_logger()
+
+TRACKING_POLL_MIN_INTERVAL = int(os.getenv("TRACKING_POLL_MIN_INTERVAL", "900"))
+TRACKING_POLL_MAX_INTERVAL = int(os.getenv("TRACKING_POLL_MAX_INTERVAL", "86400"))
+# Poll after this fraction of the carrier's median gap between events in the phase
+TRACKING_POLL_GAP_FRACTION = float(os.getenv("TRACKING_POLL_GAP_FRACTION", "0.5"))
+# Interval multiplier for carriers whose webhooks are arriving
+TRACKING_WEBHOOK_POLL_FACTOR = float(os.getenv("TRACKING_WEBHOOK_POLL_FACTOR", "4"))
+# A carrier counts as webhook-backed while its last webhook is younger than this
+TRACKING_WEBHOOK_FRESHNESS = int(os.getenv("TRACKING_WEBHOOK_FRESHNESS", "21600"))
+TRACKING_POLL_LEASE = int(os.getenv("TRACKING_POLL_LEASE", "1800"))
+# Leases in a row without a finished sync before a shipment is parked (about five days)
+TRACKING_POLL_MAX_LEASES = int(os.getenv("TRACKING_POLL_MAX_LEASES", "10"))
+TRACKING_SCHEDULER_MAX_PER_TICK = int(os.getenv("TRACKING_SCHEDULER_MAX_PER_TICK", "5000"))
+TRACKING_CADENCE_DAYS = int(os.getenv("TRACKING_CADENCE_DAYS", "14"))
+TRACKING_CADENCE_MIN_SAMPLES = int(os.getenv("TRACKING_CADENCE_MIN_SAMPLES", "20"))
+# The fixed beat interval every shipment used to be polled at, for the savings metric
+LEGACY_POLL_INTERVAL = 1800
+# How long a process reuses the cadence and webhook tables read from Redis
+LOCAL_CACHE_SECONDS = 60
+
+SCHEDULE_KEY = "tracking:schedule"
+STATUS_KEY = "tracking:schedule:status"
+LEASES_KEY = "tracking:schedule:leases"
+CADENCE_KEY = "tracking:cadence"
+WEBHOOK_KEY = "tracking:webhooks"
+
+# Phase, status keywords (substring of the lower-cased status), default interval in seconds
+PHASES: List[Tuple[str, Tuple[str, ...], int]] = [
+    ("out_for_delivery", ("out for delivery", "en reparto", "en distribucion", "with delivery courier"), 1800),
+    ("exception", tuple(EXCEPTION_STATUSES) + ("hold", "retenido"), 3600),
+    ("customs", ("customs", "aduana", "clearance", "nacionalizacion"), 21600),
+    ("pre_transit", ("label created", "information received", "pre-transit", "admitid", "creado"), 21600),
+    ("in_transit", (), 10800),
+]
+PHASE_INTERVALS = {phase: interval for phase, _, interval in PHASES}
+# Raw status codes some carriers report instead of text
+CARRIER_PHASE_CODES = {
+    "FedEx": {"od": "out_for_delivery", "de": "exception", "se": "exception", "cd": "customs", "oc": "pre_transit"},
+    "UPS": {"x": "exception", "m": "pre_transit", "i": "in_transit", "p": "in_transit"},
+}
+
+CLAIM_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local claimed, parked = {}, {}
+for _, member in ipairs(due) do
+    local leases = redis.call('HINCRBY', KEYS[2], member, 1)
+    if leases > tonumber(ARGV[4]) then
+        redis.call('ZADD', KEYS[1], '+inf', member)
+        table.insert(parked, member)
+    else
+        local lease = math.min(tonumber(ARGV[5]), tonumber(ARGV[3]) * 2 ^ (leases - 1))
+        redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + lease, member)
+        table.insert(claimed, member)
+    end
+end
+return {claimed, parked}
+"""
+
+tracking_polls_scheduled = Counter(
+    'tracking_polls_scheduled_total',
+    'Tracking polls scheduled by the adaptive scheduler',
+    ['carrier', 'phase']
+)
+tracking_polls_avoided = Counter(
+    'tracking_polls_avoided_total',
+    'Polls avoided compared with polling every shipment every 30 minutes',
+    ['carrier']
+)
+tracking_detection_delay = Histogram(
+    'tracking_event_detection_delay_seconds',
+    'Time from a carrier event to the poll that stored it',
+    ['carrier'],
+    buckets=(300, 900, 1800, 3600, 7200, 14400, 28800, 86400, 172800)
+)
+tracking_polls_parked = Counter(
+    'tracking_polls_parked_total',
+    'Shipments parked after TRACKING_POLL_MAX_LEASES polls in a row without a finished sync'
+)
+tracking_polls_pruned = Counter(
+    'tracking_polls_pruned_total',
+    'Shipments removed from the poll schedule because they are no longer active'
+)
+tracking_poll_backlog = Gauge(
+    'tracking_poll_due_shipments',
+    'Shipments due for a poll at the last scheduler tick'
+)
+
+
+def _member(carrier: str, tracking_number: str) -> str:
+    return f"{carrier}|{tracking_number}"
+
+
+def _decode(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def phase_for(carrier: str, status: Optional[str]) -> str:
+    """Shipment phase used to pick its poll interval"""
+    if not status:
+        return "pre_transit"
+    status = status.strip().lower()
+    code_phase = CARRIER_PHASE_CODES.get(carrier, {}).get(status)
+    if code_phase:
+        return code_phase
+    for phase, keywords, _ in PHASES:
+        if any(keyword in status for keyword in keywords):
+            return phase
+    return "in_transit"
+
+
+def poll_interval(
+    carrier: str,
+    status: Optional[str],
+    cadence: Dict[str, float],
+    webhook_backed: bool = False
+) -> int:
+    """Seconds until a shipment in ``status`` should be polled again"""
+    phase = phase_for(carrier, status)
+    gap = cadence.get(f"{carrier}:{phase}")
+    interval = gap * TRACKING_POLL_GAP_FRACTION if gap else PHASE_INTERVALS[phase]
+    if webhook_backed:
+        interval *= TRACKING_WEBHOOK_POLL_FACTOR
+    return int(min(TRACKING_POLL_MAX_INTERVAL, max(TRACKING_POLL_MIN_INTERVAL, interval)))
+
+
+def compute_carrier_cadence(db, days: int = TRACKING_CADENCE_DAYS) -> Dict[str, float]:
+    """Median seconds from an event to the shipment's next event, per carrier and phase"""
+    rows = db.execute(text("""
+        SELECT carrier, lower(status) AS status, count(*) AS samples,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY gap) AS median_gap
+        FROM (
+            SELECT carrier, status,
+                   EXTRACT(EPOCH FROM lead(event_date) OVER (
+                       PARTITION BY tracking_number, carrier ORDER BY event_date
+                   ) - event_date) AS gap
+            FROM tracking_events
+            WHERE event_date >= :since
+        ) gaps
+        WHERE gap > 0
+        GROUP BY carrier, lower(status)
+    """), {"since": datetime.now() - timedelta(days=days)})
+
+    # Sample-weighted mean of the per-status medians within each phase
+    totals: Dict[str, List[float]] = {}
+    for carrier_name, status, samples, median_gap in rows:
+        carrier = CarrierType[carrier_name].value
+        key = f"{carrier}:{phase_for(carrier, status)}"
+        total = totals.setdefault(key, [0.0, 0])
+        total[0] += float(median_gap) * samples
+        total[1] += samples
+
+    return {
+        key: round(weighted / samples, 1)
+        for key, (weighted, samples) in totals.items()
+        if samples >= TRACKING_CADENCE_MIN_SAMPLES
+    }
+
+
+def observe_detection_delay(carrier: str, events: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> None:
+    """Record how long newly stored events waited to be picked up by a poll"""
+    now = now or datetime.utcnow()
+    for event in events:
+        delay = (now - event["event_date"]).total_seconds()
+        if delay >= 0:
+            tracking_detection_delay.labels(carrier=carrier).observe(delay)
+
+
+async def record_webhook(carrier: str) -> None:
+    """Mark the carrier's webhooks as live; never fails the webhook itself"""
+    try:
+        await get_redis().hset(WEBHOOK_KEY, carrier, time.time())
+    except redis.RedisError as e:
+        logger.warning("Failed to record webhook arrival", carrier=carrier, error=str(e))
+
+
+class TrackingPollScheduler:
+    """Per-shipment next-poll times in a Redis sorted set"""
+
+    def __init__(self):
+        self._cadence: Dict[str, float] = {}
+        self._cadence_loaded = 0.0
+        self._webhooks: Dict[str, float] = {}
+        self._webhooks_loaded = 0.0
+
+    async def enroll(self, shipments: Iterable[ActiveShipment], now: Optional[float] = None) -> int:
+        """Add shipments the schedule does not know yet, due immediately; returns how many were added"""
+        now = now or time.time()
+        client = get_redis()
+        items = [(_member(s.carrier, s.tracking_number), s.last_status) for s in shipments]
+        added = 0
+        for start in range(0, len(items), 1000):
+            chunk = items[start:start + 1000]
+            pipe = client.pipeline(transaction=False)
+            pipe.zadd(SCHEDULE_KEY, {member: now for member, _ in chunk}, nx=True)
+            for member, status in chunk:
+                if status:
+                    pipe.hsetnx(STATUS_KEY, member, status)
+            added += (await pipe.execute())[0]
+        return added
+
+    async def claim_due(self, limit: int = TRACKING_SCHEDULER_MAX_PER_TICK, now: Optional[float] = None) -> List[ActiveShipment]:
+        """Shipments due for a poll, leased so no other tick claims them meanwhile"""
+        now = now or time.time()
+        client = get_redis()
+        members, parked = await client.eval(
+            CLAIM_DUE, 2, SCHEDULE_KEY, LEASES_KEY,
+            now, limit, TRACKING_POLL_LEASE, TRACKING_POLL_MAX_LEASES, TRACKING_POLL_MAX_INTERVAL
+        )
+        members = [_decode(member) for member in members]
+        if parked:
+            tracking_polls_parked.inc(len(parked))
+            logger.warning("Tracking polls parked after repeated failed syncs",
+                           shipments=len(parked), sample=[_decode(member) for member in parked[:10]])
+        tracking_poll_backlog.set(await client.zcount(SCHEDULE_KEY, "-inf", now))
+        if not members:
+            return []
+
+        statuses = await client.hmget(STATUS_KEY, members)
+        shipments = []
+        for member, status in zip(members, statuses):
+            carrier, _, tracking_number = member.partition("|")
+            shipments.append(ActiveShipment(tracking_number, carrier, _decode(status)))
+        return shipments
+
+    async def reschedule(
+        self,
+        results: Iterable[Tuple[ActiveShipment, TrackingResponse]],
+        now: Optional[float] = None
+    ) -> Dict[str, int]:
+        """Set the next poll for freshly synced shipments and drop the finished ones"""
+        now = now or time.time()
+        cadence = await self._load_cadence()
+        webhook_backed = await self._webhook_carriers(now)
+        client = get_redis()
+        pipe = client.pipeline(transaction=False)
+        counts = {"scheduled": 0, "finished": 0}
+
+        for shipment, tracking in results:
+            member = _member(shipment.carrier, shipment.tracking_number)
+            pipe.hdel(LEASES_KEY, member)
+            if is_terminal(shipment.carrier, tracking.status):
+                pipe.zrem(SCHEDULE_KEY, member)
+                pipe.hdel(STATUS_KEY, member)
+                counts["finished"] += 1
+                continue
+
+            interval = poll_interval(shipment.carrier, tracking.status, cadence, shipment.carrier in webhook_backed)
+            pipe.zadd(SCHEDULE_KEY, {member: now + interval})
+            pipe.hset(STATUS_KEY, member, tracking.status)
+            counts["scheduled"] += 1
+            tracking_polls_scheduled.labels(
+                carrier=shipment.carrier, phase=phase_for(shipment.carrier, tracking.status)
+            ).inc()
+            tracking_polls_avoided.labels(carrier=shipment.carrier).inc(
+                max(0.0, interval / LEGACY_POLL_INTERVAL - 1)
+            )
+
+        if counts["scheduled"] or counts["finished"]:
+            await pipe.execute()
+        return counts
+
+    async def prune(self, active: Iterable[ActiveShipment]) -> int:
+        """Drop scheduled shipments that are not in ``active``; returns how many were dropped"""
+        keep = {_member(s.carrier, s.tracking_number) for s in active}
+        client = get_redis()
+        stale = [
+            member async for member, _ in client.zscan_iter(SCHEDULE_KEY, count=1000)
+            if _decode(member) not in keep
+        ]
+        for start in range(0, len(stale), 1000):
+            chunk = stale[start:start + 1000]
+            pipe = client.pipeline(transaction=False)
+            pipe.zrem(SCHEDULE_KEY, *chunk)
+            pipe.hdel(STATUS_KEY, *chunk)
+            pipe.hdel(LEASES_KEY, *chunk)
+            await pipe.execute()
+        tracking_polls_pruned.inc(len(stale))
+        return len(stale)
+
+    async def store_cadence(self, cadence: Dict[str, float]) -> None:
+        client = get_redis()
+        pipe = client.pipeline(transaction=True)
+        pipe.delete(CADENCE_KEY)
+        if cadence:
+            pipe.hset(CADENCE_KEY, mapping=cadence)
+        await pipe.execute()
+        self._cadence, self._cadence_loaded = dict(cadence), time.monotonic()
+
+    async def depth(self) -> Dict[str, int]:
+        client = get_redis()
+        return {
+            "scheduled": await client.zcard(SCHEDULE_KEY),
+            "due": await client.zcount(SCHEDULE_KEY, "-inf", time.time()),
+            "parked": await client.zcount(SCHEDULE_KEY, "+inf", "+inf"),
+        }
+
+    async def _load_cadence(self) -> Dict[str, float]:
+        if time.monotonic() - self._cadence_loaded > LOCAL_CACHE_SECONDS:
+            raw = await get_redis().hgetall(CADENCE_KEY)
+            self._cadence = {_decode(key): float(value) for key, value in raw.items()}
+            self._cadence_loaded = time.monotonic()
+        return self._cadence
+
+    async def _webhook_carriers(self, now: float) -> set:
+        if time.monotonic() - self._webhooks_loaded > LOCAL_CACHE_SECONDS:
+            raw = await get_redis().hgetall(WEBHOOK_KEY)
+            self._webhooks = {_decode(key): float(value) for key, value in raw.items()}
+            self._webhooks_loaded = time.monotonic()
+        return {carrier for carrier, seen in self._webhooks.items() if now - seen < TRACKING_WEBHOOK_FRESHNESS}
@@ -0,0 +1,246 @@
+"""
+Batched tracking synchronization
+Active shipments are selected with one set-based query (latest event per
+tracking number via DISTINCT ON), grouped by carrier and tracked in chunks:
+carriers with a multi-tracking request (DHL, FedEx) get one request per chunk,
+the others one request per shipment. Each carrier has its own concurrency
+limit, and results are written to the database in batches off the event loop.
+"""
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import structlog
+from prometheus_client import Counter, Histogram
+from sqlalchemy import func, select
+
+from ..database import SessionLocal
+from ..models import CarrierType, ShippingLabel, TrackingEvent
+from ..schemas import TrackingResponse
+from .tracking_events import event_row, insert_tracking_events
+
+logger = structlog.get_logger()
+
+TRACKING_SYNC_DAYS = int(os.getenv("TRACKING_SYNC_DAYS", "30"))
+TRACKING_SYNC_CONCURRENCY = int(os.getenv("TRACKING_SYNC_CONCURRENCY", "4"))
+# Shipments written per database transaction
+TRACKING_SYNC_STORE_BATCH = int(os.getenv("TRACKING_SYNC_STORE_BATCH", "200"))
+
+# Latest statuses after which a shipment is no longer polled (compared lower-cased)
+TERMINAL_STATUSES = {"delivered", "entregado", "returned", "devuelto", "cancelled", "anulado"}
+# Carrier codes for the same states, as stored from the carrier's raw event type
+CARRIER_TERMINAL_CODES = {
+    "FedEx": {"dl"},
+    "UPS": {"d"},
+}
+EXCEPTION_STATUSES = {"exception", "delayed", "failed", "novedad"}
+
+tracking_sync_shipments = Counter(
+    'tracking_sync_shipments_total',
+    'Shipments processed by the tracking sync by result',
+    ['carrier', 'result']
+)
+tracking_sync_requests = Counter(
+    'tracking_sync_carrier_requests_total',
+    'Tracking requests sent to carriers by the tracking sync',
+    ['carrier']
+)
+tracking_sync_duration = Histogram(
+    'tracking_sync_batch_duration_seconds',
+    'Duration of one tracking sync batch',
+    ['carrier'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200)
+)
+
+
+class ActiveShipment(NamedTuple):
+    tracking_number: str
+    carrier: str
+    last_status: Optional[str]
+
+
+def is_terminal(carrier: str, status: Optional[str]) -> bool:
+    if not status:
+        return False
+    status = status.lower()
+    return status in TERMINAL_STATUSES or status in CARRIER_TERMINAL_CODES.get(carrier, set())
+
+
+def select_active_shipments(db, days: int = TRACKING_SYNC_DAYS, carrier: Optional[str] = None) -> List[ActiveShipment]:
+    """Recent shipments whose latest tracking event is not terminal, in one query"""
+    since = datetime.now() - timedelta(days=days)
+    latest = (
+        select(TrackingEvent.tracking_number, TrackingEvent.status)
+        .where(TrackingEvent.event_date >= since)
+        .distinct(TrackingEvent.tracking_number)
+        .order_by(TrackingEvent.tracking_number, TrackingEvent.event_date.desc())
+        .subquery()
+    )
+    query = (
+        select(ShippingLabel.tracking_number, ShippingLabel.carrier, latest.c.status)
+        .outerjoin(latest, latest.c.tracking_number == ShippingLabel.tracking_number)
+        .where(
+            ShippingLabel.created_at >= since,
+            ShippingLabel.tracking_number.isnot(None),
+            (latest.c.status.is_(None)) | (func.lower(latest.c.status).notin_(TERMINAL_STATUSES))
+        )
+    )
+    if carrier:
+        query = query.where(ShippingLabel.carrier == CarrierType(carrier))
+
+    shipments = []
+    for tracking_number, carrier_type, status in db.execute(query):
+        name = carrier_type.value
+        if not is_terminal(name, status):
+            shipments.append(ActiveShipment(tracking_number, name, status))
+    return shipments
+
+
+def store_tracking_results(results: List[Tuple[ActiveShipment, TrackingResponse]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Write a batch of tracking results; returns the newly stored events per tracking number"""
+    rows = [
+        event_row(
+            shipment.tracking_number,
+            CarrierType(shipment.carrier),
+            event.date,
+            event.status,
+            event.description,
+            event.location,
+            event.details
+        )
+        for shipment, tracking in results
+        for event in tracking.events
+    ]
+    if not rows:
+        return {}
+    db = SessionLocal()
+    try:
+        inserted = insert_tracking_events(db, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    new_events: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in inserted:
+        new_events[row["tracking_number"]].append(row)
+    return new_events
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class TrackingSyncEngine:
+    """Tracks a set of shipments through one CarrierService on the running loop"""
+
+    def __init__(
+        self,
+        carrier_service,
+        store: Callable[[List[Tuple[ActiveShipment, TrackingResponse]]], Dict[str, List[Dict[str, Any]]]] = store_tracking_results,
+        on_tracked: Optional[Callable[[ActiveShipment, TrackingResponse], None]] = None,
+        on_new_events: Optional[Callable[[ActiveShipment, TrackingResponse, List[Dict[str, Any]]], None]] = None,
+        concurrency: Optional[Dict[str, int]] = None
+    ):
+        self.carrier_service = carrier_service
+        self.store = store
+        self.on_tracked = on_tracked
+        self.on_new_events = on_new_events
+        self.concurrency = concurrency or {}
+        self._pending: List[Tuple[ActiveShipment, TrackingResponse]] = []
+        self._store_lock = asyncio.Lock()
+        self._stats: Dict[str, int] = defaultdict(int)
+
+    def _limit(self, carrier: str) -> int:
+        if carrier in self.concurrency:
+            return self.concurrency[carrier]
+        return int(os.getenv(f"{carrier.upper()}_TRACKING_CONCURRENCY", str(TRACKING_SYNC_CONCURRENCY)))
+
+    async def sync(self, shipments: List[ActiveShipment]) -> Dict[str, Any]:
+        """Track every shipment and store new events; returns counters"""
+        started = time.monotonic()
+        self._stats = defaultdict(int)
+        by_carrier: Dict[str, List[ActiveShipment]] = defaultdict(list)
+        for shipment in shipments:
+            by_carrier[shipment.carrier].append(shipment)
+
+        await asyncio.gather(*(self._sync_carrier(carrier, group) for carrier, group in by_carrier.items()))
+        await self._flush(force=True)
+
+        elapsed = time.monotonic() - started
+        return {
+            **self._stats,
+            "shipments": len(shipments),
+            "elapsed_seconds": round(elapsed, 3),
+            "shipments_per_second": round(len(shipments) / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    async def _sync_carrier(self, carrier: str, shipments: List[ActiveShipment]) -> None:
+        started = time.monotonic()
+        client = self.carrier_service.carriers.get(carrier)
+        chunk_size = getattr(client, "MAX_TRACKING_BATCH", 1)
+        semaphore = asyncio.Semaphore(self._limit(carrier))
+
+        async def run_chunk(chunk: List[ActiveShipment]) -> None:
+            async with semaphore:
+                await self._sync_chunk(carrier, chunk)
+
+        await asyncio.gather(*(run_chunk(chunk) for chunk in _chunks(shipments, chunk_size)))
+        tracking_sync_duration.labels(carrier=carrier).observe(time.monotonic() - started)
+
+    async def _sync_chunk(self, carrier: str, chunk: List[ActiveShipment]) -> None:
+        numbers = [shipment.tracking_number for shipment in chunk]
+        tracking_sync_requests.labels(carrier=carrier).inc()
+        try:
+            if len(numbers) == 1:
+                results = {numbers[0]: await self.carrier_service.track_shipment(carrier, numbers[0])}
+            else:
+                results = await self.carrier_service.track_shipments(carrier, numbers)
+        except Exception as e:
+            logger.warning("Tracking chunk failed", carrier=carrier, count=len(numbers), error=str(e))
+            self._count(carrier, "failed", len(numbers))
+            return
+
+        for shipment in chunk:
+            tracking = results.get(shipment.tracking_number)
+            if tracking is None:
+                self._count(carrier, "missing")
+            elif isinstance(tracking, Exception):
+                self._count(carrier, "failed")
+            else:
+                self._count(carrier, "synced")
+                self._pending.append((shipment, tracking))
+                if self.on_tracked:
+                    self.on_tracked(shipment, tracking)
+        await self._flush()
+
+    async def _flush(self, force: bool = False) -> None:
+        if not self._pending or (not force and len(self._pending) < TRACKING_SYNC_STORE_BATCH):
+            return
+        async with self._store_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                new_events = await asyncio.to_thread(self.store, batch)
+            except Exception as e:
+                logger.error("Failed to store tracking events", count=len(batch), error=str(e))
+                self._stats["store_failed"] += len(batch)
+                return
+        self._stats["events_added"] += sum(len(events) for events in new_events.values())
+        if self.on_new_events:
+            for shipment, tracking in batch:
+                events = new_events.get(shipment.tracking_number)
+                if events:
+                    self.on_new_events(shipment, tracking, events)
+
+    def _count(self, carrier: str, result: str, amount: int = 1) -> None:
+        self._stats[result] += amount
+        tracking_sync_shipments.labels(carrier=carrier, result=result).inc(amount)
@@ -0,0 +1,215 @@
+"""
+Carrier webhook ingestion stream
+Webhook routes only append the raw payload to a Redis Stream and answer; the
+drain_webhook_stream task reads the stream through a consumer group in
+micro-batches and writes the tracking events of a whole batch at once.
+
+Each payload is appended together with a dedup key, a hash of the carrier,
+the webhook type and the payload with its keys sorted, in one script: a
+carrier redelivering the same payload within WEBHOOK_DEDUP_TTL seconds is
+acknowledged again but never appended twice. Entries are deleted from the
+stream once acknowledged, so the stream holds only work not done yet and is
+never trimmed under a backlog.
+
+Duplicate rate is
+rate(webhook_ingest_total{outcome="duplicate"}) / rate(webhook_ingest_total);
+ingestion lag is webhook_ingest_lag_seconds (append to commit) and
+webhook_ingest_backlog (entries not yet acknowledged).
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as redis
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..carriers.transport import get_redis
+
+logger = structlog.get_logger()
+
+WEBHOOK_STREAM = "webhooks:{ingest}:stream"
+WEBHOOK_DEAD_LETTER = "webhooks:{ingest}:dead"
+WEBHOOK_GROUP = "webhook-processors"
+WEBHOOK_DEDUP_TTL = int(os.getenv("WEBHOOK_DEDUP_TTL", "86400"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "200"))
+WEBHOOK_BLOCK_MS = int(os.getenv("WEBHOOK_BLOCK_MS", "1000"))
+# How long one drain_webhook_stream run keeps reading; beat starts one this often
+WEBHOOK_DRAIN_SECONDS = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "30"))
+# Entries a consumer read but never acknowledged are taken over after this long
+WEBHOOK_CLAIM_IDLE_MS = int(os.getenv("WEBHOOK_CLAIM_IDLE_MS", "60000"))
+
+# KEYS: dedup key, stream; ARGV: dedup ttl, carrier, webhook type, payload
+APPEND = """
+if not redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+    return false
+end
+return redis.call('XADD', KEYS[2], '*', 'carrier', ARGV[2], 'type', ARGV[3], 'payload', ARGV[4], 'dedup', KEYS[1])
+"""
+
+webhook_ingest_total = Counter(
+    'webhook_ingest_total',
+    'Carrier webhooks received by outcome (accepted, duplicate)',
+    ['carrier', 'outcome']
+)
+webhook_ingest_lag = Histogram(
+    'webhook_ingest_lag_seconds',
+    'Time from appending a webhook to the stream to committing its events',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+webhook_ingest_backlog = Gauge(
+    'webhook_ingest_backlog',
+    'Webhooks in the stream not acknowledged yet (unread plus pending)'
+)
+
+
+class StreamEntry:
+    """One webhook read back from the stream"""
+
+    __slots__ = ("id", "carrier", "webhook_type", "payload", "dedup")
+
+    def __init__(self, entry_id: str, fields: Dict[str, str]):
+        self.id = entry_id
+        self.carrier = fields.get("carrier", "")
+        self.webhook_type = fields.get("type", "")
+        self.payload = fields.get("payload", "")
+        self.dedup = fields.get("dedup", "")
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return json.loads(self.payload)
+
+    @property
+    def appended_at(self) -> float:
+        # Stream IDs start with the Redis server's clock in milliseconds
+        return int(self.id.split("-", 1)[0]) / 1000
+
+
+def canonical_payload(data: Any) -> str:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def dedup_key(carrier: str, webhook_type: str, payload: str) -> str:
+    digest = hashlib.sha256(f"{carrier.upper()}|{webhook_type}|{payload}".encode()).hexdigest()
+    return f"webhooks:{{ingest}}:dedup:{digest}"
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _entries(raw) -> List[StreamEntry]:
+    return [
+        StreamEntry(_text(entry_id), {_text(k): _text(v) for k, v in fields.items()})
+        for entry_id, fields in raw or []
+        if fields  # deleted while pending
+    ]
+
+
+class WebhookStream:
+    """Append side for the webhook routes, consumer group side for the drain task"""
+
+    def __init__(self, stream: str = WEBHOOK_STREAM, group: str = WEBHOOK_GROUP):
+        self.stream = stream
+        self.group = group
+        self._group_ready = False
+
+    async def append(self, carrier: str, webhook_type: str, data: Any) -> Optional[str]:
+        """Store a webhook durably; returns its stream ID, or None for a duplicate
+
+        Redis errors propagate: the caller must not acknowledge the carrier.
+        """
+        payload = canonical_payload(data)
+        key = dedup_key(carrier, webhook_type, payload)
+        entry_id = await get_redis().eval(
+            APPEND, 2, key, self.stream, WEBHOOK_DEDUP_TTL, carrier, webhook_type, payload
+        )
+        outcome = "accepted" if entry_id else "duplicate"
+        webhook_ingest_total.labels(carrier=carrier, outcome=outcome).inc()
+        return _text(entry_id) if entry_id else None
+
+    async def read(
+        self, consumer: str, count: int = WEBHOOK_BATCH_SIZE, block_ms: int = WEBHOOK_BLOCK_MS
+    ) -> List[StreamEntry]:
+        """Next micro-batch for this consumer: abandoned entries first, then new ones"""
+        client = get_redis()
+        await self._ensure_group(client)
+
+        try:
+            claimed = await client.xautoclaim(
+                self.stream, self.group, consumer, WEBHOOK_CLAIM_IDLE_MS, start_id="0-0", count=count
+            )
+            entries = _entries(claimed[1])
+            if entries:
+                logger.info("Reclaimed abandoned webhooks", consumer=consumer, count=len(entries))
+                return entries
+
+            response = await client.xreadgroup(self.group, consumer, {self.stream: ">"}, count=count, block=block_ms)
+        except redis.ResponseError as e:
+            if "NOGROUP" in str(e):
+                # Stream or group was deleted; recreate it on the next read
+                self._group_ready = False
+            raise
+        return _entries(response[0][1]) if response else []
+
+    async def ack(self, entries: List[StreamEntry]) -> None:
+        """Acknowledge processed entries and delete them from the stream"""
+        if not entries:
+            return
+        ids = [entry.id for entry in entries]
+        now = time.time()
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.xack(self.stream, self.group, *ids)
+        pipe.xdel(self.stream, *ids)
+        await pipe.execute()
+        for entry in entries:
+            webhook_ingest_lag.observe(max(0.0, now - entry.appended_at))
+
+    async def dead_letter(self, entry: StreamEntry, error: str) -> None:
+        """Park an entry that cannot be processed and take it off the stream"""
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.xadd(WEBHOOK_DEAD_LETTER, {
+            "carrier": entry.carrier,
+            "type": entry.webhook_type,
+            "payload": entry.payload,
+            "error": error[:500],
+            "stream_id": entry.id,
+        })
+        pipe.xack(self.stream, self.group, entry.id)
+        pipe.xdel(self.stream, entry.id)
+        await pipe.execute()
+        logger.error("Webhook moved to dead letter stream", entry_id=entry.id, carrier=entry.carrier, error=error)
+
+    async def backlog(self) -> int:
+        """Entries not acknowledged yet; also exported as webhook_ingest_backlog"""
+        try:
+            groups = await get_redis().xinfo_groups(self.stream)
+        except redis.ResponseError:
+            # Stream not created yet
+            return 0
+        for group in groups:
+            if _text(group.get("name")) == self.group:
+                # "lag" is unknown (None) right after entries were deleted; fall back to the length
+                lag = group.get("lag")
+                if lag is None:
+                    lag = max(0, await get_redis().xlen(self.stream) - int(group.get("pending", 0)))
+                backlog = int(lag) + int(group.get("pending", 0))
+                webhook_ingest_backlog.set(backlog)
+                return backlog
+        return 0
+
+    async def _ensure_group(self, client) -> None:
+        if self._group_ready:
+            return
+        try:
+            await client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+
+webhook_stream = WebhookStream()
@@ -58,6 +58,16 @@ class CarrierInitializer:
             carriers.append('Aeropost')
             logger.info("Aeropost integration enabled")
 
+        # Check Coordinadora
+        if os.getenv('COORDINADORA_API_KEY'):
+            carriers.append('Coordinadora')
+            logger.info("Coordinadora integration enabled")
+
+        # Check Deprisa
+        if os.getenv('DEPRISA_CLIENT_ID'):
+            carriers.append('Deprisa')
+            logger.info("Deprisa integration enabled")
+
         return carriers
 
     async def initialize_all_carriers(self) -> Dict[str, bool]:
@@ -1,23 +1,41 @@
 from celery import Task, group, chain, chord
 from ..celery_app import app
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import structlog
 from datetime import datetime, timedelta
-import csv
 import io
 import json
+import os
 
-from ..database import SessionLocal
-from ..models import ShippingLabel, ShippingQuote, TrackingEvent, CarrierType
+from sqlalchemy import select
+
+from ..database import SessionLocal, engine
+from ..models import ShippingLabel, CarrierType, ShipmentImportJob
+from ..services.api_call_log import (
+    API_CALL_LOG_RETENTION_DAYS, drop_expired_api_call_log_partitions, ensure_api_call_log_partitions
+)
+from ..services.callback_dispatcher import CALLBACK_RETENTION_DAYS, purge_deliveries
+from ..services.carrier_service import CarrierService
+from ..services.carrier_stats import build_daily_report, record_labels, recompute_daily_stats
+from ..services.label_store import get_label_store, store_issued_label
+from ..services.shipment_import import (
+    RowError, claim_chunk, release_chunk, create_import_job, create_labels, finish_chunk, get_import_store,
+    iter_pending_chunks, plan_import, read_chunk, read_header, store_upload, validate_chunk
+)
 from .carrier_tasks import get_quote_async, generate_label_async
 from .tracking_tasks import sync_tracking_async
+from .worker_loop import run_async
 
 logger = structlog.get_logger()
 
+# Label generation for a chunk of IMPORT_CHUNK_ROWS rows can take minutes
+IMPORT_CHUNK_SOFT_TIME_LIMIT = int(os.getenv("IMPORT_CHUNK_SOFT_TIME_LIMIT", "1500"))
+
 
 class BatchTask(Task):
     """Base task for batch operations"""
     _db = None
+    _carrier_service = None
     
     @property
     def db(self):
@@ -25,6 +43,47 @@ class BatchTask(Task):
             self._db = SessionLocal()
         return self._db
     
+    @property
+    def carrier_service(self):
+        # Lives as long as the worker process, like the loop its clients are bound to
+        if self._carrier_service is None:
+            self._carrier_service = CarrierService()
+        return self._carrier_service
+    
+    def label_import_rows(self, shipments: List[Tuple[int, Dict[str, Any]]], errors: List[RowError]) -> Tuple[int, int]:
+        """Generate and store labels for validated import rows; failures are added to ``errors``"""
+        async def run():
+            service = self.carrier_service
+            for carrier in {data['carrier'] for _, data in shipments}:
+                if carrier not in service.carriers:
+                    await service.initialize_carrier(carrier)
+            return await create_labels(service, shipments)
+        
+        created = failed = 0
+        carriers = []
+        for number, data, result in run_async(run()):
+            if isinstance(result, Exception):
+                errors.append(RowError(number, None, f"Label generation failed: {result}"))
+                failed += 1
+                continue
+            stored = store_issued_label(result.label_data)
+            self.db.add(ShippingLabel(
+                order_id=data['order_id'],
+                carrier=CarrierType(data['carrier']),
+                tracking_number=result.tracking_number,
+                label_url=result.label_url,
+                label_data=result.label_data if stored is None else None,
+                label_sha256=stored.digest if stored else None,
+                label_content_type=stored.content_type if stored else None,
+                label_size=stored.size if stored else None,
+                awb_number=result.awb_number,
+                service_type=data['service_type']
+            ))
+            carriers.append(CarrierType(data['carrier']))
+            created += 1
+        record_labels(self.db, carriers)
+        return created, failed
+    
     def after_return(self, status, retval, task_id, args, kwargs, einfo):
         if self._db is not None:
             self._db.close()
@@ -124,73 +183,30 @@ def import_shipments_csv(self, csv_data: str, auto_process: bool = False):
     """
     Import shipments from CSV and optionally process them
     
+    Kept for existing callers: the CSV travels through the broker in the task
+    arguments. New clients upload the file to POST /api/v1/imports/shipments,
+    which streams it to the import store instead.
+    
     Args:
         csv_data: CSV string data
-        auto_process: Whether to automatically process imported shipments
+        auto_process: Whether to generate labels for the valid rows
     
     Returns:
-        Import results
+        The import job to poll
     """
     try:
-        logger.info("Importing shipments from CSV",
-                   task_id=self.request.id)
-        
-        # Parse CSV
-        reader = csv.DictReader(io.StringIO(csv_data))
-        shipments = []
+        digest, size = store_upload(io.BytesIO(csv_data.encode("utf-8")))
+        job = create_import_job(self.db, digest, size, None, auto_process)
+        plan_shipment_import.delay(job.id)
         
-        for row in reader:
-            shipment = {
-                'origin': {
-                    'street': row.get('origin_street'),
-                    'city': row.get('origin_city'),
-                    'state': row.get('origin_state'),
-                    'postal_code': row.get('origin_postal_code'),
-                    'country': row.get('origin_country'),
-                    'contact_name': row.get('origin_contact_name'),
-                    'contact_phone': row.get('origin_contact_phone'),
-                    'contact_email': row.get('origin_contact_email')
-                },
-                'destination': {
-                    'street': row.get('dest_street'),
-                    'city': row.get('dest_city'),
-                    'state': row.get('dest_state'),
-                    'postal_code': row.get('dest_postal_code'),
-                    'country': row.get('dest_country'),
-                    'contact_name': row.get('dest_contact_name'),
-                    'contact_phone': row.get('dest_contact_phone'),
-                    'contact_email': row.get('dest_contact_email')
-                },
-                'packages': [{
-                    'weight_kg': float(row.get('weight_kg', 1)),
-                    'length_cm': float(row.get('length_cm', 10)),
-                    'width_cm': float(row.get('width_cm', 10)),
-                    'height_cm': float(row.get('height_cm', 10)),
-                    'declared_value': float(row.get('declared_value', 0)),
-                    'currency': row.get('currency', 'USD')
-                }],
-                'service_type': row.get('service_type', 'standard'),
-                'carrier': row.get('carrier'),
-                'order_id': row.get('order_id')
-            }
-            shipments.append(shipment)
-        
-        logger.info("CSV parsed successfully",
-                   shipment_count=len(shipments))
-        
-        # Process if requested
-        if auto_process:
-            result = process_batch_shipments.delay(shipments)
-            return {
-                'status': 'processing',
-                'imported': len(shipments),
-                'batch_task_id': result.id
-            }
+        logger.info("CSV import queued",
+                   task_id=self.request.id,
+                   job_id=job.id,
+                   size=size)
         
         return {
-            'status': 'imported',
-            'count': len(shipments),
-            'shipments': shipments
+            'status': 'queued',
+            'job_id': job.id
         }
         
     except Exception as e:
@@ -200,6 +216,138 @@ def import_shipments_csv(self, csv_data: str, auto_process: bool = False):
         raise
 
 
+@app.task(
+    bind=True,
+    base=BatchTask,
+    name='src.tasks.batch_tasks.plan_shipment_import'
+)
+def plan_shipment_import(self, job_id: str):
+    """
+    Split an uploaded import file into chunks and queue a task per chunk
+    
+    The file is read once, record by record; chunk tasks only receive the
+    byte offsets of their records.
+    """
+    job = self.db.get(ShipmentImportJob, job_id)
+    if job is None or job.status != 'uploaded':
+        logger.warning("Import job not ready for planning", job_id=job_id, status=job.status if job else None)
+        return {'job_id': job_id, 'queued': 0}
+    
+    chunks = plan_import(self.db, job)
+    queued = dispatch_import_chunks(self.db, job_id) if chunks else 0
+    
+    logger.info("Shipment import planned",
+               task_id=self.request.id,
+               job_id=job_id,
+               status=job.status,
+               rows=job.total_rows,
+               chunks=chunks)
+    
+    return {'job_id': job_id, 'status': job.status, 'rows': job.total_rows, 'queued': queued}
+
+
+@app.task(
+    bind=True,
+    base=BatchTask,
+    name='src.tasks.batch_tasks.queue_import_chunks'
+)
+def queue_import_chunks(self, job_id: str):
+    """Queue the pending chunks of an import job, e.g. once a validated job is processed"""
+    queued = dispatch_import_chunks(self.db, job_id)
+    logger.info("Import chunks queued", job_id=job_id, queued=queued)
+    return {'job_id': job_id, 'queued': queued}
+
+
+def dispatch_import_chunks(db, job_id: str) -> int:
+    """Queue a chunk task for every pending chunk of a job"""
+    queued = 0
+    for start, end, first_row in iter_pending_chunks(db, job_id):
+        import_shipment_chunk.apply_async(args=[job_id, start, end, first_row], queue='batch')
+        queued += 1
+    return queued
+
+
+@app.task(
+    bind=True,
+    base=BatchTask,
+    name='src.tasks.batch_tasks.import_shipment_chunk',
+    max_retries=3,
+    soft_time_limit=IMPORT_CHUNK_SOFT_TIME_LIMIT,
+    time_limit=IMPORT_CHUNK_SOFT_TIME_LIMIT + 60
+)
+def import_shipment_chunk(self, job_id: str, start_offset: int, end_offset: int, first_row: int):
+    """
+    Validate, and for processing jobs create labels for, one chunk of an import
+    
+    Args:
+        job_id: Import job
+        start_offset: Byte offset of the chunk's first record
+        end_offset: Byte offset just past its last record
+        first_row: File row number of the first record
+    """
+    chunk = claim_chunk(self.db, job_id, start_offset)
+    if chunk is None:
+        logger.info("Import chunk already handled", job_id=job_id, start_offset=start_offset)
+        return {'job_id': job_id, 'skipped': True}
+    job = self.db.get(ShipmentImportJob, job_id)
+    
+    try:
+        with open(get_import_store().local_path(job.file_digest), "rb") as handle:
+            header, _ = read_header(handle)
+            rows, errors = read_chunk(handle, start_offset, end_offset, first_row)
+        valid, invalid = validate_chunk(header, rows)
+        
+        counters = {}
+        if not chunk.validated:
+            errors.extend(invalid)
+            counters['rows_valid'] = len(valid)
+            counters['rows_invalid'] = len({error.row_number for error in errors})
+            chunk.validated = True
+        else:
+            # Validation errors were recorded by the validation pass
+            errors = []
+        
+        if job.status == 'processing' and valid:
+            if chunk.attempts > 1:
+                # A worker died on this chunk; do not label its orders twice
+                valid = _without_labelled_orders(self.db, valid, errors)
+            created, failed = self.label_import_rows(valid, errors)
+            counters['labels_created'] = created
+            counters['labels_failed'] = failed
+        
+        final = finish_chunk(self.db, chunk, errors, counters)
+        
+    except Exception as e:
+        self.db.rollback()
+        logger.error("Import chunk failed",
+                    task_id=self.request.id,
+                    job_id=job_id,
+                    start_offset=start_offset,
+                    error=str(e))
+        # Hand the chunk back so the retry can claim it
+        release_chunk(self.db, chunk.id)
+        raise self.retry(exc=e, countdown=60)
+    
+    if final:
+        logger.info("Shipment import finished", job_id=job_id, status=final)
+    
+    return {'job_id': job_id, 'first_row': first_row, 'rows': len(rows), **counters}
+
+
+def _without_labelled_orders(db, valid: List[Tuple[int, Dict[str, Any]]], errors: List[RowError]) -> List[Tuple[int, Dict[str, Any]]]:
+    order_ids = {data['order_id'] for _, data in valid}
+    labelled = set(db.scalars(
+        select(ShippingLabel.order_id).where(ShippingLabel.order_id.in_(order_ids))
+    ))
+    remaining = []
+    for number, data in valid:
+        if data['order_id'] in labelled:
+            errors.append(RowError(number, 'order_id', 'order already has a label; skipped'))
+        else:
+            remaining.append((number, data))
+    return remaining
+
+
 @app.task(
     bind=True,
     base=BatchTask,
@@ -225,60 +373,8 @@ def generate_daily_report(self, date: str = None):
                    task_id=self.request.id,
                    date=report_date)
         
-        # Get shipments for the day
-        start_time = datetime.combine(report_date, datetime.min.time())
-        end_time = datetime.combine(report_date, datetime.max.time())
-        
-        # Query labels created
-        labels = self.db.query(ShippingLabel).filter(
-            ShippingLabel.created_at >= start_time,
-            ShippingLabel.created_at <= end_time
-        ).all()
-        
-        # Query quotes generated
-        quotes = self.db.query(ShippingQuote).filter(
-            ShippingQuote.created_at >= start_time,
-            ShippingQuote.created_at <= end_time
-        ).all()
-        
-        # Query tracking events
-        tracking_events = self.db.query(TrackingEvent).filter(
-            TrackingEvent.created_at >= start_time,
-            TrackingEvent.created_at <= end_time
-        ).all()
-        
-        # Calculate statistics by carrier
-        carrier_stats = {}
-        for carrier in CarrierType:
-            carrier_labels = [l for l in labels if l.carrier == carrier]
-            carrier_quotes = [q for q in quotes if q.carrier == carrier]
-            
-            carrier_stats[carrier.value] = {
-                'labels_generated': len(carrier_labels),
-                'quotes_generated': len(carrier_quotes),
-                'total_value': sum(q.amount for q in carrier_quotes),
-                'avg_quote_value': sum(q.amount for q in carrier_quotes) / len(carrier_quotes) if carrier_quotes else 0
-            }
-        
-        # Calculate delivery statistics
-        delivered = len([e for e in tracking_events if e.status.lower() in ['delivered', 'entregado']])
-        in_transit = len([e for e in tracking_events if e.status.lower() in ['in transit', 'en transito']])
-        exceptions = len([e for e in tracking_events if e.status.lower() in ['exception', 'failed']])
-        
-        report = {
-            'date': report_date.isoformat(),
-            'summary': {
-                'total_labels': len(labels),
-                'total_quotes': len(quotes),
-                'total_tracking_events': len(tracking_events),
-                'delivered': delivered,
-                'in_transit': in_transit,
-                'exceptions': exceptions
-            },
-            'carrier_breakdown': carrier_stats,
-            'top_routes': self._get_top_routes(quotes),
-            'generated_at': datetime.now().isoformat()
-        }
+        # A few dozen rollup rows, maintained as labels, quotes and events are written
+        report = build_daily_report(self.db, report_date)
         
         # Save report
         save_report.delay(report)
@@ -297,28 +393,100 @@ def generate_daily_report(self, date: str = None):
                     task_id=self.request.id,
                     error=str(e))
         raise
+
+
+@app.task(
+    bind=True,
+    base=BatchTask,
+    name='src.tasks.batch_tasks.recompute_carrier_daily_stats'
+)
+def recompute_carrier_daily_stats(self, date: str = None, days: int = 1):
+    """
+    Rebuild the carrier and route daily rollups from the source tables
+    
+    Args:
+        date: Last day to rebuild (YYYY-MM-DD format), defaults to yesterday
+        days: Number of days to rebuild, ending with ``date``
+    """
+    if date:
+        last_day = datetime.strptime(date, "%Y-%m-%d").date()
+    else:
+        last_day = datetime.now().date() - timedelta(days=1)
+    
+    results = {}
+    try:
+        for offset in range(days):
+            day = last_day - timedelta(days=offset)
+            results[day.isoformat()] = recompute_daily_stats(self.db, day)
+            # One transaction per day keeps row locks short
+            self.db.commit()
+    except Exception as e:
+        self.db.rollback()
+        logger.error("Failed to recompute carrier daily stats",
+                    task_id=self.request.id,
+                    error=str(e))
+        raise
+    
+    return results
+
+
+@app.task(
+    bind=True,
+    base=BatchTask,
+    name='src.tasks.batch_tasks.maintain_api_call_log_partitions'
+)
+def maintain_api_call_log_partitions(self, days_to_keep: int = API_CALL_LOG_RETENTION_DAYS):
+    """
+    Create the coming days' api_call_logs partitions and drop expired ones
     
-    def _get_top_routes(self, quotes: List[ShippingQuote]) -> List[Dict]:
-        """Get top shipping routes"""
-        routes = {}
-        for quote in quotes:
-            route = f"{quote.origin_city}-{quote.destination_city}"
-            if route not in routes:
-                routes[route] = {'count': 0, 'total_value': 0}
-            routes[route]['count'] += 1
-            routes[route]['total_value'] += quote.amount
+    Args:
+        days_to_keep: Number of days of API call logs to keep
+    """
+    try:
+        created = ensure_api_call_log_partitions(engine)
+        result = drop_expired_api_call_log_partitions(engine, days_to_keep)
         
-        # Sort by count and return top 10
-        sorted_routes = sorted(routes.items(), key=lambda x: x[1]['count'], reverse=True)
-        return [
-            {
-                'route': route,
-                'count': data['count'],
-                'total_value': data['total_value'],
-                'avg_value': data['total_value'] / data['count'] if data['count'] > 0 else 0
-            }
-            for route, data in sorted_routes[:10]
-        ]
+        logger.info("API call log partitions maintained",
+                   task_id=self.request.id,
+                   created=created,
+                   **result)
+        
+        return {'created': created, **result}
+        
+    except Exception as e:
+        logger.error("Failed to maintain API call log partitions",
+                    task_id=self.request.id,
+                    error=str(e))
+        raise
+
+
+@app.task(
+    bind=True,
+    base=BatchTask,
+    name='src.tasks.batch_tasks.clean_old_callback_deliveries'
+)
+def clean_old_callback_deliveries(self, days_to_keep: int = CALLBACK_RETENTION_DAYS):
+    """
+    Delete finished customer callback deliveries past the retention window
+    
+    Args:
+        days_to_keep: Number of days of deliveries to keep
+    """
+    try:
+        deleted = purge_deliveries(self.db, days_to_keep)
+        
+        logger.info("Old callback deliveries cleaned",
+                   task_id=self.request.id,
+                   deleted=deleted)
+        
+        return {'deleted': deleted}
+        
+    except Exception as e:
+        self.db.rollback()
+        logger.error("Failed to clean callback deliveries",
+                    task_id=self.request.id,
+                    error=str(e))
+        raise
 
 
 @app.task(
@@ -427,4 +595,77 @@ def cancel_batch_shipments(self, tracking_numbers: List[str]):
         'cancelled': len([r for r in results if r['status'] == 'cancelled']),
         'failed': len([r for r in results if r['status'] == 'failed']),
         'results': results
-    }
\ No newline at end of file
+    }
+
+
+@app.task(
+    bind=True,
+    base=BatchTask,
+    name='src.tasks.batch_tasks.migrate_label_blobs'
+)
+def migrate_label_blobs(self, batch_size: int = 500, max_batches: int = 100, after_id: int = 0):
+    """
+    Move base64 label_data of existing shipping labels into the label store
+    
+    Works in id order, one transaction per batch, and re-queues itself after
+    max_batches so a long backfill never holds one worker. Rows whose data is
+    not valid base64 are left untouched and reported.
+    
+    Args:
+        batch_size: Rows per transaction
+        max_batches: Batches before the task re-queues itself
+        after_id: Resume after this label id
+    """
+    store = get_label_store()
+    moved = 0
+    invalid = []
+    last_id = after_id
+
+    try:
+        for _ in range(max_batches):
+            labels = self.db.query(ShippingLabel).filter(
+                ShippingLabel.id > last_id,
+                ShippingLabel.label_data.isnot(None),
+                ShippingLabel.label_sha256.is_(None)
+            ).order_by(ShippingLabel.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+            if not labels:
+                break
+
+            for label in labels:
+                last_id = label.id
+                try:
+                    stored = store.put_base64(label.label_data)
+                except ValueError as e:
+                    invalid.append(label.id)
+                    logger.warning("Label data could not be migrated", label_id=label.id, error=str(e))
+                    continue
+                label.label_sha256 = stored.digest
+                label.label_content_type = stored.content_type
+                label.label_size = stored.size
+                label.label_data = None
+                moved += 1
+
+            self.db.commit()
+        else:
+            # Batch budget used up; continue in a fresh task
+            migrate_label_blobs.apply_async(
+                kwargs={'batch_size': batch_size, 'max_batches': max_batches, 'after_id': last_id},
+                queue='batch'
+            )
+
+        logger.info("Label blobs migrated",
+                   task_id=self.request.id,
+                   moved=moved,
+                   invalid=len(invalid),
+                   last_id=last_id)
+
+        return {'moved': moved, 'invalid': invalid, 'last_id': last_id}
+
+    except Exception as e:
+        logger.error("Label blob migration failed",
+                    task_id=self.request.id,
+                    last_id=last_id,
+                    error=str(e))
+        self.db.rollback()
+        raise
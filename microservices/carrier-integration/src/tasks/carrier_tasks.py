@@ -7,7 +7,10 @@ import asyncio
 from datetime import datetime, timedelta
 
 from ..services.carrier_service import CarrierService
+from ..carriers.transport import close_carrier_clients
 from ..services.fallback_service import FallbackService
+from ..services.label_store import store_issued_label
+from ..services.carrier_stats import record_labels, record_quote
 from ..schemas import QuoteRequest, LabelRequest, PickupRequest
 from ..database import SessionLocal
 from ..models import ShippingQuote, ShippingLabel, CarrierHealthStatus, CarrierType, ServiceStatus
@@ -91,7 +94,7 @@ def get_quote_async(self, quote_data: Dict[str, Any], callback_url: Optional[str
             # Save quote to database
             db_quote = ShippingQuote(
                 quote_id=quote.quote_id,
-                carrier=CarrierType[quote.carrier],
+                carrier=CarrierType(quote.carrier),
                 origin_country=quote_data['origin']['country'],
                 origin_city=quote_data['origin']['city'],
                 destination_country=quote_data['destination']['country'],
@@ -107,6 +110,7 @@ def get_quote_async(self, quote_data: Dict[str, Any], callback_url: Optional[str
                 valid_until=quote.valid_until
             )
             self.db.add(db_quote)
+            record_quote(self.db, db_quote.carrier, quote.amount, db_quote.origin_city, db_quote.destination_city)
             self.db.commit()
             
             result = {
@@ -130,6 +134,7 @@ def get_quote_async(self, quote_data: Dict[str, Any], callback_url: Optional[str
             return result
             
         finally:
+            loop.run_until_complete(close_carrier_clients())
             loop.close()
             
     except SoftTimeLimitExceeded:
@@ -179,17 +184,22 @@ def generate_label_async(self, label_data: Dict[str, Any], callback_url: Optiona
                 self.carrier_service.generate_label(label_data['carrier'], label_request)
             )
             
-            # Save label to database
+            # Save label to database; the document itself goes to the label store
+            stored = store_issued_label(label.label_data)
             db_label = ShippingLabel(
                 order_id=label_data['order_id'],
-                carrier=CarrierType[label.carrier],
+                carrier=CarrierType(label.carrier),
                 tracking_number=label.tracking_number,
                 label_url=label.label_url,
-                label_data=label.label_data,
+                label_data=label.label_data if stored is None else None,
+                label_sha256=stored.digest if stored else None,
+                label_content_type=stored.content_type if stored else None,
+                label_size=stored.size if stored else None,
                 awb_number=label.awb_number,
                 service_type=label_data.get('service_type', 'standard')
             )
             self.db.add(db_label)
+            record_labels(self.db, [db_label.carrier])
             self.db.commit()
             
             result = {
@@ -217,6 +227,7 @@ def generate_label_async(self, label_data: Dict[str, Any], callback_url: Optiona
             return result
             
         finally:
+            loop.run_until_complete(close_carrier_clients())
             loop.close()
             
     except SoftTimeLimitExceeded:
@@ -270,6 +281,7 @@ def schedule_pickup_async(self, pickup_data: Dict[str, Any], callback_url: Optio
             return result
             
         finally:
+            loop.run_until_complete(close_carrier_clients())
             loop.close()
             
     except Exception as e:
@@ -341,6 +353,8 @@ def health_check_all_carriers(self):
                 db_health.status = ServiceStatus[health.get('status', 'unknown').upper()]
                 db_health.latency_ms = health.get('latency_ms')
                 db_health.error_rate = health.get('error_rate')
+                db_health.circuit_breaker_open = health.get('circuit_breaker_open', False)
+                db_health.details = {'operations': health.get('operations')}
                 db_health.last_check = datetime.now()
                 
                 if health.get('status') == 'operational':
@@ -354,6 +368,7 @@ def health_check_all_carriers(self):
                 health_results[carrier] = health
                 
             finally:
+                loop.run_until_complete(close_carrier_clients())
                 loop.close()
                 
         except Exception as e:
@@ -371,6 +386,47 @@ def health_check_all_carriers(self):
     return health_results
 
 
+@app.task(
+    name='src.tasks.carrier_tasks.refresh_city_codes'
+)
+def refresh_city_codes():
+    """
+    Re-validate stale Servientrega city codes and reload the DANE city list
+    """
+    import os
+    from ..carriers.servientrega import ServientregaClient
+    from ..carriers.coordinadora import CoordinadoraClient
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    
+    try:
+        try:
+            client = ServientregaClient()
+            refreshed = loop.run_until_complete(client.refresh_city_codes())
+            logger.info("City codes refreshed", carrier="Servientrega", refreshed=refreshed)
+            results['Servientrega'] = {'refreshed': refreshed}
+        except Exception as e:
+            logger.error("City code refresh failed", carrier="Servientrega", error=str(e))
+            results['Servientrega'] = {'error': str(e)}
+
+        if os.getenv('COORDINADORA_API_KEY'):
+            try:
+                refreshed = loop.run_until_complete(CoordinadoraClient().refresh_city_codes())
+                logger.info("City codes refreshed", carrier="Coordinadora", refreshed=refreshed)
+                results['Coordinadora'] = {'refreshed': refreshed}
+            except Exception as e:
+                logger.error("City code refresh failed", carrier="Coordinadora", error=str(e))
+                results['Coordinadora'] = {'error': str(e)}
+
+        return results
+        
+    finally:
+        loop.run_until_complete(close_carrier_clients())
+        loop.close()
+
+
 @app.task(
     name='src.tasks.carrier_tasks.send_callback'
 )
@@ -14,6 +14,8 @@ from ..models import (
     InternationalMailbox, PackagePrealert, PackageConsolidation,
     CustomsDeclaration, ImportCostCalculation, CarrierType
 )
+from ..services.callback_dispatcher import enqueue_callback
+from ..services.consolidation import TARIFFS, PackageSize, package_volume, plan_arrived_packages, price_group
 from ..services.international_mailbox_service import InternationalMailboxService
 
 logger = structlog.get_logger()
@@ -42,6 +44,19 @@ class MailboxTask(Task):
             self._db = None
 
 
+def _queue_callback(db, callback_url: str, event: str, result: Dict[str, Any]):
+    """Hand a result to the callback dispatcher; the operation itself already succeeded"""
+    try:
+        enqueue_callback(db, callback_url, event, result)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error("Failed to queue mailbox callback",
+                    url=callback_url,
+                    event=event,
+                    error=str(e))
+
+
 @app.task(
     bind=True,
     base=MailboxTask,
@@ -84,7 +99,7 @@ def assign_mailbox_async(self, customer_id: str, carrier: str,
             
             # Send callback if provided
             if callback_url:
-                send_mailbox_callback.delay(callback_url, result)
+                _queue_callback(self.db, callback_url, "mailbox.assigned", result)
             
             return result
             
@@ -197,7 +212,7 @@ def consolidate_packages_async(self, customer_id: str, package_ids: List[str],
             
             # Send callback if provided
             if callback_url:
-                send_mailbox_callback.delay(callback_url, result)
+                _queue_callback(self.db, callback_url, "mailbox.consolidated", result)
             
             return result
             
@@ -342,36 +357,68 @@ def notify_new_packages(customer_id: str, packages: List[Dict[str, Any]]):
 
 
 @app.task(
+    bind=True,
+    base=MailboxTask,
     name='src.tasks.international_mailbox_tasks.calculate_consolidation_savings'
 )
-def calculate_consolidation_savings(consolidation_id: str, package_ids: List[str], 
+def calculate_consolidation_savings(self, consolidation_id: str, package_ids: List[str], 
                                    carrier: str):
     """
     Calculate savings from package consolidation
     
+    Prices the consolidated box against shipping each package on its own
+    with the carrier's dimensional-weight tariff.
+    
     Args:
         consolidation_id: Consolidation identifier
         package_ids: List of consolidated packages
         carrier: Carrier name
     """
     try:
-        # This would calculate the difference between:
-        # - Individual shipping costs for each package
-        # - Consolidated shipping cost
+        carrier_type = CarrierType[carrier.upper()]
+        packages = [
+            PackageSize(tracking_number, float(weight_lb or 0), package_volume(dimensions))
+            for tracking_number, weight_lb, dimensions in self.db.query(
+                PackagePrealert.tracking_number, PackagePrealert.weight_lb, PackagePrealert.dimensions
+            ).filter(
+                PackagePrealert.carrier == carrier_type,
+                PackagePrealert.tracking_number.in_(package_ids)
+            )
+        ]
+        if not packages:
+            logger.warning("No prealerts found for consolidation",
+                          consolidation_id=consolidation_id)
+            return None
+
+        priced = price_group(TARIFFS[carrier_type], packages)
         
-        estimated_savings = len(package_ids) * 15.00  # USD per package (example)
+        # Keep the carrier's own figure when it reported one
+        self.db.query(PackageConsolidation).filter(
+            PackageConsolidation.consolidation_id == consolidation_id,
+            (PackageConsolidation.savings_amount.is_(None)) | (PackageConsolidation.savings_amount == 0)
+        ).update({
+            PackageConsolidation.volumetric_weight: priced.volumetric_weight_lb,
+            PackageConsolidation.billable_weight: priced.billable_weight_lb,
+            PackageConsolidation.savings_amount: priced.savings_usd
+        }, synchronize_session=False)
+        self.db.commit()
         
         logger.info("Consolidation savings calculated",
                    consolidation_id=consolidation_id,
-                   savings_usd=estimated_savings)
+                   packages_priced=len(packages),
+                   savings_usd=priced.savings_usd)
         
         return {
             "consolidation_id": consolidation_id,
             "packages_consolidated": len(package_ids),
-            "estimated_savings_usd": estimated_savings
+            "packages_priced": len(packages),
+            "billable_weight_lb": priced.billable_weight_lb,
+            "estimated_cost_usd": priced.cost_usd,
+            "estimated_savings_usd": priced.savings_usd
         }
         
     except Exception as e:
+        self.db.rollback()
         logger.error("Failed to calculate savings", error=str(e))
         return None
 
@@ -449,33 +496,23 @@ def validate_customs_declaration(declaration_id: str, items: List[Dict[str, Any]
 
 
 @app.task(
+    bind=True,
+    base=MailboxTask,
     name='src.tasks.international_mailbox_tasks.send_mailbox_callback'
 )
-def send_mailbox_callback(callback_url: str, data: Dict[str, Any]):
+def send_mailbox_callback(self, callback_url: str, data: Dict[str, Any]):
     """
-    Send callback to webhook URL
+    Queue a callback to a webhook URL for the callback dispatcher
     
     Args:
         callback_url: Webhook URL
         data: Data to send
     """
-    import httpx
+    delivery = enqueue_callback(self.db, callback_url, "mailbox.callback", data)
+    self.db.commit()
     
-    try:
-        with httpx.Client() as client:
-            response = client.post(
-                callback_url,
-                json=data,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            
-        logger.info("Mailbox callback sent successfully", url=callback_url)
-        
-    except Exception as e:
-        logger.error("Failed to send mailbox callback",
-                    url=callback_url,
-                    error=str(e))
+    logger.info("Mailbox callback queued", url=callback_url, delivery_id=delivery.id)
+    return {'delivery_id': delivery.id}
 
 
 @app.task(
@@ -534,48 +571,46 @@ def process_arrived_packages(self):
     """
     Process packages that have arrived at origin warehouse
     
-    This task runs daily to check for packages ready to ship
+    This task runs daily to check for packages ready to ship. Arrived
+    packages are read joined to their mailbox in one query and each
+    customer's packages are packed into consolidated boxes priced against
+    the carrier's tariff; customers with a saving get a suggestion.
     """
     try:
         logger.info("Processing arrived packages",
                    task_id=self.request.id)
         
-        # Get packages that arrived but not yet shipped
-        arrived_packages = self.db.query(PackagePrealert).filter(
-            PackagePrealert.status == "arrived",
-            PackagePrealert.arrived_at.isnot(None)
-        ).all()
-        
-        # Group by customer for consolidation opportunities
-        by_customer = {}
-        for package in arrived_packages:
-            mailbox = self.db.query(InternationalMailbox).filter(
-                InternationalMailbox.mailbox_id == package.mailbox_id
-            ).first()
+        arrived = 0
+        suggestions = []
+        total_savings = 0.0
+        for plan in plan_arrived_packages(self.db):
+            arrived += plan.packages
+            if not plan.groups:
+                continue
             
-            if mailbox:
-                customer_id = mailbox.customer_id
-                if customer_id not in by_customer:
-                    by_customer[customer_id] = []
-                by_customer[customer_id].append(package)
+            total_savings += plan.savings_usd
+            suggestions.append(suggest_consolidation.s(
+                plan.customer_id,
+                [package_id for g in plan.groups for package_id in g.package_ids],
+                carrier=plan.carrier.value,
+                groups=[g._asdict() for g in plan.groups],
+                estimated_savings_usd=plan.savings_usd
+            ))
         
-        # Check consolidation opportunities
-        consolidation_suggestions = []
-        for customer_id, packages in by_customer.items():
-            if len(packages) >= 2:
-                consolidation_suggestions.append({
-                    "customer_id": customer_id,
-                    "packages": len(packages),
-                    "potential_savings": len(packages) * 15.00  # USD
-                })
-                
-                # Send consolidation suggestion
-                suggest_consolidation.delay(customer_id, 
-                                          [p.tracking_number for p in packages])
+        # Send consolidation suggestions over one broker connection
+        if suggestions:
+            group(suggestions).apply_async()
+        
+        logger.info("Arrived packages processed",
+                   task_id=self.request.id,
+                   arrived_packages=arrived,
+                   consolidation_suggestions=len(suggestions),
+                   potential_savings_usd=round(total_savings, 2))
         
         return {
-            "arrived_packages": len(arrived_packages),
-            "consolidation_suggestions": len(consolidation_suggestions),
+            "arrived_packages": arrived,
+            "consolidation_suggestions": len(suggestions),
+            "potential_savings_usd": round(total_savings, 2),
             "processed_at": datetime.now().isoformat()
         }
         
@@ -589,25 +624,32 @@ def process_arrived_packages(self):
 @app.task(
     name='src.tasks.international_mailbox_tasks.suggest_consolidation'
 )
-def suggest_consolidation(customer_id: str, package_ids: List[str]):
+def suggest_consolidation(customer_id: str, package_ids: List[str], carrier: Optional[str] = None,
+                          groups: Optional[List[Dict[str, Any]]] = None,
+                          estimated_savings_usd: Optional[float] = None):
     """
     Send consolidation suggestion to customer
     
     Args:
         customer_id: Customer identifier
         package_ids: List of packages that can be consolidated
+        carrier: PASAREX or AEROPOST
+        groups: Suggested boxes, each with its package_ids, weights, cost and savings
+        estimated_savings_usd: Savings of the suggested boxes over shipping each package alone
     """
     logger.info("Sending consolidation suggestion",
                customer_id=customer_id,
-               packages_count=len(package_ids))
+               packages_count=len(package_ids),
+               boxes=len(groups or []))
     
     # TODO: Implement notification
     # - Send email with consolidation benefits
     # - Show in customer dashboard
-    # - Calculate exact savings
     
     return {
         "customer_id": customer_id,
+        "carrier": carrier,
         "packages_suggested": len(package_ids),
-        "estimated_savings_usd": len(package_ids) * 15.00
-    }
\ No newline at end of file
+        "groups": groups or [],
+        "estimated_savings_usd": estimated_savings_usd
+    }
@@ -1,16 +1,29 @@
 from celery import Task
 from ..celery_app import app
 from typing import Dict, Any, List
+import os
 import structlog
-import asyncio
 from datetime import datetime, timedelta
 
-from ..database import SessionLocal
-from ..models import TrackingEvent, ShippingLabel, CarrierType
+from ..database import SessionLocal, engine
+from ..models import TrackingEvent, CarrierType
+from ..services.callback_dispatcher import enqueue_callback
 from ..services.carrier_service import CarrierService
+from ..services.tracking_sync import (
+    ActiveShipment, EXCEPTION_STATUSES, TRACKING_SYNC_DAYS, TrackingSyncEngine, is_terminal, select_active_shipments
+)
+from ..services.tracking_partitions import drop_expired_partitions, ensure_partitions
+from ..services.tracking_scheduler import TrackingPollScheduler, compute_carrier_cadence, observe_detection_delay
+from .worker_loop import run_async
 
 logger = structlog.get_logger()
 
+# Shipments handed to one sync_tracking_batch task
+TRACKING_TASK_BATCH = 500
+
+# Next-poll times of every active shipment
+poll_scheduler = TrackingPollScheduler()
+
 
 class TrackingTask(Task):
     """Base task for tracking operations"""
@@ -25,9 +38,17 @@ class TrackingTask(Task):
     
     @property
     def carrier_service(self):
+        # Lives as long as the worker process, like the loop its clients are bound to
         if self._carrier_service is None:
             self._carrier_service = CarrierService()
         return self._carrier_service
+
+    async def ensure_carrier(self, carrier: str) -> CarrierService:
+        """Worker carrier service with ``carrier`` initialized from environment credentials"""
+        service = self.carrier_service
+        if carrier not in service.carriers:
+            await service.initialize_carrier(carrier)
+        return service
     
     def after_return(self, status, retval, task_id, args, kwargs, einfo):
         if self._db is not None:
@@ -58,65 +79,31 @@ def sync_tracking_async(self, tracking_number: str, carrier: str):
                    tracking_number=tracking_number,
                    carrier=carrier)
         
-        # Get tracking info from carrier
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            tracking = loop.run_until_complete(
-                self.carrier_service.track_shipment(carrier, tracking_number)
-            )
-            
-            # Save tracking events to database
-            for event in tracking.events:
-                # Check if event already exists
-                existing = self.db.query(TrackingEvent).filter(
-                    TrackingEvent.tracking_number == tracking_number,
-                    TrackingEvent.event_date == event.date,
-                    TrackingEvent.status == event.status
-                ).first()
-                
-                if not existing:
-                    db_event = TrackingEvent(
-                        tracking_number=tracking_number,
-                        carrier=CarrierType[carrier],
-                        event_date=event.date,
-                        status=event.status,
-                        description=event.description,
-                        location=event.location,
-                        raw_data=event.details
-                    )
-                    self.db.add(db_event)
-            
-            self.db.commit()
-            
-            # Check if delivered
-            if tracking.status.lower() in ['delivered', 'entregado']:
-                # Trigger delivery notification
-                notify_delivery.delay(tracking_number, carrier, tracking.proof_of_delivery)
-            
-            # Check for exceptions or delays
-            if tracking.status.lower() in ['exception', 'delayed', 'failed']:
-                # Trigger exception notification
-                notify_exception.delay(tracking_number, carrier, tracking.status)
-            
-            logger.info("Tracking synced successfully",
-                       tracking_number=tracking_number,
-                       status=tracking.status,
-                       events_count=len(tracking.events))
-            
-            return {
-                'tracking_number': tracking_number,
-                'carrier': carrier,
-                'status': tracking.status,
-                'current_location': tracking.current_location,
-                'events_count': len(tracking.events),
-                'delivered': tracking.delivered_date is not None
-            }
-            
-        finally:
-            loop.close()
-            
+        last_event = self.db.query(TrackingEvent.status).filter(
+            TrackingEvent.tracking_number == tracking_number,
+            TrackingEvent.event_date >= datetime.now() - timedelta(days=TRACKING_SYNC_DAYS)
+        ).order_by(TrackingEvent.event_date.desc()).first()
+        shipment = ActiveShipment(tracking_number, carrier, last_event.status if last_event else None)
+
+        stats = run_async(_sync_shipments(self, carrier, [shipment]))
+        tracking = stats.pop('results').get(tracking_number)
+        if tracking is None:
+            raise Exception(f"No tracking information returned for {tracking_number}")
+
+        logger.info("Tracking synced successfully",
+                   tracking_number=tracking_number,
+                   status=tracking.status,
+                   events_count=len(tracking.events))
+
+        return {
+            'tracking_number': tracking_number,
+            'carrier': carrier,
+            'status': tracking.status,
+            'current_location': tracking.current_location,
+            'events_count': len(tracking.events),
+            'delivered': tracking.delivered_date is not None
+        }
+
     except Exception as e:
         logger.error("Tracking sync failed",
                     task_id=self.request.id,
@@ -137,48 +124,43 @@ def sync_all_tracking(self):
     try:
         logger.info("Starting bulk tracking sync", task_id=self.request.id)
         
-        # Get all active shipments (not delivered)
-        active_shipments = self.db.query(ShippingLabel).filter(
-            ShippingLabel.created_at >= datetime.now() - timedelta(days=30)
-        ).all()
-        
-        synced_count = 0
-        failed_count = 0
-        
+        # One query for every recent shipment whose latest event is not terminal
+        active_shipments = select_active_shipments(self.db)
+
+        by_carrier: Dict[str, List[List[str]]] = {}
         for shipment in active_shipments:
-            try:
-                # Check if already delivered
-                last_event = self.db.query(TrackingEvent).filter(
-                    TrackingEvent.tracking_number == shipment.tracking_number
-                ).order_by(TrackingEvent.event_date.desc()).first()
-                
-                if last_event and last_event.status.lower() in ['delivered', 'entregado']:
-                    continue  # Skip delivered shipments
-                
-                # Queue tracking sync
-                sync_tracking_async.delay(
-                    shipment.tracking_number,
-                    shipment.carrier.value
-                )
-                synced_count += 1
-                
-            except Exception as e:
-                logger.error("Failed to queue tracking sync",
-                           tracking_number=shipment.tracking_number,
-                           error=str(e))
-                failed_count += 1
-        
+            by_carrier.setdefault(shipment.carrier, []).append(
+                [shipment.tracking_number, shipment.last_status]
+            )
+
+        queued_count = 0
+        failed_count = 0
+
+        for carrier, shipments in by_carrier.items():
+            for start in range(0, len(shipments), TRACKING_TASK_BATCH):
+                batch = shipments[start:start + TRACKING_TASK_BATCH]
+                try:
+                    sync_tracking_batch.apply_async(args=[carrier, batch], queue='tracking')
+                    queued_count += len(batch)
+                except Exception as e:
+                    logger.error("Failed to queue tracking batch",
+                               carrier=carrier,
+                               count=len(batch),
+                               error=str(e))
+                    failed_count += len(batch)
+
         logger.info("Bulk tracking sync completed",
                    task_id=self.request.id,
-                   synced_count=synced_count,
-                   failed_count=failed_count)
-        
+                   synced_count=queued_count,
+                   failed_count=failed_count,
+                   carriers=list(by_carrier))
+
         return {
-            'synced': synced_count,
+            'synced': queued_count,
             'failed': failed_count,
             'total': len(active_shipments)
         }
-        
+
     except Exception as e:
         logger.error("Bulk tracking sync failed",
                     task_id=self.request.id,
@@ -186,6 +168,180 @@ def sync_all_tracking(self):
         raise
 
 
+@app.task(
+    bind=True,
+    base=TrackingTask,
+    name='src.tasks.tracking_tasks.sync_tracking_batch',
+    max_retries=3
+)
+def sync_tracking_batch(self, carrier: str, shipments: List[List[str]]):
+    """
+    Sync tracking for a batch of one carrier's shipments
+
+    Args:
+        carrier: Carrier name
+        shipments: [tracking_number, last_known_status] pairs
+
+    Returns:
+        Sync counters for the batch
+    """
+    try:
+        logger.info("Syncing tracking batch",
+                   task_id=self.request.id,
+                   carrier=carrier,
+                   count=len(shipments))
+
+        active = [
+            ActiveShipment(tracking_number, carrier, last_status)
+            for tracking_number, last_status in shipments
+            if not is_terminal(carrier, last_status)
+        ]
+        stats = run_async(_sync_shipments(self, carrier, active))
+        stats.pop('results')
+
+        logger.info("Tracking batch synced", task_id=self.request.id, carrier=carrier, **stats)
+        return stats
+
+    except Exception as e:
+        logger.error("Tracking batch sync failed",
+                    task_id=self.request.id,
+                    carrier=carrier,
+                    error=str(e))
+        raise self.retry(exc=e, countdown=300)
+
+
+async def _sync_shipments(task: TrackingTask, carrier: str, shipments: List[ActiveShipment]) -> Dict[str, Any]:
+    """Run the batched sync engine for one carrier; the results are returned under 'results'"""
+    service = await task.ensure_carrier(carrier)
+    results = {}
+
+    def on_tracked(shipment: ActiveShipment, tracking) -> None:
+        results[shipment.tracking_number] = tracking
+
+    def on_new_events(shipment: ActiveShipment, tracking, events: List[Dict[str, Any]]) -> None:
+        # A first sync stores the shipment's whole history, which says nothing about polling delay
+        if shipment.last_status is not None:
+            observe_detection_delay(carrier, events)
+
+        # Only events stored for the first time notify, never a re-synced one
+        statuses = [event['status'] for event in events]
+        if any(status.lower() in ('delivered', 'entregado') for status in statuses):
+            notify_delivery.delay(shipment.tracking_number, carrier, tracking.proof_of_delivery)
+        else:
+            for status in statuses:
+                if status.lower() in EXCEPTION_STATUSES:
+                    notify_exception.delay(shipment.tracking_number, carrier, status)
+                    break
+
+    engine = TrackingSyncEngine(service, on_tracked=on_tracked, on_new_events=on_new_events)
+    stats = await engine.sync(shipments)
+
+    # Shipments that failed keep their lease and are retried when it expires
+    synced = [(shipment, results[shipment.tracking_number]) for shipment in shipments if shipment.tracking_number in results]
+    try:
+        stats.update(await poll_scheduler.reschedule(synced))
+    except Exception as e:
+        logger.warning("Failed to reschedule tracking polls", carrier=carrier, error=str(e))
+
+    stats['results'] = results
+    return stats
+
+
+@app.task(
+    bind=True,
+    base=TrackingTask,
+    name='src.tasks.tracking_tasks.poll_due_tracking'
+)
+def poll_due_tracking(self):
+    """
+    Queue tracking syncs for the shipments whose next poll is due
+    """
+    try:
+        shipments = run_async(poll_scheduler.claim_due())
+
+        by_carrier: Dict[str, List[List[str]]] = {}
+        for shipment in shipments:
+            by_carrier.setdefault(shipment.carrier, []).append(
+                [shipment.tracking_number, shipment.last_status]
+            )
+
+        for carrier, batch in by_carrier.items():
+            for start in range(0, len(batch), TRACKING_TASK_BATCH):
+                sync_tracking_batch.apply_async(
+                    args=[carrier, batch[start:start + TRACKING_TASK_BATCH]],
+                    queue='tracking'
+                )
+
+        logger.info("Due tracking polls queued",
+                   task_id=self.request.id,
+                   due=len(shipments),
+                   carriers={carrier: len(batch) for carrier, batch in by_carrier.items()})
+
+        return {'queued': len(shipments)}
+
+    except Exception as e:
+        logger.error("Failed to queue due tracking polls",
+                    task_id=self.request.id,
+                    error=str(e))
+        raise
+
+
+@app.task(
+    bind=True,
+    base=TrackingTask,
+    name='src.tasks.tracking_tasks.enroll_active_shipments'
+)
+def enroll_active_shipments(self):
+    """
+    Add active shipments missing from the poll schedule (new labels), due immediately,
+    and drop the scheduled ones that are no longer active
+    """
+    try:
+        active_shipments = select_active_shipments(self.db)
+        enrolled = run_async(poll_scheduler.enroll(active_shipments))
+        pruned = run_async(poll_scheduler.prune(active_shipments))
+
+        logger.info("Active shipments enrolled for tracking",
+                   task_id=self.request.id,
+                   active=len(active_shipments),
+                   enrolled=enrolled,
+                   pruned=pruned)
+
+        return {'active': len(active_shipments), 'enrolled': enrolled, 'pruned': pruned}
+
+    except Exception as e:
+        logger.error("Failed to enroll active shipments",
+                    task_id=self.request.id,
+                    error=str(e))
+        raise
+
+
+@app.task(
+    bind=True,
+    base=TrackingTask,
+    name='src.tasks.tracking_tasks.refresh_tracking_cadence'
+)
+def refresh_tracking_cadence(self):
+    """
+    Recompute each carrier's median gap between tracking events per shipment phase
+    """
+    try:
+        cadence = compute_carrier_cadence(self.db)
+        run_async(poll_scheduler.store_cadence(cadence))
+
+        logger.info("Tracking cadence refreshed",
+                   task_id=self.request.id,
+                   cadence=cadence)
+
+        return cadence
+
+    except Exception as e:
+        logger.error("Failed to refresh tracking cadence",
+                    task_id=self.request.id,
+                    error=str(e))
+        raise
+
+
 @app.task(
     bind=True,
     base=TrackingTask,
@@ -193,36 +349,70 @@ def sync_all_tracking(self):
 )
 def clean_old_tracking_events(self, days_to_keep: int = 90):
     """
-    Clean old tracking events from database
+    Drop tracking event partitions older than the retention window
+    
+    Whole monthly partitions are detached and dropped, so a month is kept
+    until its last day is older than days_to_keep.
     
     Args:
         days_to_keep: Number of days to keep tracking events
     """
     try:
-        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-        
-        # Delete old tracking events
-        deleted_count = self.db.query(TrackingEvent).filter(
-            TrackingEvent.created_at < cutoff_date
-        ).delete()
-        
-        self.db.commit()
+        result = drop_expired_partitions(engine, days_to_keep)
         
         logger.info("Old tracking events cleaned",
                    task_id=self.request.id,
-                   deleted_count=deleted_count,
-                   cutoff_date=cutoff_date)
+                   **result)
         
-        return {'deleted_count': deleted_count}
+        return result
         
     except Exception as e:
         logger.error("Failed to clean old tracking events",
                     task_id=self.request.id,
                     error=str(e))
-        self.db.rollback()
         raise
 
 
+@app.task(
+    bind=True,
+    base=TrackingTask,
+    name='src.tasks.tracking_tasks.create_tracking_partitions'
+)
+def create_tracking_partitions(self):
+    """
+    Create the coming months' tracking event partitions
+    """
+    try:
+        created = ensure_partitions(engine)
+        
+        logger.info("Tracking event partitions checked",
+                   task_id=self.request.id,
+                   created=created)
+        
+        return {'created': created}
+        
+    except Exception as e:
+        logger.error("Failed to create tracking event partitions",
+                    task_id=self.request.id,
+                    error=str(e))
+        raise
+
+
+# Merchant endpoint that receives delivery and exception notifications, if any
+TRACKING_CALLBACK_URL = os.getenv("TRACKING_CALLBACK_URL")
+
+
+def _send_tracking_callback(event: str, notification_data: Dict[str, Any]):
+    if not TRACKING_CALLBACK_URL:
+        return
+    db = SessionLocal()
+    try:
+        enqueue_callback(db, TRACKING_CALLBACK_URL, event, notification_data)
+        db.commit()
+    finally:
+        db.close()
+
+
 @app.task(
     name='src.tasks.tracking_tasks.notify_delivery'
 )
@@ -248,8 +438,7 @@ def notify_delivery(tracking_number: str, carrier: str, proof_of_delivery: Dict[
         'timestamp': datetime.now().isoformat()
     }
     
-    # Example: Send to message queue
-    # publish_to_queue('notifications.delivery', notification_data)
+    _send_tracking_callback('tracking.delivered', notification_data)
     
     return notification_data
 
@@ -278,6 +467,7 @@ def notify_exception(tracking_number: str, carrier: str, status: str):
         'status': status,
         'timestamp': datetime.now().isoformat()
     }
+    _send_tracking_callback('tracking.exception', notification_data)
     
     return notification_data
 
@@ -291,27 +481,18 @@ def batch_tracking_update(self, tracking_numbers: List[str], carrier: str):
     """
     Update tracking for multiple shipments in batch
     """
-    results = []
-    
-    for tracking_number in tracking_numbers:
-        try:
-            result = sync_tracking_async.apply_async(
-                args=[tracking_number, carrier],
-                queue='tracking'
-            )
-            results.append({
-                'tracking_number': tracking_number,
-                'task_id': result.id,
-                'status': 'queued'
-            })
-        except Exception as e:
-            results.append({
-                'tracking_number': tracking_number,
-                'status': 'failed',
-                'error': str(e)
-            })
-    
-    return results
+    result = sync_tracking_batch.apply_async(
+        args=[carrier, [[tracking_number, None] for tracking_number in tracking_numbers]],
+        queue='tracking'
+    )
+    return [
+        {
+            'tracking_number': tracking_number,
+            'task_id': result.id,
+            'status': 'queued'
+        }
+        for tracking_number in tracking_numbers
+    ]
 
 
 @app.task(
@@ -326,8 +507,9 @@ def analyze_delivery_performance(self, carrier: str = None, days: int = 30):
     try:
         cutoff_date = datetime.now() - timedelta(days=days)
         
+        # By event date, so only the partitions in the period are read
         query = self.db.query(TrackingEvent).filter(
-            TrackingEvent.created_at >= cutoff_date
+            TrackingEvent.event_date >= cutoff_date
         )
         
         if carrier:
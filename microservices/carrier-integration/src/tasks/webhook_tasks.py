@@ -1,12 +1,23 @@
 from celery import Task
 from ..celery_app import app
-from typing import Dict, Any
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple
 import structlog
 import httpx
+import os
+import socket
+import time
 from datetime import datetime
 
+from sqlalchemy.exc import InterfaceError, OperationalError
+
 from ..database import SessionLocal
-from ..models import TrackingEvent, CarrierType, ApiCallLog
+from ..models import CarrierType
+from ..services.api_call_log import api_call_log
+from ..services.callback_dispatcher import claim_deliveries, record_results, send_batches
+from ..services.tracking_events import event_key, event_row, insert_tracking_events
+from ..services.webhook_ingest import WEBHOOK_DRAIN_SECONDS, StreamEntry, webhook_stream
+from .worker_loop import run_async
 
 logger = structlog.get_logger()
 
@@ -46,23 +57,13 @@ def process_webhook_async(self, carrier: str, webhook_type: str, data: Dict[str,
     Returns:
         Processing result
     """
+    started = time.monotonic()
     try:
         logger.info("Processing webhook",
                    task_id=self.request.id,
                    carrier=carrier,
                    webhook_type=webhook_type)
         
-        # Log the webhook call
-        api_log = ApiCallLog(
-            carrier=CarrierType[carrier.upper()],
-            endpoint=f"webhook/{webhook_type}",
-            method="POST",
-            request_data=data,
-            status_code=200,
-            latency_ms=0
-        )
-        self.db.add(api_log)
-        
         # Process based on webhook type
         if webhook_type == "tracking":
             result = process_tracking_webhook(self, carrier, data)
@@ -78,10 +79,14 @@ def process_webhook_async(self, carrier: str, webhook_type: str, data: Dict[str,
                           carrier=carrier)
             result = {'status': 'unknown_type'}
         
-        # Update API log with result
-        api_log.response_data = result
         self.db.commit()
         
+        # Audit the webhook outside the processing transaction
+        api_call_log.record(
+            carrier, f"webhook/{webhook_type}", "POST", (time.monotonic() - started) * 1000,
+            status_code=200, request_data=data, response_data=result
+        )
+        
         logger.info("Webhook processed successfully",
                    task_id=self.request.id,
                    carrier=carrier,
@@ -96,140 +101,150 @@ def process_webhook_async(self, carrier: str, webhook_type: str, data: Dict[str,
                     webhook_type=webhook_type,
                     error=str(e))
         
-        # Log the error
-        if 'api_log' in locals():
-            api_log.error_message = str(e)
-            api_log.status_code = 500
-            self.db.commit()
+        self.db.rollback()
+        api_call_log.record(
+            carrier, f"webhook/{webhook_type}", "POST", (time.monotonic() - started) * 1000,
+            status_code=500, request_data=data, error_message=str(e), level="error"
+        )
         
         raise self.retry(exc=e)
 
 
-def process_tracking_webhook(task: WebhookTask, carrier: str, data: Dict[str, Any]):
-    """Process tracking update webhook"""
+def tracking_webhook_rows(carrier: str, data: Dict[str, Any]) -> list:
+    """tracking_events rows of a tracking update webhook"""
     tracking_number = extract_tracking_number(carrier, data)
-    events = extract_tracking_events(carrier, data)
-    
-    saved_count = 0
-    for event in events:
-        # Check if event already exists
-        existing = task.db.query(TrackingEvent).filter(
-            TrackingEvent.tracking_number == tracking_number,
-            TrackingEvent.event_date == event['date'],
-            TrackingEvent.status == event['status']
-        ).first()
-        
-        if not existing:
-            db_event = TrackingEvent(
-                tracking_number=tracking_number,
-                carrier=CarrierType[carrier.upper()],
-                event_date=event['date'],
-                status=event['status'],
-                description=event['description'],
-                location=event.get('location'),
-                raw_data=event
-            )
-            task.db.add(db_event)
-            saved_count += 1
-    
-    task.db.commit()
-    
-    # Check for important status changes
-    if any(e['status'].lower() in ['delivered', 'exception', 'failed'] for e in events):
-        # Trigger notifications
+    return [
+        event_row(
+            tracking_number,
+            CarrierType[carrier.upper()],
+            event['date'],
+            event['status'],
+            event['description'],
+            event.get('location'),
+            event['raw_data']
+        )
+        for event in extract_tracking_events(carrier, data)
+    ]
+
+
+def pod_webhook_rows(carrier: str, data: Dict[str, Any]) -> list:
+    """tracking_events row of a proof of delivery webhook"""
+    pod_data = extract_pod_data(carrier, data)
+    return [event_row(
+        extract_tracking_number(carrier, data),
+        CarrierType[carrier.upper()],
+        pod_data.get('delivery_date') or datetime.now(),
+        "DELIVERED",
+        f"Delivered to {pod_data.get('recipient') or 'recipient'}",
+        pod_data.get('location'),
+        data
+    )]
+
+
+def exception_webhook_rows(carrier: str, data: Dict[str, Any]) -> list:
+    """tracking_events row of a shipment exception webhook"""
+    exception_data = extract_exception_data(carrier, data)
+    return [event_row(
+        extract_tracking_number(carrier, data),
+        CarrierType[carrier.upper()],
+        exception_data.get('date', datetime.now()),
+        "EXCEPTION",
+        exception_data.get('description', 'Shipment exception'),
+        exception_data.get('location'),
+        data
+    )]
+
+
+def status_change_webhook_rows(carrier: str, data: Dict[str, Any]) -> list:
+    """tracking_events row of a general status change webhook"""
+    new_status = data.get('status', 'UNKNOWN')
+    return [event_row(
+        extract_tracking_number(carrier, data),
+        CarrierType[carrier.upper()],
+        datetime.now(),
+        new_status,
+        data.get('description', f'Status changed to {new_status}'),
+        data.get('location'),
+        data
+    )]
+
+
+WEBHOOK_ROWS = {
+    'tracking': tracking_webhook_rows,
+    'pod': pod_webhook_rows,
+    'exception': exception_webhook_rows,
+    'status_change': status_change_webhook_rows,
+}
+
+
+def notify_new_events(carrier: str, webhook_type: str, data: Dict[str, Any], inserted: list):
+    """Follow-up tasks for the events a webhook stored; a redelivered webhook stores none"""
+    if not inserted:
+        return
+    tracking_number = inserted[0]['tracking_number']
+    
+    if webhook_type == 'tracking':
         from .tracking_tasks import notify_delivery, notify_exception
         
-        for event in events:
+        for event in inserted:
             if event['status'].lower() == 'delivered':
-                notify_delivery.delay(tracking_number, carrier, event)
+                notify_delivery.delay(tracking_number, carrier, event['raw_data'])
             elif event['status'].lower() in ['exception', 'failed']:
                 notify_exception.delay(tracking_number, carrier, event['status'])
+    elif webhook_type == 'pod':
+        send_delivery_confirmation.delay(tracking_number, carrier, extract_pod_data(carrier, data))
+    elif webhook_type == 'exception':
+        handle_shipment_exception.delay(tracking_number, carrier, extract_exception_data(carrier, data))
+
+
+def process_tracking_webhook(task: WebhookTask, carrier: str, data: Dict[str, Any]):
+    """Process tracking update webhook"""
+    inserted = insert_tracking_events(task.db, tracking_webhook_rows(carrier, data))
+    task.db.commit()
+    notify_new_events(carrier, 'tracking', data, inserted)
     
     return {
         'status': 'processed',
-        'tracking_number': tracking_number,
-        'events_saved': saved_count
+        'tracking_number': extract_tracking_number(carrier, data),
+        'events_saved': len(inserted)
     }
 
 
 def process_pod_webhook(task: WebhookTask, carrier: str, data: Dict[str, Any]):
     """Process proof of delivery webhook"""
-    tracking_number = extract_tracking_number(carrier, data)
-    pod_data = extract_pod_data(carrier, data)
-    
-    # Save delivery confirmation
-    db_event = TrackingEvent(
-        tracking_number=tracking_number,
-        carrier=CarrierType[carrier.upper()],
-        event_date=pod_data.get('delivery_date', datetime.now()),
-        status="DELIVERED",
-        description=f"Delivered to {pod_data.get('recipient', 'recipient')}",
-        location=pod_data.get('location'),
-        raw_data=data
-    )
-    task.db.add(db_event)
+    inserted = insert_tracking_events(task.db, pod_webhook_rows(carrier, data))
     task.db.commit()
-    
-    # Send delivery confirmation
-    send_delivery_confirmation.delay(tracking_number, carrier, pod_data)
+    notify_new_events(carrier, 'pod', data, inserted)
     
     return {
         'status': 'processed',
-        'tracking_number': tracking_number,
+        'tracking_number': extract_tracking_number(carrier, data),
         'delivered': True
     }
 
 
 def process_exception_webhook(task: WebhookTask, carrier: str, data: Dict[str, Any]):
     """Process shipment exception webhook"""
-    tracking_number = extract_tracking_number(carrier, data)
-    exception_data = extract_exception_data(carrier, data)
-    
-    # Save exception event
-    db_event = TrackingEvent(
-        tracking_number=tracking_number,
-        carrier=CarrierType[carrier.upper()],
-        event_date=exception_data.get('date', datetime.now()),
-        status="EXCEPTION",
-        description=exception_data.get('description', 'Shipment exception'),
-        location=exception_data.get('location'),
-        raw_data=data
-    )
-    task.db.add(db_event)
+    inserted = insert_tracking_events(task.db, exception_webhook_rows(carrier, data))
     task.db.commit()
-    
-    # Trigger exception handling
-    handle_shipment_exception.delay(tracking_number, carrier, exception_data)
+    notify_new_events(carrier, 'exception', data, inserted)
     
     return {
         'status': 'processed',
-        'tracking_number': tracking_number,
+        'tracking_number': extract_tracking_number(carrier, data),
         'exception': True
     }
 
 
 def process_status_change_webhook(task: WebhookTask, carrier: str, data: Dict[str, Any]):
     """Process general status change webhook"""
-    tracking_number = extract_tracking_number(carrier, data)
-    new_status = data.get('status', 'UNKNOWN')
-    
-    # Save status change
-    db_event = TrackingEvent(
-        tracking_number=tracking_number,
-        carrier=CarrierType[carrier.upper()],
-        event_date=datetime.now(),
-        status=new_status,
-        description=data.get('description', f'Status changed to {new_status}'),
-        location=data.get('location'),
-        raw_data=data
-    )
-    task.db.add(db_event)
+    insert_tracking_events(task.db, status_change_webhook_rows(carrier, data))
     task.db.commit()
     
     return {
         'status': 'processed',
-        'tracking_number': tracking_number,
-        'new_status': new_status
+        'tracking_number': extract_tracking_number(carrier, data),
+        'new_status': data.get('status', 'UNKNOWN')
     }
 
 
@@ -266,7 +281,8 @@ def extract_tracking_events(carrier: str, data: Dict[str, Any]) -> list:
                 'date': datetime.fromisoformat(event['timestamp']),
                 'status': event['statusCode'],
                 'description': event['description'],
-                'location': event.get('location', {}).get('address', {}).get('addressLocality')
+                'location': event.get('location', {}).get('address', {}).get('addressLocality'),
+                'raw_data': event
             })
     
     elif carrier.upper() == 'FEDEX':
@@ -275,7 +291,8 @@ def extract_tracking_events(carrier: str, data: Dict[str, Any]) -> list:
                 'date': datetime.fromisoformat(event['date']),
                 'status': event['derivedStatus'],
                 'description': event['eventDescription'],
-                'location': event.get('scanLocation')
+                'location': event.get('scanLocation'),
+                'raw_data': event
             })
     
     # Add other carrier mappings...
@@ -387,6 +404,179 @@ def notify_customer_exception(tracking_number: str, exception_data: Dict[str, An
     return {'status': 'customer_notified'}
 
 
+def _write_rows(db, rows: list) -> list:
+    inserted = insert_tracking_events(db, rows)
+    db.commit()
+    return inserted
+
+
+def process_webhook_batch(
+    db, entries: List[StreamEntry]
+) -> Tuple[List[StreamEntry], List[Tuple[StreamEntry, str]]]:
+    """
+    Store the tracking events of a micro-batch of ingested webhooks in one transaction
+    
+    Args:
+        db: Database session
+        entries: Webhooks read from the ingestion stream
+    
+    Returns:
+        Entries processed, and entries that can never be processed with the reason
+    """
+    parsed = []
+    dead = []
+    for entry in entries:
+        try:
+            rows_for = WEBHOOK_ROWS.get(entry.webhook_type)
+            if rows_for is None:
+                raise ValueError(f"Unknown webhook type {entry.webhook_type}")
+            data = entry.data
+            parsed.append((entry, data, rows_for(entry.carrier, data)))
+        except Exception as e:
+            dead.append((entry, f"Invalid webhook: {e}"))
+    
+    try:
+        inserted = _write_rows(db, [row for _, _, rows in parsed for row in rows])
+    except (OperationalError, InterfaceError):
+        # Database unavailable: the batch stays pending and is claimed again
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.warning("Webhook batch rejected, writing webhooks one by one",
+                      webhooks=len(parsed),
+                      error=str(e))
+        inserted = []
+        written = []
+        for item in parsed:
+            try:
+                inserted.extend(_write_rows(db, item[2]))
+                written.append(item)
+            except (OperationalError, InterfaceError):
+                db.rollback()
+                raise
+            except Exception as e:
+                db.rollback()
+                dead.append((item[0], str(e)))
+        parsed = written
+    
+    # Hand each new event back to the webhook that carried it
+    owner = {}
+    for index, (_, _, rows) in enumerate(parsed):
+        for row in rows:
+            owner.setdefault(event_key(row), index)
+    new_events = defaultdict(list)
+    for row in inserted:
+        new_events[owner[event_key(row)]].append(row)
+    
+    now = time.time()
+    for index, (entry, data, _) in enumerate(parsed):
+        notify_new_events(entry.carrier, entry.webhook_type, data, new_events[index])
+        api_call_log.record(
+            entry.carrier, f"webhook/{entry.webhook_type}", "POST", (now - entry.appended_at) * 1000,
+            status_code=200, request_data=data, response_data={'events_saved': len(new_events[index])}
+        )
+    
+    return [entry for entry, _, _ in parsed], dead
+
+
+@app.task(
+    bind=True,
+    base=WebhookTask,
+    name='src.tasks.webhook_tasks.drain_webhook_stream'
+)
+def drain_webhook_stream(self, max_seconds: float = WEBHOOK_DRAIN_SECONDS):
+    """
+    Process ingested webhooks from the stream in micro-batches
+    
+    Args:
+        max_seconds: How long to keep reading before leaving the stream to the next run
+    """
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    deadline = time.monotonic() + max_seconds
+    processed = 0
+    dead_lettered = 0
+    
+    try:
+        while time.monotonic() < deadline:
+            entries = run_async(webhook_stream.read(consumer))
+            if not entries:
+                continue
+            
+            done, dead = process_webhook_batch(self.db, entries)
+            run_async(webhook_stream.ack(done))
+            for entry, error in dead:
+                run_async(webhook_stream.dead_letter(entry, error))
+            processed += len(done)
+            dead_lettered += len(dead)
+        
+        backlog = run_async(webhook_stream.backlog())
+        
+    except Exception as e:
+        logger.error("Webhook stream drain failed",
+                    task_id=self.request.id,
+                    consumer=consumer,
+                    processed=processed,
+                    error=str(e))
+        raise
+    
+    logger.info("Webhook stream drained",
+               task_id=self.request.id,
+               consumer=consumer,
+               processed=processed,
+               dead_lettered=dead_lettered,
+               backlog=backlog)
+    
+    return {
+        'processed': processed,
+        'dead_lettered': dead_lettered,
+        'backlog': backlog
+    }
+
+
+@app.task(
+    bind=True,
+    base=WebhookTask,
+    name='src.tasks.webhook_tasks.dispatch_callbacks'
+)
+def dispatch_callbacks(self, max_seconds: float = 10.0):
+    """
+    Send due customer callbacks until none are left or time runs out
+    
+    Args:
+        max_seconds: How long to keep claiming new rounds of deliveries
+    """
+    deadline = time.monotonic() + max_seconds
+    totals = defaultdict(int)
+    rounds = 0
+    
+    try:
+        while time.monotonic() < deadline:
+            batches = claim_deliveries(self.db)
+            if not batches:
+                break
+            
+            results = run_async(send_batches(batches))
+            for outcome, count in record_results(self.db, results).items():
+                totals[outcome] += count
+            rounds += 1
+        
+    except Exception as e:
+        self.db.rollback()
+        logger.error("Callback dispatch failed",
+                    task_id=self.request.id,
+                    error=str(e))
+        raise
+    
+    if rounds:
+        logger.info("Callbacks dispatched",
+                   task_id=self.request.id,
+                   rounds=rounds,
+                   **totals)
+    
+    return {'rounds': rounds, **totals}
+
+
 @app.task(
     bind=True,
     base=WebhookTask,
@@ -394,23 +584,20 @@ def notify_customer_exception(tracking_number: str, exception_data: Dict[str, An
     max_retries=3
 )
 def batch_process_webhooks(self, webhooks: list[Dict[str, Any]]):
-    """Process multiple webhooks in batch"""
+    """Append multiple webhooks to the ingestion stream; duplicates are not appended again"""
     results = []
     
     for webhook in webhooks:
         try:
-            result = process_webhook_async.apply_async(
-                args=[
-                    webhook['carrier'],
-                    webhook['type'],
-                    webhook['data']
-                ],
-                queue='webhooks'
-            )
+            entry_id = run_async(webhook_stream.append(
+                webhook['carrier'],
+                webhook['type'],
+                webhook['data']
+            ))
             results.append({
                 'webhook_id': webhook.get('id'),
-                'task_id': result.id,
-                'status': 'queued'
+                'stream_id': entry_id,
+                'status': 'queued' if entry_id else 'duplicate'
             })
         except Exception as e:
             results.append({
@@ -419,4 +606,4 @@ def batch_process_webhooks(self, webhooks: list[Dict[str, Any]]):
                 'error': str(e)
             })
     
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,47 @@
+"""
+One event loop per Celery worker process
+Tasks that talk to carriers run their coroutines on this loop instead of
+creating and closing a loop per task, so pooled carrier HTTP clients, cached
+tokens and the Redis connection survive from one task to the next.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Optional
+
+import structlog
+from celery.signals import worker_process_shutdown
+
+from ..carriers.transport import close_carrier_clients
+from ..services.callback_dispatcher import close_callback_clients
+
+logger = structlog.get_logger()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_async(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine to completion on the worker's long-lived loop"""
+    return get_worker_loop().run_until_complete(coro)
+
+
+@worker_process_shutdown.connect
+def _close_worker_loop(**kwargs) -> None:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    try:
+        _loop.run_until_complete(close_carrier_clients())
+        _loop.run_until_complete(close_callback_clients())
+    except Exception as e:
+        logger.warning("Failed to close carrier clients", error=str(e))
+    finally:
+        _loop.close()
+        _loop = None
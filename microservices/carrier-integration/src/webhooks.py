@@ -1,91 +1,52 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
 from typing import Dict, Any
+import redis.asyncio as redis
 import structlog
 from datetime import datetime
 from sqlalchemy.orm import Session
 
 from .database import get_db
-from .models import TrackingEvent as TrackingEventModel, CarrierType
+from .models import CarrierType
 from .schemas import TrackingEvent
+from .services.tracking_events import event_row, insert_tracking_events
+from .services.tracking_scheduler import record_webhook
+from .services.webhook_ingest import webhook_stream
 
 logger = structlog.get_logger()
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
 
-@router.post("/dhl/tracking")
-async def dhl_tracking_webhook(
-    request: Request,
-    db: Session = Depends(get_db)
-):
+@router.post("/dhl/tracking", status_code=202)
+async def dhl_tracking_webhook(request: Request):
     """Handle DHL tracking update webhooks"""
     try:
         data = await request.json()
-        logger.info("DHL tracking webhook received", data=data)
-        
-        # Parse DHL webhook format
-        tracking_number = data.get('trackingNumber')
-        events = data.get('events', [])
-        
-        for event in events:
-            # Save tracking event to database
-            db_event = TrackingEventModel(
-                tracking_number=tracking_number,
-                carrier=CarrierType.DHL,
-                event_date=datetime.fromisoformat(event['timestamp']),
-                status=event['statusCode'],
-                description=event['description'],
-                location=event.get('location', {}).get('address', {}).get('addressLocality'),
-                raw_data=event
-            )
-            db.add(db_event)
-        
-        db.commit()
+        logger.info("DHL tracking webhook received", tracking_number=data.get('trackingNumber'))
+        await record_webhook("DHL")
         
-        # TODO: Notify relevant services about tracking update
-        await _notify_tracking_update(tracking_number, "DHL", data)
-        
-        return {"status": "success", "message": "Tracking update processed"}
+        return await _ingest("DHL", "tracking", data)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to process DHL webhook", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/fedex/tracking")
-async def fedex_tracking_webhook(
-    request: Request,
-    db: Session = Depends(get_db)
-):
+@router.post("/fedex/tracking", status_code=202)
+async def fedex_tracking_webhook(request: Request):
     """Handle FedEx tracking update webhooks"""
     try:
         data = await request.json()
-        logger.info("FedEx tracking webhook received", data=data)
-        
-        # Parse FedEx webhook format
-        tracking_info = data.get('trackingInfo', {})
-        tracking_number = tracking_info.get('trackingNumber')
-        events = tracking_info.get('scanEvents', [])
-        
-        for event in events:
-            # Save tracking event to database
-            db_event = TrackingEventModel(
-                tracking_number=tracking_number,
-                carrier=CarrierType.FEDEX,
-                event_date=datetime.fromisoformat(event['date']),
-                status=event['derivedStatus'],
-                description=event['eventDescription'],
-                location=event.get('scanLocation'),
-                raw_data=event
-            )
-            db.add(db_event)
-        
-        db.commit()
+        logger.info("FedEx tracking webhook received",
+                   tracking_number=data.get('trackingInfo', {}).get('trackingNumber'))
+        await record_webhook("FedEx")
         
-        await _notify_tracking_update(tracking_number, "FedEx", data)
-        
-        return {"status": "success", "message": "Tracking update processed"}
+        return await _ingest("FedEx", "tracking", data)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to process FedEx webhook", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -100,17 +61,19 @@ async def ups_quantum_view_webhook(
     try:
         data = await request.json()
         logger.info("UPS Quantum View webhook received", data=data)
+        await record_webhook("UPS")
         
         # Parse UPS Quantum View format
         shipments = data.get('QuantumViewEvents', {}).get('SubscriptionEvents', [])
         
+        rows = []
         for shipment in shipments:
             tracking_number = shipment.get('TrackingNumber')
             events = shipment.get('Activity', [])
             
             for event in events:
                 # Save tracking event to database
-                db_event = TrackingEventModel(
+                row = event_row(
                     tracking_number=tracking_number,
                     carrier=CarrierType.UPS,
                     event_date=datetime.strptime(
@@ -122,8 +85,9 @@ async def ups_quantum_view_webhook(
                     location=event.get('ActivityLocation', {}).get('Address', {}).get('City'),
                     raw_data=event
                 )
-                db.add(db_event)
+                rows.append(row)
         
+        insert_tracking_events(db, rows)
         db.commit()
         
         return {"status": "success", "message": "Quantum View update processed"}
@@ -142,6 +106,7 @@ async def servientrega_notification_webhook(
     try:
         data = await request.json()
         logger.info("Servientrega notification webhook received", data=data)
+        await record_webhook("Servientrega")
         
         # Parse Servientrega webhook format
         guia = data.get('NumeroGuia')
@@ -151,7 +116,7 @@ async def servientrega_notification_webhook(
         descripcion = data.get('Descripcion')
         
         # Save tracking event to database
-        db_event = TrackingEventModel(
+        row = event_row(
             tracking_number=guia,
             carrier=CarrierType.SERVIENTREGA,
             event_date=datetime.fromisoformat(fecha),
@@ -160,10 +125,11 @@ async def servientrega_notification_webhook(
             location=ciudad,
             raw_data=data
         )
-        db.add(db_event)
+        inserted = insert_tracking_events(db, [row])
         db.commit()
         
-        await _notify_tracking_update(guia, "Servientrega", data)
+        if inserted:
+            await _notify_tracking_update(guia, "Servientrega", data)
         
         return {"status": "success", "message": "Notification processed"}
         
@@ -181,6 +147,7 @@ async def interrapidisimo_event_webhook(
     try:
         data = await request.json()
         logger.info("Interrapidisimo event webhook received", data=data)
+        await record_webhook("Interrapidisimo")
         
         # Parse Interrapidisimo webhook format
         evento = data.get('evento', {})
@@ -191,7 +158,7 @@ async def interrapidisimo_event_webhook(
         descripcion = evento.get('descripcion')
         
         # Save tracking event to database
-        db_event = TrackingEventModel(
+        row = event_row(
             tracking_number=remesa,
             carrier=CarrierType.INTERRAPIDISIMO,
             event_date=datetime.fromisoformat(fecha),
@@ -200,10 +167,11 @@ async def interrapidisimo_event_webhook(
             location=ubicacion,
             raw_data=data
         )
-        db.add(db_event)
+        inserted = insert_tracking_events(db, [row])
         db.commit()
         
-        await _notify_tracking_update(remesa, "Interrapidisimo", data)
+        if inserted:
+            await _notify_tracking_update(remesa, "Interrapidisimo", data)
         
         return {"status": "success", "message": "Event processed"}
         
@@ -239,6 +207,8 @@ async def pickit_webhook(
                 logger.warning("Invalid Pickit webhook signature")
                 raise HTTPException(status_code=401, detail="Invalid signature")
         
+        await record_webhook("Pickit")
+        
         # Process webhook event
         event_type = data.get("event_type")
         event_data = data.get("data", {})
@@ -251,7 +221,7 @@ async def pickit_webhook(
             tracking_number = event_data.get("tracking_number")
             
             # Save tracking event to database
-            db_event = TrackingEventModel(
+            row = event_row(
                 tracking_number=tracking_number,
                 carrier=CarrierType.PICKIT,
                 event_date=datetime.fromisoformat(event_data.get("timestamp", datetime.utcnow().isoformat())),
@@ -260,15 +230,16 @@ async def pickit_webhook(
                 location=event_data.get("location"),
                 raw_data=data
             )
-            db.add(db_event)
+            inserted = insert_tracking_events(db, [row])
             db.commit()
             
-            # Notify about tracking update
-            await _notify_tracking_update(tracking_number, "Pickit", result)
-            
-            # Special handling for delivery
-            if event_type == "shipment.delivered":
-                await _notify_delivery_confirmation(tracking_number, "Pickit", result)
+            # Notify about tracking update (not again for a redelivered event)
+            if inserted:
+                await _notify_tracking_update(tracking_number, "Pickit", result)
+                
+                # Special handling for delivery
+                if event_type == "shipment.delivered":
+                    await _notify_delivery_confirmation(tracking_number, "Pickit", result)
         
         elif event_type == "shipment.at_pickup_point":
             # Notify customer about package arrival at pickup point
@@ -288,42 +259,37 @@ async def pickit_webhook(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/dhl/pod")
-async def dhl_proof_of_delivery_webhook(
-    request: Request,
-    db: Session = Depends(get_db)
-):
+@router.post("/dhl/pod", status_code=202)
+async def dhl_proof_of_delivery_webhook(request: Request):
     """Handle DHL Proof of Delivery webhooks"""
     try:
         data = await request.json()
-        logger.info("DHL POD webhook received", data=data)
-        
-        tracking_number = data.get('trackingNumber')
-        pod_data = data.get('proofOfDelivery', {})
-        
-        # Update tracking with delivery confirmation
-        db_event = TrackingEventModel(
-            tracking_number=tracking_number,
-            carrier=CarrierType.DHL,
-            event_date=datetime.fromisoformat(data.get('deliveryDate')),
-            status="DELIVERED",
-            description=f"Delivered to {pod_data.get('signedBy', 'recipient')}",
-            location=data.get('deliveryLocation'),
-            raw_data=data
-        )
-        db.add(db_event)
-        db.commit()
-        
-        # Notify about successful delivery
-        await _notify_delivery_confirmation(tracking_number, "DHL", pod_data)
+        logger.info("DHL POD webhook received", tracking_number=data.get('trackingNumber'))
+        await record_webhook("DHL")
         
-        return {"status": "success", "message": "POD processed"}
+        return await _ingest("DHL", "pod", data)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to process DHL POD webhook", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _ingest(carrier: str, webhook_type: str, data: Dict[str, Any]) -> Dict[str, str]:
+    """Append a webhook to the ingestion stream; the carrier is answered only once it is stored"""
+    try:
+        entry_id = await webhook_stream.append(carrier, webhook_type, data)
+    except redis.RedisError as e:
+        logger.error("Failed to store webhook", carrier=carrier, webhook_type=webhook_type, error=str(e))
+        # The carrier redelivers on 5xx
+        raise HTTPException(status_code=503, detail="Webhook could not be stored, retry later")
+    
+    if entry_id is None:
+        return {"status": "duplicate", "message": "Webhook already received"}
+    return {"status": "accepted", "message": "Webhook queued for processing", "id": entry_id}
+
+
 async def _notify_tracking_update(
     tracking_number: str,
     carrier: str,
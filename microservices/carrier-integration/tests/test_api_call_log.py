@@ -0,0 +1,158 @@
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.models import CarrierType
+from src.schemas import CarrierEnum
+from src.services.api_call_log import (
+    ApiCallLogWriter, drop_expired_api_call_log_partitions, ensure_api_call_log_partitions, partition_name
+)
+
+
+class FakeResult(list):
+    rowcount = 0
+
+
+class FakeConnection:
+    def __init__(self, partitions=(), failures=()):
+        self.partitions = list(partitions)
+        self.failures = list(failures)
+        self.statements = []
+        self.batches = []
+
+    def execute(self, statement, params=None):
+        if self.failures:
+            raise self.failures.pop(0)
+        sql = str(statement)
+        self.statements.append(sql)
+        if "pg_inherits" in sql:
+            return FakeResult(self.partitions)
+        if sql.startswith("INSERT INTO api_call_logs"):
+            self.batches.append(params)
+        return FakeResult()
+
+
+class FakeEngine:
+    def __init__(self, partitions=(), failures=()):
+        self.conn = FakeConnection(partitions, failures)
+
+    @contextmanager
+    def begin(self):
+        yield self.conn
+
+    connect = begin
+
+
+@pytest.fixture
+def no_flusher(monkeypatch):
+    # Flushes are driven from the test instead of the background thread
+    monkeypatch.setattr(ApiCallLogWriter, "_ensure_flusher", lambda self: None)
+
+
+def record(writer, carrier="DHL", level="debug"):
+    writer.record(carrier, "/api/v1/quote", "POST", 12.5, 200, {"weight": 1}, {"rate": 9.9}, level=level)
+
+
+@pytest.mark.usefixtures("no_flusher")
+class TestApiCallLogWriter:
+    def test_written_in_batches(self):
+        engine = FakeEngine()
+        writer = ApiCallLogWriter(engine, flush_rows=2)
+
+        for _ in range(5):
+            record(writer)
+
+        assert writer.flush() == 5
+        assert [len(batch) for batch in engine.conn.batches] == [2, 2, 1]
+        assert engine.conn.batches[0][0]["carrier"] == CarrierType.DHL
+        assert engine.conn.batches[0][0]["request_data"] == {"weight": 1}
+
+    def test_disabled_writer_queues_nothing(self):
+        engine = FakeEngine()
+        writer = ApiCallLogWriter(engine, enabled=False)
+
+        record(writer)
+
+        assert writer.flush() == 0
+
+    def test_unknown_carrier_skipped(self):
+        engine = FakeEngine()
+        writer = ApiCallLogWriter(engine)
+
+        record(writer, carrier="Envia")
+        record(writer, carrier="FedEx")
+
+        writer.flush()
+        assert [row["carrier"] for row in engine.conn.batches[0]] == [CarrierType.FEDEX]
+
+    def test_every_api_carrier_logged(self):
+        engine = FakeEngine()
+        writer = ApiCallLogWriter(engine)
+
+        for carrier in CarrierEnum:
+            record(writer, carrier=carrier.value)
+
+        assert writer.flush() == len(CarrierEnum)
+        assert [row["carrier"] for row in engine.conn.batches[0]] == [CarrierType(c.value) for c in CarrierEnum]
+
+    def test_payloads_dropped_above_high_water(self):
+        engine = FakeEngine()
+        writer = ApiCallLogWriter(engine, queue_size=4, payload_high_water=0.5)
+
+        for _ in range(3):
+            record(writer)
+        record(writer, level="error")
+
+        writer.flush()
+        rows = engine.conn.batches[0]
+        assert [row["request_data"] is None for row in rows] == [False, False, True, False]
+
+    def test_records_dropped_when_full(self):
+        engine = FakeEngine()
+        writer = ApiCallLogWriter(engine, queue_size=3)
+
+        for _ in range(5):
+            record(writer, level="error")
+
+        assert writer.flush() == 3
+
+    def test_requeued_when_database_unavailable(self):
+        engine = FakeEngine(failures=[OperationalError("INSERT", {}, Exception("connection refused"))])
+        writer = ApiCallLogWriter(engine, flush_rows=10)
+        for _ in range(3):
+            record(writer)
+
+        assert writer.flush() == 0
+        assert writer.flush() == 3
+        assert len(engine.conn.batches) == 1
+
+
+class TestApiCallLogPartitions:
+    def test_partition_name(self):
+        assert partition_name(date(2026, 1, 5)) == "api_call_logs_p20260105"
+
+    def test_creates_missing_days_only(self):
+        engine = FakeEngine([
+            ("api_call_logs_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-10-17 00:00:00')"),
+            ("api_call_logs_default", "DEFAULT"),
+        ])
+
+        created = ensure_api_call_log_partitions(engine, days_ahead=2, now=datetime(2026, 10, 16, 15))
+
+        # Today is still covered by the legacy partition
+        assert created == ["api_call_logs_p20261017", "api_call_logs_p20261018"]
+        assert any("DELETE FROM api_call_logs_default" in sql for sql in engine.conn.statements)
+
+    def test_drops_only_expired_days(self):
+        engine = FakeEngine([
+            ("api_call_logs_p20260914", "FOR VALUES FROM ('2026-09-14 00:00:00') TO ('2026-09-15 00:00:00')"),
+            ("api_call_logs_p20260915", "FOR VALUES FROM ('2026-09-15 00:00:00') TO ('2026-09-16 00:00:00')"),
+            ("api_call_logs_default", "DEFAULT"),
+        ])
+
+        result = drop_expired_api_call_log_partitions(engine, days_to_keep=30, now=datetime(2026, 10, 15, 12))
+
+        assert result["dropped"] == ["api_call_logs_p20260914"]
+        assert any('DETACH PARTITION "api_call_logs_p20260914"' in sql for sql in engine.conn.statements)
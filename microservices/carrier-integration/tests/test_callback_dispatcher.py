@@ -0,0 +1,172 @@
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import httpx
+import pytest
+
+from src.models import CallbackDelivery
+from src.services import callback_dispatcher
+from src.services.callback_dispatcher import (
+    CallbackBatch, CallbackResult, endpoint_of, next_open_for, record_results, retry_delay, send_batch, sign
+)
+
+NOW = datetime(2026, 10, 16, 12, 0)
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def with_for_update(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def one(self):
+        return self.rows[0]
+
+
+class FakeSession:
+    def __init__(self, deliveries, endpoint):
+        self.deliveries = deliveries
+        self.endpoint = endpoint
+        self.commits = 0
+
+    def query(self, model):
+        return FakeQuery(self.deliveries if model is CallbackDelivery else [self.endpoint])
+
+    def execute(self, statement):
+        return None
+
+    def commit(self):
+        self.commits += 1
+
+
+def delivery(delivery_id, attempts=0):
+    return SimpleNamespace(
+        id=delivery_id, event="mailbox.assigned", attempts=attempts, status="sending",
+        last_status_code=None, last_error=None, claimed_at=NOW, next_attempt_at=None, delivered_at=None
+    )
+
+
+def batch(*ids):
+    items = [{"id": i, "event": "mailbox.assigned", "created_at": None, "data": {"mailbox_id": "MB1"}} for i in ids]
+    return CallbackBatch("https://shop.example.com/hooks/quenty", "https://shop.example.com", items)
+
+
+def client_answering(status_code, headers=None):
+    client = Mock()
+    client.post = AsyncMock(return_value=Mock(status_code=status_code, headers=headers or {}))
+    return client
+
+
+class TestCallbackPolicy:
+    def test_endpoint_is_scheme_host_and_port(self):
+        assert endpoint_of("https://Shop.Example.com/hooks?x=1") == "https://shop.example.com"
+        assert endpoint_of("http://10.0.0.5:8080/cb") == "http://10.0.0.5:8080"
+        with pytest.raises(ValueError):
+            endpoint_of("ftp://shop.example.com/cb")
+
+    def test_signature_verifies_with_shared_secret(self):
+        body = b'{"deliveries":[]}'
+
+        signature = sign(body, 1760616000, secret="s3cret")
+
+        expected = hmac.new(b"s3cret", b"1760616000." + body, hashlib.sha256).hexdigest()
+        assert signature == f"sha256={expected}"
+
+    def test_retry_delay_grows_with_jitter_and_cap(self, monkeypatch):
+        monkeypatch.setattr(callback_dispatcher, "CALLBACK_RETRY_BASE_SECONDS", 30)
+        monkeypatch.setattr(callback_dispatcher, "CALLBACK_RETRY_MAX_SECONDS", 600)
+
+        for _ in range(50):
+            assert 15 <= retry_delay(1) <= 30
+            assert 60 <= retry_delay(3) <= 120
+            assert 300 <= retry_delay(10) <= 600
+        assert retry_delay(1, retry_after=900) == 900
+
+    def test_circuit_opens_after_threshold_and_backs_off(self, monkeypatch):
+        monkeypatch.setattr(callback_dispatcher, "CALLBACK_CIRCUIT_THRESHOLD", 5)
+        monkeypatch.setattr(callback_dispatcher, "CALLBACK_CIRCUIT_OPEN_SECONDS", 60)
+        monkeypatch.setattr(callback_dispatcher, "CALLBACK_CIRCUIT_MAX_SECONDS", 200)
+
+        assert next_open_for(4, None) is None
+        assert next_open_for(5, None) == 60
+        assert next_open_for(6, 60) == 120
+        assert next_open_for(7, 120) == 200
+
+
+class TestSendBatch:
+    @pytest.mark.asyncio
+    async def test_batch_sent_as_one_signed_request(self, monkeypatch):
+        monkeypatch.setattr(callback_dispatcher, "CALLBACK_SIGNING_SECRET", "s3cret")
+        client = client_answering(204)
+
+        with patch('src.services.callback_dispatcher.get_callback_client', return_value=client):
+            result = await send_batch(batch(1, 2))
+
+        assert result.delivered
+        client.post.assert_awaited_once()
+        url = client.post.await_args.args[0]
+        body = client.post.await_args.kwargs["content"]
+        headers = client.post.await_args.kwargs["headers"]
+        assert url == "https://shop.example.com/hooks/quenty"
+        assert [item["id"] for item in json.loads(body)["deliveries"]] == [1, 2]
+        assert headers["X-Quenty-Signature"] == sign(body, int(headers["X-Quenty-Timestamp"]), "s3cret")
+
+    @pytest.mark.asyncio
+    async def test_server_errors_and_timeouts_are_retried(self):
+        for client in (client_answering(503), client_answering(429, {"Retry-After": "120"})):
+            with patch('src.services.callback_dispatcher.get_callback_client', return_value=client):
+                result = await send_batch(batch(1))
+            assert not result.delivered and result.retryable
+
+        assert result.retry_after == 120
+
+        client = Mock()
+        client.post = AsyncMock(side_effect=httpx.ConnectTimeout("timed out"))
+        with patch('src.services.callback_dispatcher.get_callback_client', return_value=client):
+            result = await send_batch(batch(1))
+        assert result.status_code is None and result.retryable
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_final(self):
+        with patch('src.services.callback_dispatcher.get_callback_client', return_value=client_answering(404)):
+            result = await send_batch(batch(1))
+
+        assert not result.delivered and not result.retryable
+
+
+class TestRecordResults:
+    def test_failure_schedules_retry_and_counts_toward_circuit(self):
+        deliveries = [delivery(1), delivery(2, attempts=callback_dispatcher.CALLBACK_MAX_ATTEMPTS - 1)]
+        endpoint = SimpleNamespace(failures=callback_dispatcher.CALLBACK_CIRCUIT_THRESHOLD - 1, open_for=None,
+                                   open_until=None, last_error=None)
+        db = FakeSession(deliveries, endpoint)
+
+        totals = record_results(db, [CallbackResult(batch(1, 2), 502, "HTTP 502")], now=NOW)
+
+        assert totals == {"retry": 1, "failed": 1}
+        assert deliveries[0].status == "pending" and deliveries[0].next_attempt_at > NOW
+        assert deliveries[1].status == "failed"
+        assert endpoint.open_until == NOW + timedelta(seconds=callback_dispatcher.CALLBACK_CIRCUIT_OPEN_SECONDS)
+        assert db.commits == 1
+
+    def test_success_closes_circuit(self):
+        deliveries = [delivery(1)]
+        endpoint = SimpleNamespace(failures=7, open_for=120.0, open_until=NOW, last_error="HTTP 502")
+        db = FakeSession(deliveries, endpoint)
+
+        totals = record_results(db, [CallbackResult(batch(1), 200, None)], now=NOW)
+
+        assert totals == {"delivered": 1}
+        assert deliveries[0].status == "delivered" and deliveries[0].delivered_at == NOW
+        assert (endpoint.failures, endpoint.open_for, endpoint.open_until) == (0, None, None)
@@ -0,0 +1,148 @@
+import asyncio
+import pytest
+import time
+from unittest.mock import patch, Mock
+
+import fakeredis
+
+from src.services import carrier_health
+from src.services.carrier_health import CarrierBreakers, CircuitOpenError, counts_as_failure
+from src.error_handlers import CarrierException, CarrierErrorType
+
+
+class TestCarrierBreakers:
+    def test_failure_classification(self):
+        assert counts_as_failure(CarrierException("DHL", CarrierErrorType.TIMEOUT, "timed out"))
+        assert counts_as_failure(RuntimeError("connection reset"))
+        assert not counts_as_failure(CarrierException("DHL", CarrierErrorType.INVALID_ADDRESS, "bad address"))
+        assert not counts_as_failure(CircuitOpenError("DHL", "quote", 10))
+        assert not counts_as_failure(ValueError("Carrier DHL not initialized"))
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_rejects_without_redis(self):
+        breakers = CarrierBreakers()
+        breakers._store("DHL", "quote", "open", 5, time.time() + 30)
+        carrier_call = Mock()
+
+        with patch('src.services.carrier_health.get_redis') as mock_redis:
+            with pytest.raises(CircuitOpenError) as exc_info:
+                async with breakers.guard("DHL", "quote"):
+                    carrier_call()
+
+        carrier_call.assert_not_called()
+        mock_redis.assert_not_called()
+        assert exc_info.value.retry_after >= 1
+
+    @pytest.mark.asyncio
+    async def test_breakers_are_per_operation(self):
+        breakers = CarrierBreakers()
+        breakers._store("DHL", "label", "open", 5, time.time() + 30)
+
+        assert breakers.is_available("DHL", "label") is False
+        assert breakers.is_available("DHL", "quote") is True
+        assert breakers.is_available("FedEx", "label") is True
+
+
+KEY = "carrier:breaker:dhl:quote"
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(carrier_health, 'get_redis', lambda: client)
+    # Every worker reads the shared state on each call
+    monkeypatch.setattr(carrier_health, 'BREAKER_SYNC_INTERVAL', 0)
+    return client
+
+
+async def fail(breakers, error=None):
+    with pytest.raises(type(error or RuntimeError())):
+        async with breakers.guard("DHL", "quote"):
+            raise error or RuntimeError("connection reset")
+
+
+async def trip(breakers):
+    for _ in range(carrier_health.BREAKER_FAILURE_THRESHOLD):
+        await fail(breakers)
+
+
+async def cool_down(client):
+    await client.hset(KEY, "open_until", time.time() - 1)
+
+
+class TestSharedBreakerState:
+    @pytest.mark.asyncio
+    async def test_opens_after_threshold_for_every_worker(self, fake_redis):
+        worker, other = CarrierBreakers(), CarrierBreakers()
+
+        for _ in range(carrier_health.BREAKER_FAILURE_THRESHOLD - 1):
+            await fail(worker)
+        assert await fake_redis.hget(KEY, "state") is None
+        await fail(worker)
+
+        assert await fake_redis.hget(KEY, "state") == b"open"
+        carrier_call = Mock()
+        with pytest.raises(CircuitOpenError):
+            async with other.guard("DHL", "quote"):
+                carrier_call()
+        carrier_call.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_single_probe_leader(self, fake_redis):
+        leader, other = CarrierBreakers(), CarrierBreakers()
+        await trip(leader)
+        await cool_down(fake_redis)
+
+        async with leader.guard("DHL", "quote"):
+            assert await fake_redis.hget(KEY, "state") == b"half_open"
+            assert await fake_redis.get(f"{KEY}:probe") == leader.worker_id.encode()
+            with pytest.raises(CircuitOpenError):
+                async with other.guard("DHL", "quote"):
+                    pass
+
+    @pytest.mark.asyncio
+    async def test_probe_success_closes_breaker(self, fake_redis):
+        leader, other = CarrierBreakers(), CarrierBreakers()
+        await trip(leader)
+        await cool_down(fake_redis)
+
+        async with leader.guard("DHL", "quote"):
+            pass
+
+        assert await fake_redis.hget(KEY, "state") == b"closed"
+        assert await fake_redis.hget(KEY, "failures") == b"0"
+        assert await fake_redis.exists(f"{KEY}:probe") == 0
+        async with other.guard("DHL", "quote"):
+            pass
+
+    @pytest.mark.asyncio
+    async def test_probe_failure_reopens_for_longer(self, fake_redis):
+        leader = CarrierBreakers()
+        await trip(leader)
+        await cool_down(fake_redis)
+
+        await fail(leader)
+
+        open_for = float(await fake_redis.hget(KEY, "open_for"))
+        assert await fake_redis.hget(KEY, "state") == b"open"
+        assert open_for == 2 * carrier_health.BREAKER_OPEN_SECONDS
+        assert float(await fake_redis.hget(KEY, "open_until")) == pytest.approx(time.time() + open_for, abs=5)
+        assert await fake_redis.exists(f"{KEY}:probe") == 0
+        with pytest.raises(CircuitOpenError):
+            async with CarrierBreakers().guard("DHL", "quote"):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_frees_lock_without_verdict(self, fake_redis):
+        leader = CarrierBreakers()
+        await trip(leader)
+        await cool_down(fake_redis)
+
+        await fail(leader, asyncio.CancelledError())
+
+        assert await fake_redis.hget(KEY, "state") == b"half_open"
+        assert await fake_redis.exists(f"{KEY}:probe") == 0
+        # The next call anywhere becomes the probe
+        async with CarrierBreakers().guard("DHL", "quote"):
+            pass
+        assert await fake_redis.hget(KEY, "state") == b"closed"
@@ -0,0 +1,144 @@
+import pytest
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+import redis.asyncio as redis
+
+from src.services import carrier_quota
+from src.services.carrier_health import CircuitOpenError, counts_as_failure
+from src.services.carrier_service import CarrierService
+from src.services.carrier_quota import CarrierQuota, CarrierQuotas, QuotaExceededError, carrier_quota as quota_for
+from src.error_handlers import CarrierErrorType
+
+
+def fake_redis(*results):
+    client = Mock()
+    client.eval = AsyncMock(side_effect=list(results))
+    client.zrem = AsyncMock()
+    return client
+
+
+class TestCarrierQuotas:
+    def test_quota_rejection_is_not_a_carrier_failure(self):
+        error = QuotaExceededError("DHL", "tracking", 0.2)
+
+        assert error.error_type == CarrierErrorType.RATE_LIMIT
+        assert error.retry_after == 1
+        assert not counts_as_failure(error)
+
+    def test_limits_overridable_per_carrier(self, monkeypatch):
+        monkeypatch.setenv("FEDEX_QUOTA_PER_MINUTE", "120")
+
+        assert quota_for("FedEx") == CarrierQuota(120, 15, 15)
+        assert quota_for("Pasarex") == carrier_quota.DEFAULT_QUOTA
+
+    @pytest.mark.asyncio
+    async def test_interactive_call_uses_whole_budget(self):
+        client = fake_redis([1, 0, b"9", 1])
+
+        with patch('src.services.carrier_quota.get_redis', return_value=client):
+            async with CarrierQuotas().acquire("DHL", "quote"):
+                pass
+
+        keys_and_args = client.eval.call_args.args[1:]
+        assert keys_and_args[:3] == (2, "carrier:quota:{dhl}:tokens", "carrier:quota:{dhl}:in_flight")
+        assert keys_and_args[3:7] == (5.0, 10, 0.0, 10)
+        client.zrem.assert_awaited_once_with("carrier:quota:{dhl}:in_flight", keys_and_args[7])
+
+    @pytest.mark.asyncio
+    async def test_tracking_leaves_reserve_for_interactive_calls(self):
+        client = fake_redis([1, 0, b"5", 1])
+
+        with patch('src.services.carrier_quota.get_redis', return_value=client):
+            async with CarrierQuotas().acquire("DHL", "tracking"):
+                pass
+
+        floor_tokens, slots = client.eval.call_args.args[6:8]
+        assert floor_tokens == pytest.approx(3.0)
+        assert slots == 7
+
+    @pytest.mark.asyncio
+    async def test_reserve_rounds_up_for_every_carrier(self):
+        slots = {}
+        for carrier in ("Servientrega", "FedEx"):
+            client = fake_redis([1, 0, b"5", 1])
+            with patch('src.services.carrier_quota.get_redis', return_value=client):
+                async with CarrierQuotas().acquire(carrier, "tracking"):
+                    pass
+            slots[carrier] = client.eval.call_args.args[7]
+
+        # 30% of 5 and 15 slots: 1.5 and 4.5 are kept back as 2 and 5
+        assert slots == {"Servientrega": 3, "FedEx": 10}
+
+    @pytest.mark.asyncio
+    async def test_waits_for_refill(self):
+        client = fake_redis([0, 200, b"0.2", 2], [0, -1, b"1.2", 10], [1, 0, b"0.2", 10])
+        sleep = AsyncMock()
+
+        with patch('src.services.carrier_quota.get_redis', return_value=client), \
+                patch('src.services.carrier_quota.asyncio.sleep', sleep):
+            async with CarrierQuotas().acquire("DHL", "quote"):
+                pass
+
+        assert [call.args[0] for call in sleep.await_args_list] == [0.2, carrier_quota.CARRIER_QUOTA_SLOT_POLL]
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_wait(self, monkeypatch):
+        monkeypatch.setattr(carrier_quota, "CARRIER_QUOTA_BACKGROUND_WAIT", 1)
+        client = fake_redis([0, 2000, b"0", 0])
+        carrier_call = Mock()
+
+        with patch('src.services.carrier_quota.get_redis', return_value=client):
+            with pytest.raises(QuotaExceededError) as exc_info:
+                async with CarrierQuotas().acquire("UPS", "tracking"):
+                    carrier_call()
+
+        carrier_call.assert_not_called()
+        assert exc_info.value.retry_after == 2
+
+    @pytest.mark.asyncio
+    async def test_redis_outage_allows_call(self):
+        client = fake_redis(redis.ConnectionError("down"))
+        carrier_call = Mock()
+
+        with patch('src.services.carrier_quota.get_redis', return_value=client):
+            async with CarrierQuotas().acquire("DHL", "label"):
+                carrier_call()
+
+        carrier_call.assert_called_once()
+        client.zrem.assert_not_awaited()
+
+
+class TestCarrierCall:
+    @staticmethod
+    def recording(calls, name):
+        context = Mock()
+        context.__aenter__ = AsyncMock(side_effect=lambda: calls.append(f"{name} in"))
+        context.__aexit__ = AsyncMock(side_effect=lambda *exc: calls.append(f"{name} out"))
+        return context
+
+    @pytest.mark.asyncio
+    async def test_quota_taken_before_breaker_admits_call(self):
+        service = CarrierService()
+        calls = []
+        service.quotas.acquire = Mock(return_value=self.recording(calls, "quota"))
+        service.breakers.guard = Mock(return_value=self.recording(calls, "breaker"))
+
+        with patch('src.services.carrier_service.api_call_log'):
+            async with service._carrier_call("DHL", "tracking"):
+                calls.append("call")
+
+        # A half-open probe never waits for quota while holding the probe lock
+        assert calls == ["quota in", "breaker in", "call", "breaker out", "quota out"]
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_rejected_without_waiting_for_quota(self):
+        service = CarrierService()
+        service.breakers._store("DHL", "tracking", "open", 5, time.time() + 30)
+        service.quotas.acquire = Mock()
+
+        with pytest.raises(CircuitOpenError):
+            async with service._carrier_call("DHL", "tracking"):
+                pass
+
+        service.quotas.acquire.assert_not_called()
@@ -0,0 +1,102 @@
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from src.models import CarrierType
+from src.services.carrier_stats import build_daily_report, record_labels, record_quote, record_tracking_events
+
+
+class RecordingSession:
+    def __init__(self, scalars=()):
+        self.statements = []
+        self._scalars = list(scalars)
+
+    def execute(self, statement):
+        self.statements.append(statement.compile(dialect=postgresql.dialect()))
+        return []
+
+    def scalars(self, statement):
+        return self._scalars.pop(0)
+
+
+def rows_of(compiled):
+    """Row values of a compiled multi-row INSERT, keyed by column"""
+    params = compiled.params
+    rows = []
+    while f"carrier_m{len(rows)}" in params:
+        suffix = f"_m{len(rows)}"
+        rows.append({name[:-len(suffix)]: value for name, value in params.items() if name.endswith(suffix)})
+    return rows
+
+
+class TestIncrementalUpdates:
+    def test_events_aggregated_per_carrier_in_one_statement(self):
+        session = RecordingSession()
+
+        record_tracking_events(session, [
+            {"carrier": CarrierType.DHL, "status": "Delivered"},
+            {"carrier": CarrierType.DHL, "status": "In Transit"},
+            {"carrier": CarrierType.FEDEX, "status": "entregado"},
+            {"carrier": CarrierType.FEDEX, "status": "Picked Up"},
+        ])
+
+        assert len(session.statements) == 1
+        sql = str(session.statements[0])
+        assert "INSERT INTO carrier_daily_stats" in sql
+        assert "ON CONFLICT (stat_date, carrier) DO UPDATE" in sql
+        assert "carrier_daily_stats.tracking_events + excluded.tracking_events" in sql
+        assert "CURRENT_DATE" in sql
+        rows = {row["carrier"]: row for row in rows_of(session.statements[0])}
+        assert rows[CarrierType.DHL]["tracking_events"] == 2
+        assert rows[CarrierType.DHL]["delivered"] == 1
+        assert rows[CarrierType.DHL]["in_transit"] == 1
+        assert rows[CarrierType.FEDEX]["delivered"] == 1
+        assert rows[CarrierType.FEDEX]["exceptions"] == 0
+
+    def test_labels_counted_per_carrier(self):
+        session = RecordingSession()
+
+        record_labels(session, [CarrierType.UPS, CarrierType.UPS, CarrierType.DHL])
+
+        rows = {row["carrier"]: row for row in rows_of(session.statements[0])}
+        assert rows[CarrierType.UPS]["labels_generated"] == 2
+        assert rows[CarrierType.DHL]["labels_generated"] == 1
+
+    def test_nothing_written_without_rows(self):
+        session = RecordingSession()
+
+        record_labels(session, [])
+        record_tracking_events(session, [])
+
+        assert session.statements == []
+
+    def test_quote_updates_carrier_and_route(self):
+        session = RecordingSession()
+
+        record_quote(session, CarrierType.SERVIENTREGA, 25000.0, "Bogota", "Cali")
+
+        sql = [str(statement) for statement in session.statements]
+        assert "INSERT INTO carrier_daily_stats" in sql[0]
+        assert "INSERT INTO route_daily_stats" in sql[1]
+        assert "ON CONFLICT (stat_date, origin_city, destination_city) DO UPDATE" in sql[1]
+
+
+def test_report_reads_rollup_rows():
+    stats = [
+        SimpleNamespace(carrier=CarrierType.DHL, labels_generated=10, quotes_generated=4, quote_amount=400.0,
+                        tracking_events=30, delivered=5, in_transit=20, exceptions=1),
+        SimpleNamespace(carrier=CarrierType.UPS, labels_generated=2, quotes_generated=0, quote_amount=0.0,
+                        tracking_events=3, delivered=0, in_transit=3, exceptions=0),
+    ]
+    routes = [SimpleNamespace(origin_city="Bogota", destination_city="Cali", quotes=4, quote_amount=400.0)]
+    session = RecordingSession(scalars=[stats, routes])
+
+    report = build_daily_report(session, date(2026, 10, 1))
+
+    assert report["summary"]["total_labels"] == 12
+    assert report["summary"]["total_tracking_events"] == 33
+    assert report["summary"]["delivered"] == 5
+    assert report["carrier_breakdown"]["DHL"]["avg_quote_value"] == 100.0
+    assert report["carrier_breakdown"]["FedEx"]["labels_generated"] == 0
+    assert report["top_routes"] == [{"route": "Bogota-Cali", "count": 4, "total_value": 400.0, "avg_value": 100.0}]
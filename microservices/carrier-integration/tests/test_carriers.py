@@ -2,13 +2,22 @@ import pytest
 import asyncio
 from unittest.mock import Mock, patch, AsyncMock
 from datetime import datetime, timedelta
+import json
+import time
 import httpx
+import fakeredis
+import redis.asyncio as redis
 
 from src.carriers.dhl import DHLClient
 from src.carriers.fedex import FedExClient
 from src.carriers.ups import UPSClient
 from src.carriers.servientrega import ServientregaClient
 from src.carriers.interrapidisimo import InterrapidisimoClient
+from src.carriers.coordinadora import CoordinadoraClient
+from src.carriers.city_codes import CityCodeTable
+from src.carriers import transport
+from src.carriers.transport import get_oauth_token, invalidate_oauth_token
+from src.error_handlers import CarrierException, CarrierErrorType
 from src.schemas import (
     QuoteRequest, QuoteResponse,
     LabelRequest, LabelResponse,
@@ -159,15 +168,17 @@ class TestFedExClient:
             'expires_in': 3600
         }
         
-        with patch.object(httpx.AsyncClient, 'post', new_callable=AsyncMock) as mock_post:
+        with patch.object(httpx.AsyncClient, 'post', new_callable=AsyncMock) as mock_post, \
+                patch('src.carriers.transport._local_tokens', {}):
             mock_post.return_value.json.return_value = mock_token_response
             mock_post.return_value.raise_for_status = Mock()
             
             token = await fedex_client._get_access_token()
             
             assert token == 'new_token_123'
-            assert fedex_client.access_token == 'new_token_123'
-            assert fedex_client.token_expires is not None
+            # Reused until it is close to expiry
+            assert await fedex_client._get_access_token() == 'new_token_123'
+            assert mock_post.call_count == 1
 
 
 class TestUPSClient:
@@ -199,7 +210,8 @@ class TestUPSClient:
             }
         }
         
-        with patch.object(httpx.AsyncClient, 'post', new_callable=AsyncMock) as mock_post:
+        with patch.object(httpx.AsyncClient, 'post', new_callable=AsyncMock) as mock_post, \
+                patch('src.carriers.transport._local_tokens', {}):
             # Mock token response
             mock_post.return_value.json.side_effect = [
                 {'access_token': 'test_token', 'expires_in': 3600},
@@ -220,11 +232,16 @@ class TestServientregaClient:
             'password': 'test_pass',
             'agreement_code': 'CONV123'
         }
-        return ServientregaClient(credentials, 'sandbox')
+        # The WSDL is never downloaded; tests patch the operations they call
+        with patch('src.carriers.servientrega.get_soap_client', return_value=Mock()):
+            return ServientregaClient(credentials, 'sandbox')
     
     @pytest.mark.asyncio
     async def test_get_city_code(self, servientrega_client):
-        with patch.object(servientrega_client.soap_client.service, 'ConsultarCiudad') as mock_consultar:
+        with patch.object(servientrega_client.soap_client.service, 'ConsultarCiudad') as mock_consultar, \
+                patch('src.carriers.city_codes._tables', {}), \
+                patch('src.carriers.city_codes.CityCodeTable._read_rows', return_value=[]), \
+                patch('src.carriers.city_codes.CityCodeTable._upsert_rows'):
             mock_response = Mock()
             mock_response.Exitoso = True
             mock_response.CodigoCiudad = '11001'
@@ -236,7 +253,9 @@ class TestServientregaClient:
     
     @pytest.mark.asyncio
     async def test_check_coverage(self, servientrega_client):
-        with patch.object(servientrega_client.soap_client.service, 'ConsultarCobertura') as mock_cobertura:
+        with patch.object(servientrega_client.soap_client.service, 'ConsultarCobertura') as mock_cobertura, \
+                patch.object(servientrega_client, '_lookup_city_code', new_callable=AsyncMock) as mock_lookup:
+            mock_lookup.return_value = '05001'
             mock_response = Mock()
             mock_response.TieneCobertura = True
             mock_cobertura.return_value = mock_response
@@ -244,6 +263,22 @@ class TestServientregaClient:
             has_coverage = await servientrega_client.check_coverage('Medellín', '050001')
             
             assert has_coverage is True
+            assert mock_cobertura.call_args.kwargs['ciudad'] == '05001'
+    
+    @pytest.mark.asyncio
+    async def test_city_code_cached_after_first_lookup(self, servientrega_client):
+        with patch.object(servientrega_client.soap_client.service, 'ConsultarCiudad') as mock_consultar, \
+                patch('src.carriers.city_codes._tables', {}), \
+                patch('src.carriers.city_codes.CityCodeTable._read_rows', return_value=[]), \
+                patch('src.carriers.city_codes.CityCodeTable._upsert_rows'):
+            mock_response = Mock()
+            mock_response.Exitoso = True
+            mock_response.CodigoCiudad = '76001'
+            mock_consultar.return_value = mock_response
+            
+            assert await servientrega_client._get_city_code('Cali', '760001') == '76001'
+            assert await servientrega_client._get_city_code('CALÍ', '760001') == '76001'
+            assert mock_consultar.call_count == 1
 
 
 class TestInterrapidisimoClient:
@@ -301,6 +336,115 @@ class TestInterrapidisimoClient:
             assert 'manifest_pdf' in manifest
 
 
+class TestCoordinadoraClient:
+    @pytest.fixture
+    def coordinadora_client(self):
+        credentials = {
+            'api_key': 'test_api_key',
+            'api_password': 'test_pass',
+            'nit': '900123456',
+            'client_code': 'CLI123'
+        }
+        return CoordinadoraClient(credentials, 'sandbox')
+    
+    @pytest.fixture
+    def city_list(self):
+        return [
+            {'codigo': '11001000', 'nombre': 'Bogotá', 'departamento': 'Cundinamarca'},
+            {'codigo': '05001000', 'nombre': 'Medellín', 'departamento': 'Antioquia'}
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_city_list_synced_once(self, coordinadora_client, city_list):
+        response = Mock(status_code=200, json=Mock(return_value=city_list))
+        with patch.object(httpx.AsyncClient, 'request', new_callable=AsyncMock, return_value=response) as mock_request, \
+                patch('src.carriers.coordinadora._last_city_sync', 0.0), \
+                patch('src.carriers.city_codes.CityCodeTable._read_rows', return_value=[]), \
+                patch('src.carriers.city_codes.CityCodeTable._upsert_rows'):
+            coordinadora_client.cities = CityCodeTable("DANE")
+            
+            assert await coordinadora_client._get_city_code('BOGOTA') == '11001000'
+            assert await coordinadora_client._get_city_code('medellin') == '05001000'
+            assert mock_request.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_unknown_city_rejected(self, coordinadora_client, city_list):
+        response = Mock(status_code=200, json=Mock(return_value=city_list))
+        with patch.object(httpx.AsyncClient, 'request', new_callable=AsyncMock, return_value=response) as mock_request, \
+                patch('src.carriers.coordinadora._last_city_sync', 0.0), \
+                patch('src.carriers.city_codes.CityCodeTable._read_rows', return_value=[]), \
+                patch('src.carriers.city_codes.CityCodeTable._upsert_rows'):
+            coordinadora_client.cities = CityCodeTable("DANE")
+            
+            with pytest.raises(CarrierException) as exc_info:
+                await coordinadora_client._get_city_code('Atlantis')
+            
+            assert exc_info.value.error_type == CarrierErrorType.COVERAGE_UNAVAILABLE
+
+
+class TestOAuthTokenCache:
+    """Test the OAuth token cache shared by the workers through Redis"""
+
+    @pytest.fixture
+    def fake_redis(self, monkeypatch):
+        client = fakeredis.aioredis.FakeRedis()
+        monkeypatch.setattr(transport, 'get_redis', lambda: client)
+        # Each test starts as a fresh worker
+        monkeypatch.setattr(transport, '_local_tokens', {})
+        return client
+
+    @staticmethod
+    def token_fetch(token="fresh-token", expires_in=3600):
+        async def fetch():
+            # Long enough for concurrent callers to overlap
+            await asyncio.sleep(0.05)
+            return token, expires_in
+        return AsyncMock(side_effect=fetch)
+
+    @pytest.mark.asyncio
+    async def test_cached_token_used_without_fetch(self, fake_redis):
+        key = transport._token_key("DHL", "account-1")
+        await fake_redis.set(key, json.dumps({"token": "cached-token", "refresh_at": time.time() + 600}))
+        fetch = self.token_fetch()
+
+        assert await get_oauth_token("DHL", "account-1", fetch) == "cached-token"
+        fetch.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_fetch_once(self, fake_redis):
+        fetch = self.token_fetch()
+
+        tokens = await asyncio.gather(*(get_oauth_token("DHL", "account-1", fetch) for _ in range(5)))
+
+        assert tokens == ["fresh-token"] * 5
+        fetch.assert_awaited_once()
+        stored = json.loads(await fake_redis.get(transport._token_key("DHL", "account-1")))
+        assert stored["token"] == "fresh-token"
+
+    @pytest.mark.asyncio
+    async def test_redis_error_falls_back_to_direct_fetch(self, monkeypatch):
+        client = Mock()
+        client.get = AsyncMock(side_effect=redis.ConnectionError("Connection refused"))
+        monkeypatch.setattr(transport, 'get_redis', lambda: client)
+        monkeypatch.setattr(transport, '_local_tokens', {})
+        fetch = self.token_fetch()
+
+        assert await get_oauth_token("DHL", "account-1", fetch) == "fresh-token"
+        fetch.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_invalidation_forces_refetch(self, fake_redis):
+        key = transport._token_key("DHL", "account-1")
+        fetch = self.token_fetch()
+        await get_oauth_token("DHL", "account-1", fetch)
+
+        await invalidate_oauth_token("DHL", "account-1")
+
+        assert await fake_redis.get(key) is None
+        await get_oauth_token("DHL", "account-1", fetch)
+        assert fetch.await_count == 2
+
+
 @pytest.mark.asyncio
 async def test_carrier_fallback():
     """Test fallback between carriers when primary fails"""
@@ -0,0 +1,78 @@
+from unittest.mock import Mock, patch
+
+from src.models import CarrierType
+from src.services.consolidation import (
+    TARIFFS, PackageSize, Tariff, billable_weight, package_volume, plan_arrived_packages, plan_consolidation
+)
+
+TARIFF = Tariff(rate_per_lb=8.50, dim_divisor=166, handling_fee=11.90)
+
+
+def package(package_id, weight_lb, volume_in3=0.0):
+    return PackageSize(package_id, weight_lb, volume_in3)
+
+
+class TestTariff:
+    def test_billed_on_larger_of_actual_and_volumetric_weight(self):
+        assert billable_weight(TARIFF, 2.2, 0) == 3
+        assert billable_weight(TARIFF, 2.0, 12 * 12 * 12) == 11  # 1728 / 166 = 10.4
+        assert billable_weight(TARIFF, 0.1, 0) == 1
+
+    def test_volume_from_prealert_dimensions(self):
+        assert package_volume({"length": 10, "width": 5, "height": "2"}) == 100
+        assert package_volume({"length": 10, "width": None, "height": 2}) == 0
+        assert package_volume(None) == 0
+
+
+class TestPlanConsolidation:
+    def test_small_packages_share_one_box(self):
+        groups, individual, consolidated = plan_consolidation(TARIFF, [package("A", 1.2), package("B", 1.3)])
+
+        assert [sorted(g.package_ids) for g in groups] == [["A", "B"]]
+        # Alone: 2 lb + 2 lb and two handling fees; together: 3 lb and one fee
+        assert individual == 2 * (11.90 + 2 * 8.50)
+        assert consolidated == 11.90 + 3 * 8.50
+        assert groups[0].savings_usd == round(individual - consolidated, 2)
+
+    def test_boxes_stay_within_weight_limit(self):
+        packages = [package(f"P{i}", 30) for i in range(7)]
+
+        groups, individual, consolidated = plan_consolidation(TARIFF, packages, max_weight_lb=100)
+
+        assert sorted(len(g.package_ids) for g in groups) == [3, 3]
+        assert all(g.weight_lb <= 100 for g in groups)
+        assert consolidated < individual
+
+    def test_oversize_package_ships_alone(self):
+        groups, _, _ = plan_consolidation(TARIFF, [package("BIG", 150), package("A", 1), package("B", 1)])
+
+        assert [sorted(g.package_ids) for g in groups] == [["A", "B"]]
+
+    def test_bulky_packages_not_merged_at_a_loss(self):
+        # 10 volumetric lb each; repacked into one box they bill 24 lb
+        bulky = 10 * 166
+
+        groups, individual, consolidated = plan_consolidation(TARIFF, [package("A", 1, bulky), package("B", 1, bulky)])
+
+        assert groups == []
+        assert consolidated == individual
+
+
+class TestPlanArrivedPackages:
+    def test_one_plan_per_customer_and_carrier(self):
+        rows = [
+            ("CUST1", CarrierType.AEROPOST, "T1", 1.0, None),
+            ("CUST1", CarrierType.AEROPOST, "T2", 1.0, {"length": 4, "width": 4, "height": 4}),
+            ("CUST1", CarrierType.PASAREX, "T3", 2.0, None),
+            ("CUST2", CarrierType.AEROPOST, "T4", 1.0, None),
+        ]
+
+        with patch('src.services.consolidation.arrived_packages', return_value=iter(rows)):
+            plans = list(plan_arrived_packages(Mock()))
+
+        assert [(p.customer_id, p.carrier, p.packages) for p in plans] == [
+            ("CUST1", CarrierType.AEROPOST, 2), ("CUST1", CarrierType.PASAREX, 1), ("CUST2", CarrierType.AEROPOST, 1)
+        ]
+        assert [sorted(g.package_ids) for g in plans[0].groups] == [["T1", "T2"]]
+        assert plans[0].savings_usd == TARIFFS[CarrierType.AEROPOST].handling_fee
+        assert plans[1].groups == [] and plans[1].savings_usd == 0
@@ -0,0 +1,165 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import credentials_manager
+from src.credentials_manager import CredentialManager, CredentialStore, publish_invalidation
+from src.models import CarrierCredential, CarrierType, EnvironmentType
+from src.utils.encryption import decrypt_credentials, encrypt_credentials
+
+
+def credential(carrier, values, environment=EnvironmentType.SANDBOX, is_active=True):
+    return CarrierCredential(
+        carrier=carrier, environment=environment, credentials=encrypt_credentials(values), is_active=is_active
+    )
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = CredentialStore(ttl=300, listen=False)
+    monkeypatch.setattr(credentials_manager, "credential_store", store)
+    monkeypatch.setattr(credentials_manager, "publish_invalidation", lambda carrier: store.invalidate())
+    return store
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    CarrierCredential.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        credential(CarrierType.DHL, {"API_KEY": "dhl-key", "API_SECRET": "dhl-secret"}),
+        credential(CarrierType.DHL, {"API_KEY": "dhl-prod-key"}, environment=EnvironmentType.PRODUCTION),
+        credential(CarrierType.PICKIT, {"CLIENT_ID": "pickit-id"}),
+        credential(CarrierType.UPS, {"CLIENT_ID": "old-ups-id"}, is_active=False),
+    ])
+    session.commit()
+
+    session.queries = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, *args):
+        if statement.startswith("SELECT"):
+            session.queries += 1
+
+    yield session
+    session.close()
+
+
+class TestCredentialStore:
+    def test_loaded_once_then_served_from_memory(self, store, db):
+        manager = CredentialManager(db)
+
+        for _ in range(100):
+            assert manager.get_credential("DHL", "API_KEY") == "dhl-key"
+        assert manager.get_all_credentials("PICKIT") == {"CLIENT_ID": "pickit-id"}
+        assert manager.get_all_credentials("UPS") == {}
+
+        assert db.queries == 1
+
+    def test_rotation_picked_up_after_invalidation(self, store, db):
+        manager = CredentialManager(db)
+        assert manager.get_credential("DHL", "API_KEY") == "dhl-key"
+
+        # Another process rotates the key and publishes the invalidation
+        CredentialManager(db).rotate_credential("DHL", "API_KEY", "dhl-key-2")
+        queries = db.queries
+
+        assert manager.get_credential("DHL", "API_KEY") == "dhl-key-2"
+        assert manager.get_credential("DHL", "API_SECRET") == "dhl-secret"
+        assert db.queries == queries + 1
+
+    def test_reloaded_after_ttl(self, store, db, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr(credentials_manager.time, "monotonic", lambda: clock[0])
+        manager = CredentialManager(db)
+        manager.get_credential("DHL", "API_KEY")
+
+        clock[0] += 301
+        manager.get_credential("DHL", "API_KEY")
+
+        assert db.queries == 2
+
+    def test_invalidation_during_load_forces_another_load(self, store, db):
+        manager = CredentialManager(db)
+
+        def racing_loader():
+            result = manager._load_active_credentials()
+            store.invalidate()
+            return result
+
+        store.get("DHL", racing_loader)
+        store.get("DHL", racing_loader)
+
+        assert db.queries == 2
+
+    def test_failed_load_keeps_previous_credentials(self, store, db):
+        manager = CredentialManager(db)
+        manager.get_credential("DHL", "API_KEY")
+        store.invalidate()
+
+        def failing_loader():
+            raise RuntimeError("database unavailable")
+
+        assert store.get("DHL", failing_loader)["API_KEY"] == "dhl-key"
+
+    def test_credentials_are_read_only_and_hidden(self, store, db):
+        manager = CredentialManager(db)
+        manager.get_credential("DHL", "API_KEY")
+
+        with pytest.raises(TypeError):
+            store.get("DHL", manager._load_active_credentials)["API_KEY"] = "changed"
+        assert "dhl-key" not in repr(store)
+
+
+class TestCredentialManager:
+    def test_carrier_environment_selects_row(self, store, db, monkeypatch):
+        monkeypatch.setenv("DHL_ENVIRONMENT", "production")
+
+        assert CredentialManager(db).get_all_credentials("DHL") == {"API_KEY": "dhl-prod-key"}
+
+    def test_store_adds_type_to_encrypted_row(self, store, db):
+        manager = CredentialManager(db)
+
+        assert manager.store_credential("DHL", "ACCOUNT_NUMBER", "123456789")
+        assert manager.store_credential("FEDEX", "CLIENT_ID", "fedex-id")
+
+        row = db.query(CarrierCredential).filter(
+            CarrierCredential.carrier == CarrierType.DHL,
+            CarrierCredential.environment == EnvironmentType.SANDBOX
+        ).one()
+        assert decrypt_credentials(row.credentials) == {
+            "API_KEY": "dhl-key", "API_SECRET": "dhl-secret", "ACCOUNT_NUMBER": "123456789"
+        }
+        assert "123456789" not in row.credentials
+        assert manager.get_all_credentials("FEDEX") == {"CLIENT_ID": "fedex-id"}
+
+    def test_deactivate_removes_type_then_row(self, store, db):
+        manager = CredentialManager(db)
+
+        assert manager.deactivate_credential("PICKIT", "CLIENT_ID")
+        assert not manager.deactivate_credential("PICKIT", "CLIENT_ID")
+        assert manager.get_all_credentials("PICKIT") == {}
+
+    def test_undecryptable_row_skipped(self, store, db):
+        db.add(CarrierCredential(carrier=CarrierType.UPS, environment=EnvironmentType.SANDBOX, credentials="garbage"))
+        db.commit()
+
+        manager = CredentialManager(db)
+
+        assert manager.get_all_credentials("UPS") == {}
+        assert manager.get_credential("DHL", "API_KEY") == "dhl-key"
+
+
+def test_publish_invalidates_locally_and_broadcasts(store, monkeypatch):
+    published = []
+    monkeypatch.setattr(credentials_manager, "_publisher", SimpleNamespace(publish=lambda *args: published.append(args)))
+    store.get("DHL", lambda: {"DHL": {"API_KEY": "dhl-key"}})
+
+    publish_invalidation("DHL")
+
+    assert published == [("carrier:credentials", "DHL")]
+    assert store.get("DHL", lambda: {"DHL": {"API_KEY": "dhl-key-2"}})["API_KEY"] == "dhl-key-2"
@@ -0,0 +1,88 @@
+import base64
+import hashlib
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from src.services import label_store
+from src.services.label_store import FilesystemBlobBackend, LabelStore, detect_content_type, store_issued_label
+from src.routers.labels import download_label, parse_range
+
+PDF = b"%PDF-1.4\n" + b"x" * 200000
+
+
+class TestLabelStore:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return LabelStore(FilesystemBlobBackend(str(tmp_path)))
+
+    def test_content_addressed_write(self, store):
+        stored = store.put_base64(base64.b64encode(PDF).decode())
+
+        assert stored.digest == hashlib.sha256(PDF).hexdigest()
+        assert stored.size == len(PDF)
+        assert stored.content_type == "application/pdf"
+        assert b"".join(store.backend.iter_range(stored.digest, 0, stored.size - 1)) == PDF
+
+    def test_identical_labels_written_once(self, store, monkeypatch):
+        store.put(PDF)
+        writes = []
+        monkeypatch.setattr(store.backend, "write", lambda *args: writes.append(args))
+
+        store.put(PDF)
+
+        assert writes == []
+
+    def test_range_read(self, store):
+        stored = store.put(PDF)
+
+        assert b"".join(store.backend.iter_range(stored.digest, 2, 5)) == PDF[2:6]
+
+    def test_invalid_base64_rejected(self, store):
+        with pytest.raises(ValueError):
+            store.put_base64("not base64!")
+
+    def test_raw_label_stored_as_sent(self, store):
+        zpl = "^XA^FO50,50^FDTest^FS^XZ"
+
+        stored = store.put_label(zpl)
+
+        assert stored.content_type == "application/x-zpl"
+        assert b"".join(store.backend.iter_range(stored.digest, 0, stored.size - 1)) == zpl.encode()
+
+    def test_issued_label_never_raises(self, store, monkeypatch):
+        monkeypatch.setattr(label_store, "_store", store)
+        monkeypatch.setattr(store.backend, "write", Mock(side_effect=OSError("disk full")))
+
+        assert store_issued_label(base64.b64encode(PDF).decode()) is None
+        assert store_issued_label(None) is None
+
+    def test_unmoved_label_downloaded_as_stored(self):
+        zpl = "^XA^FO50,50^FDTest^FS^XZ"
+        for label_data, expected in ((base64.b64encode(PDF).decode(), PDF), (zpl, zpl.encode())):
+            label = SimpleNamespace(label_sha256=None, label_data=label_data)
+            db = Mock(get=Mock(return_value=label))
+
+            response = download_label(1, Mock(), db)
+
+            assert response.body == expected
+
+    def test_formats(self):
+        assert detect_content_type(b"^XA^FO50,50^FDTest^FS^XZ") == "application/x-zpl"
+        assert detect_content_type(b"\x89PNG\r\n") == "image/png"
+
+
+class TestParseRange:
+    def test_ranges(self):
+        assert parse_range(None, 100) is None
+        assert parse_range("bytes=0-9", 100) == (0, 9)
+        assert parse_range("bytes=90-", 100) == (90, 99)
+        assert parse_range("bytes=-10", 100) == (90, 99)
+        assert parse_range("bytes=50-500", 100) == (50, 99)
+        # Multiple ranges: the whole document is sent instead
+        assert parse_range("bytes=0-1,5-6", 100) is None
+
+    def test_unsatisfiable(self):
+        with pytest.raises(ValueError):
+            parse_range("bytes=100-", 100)
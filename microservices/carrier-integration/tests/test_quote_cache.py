@@ -0,0 +1,92 @@
+import pytest
+import asyncio
+from unittest.mock import patch, AsyncMock
+from datetime import datetime, timedelta
+
+from src.services.quote_cache import QuoteCache, quote_cache_key
+from src.schemas import QuoteRequest, QuoteResponse, Address, Package
+
+
+def make_request(city="Medellín", weight=2.1, service_type=None, firm_quote=False):
+    return QuoteRequest(
+        origin=Address(
+            street="Calle 100 # 19-54", city="Bogota", postal_code="110111",
+            country="CO", contact_name="Origin", contact_phone="+5712345678"
+        ),
+        destination=Address(
+            street="Carrera 43A # 1-50", city=city, postal_code="050021",
+            country="co", contact_name="Destination", contact_phone="+5742345678"
+        ),
+        packages=[Package(weight_kg=weight, length_cm=30, width_cm=20, height_cm=15)],
+        service_type=service_type,
+        firm_quote=firm_quote
+    )
+
+
+def make_quote():
+    return QuoteResponse(
+        quote_id="Q-1",
+        carrier="DHL",
+        service_type="Express",
+        amount=100.0,
+        currency="COP",
+        estimated_days=2,
+        valid_until=datetime.now() + timedelta(minutes=30)
+    )
+
+
+class TestQuoteCacheKey:
+    def test_equivalent_requests_share_key(self):
+        assert quote_cache_key("DHL", make_request("Medellín", 2.1)) == quote_cache_key("DHL", make_request("MEDELLIN", 2.4))
+
+    def test_price_relevant_fields_change_key(self):
+        base = quote_cache_key("DHL", make_request())
+        assert quote_cache_key("DHL", make_request(weight=2.6)) != base
+        assert quote_cache_key("DHL", make_request(service_type="express")) != base
+        assert quote_cache_key("FedEx", make_request()) != base
+
+    def test_firm_flag_not_part_of_key(self):
+        assert quote_cache_key("DHL", make_request(firm_quote=True)) == quote_cache_key("DHL", make_request())
+
+
+class TestQuoteCache:
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_coalesced(self):
+        cache = QuoteCache(enabled=True)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return make_quote()
+
+        with patch.object(cache, '_load', new_callable=AsyncMock, return_value=None), \
+                patch.object(cache, '_store', new_callable=AsyncMock) as mock_store:
+            quotes = await asyncio.gather(*(cache.get_or_fetch("DHL", make_request(), fetch) for _ in range(5)))
+
+        assert len(calls) == 1
+        assert all(q.amount == 100.0 for q in quotes)
+        assert mock_store.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_hit_skips_carrier(self):
+        cache = QuoteCache(enabled=True)
+        fetch = AsyncMock()
+
+        with patch.object(cache, '_load', new_callable=AsyncMock, return_value=make_quote()):
+            quote = await cache.get_or_fetch("DHL", make_request(), fetch)
+
+        assert quote.quote_id == "Q-1"
+        fetch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_bypass_calls_carrier(self):
+        cache = QuoteCache(enabled=True)
+        fetch = AsyncMock(return_value=make_quote())
+
+        with patch.object(cache, '_load', new_callable=AsyncMock, return_value=make_quote()) as mock_load, \
+                patch.object(cache, '_store', new_callable=AsyncMock):
+            await cache.get_or_fetch("DHL", make_request(), fetch, bypass=True)
+
+        fetch.assert_called_once()
+        mock_load.assert_not_called()
@@ -0,0 +1,126 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+
+from src.services.quote_orchestrator import QuoteOrchestrator, LatencyTracker
+from src.schemas import QuoteRequest, QuoteResponse, Address, Package
+
+
+def make_quote(carrier, amount):
+    return QuoteResponse(
+        quote_id=f"{carrier}-1",
+        carrier=carrier,
+        service_type="Standard",
+        amount=amount,
+        currency="COP",
+        estimated_days=2,
+        valid_until=datetime.now() + timedelta(hours=1)
+    )
+
+
+class FakeCarrierService:
+    """Answers quotes after a per-carrier delay; None means never answers"""
+
+    def __init__(self, delays, amounts):
+        self.delays = delays
+        self.amounts = amounts
+        self.calls = []
+
+    async def get_quote(self, carrier, request, coalesce=True):
+        self.calls.append(carrier)
+        delay = self.delays[carrier]
+        if isinstance(delay, list):
+            delay = delay.pop(0)
+        if delay is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(delay)
+        if self.amounts[carrier] is None:
+            raise Exception(f"{carrier} unavailable")
+        return make_quote(carrier, self.amounts[carrier])
+
+
+class TestQuoteOrchestrator:
+    @pytest.fixture
+    def quote_request(self):
+        address = Address(
+            street="Calle 100 # 19-54",
+            city="Bogota",
+            postal_code="110111",
+            country="CO",
+            contact_name="Test",
+            contact_phone="+5712345678"
+        )
+        return QuoteRequest(
+            origin=address,
+            destination=address,
+            packages=[Package(weight_kg=1.0, length_cm=10, width_cm=10, height_cm=10)]
+        )
+
+    @pytest.mark.asyncio
+    async def test_deadline_reports_timed_out_carriers(self, quote_request):
+        service = FakeCarrierService(
+            delays={'DHL': 0.01, 'FedEx': None, 'UPS': 0.02},
+            amounts={'DHL': 120.0, 'FedEx': 10.0, 'UPS': 100.0}
+        )
+        orchestrator = QuoteOrchestrator(service, quorum=3)
+
+        quote = await orchestrator.best_quote(quote_request, ['DHL', 'FedEx', 'UPS'], deadline=0.2)
+
+        assert quote.carrier == 'UPS'
+        assert quote.amount == 100.0
+        assert quote.carriers_quoted == ['DHL', 'UPS']
+        assert quote.carriers_timed_out == ['FedEx']
+
+    @pytest.mark.asyncio
+    async def test_returns_early_on_quorum(self, quote_request):
+        service = FakeCarrierService(
+            delays={'DHL': 0.01, 'FedEx': 5.0, 'UPS': 0.01},
+            amounts={'DHL': 120.0, 'FedEx': 10.0, 'UPS': 100.0}
+        )
+        orchestrator = QuoteOrchestrator(service, quorum=2)
+
+        started = asyncio.get_running_loop().time()
+        quote = await orchestrator.best_quote(quote_request, ['DHL', 'FedEx', 'UPS'], deadline=3.0)
+
+        assert asyncio.get_running_loop().time() - started < 1.0
+        assert quote.amount == 100.0
+        assert quote.carriers_skipped == ['FedEx']
+        assert quote.carriers_timed_out == []
+
+    @pytest.mark.asyncio
+    async def test_failed_carriers_reported(self, quote_request):
+        service = FakeCarrierService(
+            delays={'DHL': 0.01, 'UPS': 0.01},
+            amounts={'DHL': None, 'UPS': 100.0}
+        )
+        orchestrator = QuoteOrchestrator(service)
+
+        quote = await orchestrator.best_quote(quote_request, ['DHL', 'UPS'], deadline=1.0)
+
+        assert quote.carrier == 'UPS'
+        assert quote.carriers_failed == ['DHL']
+
+    @pytest.mark.asyncio
+    async def test_slow_carrier_is_hedged(self, quote_request):
+        latency = LatencyTracker()
+        for _ in range(50):
+            latency.observe('DHL', 0.02)
+        # First request stalls, the hedge answers at the usual speed
+        service = FakeCarrierService(delays={'DHL': [None, 0.01]}, amounts={'DHL': 120.0})
+        orchestrator = QuoteOrchestrator(service, latency=latency)
+
+        quote = await orchestrator.best_quote(quote_request, ['DHL'], deadline=1.0)
+
+        assert quote.amount == 120.0
+        assert service.calls == ['DHL', 'DHL']
+
+    def test_percentiles(self):
+        latency = LatencyTracker()
+        for value in range(1, 101):
+            latency.observe('UPS', value / 100)
+
+        assert latency.percentile('UPS', 50) == 0.5
+        assert latency.percentile('UPS', 95) == 0.95
+        assert latency.percentile('UPS', 100) == 1.0
+        assert latency.percentile('UPS', 0) == 0.01
+        assert latency.hedge_delay('FedEx') is None
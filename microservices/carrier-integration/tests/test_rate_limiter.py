@@ -0,0 +1,104 @@
+import asyncio
+import math
+
+from src.services import rate_limiter
+from src.services.rate_limiter import RateLimit, RateLimiter
+
+
+class FakeRedis:
+    """Runs the GCRA script's logic in Python against a dict"""
+
+    def __init__(self):
+        self.values = {}
+        self.calls = []
+
+    def register_script(self, source):
+        async def script(keys, args):
+            self.calls.append((keys, args))
+            now, granted = args[0], args[1]
+            windows = [(args[2 + 2 * i], args[3 + 2 * i]) for i in range(len(keys))]
+            tats = [max(self.values.get(key, now), now) for key in keys]
+            for tat, (emission, period) in zip(tats, windows):
+                granted = min(granted, (now + period - tat) // emission)
+            if granted < 1:
+                waits = [tat + emission - period - now for tat, (emission, period) in zip(tats, windows)]
+                binding = waits.index(max(waits))
+                return [0, 0, waits[binding], tats[binding] - now, binding + 1]
+            best = None
+            for i, (key, tat, (emission, period)) in enumerate(zip(keys, tats, windows)):
+                self.values[key] = tat + granted * emission
+                left = (now + period - self.values[key]) // emission
+                if best is None or left < best[0]:
+                    best = (left, self.values[key] - now, i + 1)
+            return [granted, best[0], 0, best[1], best[2]]
+        return script
+
+
+def run(limiter, key, times):
+    return [asyncio.run(limiter.check(key)) for _ in range(times)]
+
+
+def test_one_script_call_covers_all_windows():
+    redis = FakeRedis()
+    limiter = RateLimiter([RateLimit(1000, 3600), RateLimit(60, 60)], get_client=lambda: redis, local_batch=1)
+
+    decision, = run(limiter, "ip:1.2.3.4", 1)
+
+    keys, args = redis.calls[0]
+    assert keys == ["rate_limit:{ip:1.2.3.4}:60", "rate_limit:{ip:1.2.3.4}:3600"]
+    assert args[1:] == [1, 1000, 60000, 3600, 3600000]
+    assert decision.allowed and decision.limit == 60 and decision.remaining == 59
+
+
+def test_limit_enforced_without_edge_burst(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: clock[0])
+    redis = FakeRedis()
+    limiter = RateLimiter([RateLimit(60, 60)], get_client=lambda: redis, local_batch=1)
+
+    assert all(decision.allowed for decision in run(limiter, "k", 60))
+    denied, = run(limiter, "k", 1)
+
+    assert not denied.allowed
+    assert math.isclose(denied.retry_after, 1.0)
+    clock[0] += 1.0
+    assert [decision.allowed for decision in run(limiter, "k", 2)] == [True, False]
+
+
+def test_busy_client_spends_reserved_batches_locally():
+    redis = FakeRedis()
+    limiter = RateLimiter([RateLimit(600, 60)], get_client=lambda: redis, local_batch=8)
+
+    decisions = run(limiter, "k", 1 + 2 + 4 + 8 + 8)
+
+    assert [args[1] for _, args in redis.calls] == [1, 2, 4, 8, 8]
+    assert decisions[-1].remaining == 600 - 23
+    assert {decision.source for decision in decisions} == {"local", "redis"}
+
+
+def test_batch_shrinks_after_unspent_lease(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: clock[0])
+    redis = FakeRedis()
+    limiter = RateLimiter([RateLimit(600, 60)], get_client=lambda: redis, local_batch=8, lease_seconds=1)
+    run(limiter, "k", 1 + 2 + 1)
+
+    clock[0] += 2
+    run(limiter, "k", 1)
+
+    assert [args[1] for _, args in redis.calls] == [1, 2, 4, 2]
+
+
+def test_denied_client_answered_locally_until_retry(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: clock[0])
+    redis = FakeRedis()
+    limiter = RateLimiter([RateLimit(2, 60)], get_client=lambda: redis)
+    run(limiter, "k", 3)
+    calls = len(redis.calls)
+
+    denied = run(limiter, "k", 5)
+
+    assert len(redis.calls) == calls
+    assert not any(decision.allowed for decision in denied)
+    assert denied[-1].retry_after == 30.0
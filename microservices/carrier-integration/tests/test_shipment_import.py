@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+from src.services.label_store import FilesystemBlobBackend
+from src.services.shipment_import import (
+    ImportFileError, iter_records, plan_chunks, read_chunk, read_header, store_upload, validate_chunk,
+    create_labels
+)
+
+HEADER = (
+    "order_id,carrier,service_type,"
+    "origin_street,origin_city,origin_postal_code,origin_country,origin_contact_name,origin_contact_phone,"
+    "dest_street,dest_city,dest_postal_code,dest_country,dest_contact_name,dest_contact_phone,"
+    "weight_kg,length_cm,width_cm,height_cm,declared_value,currency\r\n"
+)
+
+
+def row(order_id="A-1", carrier="FedEx", weight="2.5", dest_street="Calle 1 # 2-3", currency="COP"):
+    return (
+        f'{order_id},{carrier},standard,'
+        f'Cra 7 # 10-20,Bogota,110111,CO,Ana,3001234567,'
+        f'"{dest_street}",Medellin,050001,CO,Luis,3007654321,'
+        f'{weight},30,20,10,150000,{currency}\r\n'
+    )
+
+
+def csv_file(*rows):
+    return io.BytesIO((HEADER + "".join(rows)).encode("utf-8"))
+
+
+def chunk_rows(handle, chunk_rows=2):
+    header, data_start = read_header(handle)
+    rows = []
+    for span in plan_chunks(handle, data_start, chunk_rows):
+        parsed, errors = read_chunk(handle, span.start, span.end, span.first_row)
+        assert errors == []
+        rows.append(parsed)
+    return header, rows
+
+
+class TestRecords:
+    def test_quoted_line_breaks_stay_in_one_record(self):
+        handle = csv_file(row("A-1", dest_street="Torre 2\nApto 301"), row("A-2"))
+        _, data_start = read_header(handle)
+
+        records = list(iter_records(handle, data_start, float("inf")))
+
+        assert len(records) == 2
+        assert b"Apto 301" in records[0][1]
+
+    def test_chunks_cover_every_row_once(self):
+        handle = csv_file(*(row(f"A-{i}") for i in range(5)), "\r\n")
+        _, data_start = read_header(handle)
+
+        spans = list(plan_chunks(handle, data_start, chunk_rows=2))
+
+        assert [span.row_count for span in spans] == [2, 2, 1]
+        assert [span.first_row for span in spans] == [2, 4, 6]
+        assert all(a.end <= b.start for a, b in zip(spans, spans[1:]))
+
+    def test_chunk_reads_its_rows_only(self):
+        handle = csv_file(*(row(f"A-{i}") for i in range(5)))
+
+        _, chunks = chunk_rows(handle)
+
+        assert [[cells[0] for _, cells in chunk] for chunk in chunks] == [["A-0", "A-1"], ["A-2", "A-3"], ["A-4"]]
+        assert [number for number, _ in chunks[2]] == [6]
+
+    def test_missing_columns_rejected(self):
+        with pytest.raises(ImportFileError):
+            read_header(io.BytesIO(b"order_id,carrier\r\nA-1,FedEx\r\n"))
+
+    def test_unterminated_quote_rejected(self, monkeypatch):
+        monkeypatch.setattr("src.services.shipment_import.IMPORT_MAX_RECORD_BYTES", 1024)
+        handle = csv_file('A-1,"' + "x" * 2000 + "\r\n")
+        _, data_start = read_header(handle)
+
+        with pytest.raises(ImportFileError):
+            list(plan_chunks(handle, data_start))
+
+
+class TestValidation:
+    def test_valid_rows(self):
+        header, chunks = chunk_rows(csv_file(row("A-1"), row("A-2", carrier="dhl")))
+
+        valid, errors = validate_chunk(header, chunks[0])
+
+        assert errors == []
+        assert [data["carrier"] for _, data in valid] == ["FedEx", "DHL"]
+        assert valid[0][1]["packages"][0]["weight_kg"] == 2.5
+        assert valid[0][1]["destination"]["city"] == "Medellin"
+
+    def test_errors_reported_per_row_and_field(self):
+        header, chunks = chunk_rows(csv_file(row("A-1", weight="heavy"), row("", carrier="Envia")))
+
+        valid, errors = validate_chunk(header, chunks[0])
+
+        assert valid == []
+        assert (2, "weight_kg") in {(error.row_number, error.field) for error in errors}
+        assert {(error.row_number, error.field) for error in errors if error.row_number == 3} == {
+            (3, "order_id"), (3, "carrier")
+        }
+
+    def test_empty_package_cells_use_defaults(self):
+        header, chunks = chunk_rows(csv_file(row("A-1", weight="", currency="")))
+
+        valid, errors = validate_chunk(header, chunks[0])
+
+        assert errors == []
+        assert valid[0][1]["packages"][0]["weight_kg"] == 1.0
+        assert valid[0][1]["packages"][0]["currency"] == "USD"
+
+
+def test_store_upload_is_content_addressed(tmp_path):
+    data = (HEADER + row()).encode()
+    backend = FilesystemBlobBackend(str(tmp_path))
+
+    digest, size = store_upload(io.BytesIO(data), backend)
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    with open(backend.local_path(digest), "rb") as handle:
+        assert handle.read() == data
+
+
+def test_labels_limited_per_carrier():
+    class FakeCarrierService:
+        def __init__(self):
+            self.in_flight = {}
+            self.peak = {}
+
+        async def generate_label(self, carrier, request):
+            self.in_flight[carrier] = self.in_flight.get(carrier, 0) + 1
+            self.peak[carrier] = max(self.peak.get(carrier, 0), self.in_flight[carrier])
+            await asyncio.sleep(0.01)
+            self.in_flight[carrier] -= 1
+            if request.order_id == "A-3":
+                raise RuntimeError("address rejected")
+            return request.order_id
+
+    header, chunks = chunk_rows(
+        csv_file(*(row(f"A-{i}", carrier="FedEx" if i % 2 else "DHL") for i in range(8))),
+        chunk_rows=8
+    )
+    valid, _ = validate_chunk(header, chunks[0])
+    service = FakeCarrierService()
+
+    results = asyncio.run(create_labels(service, valid, concurrency={"FedEx": 2, "DHL": 1}))
+
+    assert service.peak == {"FedEx": 2, "DHL": 1}
+    assert [number for number, _, _ in results] == list(range(2, 10))
+    assert isinstance(results[3][2], RuntimeError)
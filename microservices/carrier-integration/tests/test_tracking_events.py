@@ -0,0 +1,96 @@
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy.dialects import postgresql
+
+from src.models import CarrierType
+from src.services import tracking_events
+from src.services.tracking_events import event_row, insert_tracking_events
+
+
+class FakeSession:
+    """Plays PostgreSQL: rows whose key is already stored are skipped, new ones returned"""
+
+    def __init__(self, stored=()):
+        self.stored = set(stored)
+        self.statements = []
+        self.stats_statements = []
+
+    def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        if statement.table.name != "tracking_events":
+            self.stats_statements.append(str(compiled))
+            return []
+        self.statements.append(str(compiled))
+        params = compiled.params
+        returned = []
+        index = 0
+        while f"tracking_number_m{index}" in params:
+            key = tuple(params[f"{column}_m{index}"] for column in ("tracking_number", "carrier", "event_date", "status"))
+            if key not in self.stored:
+                self.stored.add(key)
+                returned.append((len(self.stored), *key))
+            index += 1
+        return returned
+
+
+def make_rows(count, tracking_number="TRK1"):
+    start = datetime(2024, 1, 1)
+    return [
+        event_row(tracking_number, CarrierType.DHL, start + timedelta(hours=i), "In Transit", "Scan")
+        for i in range(count)
+    ]
+
+
+class TestInsertTrackingEvents:
+    def test_returns_only_new_events(self):
+        rows = make_rows(3)
+        session = FakeSession(stored={tracking_events.event_key(rows[0])})
+
+        inserted = insert_tracking_events(session, rows)
+
+        assert [row["event_date"] for row in inserted] == [rows[1]["event_date"], rows[2]["event_date"]]
+        assert all("id" in row for row in inserted)
+        assert "ON CONFLICT ON CONSTRAINT uq_tracking_events_natural_key DO NOTHING" in session.statements[0]
+        assert "RETURNING" in session.statements[0]
+
+    def test_duplicates_in_batch_sent_once(self):
+        rows = make_rows(2) + make_rows(2)
+        session = FakeSession()
+
+        inserted = insert_tracking_events(session, rows)
+
+        assert len(inserted) == 2
+        assert len(session.statements) == 1
+
+    def test_new_events_counted_in_daily_stats(self):
+        rows = make_rows(3)
+        session = FakeSession(stored={tracking_events.event_key(rows[0])})
+
+        insert_tracking_events(session, rows)
+        insert_tracking_events(session, rows)
+
+        # Only the first call inserted anything
+        assert len(session.stats_statements) == 1
+        assert "INSERT INTO carrier_daily_stats" in session.stats_statements[0]
+        assert "ON CONFLICT (stat_date, carrier) DO UPDATE" in session.stats_statements[0]
+
+    def test_large_batches_are_chunked(self, monkeypatch):
+        monkeypatch.setattr(tracking_events, "TRACKING_EVENT_INSERT_CHUNK", 4)
+        session = FakeSession()
+
+        inserted = insert_tracking_events(session, make_rows(10))
+
+        assert len(inserted) == 10
+        assert len(session.statements) == 3
+
+    def test_aware_timestamps_normalized_to_utc(self):
+        bogota = timezone(timedelta(hours=-5))
+        row = event_row("TRK1", CarrierType.DHL, datetime(2024, 1, 1, 7, tzinfo=bogota), "Delivered")
+
+        assert row["event_date"] == datetime(2024, 1, 1, 12)
+
+    def test_empty_batch(self):
+        session = FakeSession()
+
+        assert insert_tracking_events(session, []) == []
+        assert session.statements == []
@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.services.tracking_partitions import (
+    add_months, drop_expired_partitions, ensure_partitions, list_partitions, partition_name
+)
+
+
+class FakeResult(list):
+    rowcount = 0
+
+
+class FakeConnection:
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if "pg_inherits" in sql:
+            return FakeResult(self.partitions)
+        return FakeResult()
+
+
+class FakeEngine:
+    def __init__(self, partitions):
+        self.conn = FakeConnection(partitions)
+
+    @contextmanager
+    def begin(self):
+        yield self.conn
+
+    connect = begin
+
+
+LEGACY = ("tracking_events_legacy", "FOR VALUES FROM (MINVALUE) TO ('2024-03-01 00:00:00')")
+DEFAULT = ("tracking_events_default", "DEFAULT")
+
+
+class TestTrackingPartitions:
+    def test_month_arithmetic(self):
+        assert add_months(datetime(2024, 11, 1), 2) == datetime(2025, 1, 1)
+        assert partition_name(datetime(2025, 1, 1)) == "tracking_events_p2025_01"
+
+    def test_bounds_parsed(self):
+        engine = FakeEngine([
+            LEGACY,
+            ("tracking_events_p2024_03", "FOR VALUES FROM ('2024-03-01 00:00:00') TO ('2024-04-01 00:00:00')"),
+            DEFAULT,
+        ])
+
+        partitions = list_partitions(engine.conn)
+
+        assert partitions[0].lower is None
+        assert partitions[0].upper == datetime(2024, 3, 1)
+        assert partitions[1].lower == datetime(2024, 3, 1)
+        assert partitions[2].is_default
+
+    def test_creates_missing_months_only(self):
+        engine = FakeEngine([LEGACY, DEFAULT])
+
+        created = ensure_partitions(engine, months_ahead=2, now=datetime(2024, 2, 15))
+
+        # February is still covered by the legacy partition
+        assert created == ["tracking_events_p2024_03", "tracking_events_p2024_04"]
+        assert any("DELETE FROM tracking_events_default" in sql for sql in engine.conn.statements)
+
+    def test_drops_only_fully_expired_partitions(self):
+        engine = FakeEngine([
+            LEGACY,
+            ("tracking_events_p2024_03", "FOR VALUES FROM ('2024-03-01 00:00:00') TO ('2024-04-01 00:00:00')"),
+            DEFAULT,
+        ])
+
+        result = drop_expired_partitions(engine, days_to_keep=30, now=datetime(2024, 4, 20))
+
+        assert result["dropped"] == ["tracking_events_legacy"]
+        assert any('DETACH PARTITION "tracking_events_legacy"' in sql for sql in engine.conn.statements)
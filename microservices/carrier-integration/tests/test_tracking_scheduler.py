@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from src.services import tracking_scheduler
+from src.services.tracking_scheduler import (
+    LEASES_KEY, SCHEDULE_KEY, STATUS_KEY, TrackingPollScheduler, phase_for, poll_interval
+)
+from src.services.tracking_sync import ActiveShipment
+
+
+class TestPollInterval:
+    def test_phases_from_status(self):
+        assert phase_for('DHL', None) == 'pre_transit'
+        assert phase_for('DHL', 'Out for delivery') == 'out_for_delivery'
+        assert phase_for('Servientrega', 'En reparto') == 'out_for_delivery'
+        assert phase_for('DHL', 'Held in customs') == 'customs'
+        assert phase_for('FedEx', 'OD') == 'out_for_delivery'
+        assert phase_for('UPS', 'X') == 'exception'
+        assert phase_for('DHL', 'Arrived at facility') == 'in_transit'
+
+    def test_defaults_without_cadence(self):
+        assert poll_interval('DHL', 'Out for delivery', {}) == 1800
+        assert poll_interval('DHL', 'Arrived at facility', {}) == 10800
+
+    def test_carrier_cadence_overrides_default(self):
+        cadence = {'DHL:in_transit': 4 * 3600}
+
+        assert poll_interval('DHL', 'Arrived at facility', cadence) == 2 * 3600
+        assert poll_interval('UPS', 'Arrived at facility', cadence) == 10800
+
+    def test_webhooks_stretch_interval(self):
+        assert poll_interval('DHL', 'Arrived at facility', {}, webhook_backed=True) == 43200
+
+    def test_interval_bounded(self):
+        assert poll_interval('DHL', 'Out for delivery', {'DHL:out_for_delivery': 60}) == 900
+        assert poll_interval('DHL', 'Held in customs', {}, webhook_backed=True) == 86400
+
+    def test_detection_delay_observed(self):
+        now = datetime(2024, 1, 1, 12)
+        before = tracking_scheduler.tracking_detection_delay.labels(carrier='DHL')._sum.get()
+
+        tracking_scheduler.observe_detection_delay('DHL', [{'event_date': now - timedelta(minutes=10)}], now=now)
+
+        assert tracking_scheduler.tracking_detection_delay.labels(carrier='DHL')._sum.get() - before == 600
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(tracking_scheduler, 'get_redis', lambda: client)
+    return client
+
+
+def tracking(status):
+    return SimpleNamespace(status=status)
+
+
+class TestScheduleLifecycle:
+    NOW = 1_760_616_000.0
+
+    @pytest.mark.asyncio
+    async def test_claim_leases_due_shipments(self, fake_redis):
+        scheduler = TrackingPollScheduler()
+        await scheduler.enroll([ActiveShipment('T1', 'DHL', 'In transit'), ActiveShipment('T2', 'UPS', None)], now=self.NOW)
+
+        claimed = await scheduler.claim_due(now=self.NOW)
+
+        assert sorted(claimed) == [ActiveShipment('T1', 'DHL', 'In transit'), ActiveShipment('T2', 'UPS', None)]
+        assert await fake_redis.zscore(SCHEDULE_KEY, 'DHL|T1') == self.NOW + tracking_scheduler.TRACKING_POLL_LEASE
+        assert await scheduler.claim_due(now=self.NOW + 60) == []
+
+    @pytest.mark.asyncio
+    async def test_unfinished_leases_back_off_then_park(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(tracking_scheduler, 'TRACKING_POLL_MAX_LEASES', 3)
+        scheduler = TrackingPollScheduler()
+        await scheduler.enroll([ActiveShipment('T1', 'DHL', None)], now=self.NOW)
+        lease = tracking_scheduler.TRACKING_POLL_LEASE
+
+        now = self.NOW
+        for expected in (lease, 2 * lease, 4 * lease):
+            assert len(await scheduler.claim_due(now=now)) == 1
+            assert await fake_redis.zscore(SCHEDULE_KEY, 'DHL|T1') == now + expected
+            now += expected
+
+        assert await scheduler.claim_due(now=now) == []
+        assert await fake_redis.zscore(SCHEDULE_KEY, 'DHL|T1') == float('inf')
+        # A parked shipment is not re-enrolled while it stays active
+        assert await scheduler.enroll([ActiveShipment('T1', 'DHL', None)], now=now) == 0
+
+    @pytest.mark.asyncio
+    async def test_reschedule_finishes_delivered_and_resets_lease(self, fake_redis):
+        scheduler = TrackingPollScheduler()
+        shipments = [ActiveShipment('T1', 'DHL', 'In transit'), ActiveShipment('T2', 'DHL', 'Out for delivery')]
+        await scheduler.enroll(shipments, now=self.NOW)
+        await scheduler.claim_due(now=self.NOW)
+
+        counts = await scheduler.reschedule(
+            [(shipments[0], tracking('Out for delivery')), (shipments[1], tracking('Delivered'))], now=self.NOW
+        )
+
+        assert counts == {"scheduled": 1, "finished": 1}
+        assert await fake_redis.zscore(SCHEDULE_KEY, 'DHL|T1') == self.NOW + 1800
+        assert await fake_redis.zscore(SCHEDULE_KEY, 'DHL|T2') is None
+        assert await fake_redis.hget(STATUS_KEY, 'DHL|T2') is None
+        assert await fake_redis.hgetall(LEASES_KEY) == {}
+
+    @pytest.mark.asyncio
+    async def test_prune_drops_inactive_shipments(self, fake_redis):
+        scheduler = TrackingPollScheduler()
+        active = [ActiveShipment('T1', 'DHL', 'In transit')]
+        await scheduler.enroll(active + [ActiveShipment('T2', 'DHL', 'In transit')], now=self.NOW)
+        await scheduler.claim_due(now=self.NOW)
+
+        assert await scheduler.prune(active) == 1
+
+        assert await fake_redis.zrange(SCHEDULE_KEY, 0, -1) == [b'DHL|T1']
+        assert await fake_redis.hkeys(STATUS_KEY) == [b'DHL|T1']
+        assert await fake_redis.hkeys(LEASES_KEY) == [b'DHL|T1']
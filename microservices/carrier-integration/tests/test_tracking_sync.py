@@ -0,0 +1,125 @@
+import pytest
+import asyncio
+from datetime import datetime
+
+from src.services.tracking_sync import ActiveShipment, TrackingSyncEngine, is_terminal
+from src.schemas import TrackingEvent, TrackingResponse
+
+
+def make_tracking(tracking_number, carrier, status="In Transit"):
+    return TrackingResponse(
+        tracking_number=tracking_number,
+        carrier=carrier,
+        status=status,
+        events=[TrackingEvent(date=datetime(2024, 1, 1), status=status, description=status)]
+    )
+
+
+class BatchClient:
+    MAX_TRACKING_BATCH = 10
+
+
+class SingleClient:
+    pass
+
+
+class FakeCarrierService:
+    def __init__(self, fail=()):
+        self.carriers = {'DHL': BatchClient(), 'UPS': SingleClient()}
+        self.fail = set(fail)
+        self.batch_calls = []
+        self.single_calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _call(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+    async def track_shipments(self, carrier, tracking_numbers):
+        self.batch_calls.append(list(tracking_numbers))
+        await self._call()
+        return {
+            number: Exception("not found") if number in self.fail else make_tracking(number, carrier)
+            for number in tracking_numbers
+        }
+
+    async def track_shipment(self, carrier, tracking_number):
+        self.single_calls.append(tracking_number)
+        await self._call()
+        if tracking_number in self.fail:
+            raise Exception("not found")
+        return make_tracking(tracking_number, carrier, status="Delivered")
+
+
+class TestTrackingSyncEngine:
+    @pytest.mark.asyncio
+    async def test_groups_by_carrier_and_chunks_batches(self):
+        service = FakeCarrierService()
+        stored = []
+        engine = TrackingSyncEngine(service, store=lambda batch: stored.extend(batch) or {})
+        shipments = [ActiveShipment(f"DHL{i}", 'DHL', None) for i in range(25)]
+        shipments += [ActiveShipment(f"UPS{i}", 'UPS', None) for i in range(3)]
+
+        stats = await engine.sync(shipments)
+
+        assert [len(call) for call in service.batch_calls] == [10, 10, 5]
+        assert len(service.single_calls) == 3
+        assert stats['synced'] == 28
+        assert len(stored) == 28
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limited_per_carrier(self):
+        service = FakeCarrierService()
+        engine = TrackingSyncEngine(service, store=lambda batch: {}, concurrency={'UPS': 2})
+
+        await engine.sync([ActiveShipment(f"UPS{i}", 'UPS', None) for i in range(10)])
+
+        assert service.max_in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_failures_counted_and_not_stored(self):
+        service = FakeCarrierService(fail={'DHL1', 'UPS1'})
+        stored = []
+        tracked = []
+        engine = TrackingSyncEngine(
+            service,
+            store=lambda batch: stored.extend(batch) or {},
+            on_tracked=lambda shipment, tracking: tracked.append(shipment.tracking_number)
+        )
+
+        stats = await engine.sync([
+            ActiveShipment('DHL0', 'DHL', None),
+            ActiveShipment('DHL1', 'DHL', None),
+            ActiveShipment('UPS0', 'UPS', None),
+            ActiveShipment('UPS1', 'UPS', None),
+        ])
+
+        assert stats['synced'] == 2
+        assert stats['failed'] == 2
+        assert sorted(tracked) == ['DHL0', 'UPS0']
+        assert sorted(shipment.tracking_number for shipment, _ in stored) == ['DHL0', 'UPS0']
+
+    @pytest.mark.asyncio
+    async def test_only_new_events_reported(self):
+        service = FakeCarrierService()
+        notified = []
+        engine = TrackingSyncEngine(
+            service,
+            # DHL1 was synced before: none of its events are new
+            store=lambda batch: {'DHL0': [{'tracking_number': 'DHL0', 'status': 'In Transit'}]},
+            on_new_events=lambda shipment, tracking, events: notified.append((shipment.tracking_number, len(events)))
+        )
+
+        stats = await engine.sync([ActiveShipment('DHL0', 'DHL', None), ActiveShipment('DHL1', 'DHL', None)])
+
+        assert notified == [('DHL0', 1)]
+        assert stats['events_added'] == 1
+
+    def test_terminal_statuses(self):
+        assert is_terminal('DHL', 'Delivered')
+        assert is_terminal('FedEx', 'DL')
+        assert not is_terminal('DHL', 'DL')
+        assert not is_terminal('UPS', None)
@@ -0,0 +1,121 @@
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+import redis.asyncio as redis
+
+from src.services.webhook_ingest import WEBHOOK_STREAM, WebhookStream, canonical_payload, dedup_key
+
+
+def fake_redis():
+    client = Mock()
+    client.eval = AsyncMock()
+    client.xgroup_create = AsyncMock()
+    client.xautoclaim = AsyncMock(return_value=[b"0-0", [], []])
+    client.xreadgroup = AsyncMock(return_value=[])
+    client.xinfo_groups = AsyncMock(return_value=[])
+    client.xlen = AsyncMock(return_value=0)
+    pipe = Mock()
+    pipe.execute = AsyncMock()
+    client.pipeline = Mock(return_value=pipe)
+    return client
+
+
+def entry(entry_id, carrier="DHL", webhook_type="tracking", payload='{"trackingNumber": "TRK1"}'):
+    return (entry_id, {b"carrier": carrier.encode(), b"type": webhook_type.encode(), b"payload": payload.encode()})
+
+
+class TestDedupKey:
+    def test_same_payload_in_any_key_order_is_a_duplicate(self):
+        first = canonical_payload({"trackingNumber": "TRK1", "events": [{"statusCode": "transit"}]})
+        second = canonical_payload({"events": [{"statusCode": "transit"}], "trackingNumber": "TRK1"})
+
+        assert dedup_key("DHL", "tracking", first) == dedup_key("DHL", "tracking", second)
+
+    def test_carrier_and_type_are_part_of_the_key(self):
+        payload = canonical_payload({"trackingNumber": "TRK1"})
+
+        assert dedup_key("DHL", "tracking", payload) != dedup_key("DHL", "pod", payload)
+        assert dedup_key("DHL", "tracking", payload) != dedup_key("FedEx", "tracking", payload)
+
+
+class TestWebhookStream:
+    @pytest.mark.asyncio
+    async def test_append_stores_payload_once(self):
+        client = fake_redis()
+        client.eval.side_effect = [b"1700000000000-0", None]
+        metric = Mock()
+
+        with patch('src.services.webhook_ingest.get_redis', return_value=client), \
+                patch('src.services.webhook_ingest.webhook_ingest_total', metric):
+            first = await WebhookStream().append("DHL", "tracking", {"trackingNumber": "TRK1"})
+            second = await WebhookStream().append("DHL", "tracking", {"trackingNumber": "TRK1"})
+
+        assert first == "1700000000000-0"
+        assert second is None
+        assert client.eval.call_args.args[3] == WEBHOOK_STREAM
+        assert [call.kwargs["outcome"] for call in metric.labels.call_args_list] == ["accepted", "duplicate"]
+
+    @pytest.mark.asyncio
+    async def test_append_failure_propagates(self):
+        client = fake_redis()
+        client.eval.side_effect = redis.ConnectionError("down")
+
+        with patch('src.services.webhook_ingest.get_redis', return_value=client):
+            with pytest.raises(redis.ConnectionError):
+                await WebhookStream().append("DHL", "tracking", {"trackingNumber": "TRK1"})
+
+    @pytest.mark.asyncio
+    async def test_abandoned_entries_read_first(self):
+        client = fake_redis()
+        client.xautoclaim.return_value = [b"0-0", [entry(b"1-0")], []]
+
+        with patch('src.services.webhook_ingest.get_redis', return_value=client):
+            entries = await WebhookStream().read("worker-1")
+
+        assert [e.id for e in entries] == ["1-0"]
+        client.xreadgroup.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_new_entries_read_through_group(self):
+        client = fake_redis()
+        client.xreadgroup.return_value = [[WEBHOOK_STREAM.encode(), [entry(b"1700000000000-0"), entry(b"1700000000001-0", "FedEx")]]]
+        stream = WebhookStream()
+
+        with patch('src.services.webhook_ingest.get_redis', return_value=client):
+            entries = await stream.read("worker-1")
+            await stream.read("worker-1")
+
+        assert [(e.carrier, e.webhook_type) for e in entries] == [("DHL", "tracking"), ("FedEx", "tracking")]
+        assert entries[0].data == {"trackingNumber": "TRK1"}
+        assert entries[0].appended_at == 1700000000.0
+        # The group is created once per process
+        client.xgroup_create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_existing_group_is_reused(self):
+        client = fake_redis()
+        client.xgroup_create.side_effect = redis.ResponseError("BUSYGROUP Consumer Group name already exists")
+
+        with patch('src.services.webhook_ingest.get_redis', return_value=client):
+            assert await WebhookStream().read("worker-1") == []
+
+    @pytest.mark.asyncio
+    async def test_ack_deletes_processed_entries(self):
+        client = fake_redis()
+        client.xautoclaim.return_value = [b"0-0", [entry(b"1-0"), entry(b"2-0")], []]
+        stream = WebhookStream()
+
+        with patch('src.services.webhook_ingest.get_redis', return_value=client):
+            await stream.ack(await stream.read("worker-1"))
+
+        pipe = client.pipeline.return_value
+        pipe.xack.assert_called_once_with(WEBHOOK_STREAM, "webhook-processors", "1-0", "2-0")
+        pipe.xdel.assert_called_once_with(WEBHOOK_STREAM, "1-0", "2-0")
+
+    @pytest.mark.asyncio
+    async def test_backlog_counts_unread_and_pending(self):
+        client = fake_redis()
+        client.xinfo_groups.return_value = [{"name": b"webhook-processors", "pending": 3, "lag": 40}]
+
+        with patch('src.services.webhook_ingest.get_redis', return_value=client):
+            assert await WebhookStream().backlog() == 43
@@ -234,10 +234,13 @@ async def metrics():
 @app.post("/api/v1/franchises", response_model=FranchiseResponse)
 async def create_franchise(
     franchise_data: FranchiseCreate,
+    response: Response,
     current_user: dict = Depends(require_permissions(["franchises:create"])),
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new franchise"""
+    # Lets the API gateway drop cached reads of this data
+    response.headers["X-Cache-Invalidate"] = "franchises,territories"
     try:
         # Check if territory is available
         territory_stmt = select(Territory).where(Territory.territory_code == franchise_data.territory_code)
@@ -394,10 +397,13 @@ async def get_franchise(
 async def update_franchise(
     franchise_id: str,
     update_data: FranchiseUpdate,
+    response: Response,
     current_user: dict = Depends(require_permissions(["franchises:update"])),
     db: AsyncSession = Depends(get_db)
 ):
     """Update franchise information"""
+    # Lets the API gateway drop cached reads of this data
+    response.headers["X-Cache-Invalidate"] = f"franchises,territories,franchise:{franchise_id}"
     try:
         stmt = select(Franchise).where(Franchise.franchise_id == franchise_id)
         result = await db.execute(stmt)
@@ -436,10 +442,13 @@ async def update_franchise(
 async def update_franchise_status(
     franchise_id: str,
     status_update: StatusUpdate,
+    response: Response,
     current_user: dict = Depends(require_permissions(["franchises:update"])),
     db: AsyncSession = Depends(get_db)
 ):
     """Update franchise status"""
+    # Lets the API gateway drop cached reads of this data
+    response.headers["X-Cache-Invalidate"] = f"franchises,territories,franchise:{franchise_id}"
     try:
         stmt = select(Franchise).where(Franchise.franchise_id == franchise_id)
         result = await db.execute(stmt)
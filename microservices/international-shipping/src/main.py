@@ -7,7 +7,6 @@ from pydantic_settings import BaseSettings
 import structlog
 from typing import Optional, List, Dict, Any
 import consul
-import httpx
 import os
 import logging
 from datetime import datetime, date, timedelta
@@ -19,6 +18,8 @@ from starlette.responses import Response
 import time
 from .models import Manifest, ManifestItem, ShippingRate, Country, ShippingCarrier, Base, ManifestStatus, ShippingZone
 from .database import get_db, create_tables, engine
+from shared.token_verifier import TokenVerifier
+from shared.deadline import DeadlineMiddleware
 
 # Import logging configuration
 try:
@@ -57,6 +58,10 @@ class Settings(BaseSettings):
     consul_host: str = "consul"
     consul_port: int = 8500
     auth_service_url: str = "http://auth-service:8003"
+    jwt_secret_key: str = "your-super-secret-jwt-key-change-in-production"
+    jwt_algorithm: str = "HS256"
+    token_cache_ttl_seconds: int = 300
+    token_revocation_channel: str = "auth:token-revocations"
 
     class Config:
         env_file = ".env"
@@ -71,6 +76,10 @@ app = FastAPI(
     description="Microservice for international shipping and manifest management",
     version="2.0.0"
 )
+
+# Honour the gateway-propagated request deadline
+app.add_middleware(DeadlineMiddleware)
+
 # Prometheus metrics
 intl_shipping_service_operations_total = Counter(
     'intl_shipping_service_operations_total',
@@ -89,21 +98,18 @@ http_requests_total = Counter(
 )
 
 # Auth dependency
+token_verifier = TokenVerifier(
+    auth_service_url=settings.auth_service_url,
+    secret_key=settings.jwt_secret_key,
+    algorithm=settings.jwt_algorithm,
+    redis_url=settings.redis_url,
+    revocation_channel=settings.token_revocation_channel,
+    cache_ttl=settings.token_cache_ttl_seconds
+)
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify token with auth service and return user info"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.auth_service_url}/api/v1/profile",
-                headers={"Authorization": f"Bearer {credentials.credentials}"}
-            )
-            if response.status_code != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            return response.json()
-    except httpx.RequestError:
-        raise HTTPException(status_code=503, detail="Auth service unavailable")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    """Verify token locally and return the cached user info"""
+    return await token_verifier.verify(credentials.credentials)
 
 async def get_current_user(user_info = Depends(verify_token)):
     """Get current authenticated user"""
@@ -552,9 +558,12 @@ async def get_countries(
 @app.post("/api/v1/countries", response_model=Dict[str, Any])
 async def create_country(
     country: CountryCreate,
+    response: Response,
     current_user = Depends(require_permissions(["admin:create"])),
     db: AsyncSession = Depends(get_db)
 ):
+    # Lets the API gateway drop cached reads of this data
+    response.headers["X-Cache-Invalidate"] = "countries"
     try:
         return {
             "id": 16,  # Mock ID
@@ -612,9 +621,12 @@ async def get_carriers(
 @app.post("/api/v1/carriers", response_model=Dict[str, Any])
 async def create_carrier(
     carrier: CarrierCreate,
+    response: Response,
     current_user = Depends(require_permissions(["admin:create"])),
     db: AsyncSession = Depends(get_db)
 ):
+    # Lets the API gateway drop cached reads of this data
+    response.headers["X-Cache-Invalidate"] = "carriers"
     try:
         return {
             "id": 16,  # Mock ID
@@ -693,10 +705,12 @@ async def register_with_consul():
 async def startup_event():
     await create_tables()
     await register_with_consul()
+    await token_verifier.start()
     logger.info(f"{settings.service_name} started")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await token_verifier.stop()
     c = consul.Consul(host=settings.consul_host, port=settings.consul_port)
     try:
         c.agent.service.deregister(f"{settings.service_name}-1")
@@ -8,7 +8,6 @@ from pydantic_settings import BaseSettings
 import structlog
 from typing import Optional, List, Dict, Any
 import consul
-import httpx
 import os
 import logging
 from datetime import datetime, date, timedelta
@@ -26,6 +25,8 @@ from .models import (
     CreditStatus, CreditType, PaymentFrequency, RiskLevel, PaymentStatus
 )
 from .database import get_db, create_tables, engine
+from shared.token_verifier import TokenVerifier
+from shared.deadline import DeadlineMiddleware
 
 # Import logging configuration
 try:
@@ -64,6 +65,10 @@ class Settings(BaseSettings):
     consul_host: str = "consul"
     consul_port: int = 8500
     auth_service_url: str = "http://auth-service:8009"
+    jwt_secret_key: str = "your-super-secret-jwt-key-change-in-production"
+    jwt_algorithm: str = "HS256"
+    token_cache_ttl_seconds: int = 300
+    token_revocation_channel: str = "auth:token-revocations"
 
     model_config = {"env_file": ".env"}
 
@@ -79,6 +84,10 @@ app = FastAPI(
     description="Microservice for microcredit and financing management",
     version="2.0.0"
 )
+
+# Honour the gateway-propagated request deadline
+app.add_middleware(DeadlineMiddleware)
+
 # Prometheus metrics
 microcredit_service_operations_total = Counter(
     'microcredit_service_operations_total',
@@ -97,21 +106,18 @@ http_requests_total = Counter(
 )
 
 # Auth dependency
+token_verifier = TokenVerifier(
+    auth_service_url=settings.auth_service_url,
+    secret_key=settings.jwt_secret_key,
+    algorithm=settings.jwt_algorithm,
+    redis_url=settings.redis_url,
+    revocation_channel=settings.token_revocation_channel,
+    cache_ttl=settings.token_cache_ttl_seconds
+)
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify token with auth service and return user info"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.auth_service_url}/api/v1/profile",
-                headers={"Authorization": f"Bearer {credentials.credentials}"}
-            )
-            if response.status_code != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            return response.json()
-    except httpx.RequestError:
-        raise HTTPException(status_code=503, detail="Auth service unavailable")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    """Verify token locally and return the cached user info"""
+    return await token_verifier.verify(credentials.credentials)
 
 async def get_current_user(user_info = Depends(verify_token)):
     """Get current authenticated user"""
@@ -861,10 +867,12 @@ async def register_with_consul():
 async def startup_event():
     await create_tables()
     await register_with_consul()
+    await token_verifier.start()
     logger.info(f"{settings.service_name} started")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await token_verifier.stop()
     c = consul.Consul(host=settings.consul_host, port=settings.consul_port)
     try:
         c.agent.service.deregister(f"{settings.service_name}-1")
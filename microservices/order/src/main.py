@@ -8,7 +8,6 @@ from pydantic_settings import BaseSettings
 import structlog
 from typing import Optional, List, Dict, Any
 import consul
-import httpx
 import os
 import logging
 from datetime import datetime, date, timedelta
@@ -20,6 +19,8 @@ from starlette.responses import Response
 import time
 from .models import Product, InventoryItem, StockMovement, Order, OrderItem, Base, StockMovementType
 from .database import get_db, create_tables, engine
+from shared.token_verifier import TokenVerifier
+from shared.deadline import DeadlineMiddleware
 
 # Import logging configuration
 try:
@@ -58,6 +59,10 @@ class Settings(BaseSettings):
     consul_host: str = "consul"
     consul_port: int = 8500
     auth_service_url: str = "http://auth-service:8003"
+    jwt_secret_key: str = "your-super-secret-jwt-key-change-in-production"
+    jwt_algorithm: str = "HS256"
+    token_cache_ttl_seconds: int = 300
+    token_revocation_channel: str = "auth:token-revocations"
 
     class Config:
         env_file = ".env"
@@ -72,6 +77,10 @@ app = FastAPI(
     description="Microservice for order and inventory management",
     version="2.0.0"
 )
+
+# Honour the gateway-propagated request deadline
+app.add_middleware(DeadlineMiddleware)
+
 # Prometheus metrics
 order_service_operations_total = Counter(
     'order_service_operations_total',
@@ -90,21 +99,18 @@ http_requests_total = Counter(
 )
 
 # Auth dependency
+token_verifier = TokenVerifier(
+    auth_service_url=settings.auth_service_url,
+    secret_key=settings.jwt_secret_key,
+    algorithm=settings.jwt_algorithm,
+    redis_url=settings.redis_url,
+    revocation_channel=settings.token_revocation_channel,
+    cache_ttl=settings.token_cache_ttl_seconds
+)
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify token with auth service and return user info"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.auth_service_url}/api/v1/profile",
-                headers={"Authorization": f"Bearer {credentials.credentials}"}
-            )
-            if response.status_code != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            return response.json()
-    except httpx.RequestError:
-        raise HTTPException(status_code=503, detail="Auth service unavailable")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    """Verify token locally and return the cached user info"""
+    return await token_verifier.verify(credentials.credentials)
 
 async def get_current_user(user_info = Depends(verify_token)):
     """Get current authenticated user"""
@@ -302,9 +308,12 @@ async def get_product(
 @app.post("/api/v1/products", response_model=Dict[str, Any])
 async def create_product(
     product: ProductCreate, 
+    response: Response,
     current_user = Depends(require_permissions(["products:create"])),
     db: AsyncSession = Depends(get_db)
 ):
+    # Lets the API gateway drop cached reads of this data
+    response.headers["X-Cache-Invalidate"] = "products"
     try:
         unique_id = f"PROD-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
         
@@ -338,9 +347,12 @@ async def create_product(
 async def update_product(
     product_id: int,
     product_update: ProductUpdate,
+    response: Response,
     current_user = Depends(require_permissions(["products:update"])),
     db: AsyncSession = Depends(get_db)
 ):
+    # Lets the API gateway drop cached reads of this data
+    response.headers["X-Cache-Invalidate"] = f"products,product:{product_id}"
     try:
         current_product = await get_product(product_id, db)
         
@@ -358,9 +370,12 @@ async def update_product(
 @app.delete("/api/v1/products/{product_id}")
 async def delete_product(
     product_id: int,
+    response: Response,
     current_user = Depends(require_permissions(["products:delete"])),
     db: AsyncSession = Depends(get_db)
 ):
+    # Lets the API gateway drop cached reads of this data
+    response.headers["X-Cache-Invalidate"] = f"products,product:{product_id}"
     try:
         return {"message": f"Product {product_id} deleted successfully"}
     except Exception as e:
@@ -668,6 +683,7 @@ async def register_with_consul():
 async def startup_event():
     await create_tables()
     await register_with_consul()
+    await token_verifier.start()
     if INFO_MESSAGES and "ORD_I006" in INFO_MESSAGES:
         logger.info(
             INFO_MESSAGES["ORD_I006"]["message"].format(port=8002),
@@ -678,6 +694,7 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await token_verifier.stop()
     c = consul.Consul(host=settings.consul_host, port=settings.consul_port)
     try:
         c.agent.service.deregister(f"{settings.service_name}-1")
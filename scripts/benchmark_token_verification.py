@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Token verification benchmark
+Compares p50/p99 latency of the legacy per-request auth-service round-trip
+(new AsyncClient + GET /api/v1/profile) against the local TokenVerifier
+(signature check + per-jti claims cache) used by the downstream services.
+
+Usage:
+    python scripts/benchmark_token_verification.py \
+        --auth-url http://localhost:8019 --username admin --password AdminPassword123 \
+        --secret-key your-secret-key-change-this-in-production --iterations 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# TokenVerifier is vendored per service; the order-service copy is canonical
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "microservices" / "order"))
+
+from src.token_verifier import TokenVerifier  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, samples):
+    print(
+        f"{name:<28} n={len(samples):<6} "
+        f"p50={percentile(samples, 50) * 1000:8.3f} ms  "
+        f"p99={percentile(samples, 99) * 1000:8.3f} ms  "
+        f"mean={statistics.mean(samples) * 1000:8.3f} ms"
+    )
+
+
+async def login(auth_url, username, password):
+    async with httpx.AsyncClient(base_url=auth_url, timeout=10.0) as client:
+        response = await client.post(
+            "/api/v1/auth/login",
+            json={"username_or_email": username, "password": password}
+        )
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+
+async def bench_round_trip(auth_url, token, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
+                f"{auth_url}/api/v1/profile",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            response.raise_for_status()
+            response.json()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_local(args, token, iterations):
+    verifier = TokenVerifier(
+        auth_service_url=args.auth_url,
+        secret_key=args.secret_key,
+        algorithm=args.algorithm,
+        redis_url=args.redis_url,
+        revocation_channel=args.revocation_channel
+    )
+    await verifier.start()
+    try:
+        # Give the revocation feed a moment to subscribe so the cache is live
+        for _ in range(50):
+            if verifier._feed_connected:
+                break
+            await asyncio.sleep(0.05)
+        if not verifier._feed_connected:
+            print("warning: revocation feed not connected, cache disabled")
+
+        cold_start = time.perf_counter()
+        await verifier.verify(token)
+        cold = time.perf_counter() - cold_start
+
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await verifier.verify(token)
+            samples.append(time.perf_counter() - start)
+        return cold, samples
+    finally:
+        await verifier.stop()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--auth-url", default="http://localhost:8019")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="AdminPassword123")
+    parser.add_argument("--secret-key", default="your-secret-key-change-this-in-production")
+    parser.add_argument("--algorithm", default="HS256")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--revocation-channel", default="auth:token-revocations")
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    token = await login(args.auth_url, args.username, args.password)
+
+    round_trip = await bench_round_trip(args.auth_url, token, args.iterations)
+    cold, local = await bench_local(args, token, args.iterations)
+
+    report("auth round-trip (legacy)", round_trip)
+    report("local verify (cached)", local)
+    print(f"{'local verify (first use)':<28} {cold * 1000:8.3f} ms")
+    print(f"p50 speedup: {percentile(round_trip, 50) / percentile(local, 50):.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+Request deadline propagation.
+
+The API gateway stamps every proxied request with ``X-Request-Deadline``
+(absolute Unix time in milliseconds). Work that can no longer finish before
+the caller gives up is refused or cut short with a 504 instead of holding
+connections, and handlers can read the remaining budget via
+``remaining_time()`` to bound their own outbound calls.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+DEADLINE_HEADER = "X-Request-Deadline"
+
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the current request's deadline (``default`` if none)"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return default
+    return max(0.0, deadline - time.time())
+
+
+def _deadline_exceeded() -> JSONResponse:
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+
+
+class DeadlineMiddleware(BaseHTTPMiddleware):
+    """Honours the gateway's X-Request-Deadline header"""
+
+    async def dispatch(self, request: Request, call_next):
+        raw = request.headers.get(DEADLINE_HEADER)
+        if not raw:
+            return await call_next(request)
+        try:
+            deadline = int(raw) / 1000
+        except ValueError:
+            return await call_next(request)
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return _deadline_exceeded()
+
+        token = request_deadline.set(deadline)
+        try:
+            return await asyncio.wait_for(call_next(request), timeout=remaining)
+        except asyncio.TimeoutError:
+            return _deadline_exceeded()
+        finally:
+            request_deadline.reset(token)
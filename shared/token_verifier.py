@@ -0,0 +1,249 @@
+"""
+Local JWT verification with a per-jti claims cache.
+
+Access tokens are verified in-process against the shared signing key
+(signature, expiry and token type). The user profile behind a token
+(claims and permissions) is fetched from auth-service once per ``jti`` and
+cached until the token expires or ``cache_ttl`` lapses, whichever comes first.
+
+auth-service publishes revocations (logout, password change, deactivation,
+role/permission changes) on a Redis pub/sub channel; the verifier listens on
+it and evicts affected entries. While the feed is disconnected the cache is
+bypassed, so a missed revocation can never be served from memory.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+import httpx
+import jwt
+import redis.asyncio as redis
+import structlog
+from fastapi import HTTPException
+from prometheus_client import Counter
+
+logger = structlog.get_logger()
+
+token_verifications_total = Counter(
+    'auth_token_verifications_total',
+    'Token verifications by outcome',
+    ['result']
+)
+token_revocations_total = Counter(
+    'auth_token_revocations_received_total',
+    'Revocation events received from auth-service',
+    ['type']
+)
+
+
+class TokenVerifier:
+    """Verifies bearer tokens locally and caches resolved profiles per jti"""
+
+    def __init__(
+        self,
+        auth_service_url: str,
+        secret_key: str,
+        algorithm: str = "HS256",
+        redis_url: Optional[str] = None,
+        revocation_channel: str = "auth:token-revocations",
+        cache_ttl: int = 300,
+        max_entries: int = 10000
+    ):
+        self.auth_service_url = auth_service_url
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.redis_url = redis_url
+        self.revocation_channel = revocation_channel
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+
+        # jti -> (profile, user_id, expires_at)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._user_jtis: Dict[str, Set[str]] = {}
+        self._user_revoked_at: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._feed_connected = False
+        self._listener: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        """Open the pooled auth-service client and subscribe to revocations"""
+        self._http = httpx.AsyncClient(
+            base_url=self.auth_service_url,
+            timeout=httpx.Timeout(5.0, connect=2.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+        )
+        if self.redis_url:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._http:
+            await self._http.aclose()
+            self._http = None
+        self._clear()
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Return the user profile for a bearer token or raise 401/503"""
+        try:
+            claims = jwt.decode(
+                token,
+                self.secret_key,
+                algorithms=[self.algorithm],
+                options={"require": ["exp", "sub", "jti"]}
+            )
+        except jwt.ExpiredSignatureError:
+            token_verifications_total.labels(result='expired').inc()
+            raise HTTPException(status_code=401, detail="Token has expired")
+        except jwt.InvalidTokenError:
+            token_verifications_total.labels(result='invalid').inc()
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        if claims.get("type", "access") != "access":
+            token_verifications_total.labels(result='invalid').inc()
+            raise HTTPException(status_code=401, detail="Invalid token type")
+
+        jti = claims["jti"]
+        user_id = str(claims["sub"])
+
+        profile = self._get_cached(jti)
+        if profile is not None:
+            token_verifications_total.labels(result='hit').inc()
+            return profile
+
+        # Coalesce concurrent first-use of the same token into one round-trip
+        pending = self._inflight.get(jti)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[jti] = future
+        try:
+            profile = await self._fetch_and_store(token, jti, user_id, claims["exp"])
+            future.set_result(profile)
+            return profile
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so the loop doesn't warn when nobody else awaited it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(jti, None)
+
+    def _get_cached(self, jti: str) -> Optional[Dict[str, Any]]:
+        if not self._feed_connected:
+            return None
+        entry = self._cache.get(jti)
+        if entry is None:
+            return None
+        profile, user_id, expires_at = entry
+        if expires_at <= time.time():
+            self._evict(jti)
+            return None
+        self._cache.move_to_end(jti)
+        return profile
+
+    async def _fetch_and_store(self, token: str, jti: str, user_id: str, exp: int) -> Dict[str, Any]:
+        fetched_at = time.time()
+        try:
+            response = await self._http.get(
+                "/api/v1/profile",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+        except httpx.RequestError:
+            token_verifications_total.labels(result='unavailable').inc()
+            raise HTTPException(status_code=503, detail="Auth service unavailable")
+
+        if response.status_code != 200:
+            token_verifications_total.labels(result='rejected').inc()
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        profile = response.json()
+        token_verifications_total.labels(result='miss').inc()
+
+        # A revocation that arrived while the profile was in flight wins
+        if self._feed_connected and self._user_revoked_at.get(user_id, 0) < fetched_at:
+            self._store(jti, user_id, profile, min(exp, fetched_at + self.cache_ttl))
+        return profile
+
+    def _store(self, jti: str, user_id: str, profile: Dict[str, Any], expires_at: float) -> None:
+        self._cache[jti] = (profile, user_id, expires_at)
+        self._cache.move_to_end(jti)
+        self._user_jtis.setdefault(user_id, set()).add(jti)
+        while len(self._cache) > self.max_entries:
+            oldest = next(iter(self._cache))
+            self._evict(oldest)
+
+    def _evict(self, jti: str) -> None:
+        entry = self._cache.pop(jti, None)
+        if entry is None:
+            return
+        jtis = self._user_jtis.get(entry[1])
+        if jtis is not None:
+            jtis.discard(jti)
+            if not jtis:
+                del self._user_jtis[entry[1]]
+
+    def _clear(self) -> None:
+        self._cache.clear()
+        self._user_jtis.clear()
+
+    def apply_revocation(self, event: Dict[str, Any]) -> None:
+        """Evict cache entries affected by a revocation event"""
+        event_type = event.get("type")
+        token_revocations_total.labels(type=event_type or 'unknown').inc()
+        if event_type == "jti":
+            self._evict(event.get("jti"))
+        elif event_type == "user":
+            user_id = str(event.get("user_id"))
+            self._user_revoked_at[user_id] = time.time()
+            for jti in list(self._user_jtis.get(user_id, ())):
+                self._evict(jti)
+            # Only recent revocations matter for in-flight fetches
+            if len(self._user_revoked_at) > self.max_entries:
+                cutoff = time.time() - 60
+                self._user_revoked_at = {
+                    uid: ts for uid, ts in self._user_revoked_at.items() if ts >= cutoff
+                }
+
+    async def _listen(self) -> None:
+        while True:
+            client = redis.from_url(self.redis_url, decode_responses=True)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.revocation_channel)
+                # Anything cached before (re)subscribing may have missed events
+                self._clear()
+                self._feed_connected = True
+                logger.info("Subscribed to token revocation feed", channel=self.revocation_channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self.apply_revocation(json.loads(message["data"]))
+                    except (ValueError, TypeError) as e:
+                        logger.warning("Malformed revocation event", error=str(e))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Token revocation feed disconnected", error=str(e))
+            finally:
+                self._feed_connected = False
+                self._clear()
+                try:
+                    await pubsub.close()
+                    await client.close()
+                except Exception:
+                    pass
+            await asyncio.sleep(1)
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from shared.deadline import DEADLINE_HEADER, DeadlineMiddleware, remaining_time
+
+
+def deadline_app():
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware)
+
+    @app.get("/remaining")
+    async def remaining():
+        return {"remaining": remaining_time()}
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(1)
+        return {"done": True}
+
+    return TestClient(app)
+
+
+def deadline_in(seconds):
+    return {DEADLINE_HEADER: str(int((time.time() + seconds) * 1000))}
+
+
+class TestDeadlineMiddleware:
+    def test_without_deadline_nothing_changes(self):
+        response = deadline_app().get("/remaining")
+
+        assert response.json() == {"remaining": None}
+
+    def test_remaining_budget_visible_to_handlers(self):
+        response = deadline_app().get("/remaining", headers=deadline_in(5))
+
+        assert 4 < response.json()["remaining"] <= 5
+
+    def test_expired_deadline_refused(self):
+        response = deadline_app().get("/remaining", headers=deadline_in(-1))
+
+        assert response.status_code == 504
+
+    def test_slow_handler_cut_short(self):
+        response = deadline_app().get("/slow", headers=deadline_in(0.1))
+
+        assert response.status_code == 504
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, Mock
+
+import fakeredis
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from shared import token_verifier
+from shared.token_verifier import TokenVerifier
+
+SECRET = "test-secret"
+
+
+def make_token(jti="jti-1", sub="42", exp_in=600, token_type="access"):
+    claims = {"jti": jti, "sub": sub, "exp": int(time.time()) + exp_in, "type": token_type}
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+def auth_service(profile=None, status_code=200):
+    http = Mock()
+    http.get = AsyncMock(return_value=Mock(status_code=status_code, json=Mock(return_value=profile or {"id": 42})))
+    http.aclose = AsyncMock()
+    return http
+
+
+def connected_verifier(**kwargs):
+    verifier = TokenVerifier("http://auth-service", SECRET, **kwargs)
+    verifier._http = auth_service()
+    # As if subscribed to the revocation feed
+    verifier._feed_connected = True
+    return verifier
+
+
+class TestTokenValidation:
+    @pytest.mark.asyncio
+    async def test_expired_token_rejected_without_auth_service(self):
+        verifier = connected_verifier()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await verifier.verify(make_token(exp_in=-10))
+
+        assert exc_info.value.status_code == 401
+        assert exc_info.value.detail == "Token has expired"
+        verifier._http.get.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_refresh_token_and_bad_signature_rejected(self):
+        verifier = connected_verifier()
+        forged = jwt.encode({"jti": "x", "sub": "42", "exp": int(time.time()) + 60}, "other", algorithm="HS256")
+
+        for token in (make_token(token_type="refresh"), forged):
+            with pytest.raises(HTTPException) as exc_info:
+                await verifier.verify(token)
+            assert exc_info.value.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_auth_service_rejection_is_unauthorized(self):
+        verifier = connected_verifier()
+        verifier._http = auth_service(status_code=401)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await verifier.verify(make_token())
+
+        assert exc_info.value.status_code == 401
+        assert verifier._cache == {}
+
+
+class TestClaimsCache:
+    @pytest.mark.asyncio
+    async def test_profile_fetched_once_per_jti(self):
+        verifier = connected_verifier()
+        token = make_token()
+
+        assert await verifier.verify(token) == {"id": 42}
+        assert await verifier.verify(token) == {"id": 42}
+        await verifier.verify(make_token(jti="jti-2"))
+
+        assert verifier._http.get.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_use_coalesced(self):
+        verifier = connected_verifier()
+        token = make_token()
+
+        results = await asyncio.gather(*(verifier.verify(token) for _ in range(5)))
+
+        assert results == [{"id": 42}] * 5
+        verifier._http.get.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_entry_expires_with_cache_ttl(self, monkeypatch):
+        verifier = connected_verifier(cache_ttl=60)
+        token = make_token(exp_in=600)
+        await verifier.verify(token)
+
+        now = time.time()
+        monkeypatch.setattr(token_verifier.time, "time", lambda: now + 61)
+        await verifier.verify(token)
+
+        assert verifier._http.get.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_evicted(self):
+        verifier = connected_verifier(max_entries=2)
+        for jti in ("a", "b", "a", "c"):
+            await verifier.verify(make_token(jti=jti))
+
+        assert list(verifier._cache) == ["a", "c"]
+        assert verifier._user_jtis == {"42": {"a", "c"}}
+
+    @pytest.mark.asyncio
+    async def test_cache_bypassed_while_feed_disconnected(self):
+        verifier = connected_verifier()
+        verifier._feed_connected = False
+        token = make_token()
+
+        await verifier.verify(token)
+        await verifier.verify(token)
+
+        assert verifier._http.get.await_count == 2
+        assert verifier._cache == {}
+
+
+class TestRevocations:
+    @pytest.mark.asyncio
+    async def test_jti_revocation_evicts_one_token(self):
+        verifier = connected_verifier()
+        await verifier.verify(make_token(jti="a"))
+        await verifier.verify(make_token(jti="b"))
+
+        verifier.apply_revocation({"type": "jti", "jti": "a"})
+
+        assert list(verifier._cache) == ["b"]
+
+    @pytest.mark.asyncio
+    async def test_user_revocation_evicts_every_token_of_user(self):
+        verifier = connected_verifier()
+        await verifier.verify(make_token(jti="a"))
+        await verifier.verify(make_token(jti="b"))
+        await verifier.verify(make_token(jti="c", sub="7"))
+
+        verifier.apply_revocation({"type": "user", "user_id": 42})
+
+        assert list(verifier._cache) == ["c"]
+        assert "42" not in verifier._user_jtis
+
+    @pytest.mark.asyncio
+    async def test_revocation_during_fetch_not_cached(self):
+        verifier = connected_verifier()
+
+        async def revoked_while_fetching(*args, **kwargs):
+            verifier.apply_revocation({"type": "user", "user_id": "42"})
+            return Mock(status_code=200, json=Mock(return_value={"id": 42}))
+
+        verifier._http.get = AsyncMock(side_effect=revoked_while_fetching)
+
+        assert await verifier.verify(make_token()) == {"id": 42}
+        assert verifier._cache == {}
+
+    @pytest.mark.asyncio
+    async def test_feed_message_invalidates_cache(self, monkeypatch):
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(
+            token_verifier.redis, "from_url",
+            lambda url, **kwargs: fakeredis.aioredis.FakeRedis(server=server, **kwargs)
+        )
+        verifier = TokenVerifier("http://auth-service", SECRET, redis_url="redis://redis:6379/0")
+        await verifier.start()
+        await verifier._http.aclose()
+        verifier._http = auth_service()
+        try:
+            for _ in range(100):
+                if verifier._feed_connected:
+                    break
+                await asyncio.sleep(0.01)
+            token = make_token()
+            await verifier.verify(token)
+            assert "jti-1" in verifier._cache
+
+            publisher = fakeredis.aioredis.FakeRedis(server=server)
+            await publisher.publish(verifier.revocation_channel, json.dumps({"type": "jti", "jti": "jti-1"}))
+            for _ in range(100):
+                if "jti-1" not in verifier._cache:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert "jti-1" not in verifier._cache
+            await verifier.verify(token)
+            assert verifier._http.get.await_count == 2
+        finally:
+            await verifier.stop()